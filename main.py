@@ -53,6 +53,10 @@ from src.evaluations.routes import evaluation_routes  # Sistema de evaluaciones
 from src.content.template_routes import template_bp, preview_bp
 # Sistema de eliminación en cascada
 from src.shared.cascade_routes import cascade_bp
+# Métricas internas (cachés, contadores)
+from src.shared.metrics_routes import metrics_bp
+# Cola durable de tareas en segundo plano
+from src.shared.background_task_routes import background_tasks_bp, register_inline_task_drain
 # Sistema de validación de LLM
 from src.llm.routes import llm_bp
 # Sistema de progreso
@@ -290,6 +294,11 @@ def create_app(config_object=active_config):
     # Sistema de eliminación en cascada
     app.register_blueprint(cascade_bp, url_prefix='/api/cascade')
     
+    # Métricas internas
+    app.register_blueprint(metrics_bp)  # Ya incluye url_prefix='/api/metrics'
+    app.register_blueprint(background_tasks_bp)  # Ya incluye url_prefix='/api/background-tasks'
+    register_inline_task_drain(app)  # Modo durable (Vercel): procesa las tareas de cada petición
+    
     # Sistema de validación de LLM
     app.register_blueprint(llm_bp, url_prefix='/api/llm')
 
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark del validador de HTML de slides.
+
+Compara el escáner de una sola pasada (src/content/html_safety.py) con la
+implementación anterior de ContentService.validate_slide_html_content
+(varias pasadas de lower()/in/re.findall), verificando además que ambos
+devuelvan exactamente el mismo resultado para cada documento.
+
+Corpus:
+    - Plantillas de ejemplo (src/content/template_examples.py), siempre incluidas
+    - Archivos .html de un directorio (--dir)
+    - Slides reales de MongoDB (--from-db, requiere MONGO_DB_URI y DB_NAME):
+      content.content_html y content.full_html de topic_contents tipo slide
+
+Uso:
+    python scripts/benchmark_slide_html_validation.py
+    python scripts/benchmark_slide_html_validation.py --from-db --limit 500
+    python scripts/benchmark_slide_html_validation.py --dir ./slides --repeat 20
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.content.html_safety import SLIDE_LINK_WHITELIST, SLIDE_SCRIPT_WHITELIST, validate_slide_html
+
+_log = logging.getLogger("benchmark_slide_html_validation")
+_log.addHandler(logging.NullHandler())
+_log.propagate = False
+
+
+def legacy_validate_slide_html_content(
+    html_content: str,
+    allow_full_document: bool = False,
+    allow_iframe: bool = False,
+) -> Tuple[bool, str]:
+    """Implementación anterior (multi-pasada), conservada solo como referencia."""
+    try:
+        if not isinstance(html_content, str):
+            _log.debug("validate_slide_html_content: contenido no es str")
+            return False, "HTML debe ser una cadena de texto"
+        raw = html_content
+        if not raw.strip():
+            _log.debug("validate_slide_html_content: contenido vacío o solo espacios")
+            return False, "HTML no debe estar vacío"
+
+        # Tamaño razonable para una slide individual (150 KB = 153,600 bytes)
+        max_bytes = (2 * 1024 * 1024) if allow_full_document else (150 * 1024)  # 150KB or 2MB
+        current_bytes = len(html_content.encode('utf-8'))
+        if current_bytes > max_bytes:
+            _log.warning(f"validate_slide_html_content: HTML demasiado largo ({current_bytes} bytes > {max_bytes} bytes)")
+            return False, f"HTML excede el tamaño máximo permitido de 150 KB ({current_bytes:,} bytes de {max_bytes:,} bytes permitidos)"
+
+        low = raw.lower()
+
+        # Prohibir tags peligrosos explícitos
+        base_dangerous = ["object", "embed"]
+        if not allow_iframe:
+            base_dangerous.append("iframe")
+
+        # link se valida por whitelist (igual que script), no se prohíbe categóricamente
+        dangerous_tags = base_dangerous if allow_full_document else base_dangerous + ["meta", "base"]
+        for tag in dangerous_tags:
+            if f"<{tag}" in low or f"</{tag}" in low:
+                _log.warning(f"validate_slide_html_content: encontrado tag prohibido <{tag}>")
+                return False, f"HTML contiene etiqueta <{tag}> prohibida"
+
+        # Validar <link> con whitelist de CDNs permitidos
+        if "<link" in low:
+            link_tags = re.findall(r"<link[^>]*>", raw, flags=re.IGNORECASE)
+            for tag in link_tags:
+                href_match = re.search(r'href\s*=\s*"([^"]+)"|href\s*=\s*\'([^\']+)\'', tag, flags=re.IGNORECASE)
+                href_value = None
+                if href_match:
+                    href_value = href_match.group(1) or href_match.group(2)
+                if not href_value:
+                    # Links sin href (ej: <link rel="preconnect">) se permiten
+                    continue
+                normalized_href = href_value.strip().lower()
+                # Validar que el href esté en la whitelist de CDNs
+                if not any(allowed in normalized_href for allowed in SLIDE_LINK_WHITELIST):
+                    _log.warning(f"validate_slide_html_content: link href no permitido {href_value}")
+                    return False, f"HTML contiene etiqueta <link> con href no autorizado: {href_value}"
+
+        # Validar scripts: permitir inline si allow_full_document, o externos autorizados
+        if "<script" in low:
+            script_tags = re.findall(r"<script[^>]*>", raw, flags=re.IGNORECASE)
+            if not script_tags:
+                _log.warning("validate_slide_html_content: <script> sin tag de apertura reconocido")
+                return False, "HTML contiene etiqueta <script> prohibida"
+            for tag in script_tags:
+                src_match = re.search(r'src\s*=\s*"([^"]+)"|src\s*=\s*\'([^\']+)\'', tag, flags=re.IGNORECASE)
+                src_value = None
+                if src_match:
+                    src_value = src_match.group(1) or src_match.group(2)
+                
+                if not src_value:
+                    # Script inline (sin src) - permitir solo si allow_full_document
+                    if not allow_full_document:
+                        _log.warning("validate_slide_html_content: <script> sin atributo src (no permitido sin allow_full_document)")
+                        return False, "HTML contiene etiqueta <script> sin src (prohibido)"
+                    # Scripts inline permitidos para documentos completos (ej: videos interactivos)
+                    _log.debug("validate_slide_html_content: script inline permitido (allow_full_document=True)")
+                    continue
+
+                # Script con src - validar whitelist
+                normalized_src = src_value.strip()
+                normalized_src_base = normalized_src.split("?")[0].lower()
+                if not any(normalized_src_base.startswith(allowed.lower()) for allowed in SLIDE_SCRIPT_WHITELIST):
+                    _log.warning(f"validate_slide_html_content: script src no permitido {normalized_src}")
+                    return False, "HTML contiene etiqueta <script> con src no autorizado"
+
+        # Prohibir eventos inline (on*) salvo cuando se permite documento completo
+        if not allow_full_document:
+            if re.search(r'on[a-z]+\s*=', low):
+                _log.warning("validate_slide_html_content: encontrado atributo de evento inline (on*)")
+                return False, "HTML contiene atributos de evento inline (on*) que estan prohibidos"
+        # Prohibir javascript: URIs
+        if "javascript:" in low:
+            _log.warning("validate_slide_html_content: encontrado javascript: URI")
+            return False, "HTML contiene URIs javascript: que están prohibidas"
+
+        # Prohibir data: URIs that could embed scripts or HTML (basic)
+        if re.search(r'data:\s*text\/html', low) or re.search(r'data:\s*text\/javascript', low):
+            _log.warning("validate_slide_html_content: encontrado data:text/html o data:text/javascript")
+            return False, "HTML contiene data: URIs potencialmente peligrosas"
+
+        # CSS expression() and javascript in url()
+        if "expression(" in low or re.search(r'url\(\s*javascript:', low):
+            _log.warning("validate_slide_html_content: encontrado expression() o url(javascript:...) en CSS")
+            return False, "HTML contiene expresiones CSS potencialmente peligrosas"
+
+        # Comprobar equilibrio básico de <> para detectar HTML truncado
+        # Nota: Para documentos completos (allow_full_document), omitir este check porque
+        # el JavaScript puede contener muchos operadores < y > que no son etiquetas HTML
+        if not allow_full_document:
+            lt_count = raw.count("<")
+            gt_count = raw.count(">")
+            if abs(lt_count - gt_count) > 5:  # allow small imbalance for fragments, but not large mismatches
+                _log.debug(f"validate_slide_html_content: desequilibrio en etiquetas (<: {lt_count}, >: {gt_count})")
+                return False, "HTML parece estar mal formado (desequilibrio de etiquetas)"
+
+        # Comprobar número de etiquetas para evitar payloads excesivos
+        tag_count = len(re.findall(r"<[a-zA-Z]+[^\>]*>", raw))
+        if tag_count > 500:
+            _log.warning(f"validate_slide_html_content: demasiadas etiquetas HTML ({tag_count})")
+            return False, "HTML contiene demasiadas etiquetas; posiblemente intento de abuso"
+
+        # Comprobar existencia de contenido significativo (texto o tags comunes)
+        if not re.search(r"[A-Za-z0-9]", raw) and tag_count == 0:
+            _log.debug("validate_slide_html_content: sin texto alfanumérico ni etiquetas detectadas")
+            return False, "HTML no contiene contenido válido"
+
+        # Es aceptable si el HTML es un fragmento ligero; registrar advertencias cuando aplica
+        if tag_count == 0:
+            _log.debug("validate_slide_html_content: HTML parece ser texto plano o fragmento sin etiquetas")
+
+        _log.debug("validate_slide_html_content: HTML validado correctamente")
+        return True, ""
+    except Exception as e:
+        _log.error(f"Error validando HTML de slide: {str(e)}")
+        return False, f"Error validando HTML: {str(e)}"
+
+
+def load_example_corpus() -> List[str]:
+    from src.content import template_examples
+    return [
+        value for name, value in vars(template_examples).items()
+        if name.isupper() and isinstance(value, str)
+    ]
+
+
+def load_dir_corpus(path: str) -> List[str]:
+    docs = []
+    for root, _, files in os.walk(path):
+        for filename in files:
+            if filename.lower().endswith((".html", ".htm")):
+                with open(os.path.join(root, filename), encoding="utf-8", errors="replace") as fh:
+                    docs.append(fh.read())
+    return docs
+
+
+def load_db_corpus(limit: int) -> List[str]:
+    from src.shared.database import get_db
+    docs = []
+    cursor = get_db().topic_contents.find(
+        {"content_type": "slide"},
+        {"content.content_html": 1, "content.full_html": 1}
+    ).limit(limit)
+    for doc in cursor:
+        content = doc.get("content") or {}
+        for key in ("content_html", "full_html"):
+            if isinstance(content.get(key), str) and content[key].strip():
+                docs.append(content[key])
+    return docs
+
+
+def synthetic_variants(corpus: List[str]) -> List[str]:
+    """Variantes maliciosas para ejercitar todas las reglas."""
+    injections = [
+        '<img src="x" onerror="alert(1)">',
+        '<a href="javascript:alert(1)">x</a>',
+        '<iframe src="https://example.com"></iframe>',
+        '<script src="https://evil.example.com/x.js"></script>',
+        '<link rel="stylesheet" href="https://evil.example.com/x.css">',
+        '<div style="width: expression(alert(1))"></div>',
+        '<object data="x"></object>',
+        '<a href="data:text/html;base64,AAAA">x</a>',
+    ]
+    variants = []
+    for doc in corpus[:10]:
+        for injection in injections:
+            variants.append(doc.replace("</body>", injection + "</body>") if "</body>" in doc else doc + injection)
+    return variants
+
+
+def run(corpus: List[str], repeat: int) -> int:
+    modes = [(True, True), (False, False), (False, True)]
+    mismatches = 0
+    for doc in corpus:
+        for full_doc, iframe in modes:
+            legacy = legacy_validate_slide_html_content(doc, full_doc, iframe)
+            current = validate_slide_html(doc, full_doc, iframe)
+            if legacy != current:
+                mismatches += 1
+                print(f"DIFERENCIA (full={full_doc}, iframe={iframe}): legacy={legacy} actual={current}")
+
+    total_bytes = sum(len(doc.encode("utf-8")) for doc in corpus)
+    print(f"Documentos: {len(corpus)}  Tamaño total: {total_bytes / 1024:.1f} KB  Repeticiones: {repeat}")
+    for full_doc, iframe in modes:
+        timings = {}
+        for label, fn in (("legacy", legacy_validate_slide_html_content), ("scanner", validate_slide_html)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for doc in corpus:
+                    fn(doc, full_doc, iframe)
+            timings[label] = time.perf_counter() - start
+        speedup = timings["legacy"] / timings["scanner"] if timings["scanner"] else float("inf")
+        print(
+            f"allow_full_document={full_doc!s:5} allow_iframe={iframe!s:5} "
+            f"legacy={timings['legacy'] * 1000:8.1f} ms  scanner={timings['scanner'] * 1000:8.1f} ms  "
+            f"x{speedup:.2f}"
+        )
+    print(f"Resultados distintos: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="Directorio con archivos .html")
+    parser.add_argument("--from-db", action="store_true", help="Cargar slides reales desde MongoDB")
+    parser.add_argument("--limit", type=int, default=200, help="Máximo de slides a leer de MongoDB")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeticiones por documento")
+    args = parser.parse_args()
+
+    corpus = load_example_corpus()
+    if args.dir:
+        corpus.extend(load_dir_corpus(args.dir))
+    if args.from_db:
+        corpus.extend(load_db_corpus(args.limit))
+    corpus.extend(synthetic_variants(corpus))
+
+    sys.exit(1 if run(corpus, args.repeat) else 0)
+
+
+if __name__ == "__main__":
+    main()
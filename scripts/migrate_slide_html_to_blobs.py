@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Script para mover el HTML en línea de slides al almacén de blobs direccionado
+por contenido (src/shared/blob_store.py) y recolectar blobs sin referencias.
+
+Recorre topic_contents y virtual_topic_contents; cada content.content_html /
+content.full_html de al menos CONTENT_BLOB_MIN_BYTES se reemplaza por una
+referencia {"blob_ref", "length"}. HTML idéntico queda en un único blob.
+
+La actualización es condicional (el campo debe seguir teniendo el mismo texto),
+de modo que una edición concurrente nunca se pierde.
+
+Uso:
+    python scripts/migrate_slide_html_to_blobs.py --dry-run
+    python scripts/migrate_slide_html_to_blobs.py --batch-size 200
+    python scripts/migrate_slide_html_to_blobs.py --gc-only
+"""
+
+import sys
+import os
+import logging
+import argparse
+
+# Agregar path para importar módulos del proyecto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.shared.database import get_db
+from src.shared.blob_store import BLOB_FIELDS, ContentBlobStore
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("topic_contents", "virtual_topic_contents")
+
+
+def migrate_collection(store: ContentBlobStore, collection_name: str, batch_size: int, dry_run: bool) -> dict:
+    """
+    Externaliza los campos HTML en línea de una colección.
+
+    Returns:
+        Dict con documentos revisados, campos movidos y bytes en línea liberados
+    """
+    collection = get_db()[collection_name]
+    query = {"$or": [{f"content.{field}": {"$type": "string"}} for field in BLOB_FIELDS]}
+    projection = {f"content.{field}": 1 for field in BLOB_FIELDS}
+    report = {"documents": 0, "fields_moved": 0, "inline_bytes": 0}
+
+    for doc in collection.find(query, projection).batch_size(batch_size):
+        report["documents"] += 1
+        content = doc.get("content") or {}
+        for field in BLOB_FIELDS:
+            text = content.get(field)
+            if not isinstance(text, str) or len(text.encode("utf-8")) < store.min_bytes:
+                continue
+            report["fields_moved"] += 1
+            report["inline_bytes"] += len(text.encode("utf-8"))
+            if dry_run:
+                continue
+            ref = store.put(text)
+            result = collection.update_one(
+                {"_id": doc["_id"], f"content.{field}": text},
+                {"$set": {f"content.{field}": ref}}
+            )
+            if not result.modified_count:
+                # El documento cambió mientras tanto: no dejar la referencia colgada
+                store.release(ref)
+                report["fields_moved"] -= 1
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mueve HTML de slides al almacén de blobs")
+    parser.add_argument("--dry-run", action="store_true", help="Solo reportar, sin escribir")
+    parser.add_argument("--batch-size", type=int, default=200, help="Tamaño de lote del cursor")
+    parser.add_argument("--gc-only", action="store_true", help="Solo recolectar blobs sin referencias")
+    args = parser.parse_args()
+
+    store = ContentBlobStore(enabled=True)
+
+    try:
+        if not args.gc_only:
+            for collection_name in COLLECTIONS:
+                report = migrate_collection(store, collection_name, args.batch_size, args.dry_run)
+                logger.info(
+                    f"{collection_name}: {report['documents']} documentos revisados, "
+                    f"{report['fields_moved']} campos {'a mover' if args.dry_run else 'movidos'}, "
+                    f"{report['inline_bytes'] / (1024 * 1024):.2f} MB en línea"
+                )
+
+        if not args.dry_run:
+            removed = store.collect_garbage(limit=10000)
+            logger.info(f"Blobs sin referencias eliminados: {removed}")
+
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrumpido por usuario")
+        sys.exit(1)
+    except Exception as e:
+        logger.error(f"Error durante la migración: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from src.shared.database import get_db
 from src.shared.constants import COLLECTIONS, ROLES
 from src.shared.standardization import BaseService, ErrorCodes
 from src.shared.exceptions import AppException
+from src.shared.evaluation_statistics import EvaluationStatisticsEngine
 from .models import (
     StudentPerformance,
     ClassStatistics,
@@ -14,6 +15,13 @@ from .models import (
     TeacherAnalytics
 )
 
+# Estadísticas de tiempo vacías: evaluation_results no registra tiempos de resolución
+EMPTY_TIME_STATS = {
+    "avg_completion_time": 0.0,
+    "min_completion_time": 0.0,
+    "max_completion_time": 0.0
+}
+
 class StudentAnalyticsService(BaseService):
     def __init__(self):
         super().__init__(collection_name="analytics_student_performance")
@@ -691,33 +699,35 @@ class EvaluationAnalyticsService(BaseService):
 
     def analyze_evaluation(self, evaluation_id: str) -> Optional[Dict]:
         try:
-            # Obtener resultados de la evaluación
-            results = list(self.db.evaluation_results.find({
-                "evaluation_id": ObjectId(evaluation_id)
-            }))
-
-            if not results:
+            # Estadísticas de los resultados calculadas sin cargar los documentos
+            stats = EvaluationStatisticsEngine(self.db).result_statistics(evaluation_id)
+            total = stats["count"]
+            if not total:
                 return None
 
-            # Calcular métricas básicas
+            first_result = self.db.evaluation_results.find_one(
+                {"evaluation_id": ObjectId(evaluation_id)}, {"class_id": 1}
+            ) or {}
+
+            # Calcular métricas básicas (los resultados sin nota cuentan como 0)
             metrics = {
-                "avg_score": sum(r.get("score", 0) for r in results) / len(results),
-                "completion_rate": len([r for r in results if r.get("status") == "completed"]) / len(results),
-                "passing_rate": len([r for r in results if r.get("score", 0) >= 60]) / len(results)
+                "avg_score": (stats["mean"] or 0) * stats["scored"] / total,
+                "completion_rate": stats["completed"] / total,
+                "passing_rate": stats["passing"] / total,
+                "score_stddev": stats["stddev"],
+                "min_score": stats["min"],
+                "max_score": stats["max"],
+                "score_percentiles": stats["percentiles"],
+                "score_histogram": stats["histogram"]
             }
 
-            # Analizar estadísticas por pregunta
-            question_stats = self._analyze_questions(results)
-
-            # Calcular estadísticas de tiempo
-            time_stats = self._calculate_time_stats(results)
-
+            # evaluation_results no guarda respuestas por pregunta ni tiempos de resolución
             analytics = EvaluationAnalytics(
                 evaluation_id=evaluation_id,
-                class_id=str(results[0]["class_id"]),
+                class_id=str(first_result.get("class_id")),
                 metrics=metrics,
-                question_stats=question_stats,
-                time_stats=time_stats
+                question_stats=[],
+                time_stats=dict(EMPTY_TIME_STATS)
             )
 
             return analytics.to_dict()
@@ -725,18 +735,6 @@ class EvaluationAnalyticsService(BaseService):
             print(f"Error al analizar evaluación: {str(e)}")
             return None
 
-    def _analyze_questions(self, results: List[Dict]) -> List[Dict]:
-        # Implementar análisis detallado por pregunta
-        return []
-
-    def _calculate_time_stats(self, results: List[Dict]) -> Dict[str, float]:
-        # Implementar cálculos de tiempo
-        return {
-            "avg_completion_time": 0.0,
-            "min_completion_time": 0.0,
-            "max_completion_time": 0.0
-        }
-
 class InstituteAnalyticsService(BaseService):
     def __init__(self):
         super().__init__(collection_name="analytics_institutes")
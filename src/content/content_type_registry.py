@@ -0,0 +1,231 @@
+"""
+Registro en proceso de los tipos de contenido.
+
+Los tipos de contenido casi nunca cambian, pero create_content y
+create_bulk_content los consultaban con un find_one por elemento. El registro
+carga todos los tipos activos con una sola consulta y responde búsquedas por
+código (incluidos los alias de ContentService) desde un diccionario.
+
+Se recarga cuando:
+    - vence CONTENT_TYPE_REGISTRY_TTL_SECONDS (acota cambios hechos fuera del servicio),
+    - cambia el sello de versión `content_types:registry:version` del backend
+      compartido (src/shared/cache.py). Cualquier escritura a través de
+      ContentTypeService llama a invalidate(), que incrementa el sello; con
+      SHARED_CACHE_BACKEND=mongo las demás instancias recargan en como máximo
+      VERSION_CHECK_SECONDS.
+
+Ejemplo de uso:
+    from src.content.content_type_registry import content_type_registry
+
+    content_type_def = content_type_registry.get("pdf")  # -> tipo "documents"
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.shared.cache import get_shared_cache_backend
+from src.shared.metrics import increment, register_metrics_provider
+
+CONTENT_TYPES_COLLECTION = "content_types"
+REGISTRY_VERSION_KEY = "content_types:registry:version"
+DEFAULT_TTL_SECONDS = 300
+VERSION_CHECK_SECONDS = 2
+
+# Alias aceptados en payloads -> código registrado
+CONTENT_TYPE_ALIASES = {
+    'document': 'documents',
+    'documents': 'documents',
+    'doc': 'documents',
+    'docx': 'documents',
+    'pdf': 'documents',
+    'video_content': 'video',
+    'image_content': 'image',
+    'audio_content': 'audio',
+    'external_link': 'link',
+    'link': 'link',
+    'slide-template': 'slide_template'
+}
+
+# Tipos internos no registrados en la colección
+BUILTIN_CONTENT_TYPES = {
+    "slide_template": {
+        "code": "slide_template",
+        "name": "Slide Template",
+        "description": "Plantilla base reutilizable para renderizar diapositivas",
+        "status": "active",
+        "subcategory": "template",
+        "builtin": True
+    }
+}
+
+
+def normalize_content_type_code(code: Optional[str]) -> Optional[str]:
+    """Minúsculas, sin espacios y con el alias resuelto; valores vacíos se retornan igual."""
+    if not code or not isinstance(code, str):
+        return code
+    normalized = code.strip().lower()
+    return CONTENT_TYPE_ALIASES.get(normalized, normalized)
+
+
+class ContentTypeRegistry:
+    """
+    Instantánea inmutable {código: tipo} de los tipos de contenido activos.
+    """
+
+    def __init__(self, collection=None, ttl_seconds: Optional[float] = None,
+                 version_check_seconds: float = VERSION_CHECK_SECONDS, backend=None,
+                 register_metrics: bool = True):
+        """
+        Args:
+            collection: Colección de tipos (por defecto get_db()["content_types"], diferida)
+            ttl_seconds: Vida máxima de la instantánea
+            version_check_seconds: Intervalo mínimo entre lecturas del sello de versión
+            backend: Backend compartido del sello (por defecto get_shared_cache_backend())
+        """
+        self._collection = collection
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("CONTENT_TYPE_REGISTRY_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._by_code: Optional[Dict[str, Dict]] = None
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._version_checked_at = 0.0
+        self._reloads = 0
+        self._lookups = 0
+        if register_metrics:
+            register_metrics_provider("content_type_registry", self.stats)
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from src.shared.database import get_db
+            self._collection = get_db()[CONTENT_TYPES_COLLECTION]
+        return self._collection
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else get_shared_cache_backend()
+
+    def _read_version(self) -> Optional[int]:
+        try:
+            return self.backend.get_counter(REGISTRY_VERSION_KEY)
+        except Exception as e:
+            logging.debug(f"ContentTypeRegistry: no se pudo leer el sello de versión: {e}")
+            return None
+
+    def _is_stale(self, now: float) -> bool:
+        if self._by_code is None or now - self._loaded_at >= self.ttl_seconds:
+            return True
+        if now - self._version_checked_at < self.version_check_seconds:
+            return False
+        self._version_checked_at = now
+        version = self._read_version()
+        return version is not None and version != self._version
+
+    def _load(self) -> Dict[str, Dict]:
+        version = self._read_version()
+        by_code: Dict[str, Dict] = {}
+        for content_type in self.collection.find({"status": "active"}):
+            content_type["_id"] = str(content_type["_id"])
+            code = content_type.get("code")
+            if isinstance(code, str):
+                by_code[code.strip().lower()] = content_type
+        for code, content_type in BUILTIN_CONTENT_TYPES.items():
+            by_code.setdefault(code, content_type)
+        # Los alias apuntan al mismo diccionario que su código registrado
+        for alias, code in CONTENT_TYPE_ALIASES.items():
+            if code in by_code and alias not in by_code:
+                by_code[alias] = by_code[code]
+
+        now = time.monotonic()
+        self._by_code = by_code
+        self._version = version
+        self._loaded_at = now
+        self._version_checked_at = now
+        self._reloads += 1
+        increment("content_type_registry.reloads")
+        return by_code
+
+    def _snapshot(self) -> Dict[str, Dict]:
+        by_code = self._by_code
+        if not self._is_stale(time.monotonic()):
+            return by_code
+        with self._lock:
+            # Otro hilo pudo recargar mientras se esperaba el lock
+            if self._by_code is not by_code and self._by_code is not None:
+                return self._by_code
+            try:
+                return self._load()
+            except Exception as e:
+                if self._by_code is None:
+                    raise
+                logging.warning(f"ContentTypeRegistry: recarga fallida, se usa la instantánea anterior: {e}")
+                self._loaded_at = time.monotonic()
+                return self._by_code
+
+    def get(self, code: Optional[str]) -> Optional[Dict]:
+        """Tipo de contenido activo por código o alias (copia), o None."""
+        if not code or not isinstance(code, str):
+            return None
+        normalized = code.strip().lower()
+        self._lookups += 1
+        content_type = self._snapshot().get(normalized)
+        return dict(content_type) if content_type is not None else None
+
+    def get_many(self, codes: Iterable[Optional[str]]) -> Dict[str, Dict]:
+        """{código normalizado: tipo} para los códigos existentes; los demás se omiten."""
+        by_code = self._snapshot()
+        result = {}
+        for code in codes:
+            if not isinstance(code, str) or not code.strip():
+                continue
+            normalized = code.strip().lower()
+            self._lookups += 1
+            if normalized in by_code:
+                result[normalized] = dict(by_code[normalized])
+        return result
+
+    def list(self, subcategory: Optional[str] = None, include_builtin: bool = False) -> List[Dict]:
+        """Tipos activos (sin alias), opcionalmente filtrados por subcategoría."""
+        seen = set()
+        result = []
+        for content_type in self._snapshot().values():
+            if id(content_type) in seen:
+                continue
+            seen.add(id(content_type))
+            if content_type.get("builtin") and not include_builtin:
+                continue
+            if subcategory and content_type.get("subcategory") != subcategory:
+                continue
+            result.append(dict(content_type))
+        return result
+
+    def invalidate(self) -> None:
+        """Descarta la instantánea local y avisa a las demás instancias."""
+        with self._lock:
+            self._by_code = None
+        try:
+            self.backend.incr(REGISTRY_VERSION_KEY)
+        except Exception as e:
+            logging.warning(f"ContentTypeRegistry: no se pudo publicar la invalidación: {e}")
+        increment("content_type_registry.invalidations")
+
+    def stats(self) -> Dict[str, Any]:
+        by_code = self._by_code or {}
+        return {
+            "loaded": self._by_code is not None,
+            "content_types": len({id(ct) for ct in by_code.values()}),
+            "version": self._version,
+            "reloads": self._reloads,
+            "lookups": self._lookups,
+        }
+
+
+# Instancia compartida por los servicios
+content_type_registry = ContentTypeRegistry()
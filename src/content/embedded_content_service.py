@@ -5,6 +5,11 @@ from bson import ObjectId
 from pymongo.database import Database
 from src.content.models import ContentTypes, TopicContent
 
+# Estados de los contenidos que participan en el análisis de embedding
+EMBEDDING_ACTIVE_STATUSES = ["draft", "active", "published"]
+# Campos suficientes para las estadísticas (sin cargar el contenido de las slides)
+EMBEDDING_STATISTICS_PROJECTION = {"content_type": 1, "status": 1, "parent_content_id": 1, "order": 1}
+
 class EmbeddedContentService:
     """
     Servicio para manejar contenido embebido vs separado en diapositivas.
@@ -58,39 +63,44 @@ class EmbeddedContentService:
             if not slide:
                 return {'strategy': 'error', 'reason': 'Diapositiva no encontrada'}
             
-            content_type = content.get('content_type')
-            content_data = content.get('content', {})
-            
-            # Verificar si el tipo puede ser embebido
-            if content_type in self.separate_only_types:
-                return {
-                    'strategy': 'separate',
-                    'reason': f'Tipo {content_type} requiere presentación separada',
-                    'confidence': 1.0
-                }
-            
-            if content_type not in self.embeddable_types:
-                return {
-                    'strategy': 'separate',
-                    'reason': f'Tipo {content_type} no soporta embedding',
-                    'confidence': 0.8
-                }
-            
-            # Analizar características del contenido
-            embed_config = self.embeddable_types[content_type]
-            analysis = self._analyze_content_characteristics(content_data, embed_config)
-            
-            # Analizar la diapositiva actual
-            slide_analysis = self._analyze_slide_capacity(slide)
-            
-            # Determinar estrategia final
-            strategy = self._determine_embedding_strategy(analysis, slide_analysis, embed_config)
-            
-            return strategy
+            return self.analyze_loaded_documents(slide, content)
             
         except Exception as e:
             logging.error(f"Error analizando estrategia de embedding: {str(e)}")
             return {'strategy': 'error', 'reason': f'Error interno: {str(e)}'}
+
+    def analyze_loaded_documents(self, slide: Dict, content: Dict) -> Dict[str, Any]:
+        """
+        Misma decisión que analyze_content_embedding_strategy sobre documentos ya
+        cargados (sin consultas). Lo usan los análisis por lote del tema.
+        """
+        content_type = content.get('content_type')
+        content_data = content.get('content', {})
+        
+        # Verificar si el tipo puede ser embebido
+        if content_type in self.separate_only_types:
+            return {
+                'strategy': 'separate',
+                'reason': f'Tipo {content_type} requiere presentación separada',
+                'confidence': 1.0
+            }
+        
+        if content_type not in self.embeddable_types:
+            return {
+                'strategy': 'separate',
+                'reason': f'Tipo {content_type} no soporta embedding',
+                'confidence': 0.8
+            }
+        
+        # Analizar características del contenido
+        embed_config = self.embeddable_types[content_type]
+        analysis = self._analyze_content_characteristics(content_data, embed_config)
+        
+        # Analizar la diapositiva actual
+        slide_analysis = self._analyze_slide_capacity(slide)
+        
+        # Determinar estrategia final
+        return self._determine_embedding_strategy(analysis, slide_analysis, embed_config)
     
     def _analyze_content_characteristics(self, content_data: Any, embed_config: Dict) -> Dict:
         """
@@ -380,59 +390,113 @@ class EmbeddedContentService:
             logging.error(f"Error extrayendo contenido embebido: {str(e)}")
             return False, f"Error interno: {str(e)}"
     
-    def get_embedding_recommendations(self, topic_id: str) -> List[Dict]:
+    def _load_topic_embedding_documents(self, topic_id: str, projection: Optional[Dict] = None) -> Dict[str, Any]:
         """
-        Obtiene recomendaciones de embedding para todos los contenidos de un tema.
-        
+        Carga con una sola consulta los contenidos del tema relevantes para el
+        embedding y los agrupa en una pasada.
+
+        Returns:
+            Dict con slides (ordenadas por order), contents_by_parent
+            ({parent_content_id: [contenidos]}), separate_count y embedded_count
+        """
+        documents = self.collection.find({
+            "topic_id": ObjectId(topic_id),
+            "status": {"$in": EMBEDDING_ACTIVE_STATUSES + ["embedded"]}
+        }, projection)
+
+        slides = []
+        contents_by_parent: Dict[str, List[Dict]] = {}
+        separate_count = 0
+        embedded_count = 0
+        for document in documents:
+            status = document.get("status")
+            if status == "embedded":
+                embedded_count += 1
+                continue
+            if document.get("content_type") == ContentTypes.SLIDE:
+                slides.append(document)
+            parent_id = document.get("parent_content_id")
+            if parent_id is not None:
+                separate_count += 1
+                contents_by_parent.setdefault(str(parent_id), []).append(document)
+
+        # Mismo orden que sort("order", 1) en Mongo: sin order primero
+        slides.sort(key=lambda slide: (slide.get("order") is not None, slide.get("order") or 0))
+        return {
+            "slides": slides,
+            "contents_by_parent": contents_by_parent,
+            "separate_count": separate_count,
+            "embedded_count": embedded_count
+        }
+
+    def analyze_topic_embeddings(self, topic_id: str, include_recommendations: bool = True) -> Dict[str, Any]:
+        """
+        Recomendaciones y estadísticas de embedding de un tema con una sola
+        consulta: cada par diapositiva-contenido se analiza sobre los
+        documentos ya cargados.
+
         Args:
             topic_id: ID del tema
-            
+            include_recommendations: False para calcular solo estadísticas
+                (se proyectan únicamente los campos necesarios)
+
         Returns:
-            Lista de recomendaciones de embedding
+            Dict con recommendations (lista) y statistics
         """
-        try:
-            recommendations = []
-            
-            # Obtener todas las diapositivas del tema
-            slides = list(self.collection.find({
-                "topic_id": ObjectId(topic_id),
-                "content_type": ContentTypes.SLIDE,
-                "status": {"$in": ["draft", "active", "published"]}
-            }).sort("order", 1))
-            
-            # Obtener contenidos opcionales
-            optional_contents = list(self.collection.find({
-                "topic_id": ObjectId(topic_id),
-                "parent_content_id": {"$exists": True, "$ne": None},
-                "status": {"$in": ["draft", "active", "published"]}
-            }))
-            
-            # Analizar cada combinación diapositiva-contenido
+        projection = None if include_recommendations else EMBEDDING_STATISTICS_PROJECTION
+        loaded = self._load_topic_embedding_documents(topic_id, projection)
+        slides = loaded["slides"]
+
+        recommendations = []
+        if include_recommendations:
             for slide in slides:
                 slide_id = str(slide["_id"])
-                
-                # Contenidos asociados a esta diapositiva
-                associated_contents = [
-                    content for content in optional_contents
-                    if str(content.get("parent_content_id")) == slide_id
-                ]
-                
-                for content in associated_contents:
-                    content_id = str(content["_id"])
-                    strategy = self.analyze_content_embedding_strategy(slide_id, content_id)
-                    
+                slide_content = slide.get("content")
+                default_title = f"Diapositiva {slide.get('order', '?')}"
+                slide_title = slide_content.get("title", default_title) if isinstance(slide_content, dict) else default_title
+                for content in loaded["contents_by_parent"].get(slide_id, []):
+                    try:
+                        strategy = self.analyze_loaded_documents(slide, content)
+                    except Exception as e:
+                        logging.error(f"Error analizando estrategia de embedding: {str(e)}")
+                        strategy = {'strategy': 'error', 'reason': f'Error interno: {str(e)}'}
                     recommendations.append({
                         "slide_id": slide_id,
-                        "slide_title": slide.get("content", {}).get("title", f"Diapositiva {slide.get('order', '?')}"),
-                        "content_id": content_id,
+                        "slide_title": slide_title,
+                        "content_id": str(content["_id"]),
                         "content_type": content.get("content_type"),
                         "strategy": strategy["strategy"],
                         "reason": strategy["reason"],
                         "confidence": strategy.get("confidence", 0.0),
                         "recommended_position": self._suggest_embed_position(strategy)
                     })
+
+        embedded_count = loaded["embedded_count"]
+        separate_count = loaded["separate_count"]
+        total_optional = embedded_count + separate_count
+        total_slides = len(slides)
+        statistics = {
+            "total_slides": total_slides,
+            "embedded_contents": embedded_count,
+            "separate_contents": separate_count,
+            "total_optional_contents": total_optional,
+            "embedding_ratio": embedded_count / total_optional if total_optional > 0 else 0,
+            "avg_contents_per_slide": total_optional / total_slides if total_slides > 0 else 0
+        }
+        return {"recommendations": recommendations, "statistics": statistics}
+
+    def get_embedding_recommendations(self, topic_id: str) -> List[Dict]:
+        """
+        Obtiene recomendaciones de embedding para todos los contenidos de un tema.
+        
+        Args:
+            topic_id: ID del tema
             
-            return recommendations
+        Returns:
+            Lista de recomendaciones de embedding
+        """
+        try:
+            return self.analyze_topic_embeddings(topic_id)["recommendations"]
             
         except Exception as e:
             logging.error(f"Error obteniendo recomendaciones de embedding: {str(e)}")
@@ -481,33 +545,8 @@ class EmbeddedContentService:
             Dict con estadísticas de embedding
         """
         try:
-            # Contar contenidos por estado de embedding
-            embedded_count = self.collection.count_documents({
-                "topic_id": ObjectId(topic_id),
-                "status": "embedded"
-            })
-            
-            separate_count = self.collection.count_documents({
-                "topic_id": ObjectId(topic_id),
-                "parent_content_id": {"$exists": True, "$ne": None},
-                "status": {"$in": ["draft", "active", "published"]}
-            })
-            
-            total_slides = self.collection.count_documents({
-                "topic_id": ObjectId(topic_id),
-                "content_type": ContentTypes.SLIDE,
-                "status": {"$in": ["draft", "active", "published"]}
-            })
-            
-            return {
-                "total_slides": total_slides,
-                "embedded_contents": embedded_count,
-                "separate_contents": separate_count,
-                "total_optional_contents": embedded_count + separate_count,
-                "embedding_ratio": embedded_count / (embedded_count + separate_count) if (embedded_count + separate_count) > 0 else 0,
-                "avg_contents_per_slide": (embedded_count + separate_count) / total_slides if total_slides > 0 else 0
-            }
+            return self.analyze_topic_embeddings(topic_id, include_recommendations=False)["statistics"]
             
         except Exception as e:
             logging.error(f"Error obteniendo estadísticas de embedding: {str(e)}")
-            return {}
\ No newline at end of file
+            return {}
@@ -0,0 +1,287 @@
+"""
+Escáner de seguridad de HTML para diapositivas.
+
+Reemplaza la validación anterior (lower() + un `in` o `re.findall` por regla
+sobre todo el documento) por un único recorrido con un tokenizador compilado de
+las etiquetas relevantes para seguridad: en ese recorrido se resuelven las
+etiquetas prohibidas y los atributos de <link> y <script>. Los patrones en
+línea (eventos on*, javascript:, data:, CSS) se resuelven sobre la misma copia
+en minúsculas con sondas de subcadena y el conteo de etiquetas con un findall;
+en CPython ambos corren en C y son más rápidos que una máquina de estados
+escrita carácter a carácter en Python.
+
+Todas las violaciones se recolectan (scan_slide_html) y, como antes, se reporta
+la de mayor prioridad con el mismo mensaje que la implementación anterior.
+Ver scripts/benchmark_slide_html_validation.py para la comparación.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# Allowlist de scripts externos seguros (framework visual de slides)
+SLIDE_SCRIPT_WHITELIST = [
+    # Permitir cualquier version del framework de slides publicada en jsDelivr
+    "https://cdn.jsdelivr.net/gh/Luisdanielgm/framework_slide",
+    # CDNs para templates interactivos (Video Interactivo, Juegos, etc.)
+    "https://cdn.tailwindcss.com",          # Tailwind CSS CDN
+    "https://unpkg.com/lucide",             # Lucide Icons
+    "https://www.youtube.com/iframe_api",   # YouTube Iframe API
+]
+
+# Allowlist de CDNs permitidos para <link> (stylesheets, fonts, etc.)
+SLIDE_LINK_WHITELIST = [
+    "cdn.jsdelivr.net",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com",
+    "cdnjs.cloudflare.com",
+    "unpkg.com",
+]
+
+SLIDE_MAX_BYTES = 150 * 1024
+FULL_DOCUMENT_MAX_BYTES = 2 * 1024 * 1024
+MAX_TAG_COUNT = 500
+MAX_TAG_IMBALANCE = 5
+
+_SCRIPT_WHITELIST_LOWER = tuple(allowed.lower() for allowed in SLIDE_SCRIPT_WHITELIST)
+
+# Tokenizador de etiquetas relevantes para seguridad. Coincide por prefijo (igual
+# que las comprobaciones `"<object" in low` anteriores) y nunca consume más allá
+# del nombre, así que una etiqueta anidada dentro de otra no queda oculta.
+_SECURITY_TAGS = r"<(/?)(object|embed|iframe|meta|base|link|script)"
+_SECURITY_TAG_RE = re.compile(_SECURITY_TAGS)
+_SECURITY_TAG_RE_I = re.compile(_SECURITY_TAGS, re.IGNORECASE)
+_TAG_RE = re.compile(r"<[a-zA-Z]+[^\>]*>")
+_EVENT_RE = re.compile(r'on[a-z]+\s*=')
+_DATA_URI_RE = re.compile(r'data:\s*text/(?:html|javascript)')
+_CSS_JS_URL_RE = re.compile(r'url\(\s*javascript:')
+_HREF_RE = re.compile(r'href\s*=\s*"([^"]+)"|href\s*=\s*\'([^\']+)\'', re.IGNORECASE)
+_SRC_RE = re.compile(r'src\s*=\s*"([^"]+)"|src\s*=\s*\'([^\']+)\'', re.IGNORECASE)
+_ALNUM_RE = re.compile(r"[A-Za-z0-9]")
+
+# Prioridad de cada regla (menor = se reporta primero)
+RULE_DANGEROUS_TAG = 10
+RULE_LINK = 20
+RULE_SCRIPT = 30
+RULE_EVENT = 40
+RULE_JAVASCRIPT_URI = 50
+RULE_DATA_URI = 60
+RULE_CSS_EXPRESSION = 70
+RULE_IMBALANCE = 80
+RULE_TAG_COUNT = 90
+RULE_EMPTY = 100
+
+
+def _dangerous_tags(allow_full_document: bool, allow_iframe: bool) -> List[str]:
+    base_dangerous = ["object", "embed"]
+    if not allow_iframe:
+        base_dangerous.append("iframe")
+    # link se valida por whitelist (igual que script), no se prohíbe categóricamente
+    return base_dangerous if allow_full_document else base_dangerous + ["meta", "base"]
+
+
+def _attr_value(pattern: re.Pattern, tag: str) -> str:
+    match = pattern.search(tag)
+    if not match:
+        return ""
+    return match.group(1) or match.group(2) or ""
+
+
+def _violation(rule: int, code: str, message: str, **details) -> Dict:
+    violation = {"rule": rule, "code": code, "message": message}
+    if details:
+        violation["details"] = details
+    return violation
+
+
+def scan_slide_html(
+    html_content: str,
+    allow_full_document: bool = False,
+    allow_iframe: bool = False,
+    stop_at_first: bool = False,
+) -> List[Dict]:
+    """
+    Analiza el HTML y devuelve todas las violaciones encontradas.
+
+    Args:
+        html_content: HTML a analizar
+        allow_full_document: Permite documentos completos (scripts inline, eventos, 2MB)
+        allow_iframe: Permite etiquetas <iframe>
+        stop_at_first: Detenerse en cuanto se conozca la violación de mayor prioridad
+
+    Returns:
+        Lista de violaciones {"rule", "code", "message", "details"?} ordenada por prioridad
+    """
+    if not isinstance(html_content, str):
+        return [_violation(0, "not_string", "HTML debe ser una cadena de texto")]
+    raw = html_content
+    if not raw.strip():
+        return [_violation(0, "empty", "HTML no debe estar vacío")]
+
+    # Tamaño: evitar codificar a UTF-8 cuando el resultado es evidente
+    max_bytes = FULL_DOCUMENT_MAX_BYTES if allow_full_document else SLIDE_MAX_BYTES
+    if len(raw) * 4 > max_bytes:
+        current_bytes = len(raw) if raw.isascii() else len(raw.encode('utf-8'))
+        if current_bytes > max_bytes:
+            return [_violation(
+                0, "too_large",
+                f"HTML excede el tamaño máximo permitido de 150 KB ({current_bytes:,} bytes de {max_bytes:,} bytes permitidos)",
+                bytes=current_bytes, max_bytes=max_bytes
+            )]
+
+    dangerous = _dangerous_tags(allow_full_document, allow_iframe)
+    found_dangerous = set()
+    violations: List[Dict] = []
+    link_violation = None
+    script_violation = None
+    saw_script_start = False
+    script_tag_count = 0
+    # Fin (exclusivo) de la última coincidencia de <link ...> / <script ...>; replica
+    # la semántica no solapada de re.findall(r"<link[^>]*>") de la versión anterior.
+    link_until = script_until = 0
+
+    # Se tokeniza sobre la copia en minúsculas (también usada por las sondas en
+    # línea). Si lower() cambió la longitud (caracteres Unicode que se expanden),
+    # las posiciones no coinciden con el original y se tokeniza el original.
+    low = raw.lower()
+    if len(low) == len(raw):
+        tag_matches = _SECURITY_TAG_RE.finditer(low)
+    else:
+        tag_matches = _SECURITY_TAG_RE_I.finditer(raw)
+
+    find = raw.find
+    for match in tag_matches:
+        name = match.group(2).lower()
+
+        if name in dangerous:
+            found_dangerous.add(name)
+            if stop_at_first and name == dangerous[0]:
+                # Ninguna otra violación puede tener mayor prioridad
+                break
+        if match.group(1) or (stop_at_first and found_dangerous):
+            # Cierres solo cuentan como etiqueta prohibida; con una prohibida ya
+            # encontrada solo resta buscar otras de mayor prioridad
+            continue
+
+        start = match.start()
+        if name == "link":
+            if start < link_until or link_violation is not None:
+                continue
+            end = find(">", start)
+            if end == -1:
+                continue
+            link_until = end + 1
+            href_value = _attr_value(_HREF_RE, raw[start:end + 1])
+            # Links sin href (ej: <link rel="preconnect">) se permiten
+            if href_value:
+                normalized_href = href_value.strip().lower()
+                if not any(allowed in normalized_href for allowed in SLIDE_LINK_WHITELIST):
+                    link_violation = _violation(
+                        RULE_LINK, "link_href",
+                        f"HTML contiene etiqueta <link> con href no autorizado: {href_value}",
+                        href=href_value
+                    )
+        elif name == "script":
+            saw_script_start = True
+            if start < script_until:
+                continue
+            end = find(">", start)
+            if end == -1:
+                continue
+            script_until = end + 1
+            script_tag_count += 1
+            if script_violation is not None:
+                continue
+            src_value = _attr_value(_SRC_RE, raw[start:end + 1])
+            if not src_value:
+                # Script inline (sin src) - permitir solo si allow_full_document
+                if not allow_full_document:
+                    script_violation = _violation(
+                        RULE_SCRIPT, "inline_script",
+                        "HTML contiene etiqueta <script> sin src (prohibido)"
+                    )
+            else:
+                normalized_src = src_value.strip()
+                if not normalized_src.split("?")[0].lower().startswith(_SCRIPT_WHITELIST_LOWER):
+                    script_violation = _violation(
+                        RULE_SCRIPT, "script_src",
+                        "HTML contiene etiqueta <script> con src no autorizado",
+                        src=normalized_src
+                    )
+
+    for dangerous_tag in dangerous:
+        if dangerous_tag in found_dangerous:
+            violations.append(_violation(
+                RULE_DANGEROUS_TAG, "dangerous_tag",
+                f"HTML contiene etiqueta <{dangerous_tag}> prohibida", tag=dangerous_tag
+            ))
+            break
+    if link_violation:
+        violations.append(link_violation)
+    if saw_script_start and script_tag_count == 0:
+        violations.append(_violation(RULE_SCRIPT, "script_tag", "HTML contiene etiqueta <script> prohibida"))
+    elif script_violation:
+        violations.append(script_violation)
+    if violations and stop_at_first:
+        return violations[:1]
+
+    # Patrones en línea (atributos, URIs y CSS): sondas de subcadena en C sobre la
+    # copia en minúsculas; las regex solo se ejecutan si la sonda acierta.
+    inline_checks = (
+        # Eventos inline (on*) solo se prohíben fuera de documentos completos
+        (lambda: not allow_full_document and "on" in low and _EVENT_RE.search(low) is not None,
+         RULE_EVENT, "inline_event", "HTML contiene atributos de evento inline (on*) que estan prohibidos"),
+        (lambda: "javascript:" in low,
+         RULE_JAVASCRIPT_URI, "javascript_uri", "HTML contiene URIs javascript: que están prohibidas"),
+        (lambda: "data:" in low and _DATA_URI_RE.search(low) is not None,
+         RULE_DATA_URI, "data_uri", "HTML contiene data: URIs potencialmente peligrosas"),
+        (lambda: "expression(" in low or ("url(" in low and _CSS_JS_URL_RE.search(low) is not None),
+         RULE_CSS_EXPRESSION, "css_expression", "HTML contiene expresiones CSS potencialmente peligrosas"),
+    )
+    for check, rule, code, message in inline_checks:
+        if check():
+            violations.append(_violation(rule, code, message))
+            if stop_at_first:
+                return violations
+
+    # Equilibrio básico de <> para detectar HTML truncado. Se omite en documentos
+    # completos porque el JavaScript puede contener muchos operadores < y >.
+    if not allow_full_document:
+        lt_count = raw.count("<")
+        gt_count = raw.count(">")
+        if abs(lt_count - gt_count) > MAX_TAG_IMBALANCE:
+            violations.append(_violation(
+                RULE_IMBALANCE, "tag_imbalance",
+                "HTML parece estar mal formado (desequilibrio de etiquetas)",
+                lt=lt_count, gt=gt_count
+            ))
+            if stop_at_first:
+                return violations
+
+    tag_count = len(_TAG_RE.findall(raw))
+    if tag_count > MAX_TAG_COUNT:
+        violations.append(_violation(
+            RULE_TAG_COUNT, "too_many_tags",
+            "HTML contiene demasiadas etiquetas; posiblemente intento de abuso",
+            tag_count=tag_count
+        ))
+    elif tag_count == 0 and not _ALNUM_RE.search(raw):
+        violations.append(_violation(RULE_EMPTY, "no_content", "HTML no contiene contenido válido"))
+
+    return violations
+
+
+def validate_slide_html(
+    html_content: str,
+    allow_full_document: bool = False,
+    allow_iframe: bool = False,
+) -> Tuple[bool, str]:
+    """
+    Valida el HTML de una diapositiva deteniéndose en la violación de mayor prioridad.
+
+    Returns:
+        (True, "") si es válido, o (False, mensaje de la violación de mayor prioridad)
+    """
+    violations = scan_slide_html(html_content, allow_full_document, allow_iframe, stop_at_first=True)
+    if violations:
+        return False, violations[0]["message"]
+    return True, ""
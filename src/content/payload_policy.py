@@ -0,0 +1,113 @@
+"""
+Detección de claves prohibidas en payloads de contenido.
+
+Recorrido iterativo (pila explícita) de dicts y listas anidados. La ruta de cada
+nodo no se construye durante el recorrido: cada marco guarda solo una referencia
+a su padre y el segmento (clave o índice), y la ruta "a.b[0].c" se materializa
+únicamente cuando aparece una clave prohibida. Las rutas de la lista blanca se
+precompilan en una sola expresión regular.
+"""
+
+import re
+from typing import Any, Iterable, Iterator, Optional, Pattern, Tuple
+
+# Campos que el cliente no puede enviar: el sistema elige proveedor y modelo
+FORBIDDEN_PAYLOAD_KEYS = frozenset({"provider", "model"})
+
+# Rutas (normalizadas sin índices: "a.b.c") donde las claves prohibidas se permiten.
+# Actualmente ninguna (template_snapshot fue eliminado).
+FORBIDDEN_KEYS_WHITELIST_PATTERNS: Tuple[str, ...] = ()
+
+_INDEX_RE = re.compile(r'\[\d+\]')
+_DOTS_RE = re.compile(r'\.+')
+
+
+def compile_path_whitelist(patterns: Iterable[str]) -> Optional[Pattern]:
+    """
+    Compila prefijos de ruta en una única regex anclada. Retorna None si no hay
+    patrones, lo que permite omitir la comprobación por completo.
+    """
+    patterns = [p for p in patterns if p]
+    if not patterns:
+        return None
+    return re.compile("|".join(re.escape(p) for p in patterns))
+
+
+_DEFAULT_WHITELIST_RE = compile_path_whitelist(FORBIDDEN_KEYS_WHITELIST_PATTERNS)
+
+
+def normalize_payload_path(path: str) -> str:
+    """Convierte "a[0].b" en "a.b" para compararla con la lista blanca."""
+    normalized_path = _DOTS_RE.sub('.', _INDEX_RE.sub('.', path))
+    if normalized_path.endswith('.') and len(normalized_path) > 1:
+        normalized_path = normalized_path.rstrip('.')
+    return normalized_path
+
+
+def _build_path(frame: Optional[tuple]) -> str:
+    """Materializa la ruta de un marco (padre, segmento) recorriendo sus ancestros."""
+    segments = []
+    while frame is not None:
+        parent, segment = frame
+        segments.append(segment)
+        frame = parent
+    path = ""
+    for segment in reversed(segments):
+        if isinstance(segment, int) and not isinstance(segment, bool):
+            path = f"{path}[{segment}]"
+        else:
+            path = f"{path}.{segment}" if path else f"{segment}"
+    return path
+
+
+def iter_forbidden_keys(
+    data: Any,
+    forbidden_fields: Iterable[str] = FORBIDDEN_PAYLOAD_KEYS,
+    whitelist_re: Optional[Pattern] = _DEFAULT_WHITELIST_RE,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Recorre la estructura en profundidad (mismo orden que la versión recursiva)
+    y produce (clave, ruta) por cada clave prohibida fuera de la lista blanca.
+    Al ser un generador, el consumidor puede detenerse en la primera violación.
+
+    Los índices de lista se guardan como int y las claves de dict como str, así
+    _build_path puede distinguir "a[0]" de "a.0".
+    """
+    forbidden = forbidden_fields if isinstance(forbidden_fields, frozenset) else frozenset(forbidden_fields)
+    # Cada elemento de la pila: (valor, marco, viene_de_clave_prohibida).
+    # marco = (marco_padre, segmento) o None en la raíz. Los escalares solo se
+    # apilan si su clave está prohibida, para reportarlos en el orden original.
+    stack = [(data, None, False)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        value, frame, is_forbidden = pop()
+        if is_forbidden:
+            path = _build_path(frame)
+            if whitelist_re is None or not whitelist_re.match(normalize_payload_path(path)):
+                yield frame[1], path
+        if isinstance(value, dict):
+            children = []
+            for key, child in value.items():
+                key_forbidden = key in forbidden
+                if key_forbidden or isinstance(child, (dict, list)):
+                    children.append((child, (frame, key if not isinstance(key, int) else str(key)), key_forbidden))
+            # Apilar en orden inverso para visitar en el orden original
+            children.reverse()
+            stack.extend(children)
+        elif isinstance(value, list):
+            for index in range(len(value) - 1, -1, -1):
+                child = value[index]
+                if isinstance(child, (dict, list)):
+                    push((child, (frame, index), False))
+
+
+def find_forbidden_key(
+    data: Any,
+    forbidden_fields: Iterable[str] = FORBIDDEN_PAYLOAD_KEYS,
+    whitelist_re: Optional[Pattern] = _DEFAULT_WHITELIST_RE,
+) -> Optional[Tuple[str, str]]:
+    """
+    Retorna la primera (clave, ruta) prohibida encontrada, o None si el payload es válido.
+    """
+    return next(iter_forbidden_keys(data, forbidden_fields, whitelist_re), None)
@@ -16,6 +16,9 @@ from .services import (
 )
 from src.content.template_integration_service import TemplateIntegrationService
 from src.shared.constants import ROLES
+from src.shared.pagination import parse_page_limit
+from src.shared.cache import content_hash
+from src.shared.exceptions import AppException
 
 content_bp = Blueprint('content', __name__, url_prefix='/api/content')
 
@@ -1056,18 +1059,87 @@ def get_topic_slides_status(topic_id):
             status_code=500,
         )
 
+def _etag_response(data, etag):
+    """
+    Respuesta estándar con cabecera ETag; 304 sin cuerpo si If-None-Match coincide.
+    Sin ETag (p. ej. datos que no quedaron guardados) responde siempre con cuerpo.
+    """
+    if etag is None:
+        response, status_code = APIRoute.success(data=data)
+        response.status_code = status_code
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    if_none_match = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    if etag in if_none_match:
+        response = make_response('', 304)
+    else:
+        response, status_code = APIRoute.success(data=data)
+        response.status_code = status_code
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@content_bp.route('/topic/<topic_id>/sequence', methods=['GET'])
+@APIRoute.standard(auth_required_flag=True)
+def get_topic_content_sequence(topic_id):
+    """
+    Secuencia estructurada precalculada de un tema (ids, tipos, orden y padres),
+    sin los documentos completos. Soporta If-None-Match con el ETag devuelto.
+    """
+    try:
+        if not ObjectId.is_valid(topic_id):
+            return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "ID de topic inválido")
+
+        sequence = content_service.structured_sequence_service.get_topic_sequence(topic_id)
+        return _etag_response(sequence, sequence["etag"])
+    except Exception as e:
+        logging.error(f"Error obteniendo secuencia del topic {topic_id}: {str(e)}")
+        return APIRoute.error(ErrorCodes.SERVER_ERROR, "Error interno del servidor", status_code=500)
+
+@content_bp.route('/sequences', methods=['GET'])
+@APIRoute.standard(auth_required_flag=True)
+def get_topic_content_sequences():
+    """
+    Secuencias precalculadas de varios temas en una sola llamada (vistas de módulo).
+    Query params:
+        - module_id: todos los temas del módulo
+        - topic_ids: lista separada por comas (alternativa a module_id)
+    """
+    try:
+        module_id = request.args.get('module_id')
+        if module_id:
+            if not ObjectId.is_valid(module_id):
+                return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "ID de módulo inválido")
+            topic_ids = [str(t["_id"]) for t in get_db().topics.find({"module_id": ObjectId(module_id)}, {"_id": 1})]
+        else:
+            topic_ids = [t.strip() for t in (request.args.get('topic_ids') or '').split(',') if t.strip()]
+            if not topic_ids:
+                return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "Se requiere module_id o topic_ids")
+            invalid = [t for t in topic_ids if not ObjectId.is_valid(t)]
+            if invalid:
+                return APIRoute.error(ErrorCodes.VALIDATION_ERROR, f"IDs de topic inválidos: {', '.join(invalid)}")
+
+        sequences = content_service.structured_sequence_service.get_topic_sequences(topic_ids)
+        etags = [s["etag"] for s in sequences.values()]
+        etag = None if None in etags else f'W/"seqs-{content_hash(*etags)[:32]}"'
+        return _etag_response({"sequences": sequences}, etag)
+    except Exception as e:
+        logging.error(f"Error obteniendo secuencias de temas: {str(e)}")
+        return APIRoute.error(ErrorCodes.SERVER_ERROR, "Error interno del servidor", status_code=500)
+
 @content_bp.route('/topic/<topic_id>/slides/advanced', methods=['GET'])
 @APIRoute.standard(auth_required_flag=True)
 def get_topic_slides_advanced(topic_id):
     """
-    Endpoint auxiliar que expone la funcionalidad de get_topic_slides_optimized / get_slides_with_advanced_filters.
+    Endpoint auxiliar que expone la funcionalidad de get_topic_slides_optimized.
     Query params:
         - status: comma-separated list of statuses (e.g. skeleton,html_ready,narrative_ready)
         - render_engine: filter by render engine
         - group_by_parent: boolean
         - include_progress: boolean
         - limit: int
-        - skip: int
+        - cursor: cursor keyset devuelto como next_cursor en la página anterior
+        - skip: int (compatibilidad; se ignora si se envía cursor)
     """
     try:
         # Validate topic
@@ -1095,33 +1167,34 @@ def get_topic_slides_advanced(topic_id):
             include_progress = True
 
         # Pagination
-        try:
-            limit_raw = request.args.get('limit', None)
-            limit = int(limit_raw) if limit_raw is not None else None
-        except Exception:
-            return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "Parámetro 'limit' inválido")
+        limit = parse_page_limit(request.args.get('limit'), default=None)
+        cursor = request.args.get('cursor')
         try:
             skip_raw = request.args.get('skip', 0)
             skip = int(skip_raw) if skip_raw is not None else 0
         except Exception:
             return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "Parámetro 'skip' inválido")
 
-        # Use advanced filters method
         try:
-            res = content_service.get_slides_with_advanced_filters(
+            res = content_service.get_topic_slides_optimized(
                 topic_id=topic_id,
-                status=status_list,
+                status_filter=status_list,
                 render_engine=render_engine,
                 group_by_parent=group_by_parent,
                 include_progress=include_progress,
                 limit=limit,
-                skip=skip
+                skip=skip,
+                cursor=cursor
             )
             return APIRoute.success(data=res)
+        except AppException:
+            raise
         except Exception as e:
-            logging.error(f"Error ejecutando get_slides_with_advanced_filters: {e}")
+            logging.error(f"Error ejecutando get_topic_slides_optimized: {e}")
             return APIRoute.error(ErrorCodes.SERVER_ERROR, "Error interno al obtener slides avanzados", status_code=500)
 
+    except AppException:
+        raise
     except Exception as e:
         logging.error(f"Error en endpoint get_topic_slides_advanced para topic {topic_id}: {str(e)}")
         return APIRoute.error(
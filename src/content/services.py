@@ -3,9 +3,8 @@ from bson import ObjectId
 from datetime import datetime, timedelta
 import json
 import logging
-import threading
-from pymongo import ReturnDocument
-from pymongo.errors import DuplicateKeyError
+from pymongo import InsertOne, UpdateOne, DeleteMany
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from concurrent.futures import ThreadPoolExecutor
 
 from src.shared.database import get_db
@@ -16,9 +15,16 @@ from src.shared.utils import normalize_objectid
 from src.shared.cascade_deletion_service import CascadeDeletionService
 from .models import ContentType, TopicContent, VirtualTopicContent, ContentResult, ContentTypes, DeprecatedContentTypes, LearningMethodologyTypes
 from .slide_style_service import SlideStyleService
+from .html_safety import SLIDE_SCRIPT_WHITELIST, scan_slide_html
+from .payload_policy import FORBIDDEN_PAYLOAD_KEYS, find_forbidden_key
+from .content_type_registry import CONTENT_TYPE_ALIASES, content_type_registry, normalize_content_type_code
+from src.shared.cache import LRUCache, VersionedCache, content_hash
+from src.shared.pagination import build_keyset_filter, decode_cursor, paginate_results
+from src.shared.blob_store import BLOB_FIELDS, content_blob_store, blob_text_length
+from src.shared.background_tasks import background_runner
 import re
 from src.ai_monitoring.services import AIMonitoringService
-from .structured_sequence_service import StructuredSequenceService
+from .structured_sequence_service import StructuredSequenceService, invalidate_topic_sequence
 from .template_recommendation_service import TemplateRecommendationService
 from .embedded_content_service import EmbeddedContentService
 from .content_personalization_service import ContentPersonalizationService
@@ -30,24 +36,38 @@ FORBIDDEN_KEYS_ERROR_MSG = "Los campos 'provider' y 'model' no están permitidos
 FORBIDDEN_KEYS_ERROR_MSG_SHORT = "Los campos 'provider' y 'model' no están permitidos en payloads de contenido."
 SLIDE_PLAN_TYPE_ERROR_MSG = "El campo 'slide_plan' debe ser una cadena de texto (Markdown/texto plano), no un objeto JSON o array."
 
-# Allowlist de scripts externos seguros (framework visual de slides)
-SLIDE_SCRIPT_WHITELIST = [
-    # Permitir cualquier version del framework de slides publicada en jsDelivr
-    "https://cdn.jsdelivr.net/gh/Luisdanielgm/framework_slide",
-    # CDNs para templates interactivos (Video Interactivo, Juegos, etc.)
-    "https://cdn.tailwindcss.com",          # Tailwind CSS CDN
-    "https://unpkg.com/lucide",             # Lucide Icons
-    "https://www.youtube.com/iframe_api",   # YouTube Iframe API
-]
-
-# Allowlist de CDNs permitidos para <link> (stylesheets, fonts, etc.)
-SLIDE_LINK_WHITELIST = [
-    "cdn.jsdelivr.net",
-    "fonts.googleapis.com",
-    "fonts.gstatic.com",
-    "cdnjs.cloudflare.com",
-    "unpkg.com",
-]
+# Cachés de validación/sanitización de HTML de slides, compartidas por todas las
+# instancias de ContentService. La clave es el hash del HTML más los flags, de modo
+# que re-guardar un deck sin cambios no vuelve a ejecutar el escáner ni bleach.
+# La caché de sanitización guarda el HTML resultante, por eso es más pequeña.
+SLIDE_HTML_VALIDATION_CACHE_SIZE = 4096
+SLIDE_HTML_SANITIZE_CACHE_SIZE = 512
+_slide_html_validation_cache = LRUCache("slide_html_validation", max_size=SLIDE_HTML_VALIDATION_CACHE_SIZE)
+_slide_html_sanitize_cache = LRUCache("slide_html_sanitize", max_size=SLIDE_HTML_SANITIZE_CACHE_SIZE)
+
+# Estadísticas de slides por topic (get_slide_generation_status y las de
+# get_topic_slides_optimized). Las claves llevan la versión del topic, que se
+# incrementa en cada escritura de slides; con SHARED_CACHE_BACKEND=mongo la
+# versión es compartida y cualquier instancia deja de servir datos anteriores.
+SLIDE_STATS_CACHE_TTL_SECONDS = 10
+SLIDE_STATS_CACHE_SIZE = 512
+_slide_stats_cache = VersionedCache("slide_stats", ttl_seconds=SLIDE_STATS_CACHE_TTL_SECONDS,
+                                    max_size=SLIDE_STATS_CACHE_SIZE)
+
+
+def invalidate_topic_slide_stats(topic_id: Any) -> None:
+    """Invalida las estadísticas de slides cacheadas de un topic en todas las instancias."""
+    if topic_id:
+        _slide_stats_cache.bump_version(str(topic_id))
+
+# Orden estable de la paginación keyset de slides (índice idx_topic_contents_slide_status_order)
+SLIDE_PAGE_SORT = [("order", 1), ("_id", 1)]
+
+# Tareas en segundo plano de ContentResultService (ventanas de debounce en segundos)
+VAKR_REFRESH_TASK = "content_result.vakr_refresh"
+EVALUATION_GRADING_TASK = "content_result.evaluation_grading"
+VAKR_REFRESH_DEBOUNCE_SECONDS = 5
+EVALUATION_GRADING_DEBOUNCE_SECONDS = 3
 
 class ContentTypeService(VerificationBaseService):
     """
@@ -56,6 +76,7 @@ class ContentTypeService(VerificationBaseService):
     """
     def __init__(self):
         super().__init__(collection_name="content_types")
+        self.registry = content_type_registry
 
     def create_content_type(self, content_type_data: Dict) -> Tuple[bool, str]:
         """
@@ -75,6 +96,7 @@ class ContentTypeService(VerificationBaseService):
 
             content_type = ContentType(**content_type_data)
             result = self.collection.insert_one(content_type.to_dict())
+            self.registry.invalidate()
             
             return True, str(result.inserted_id)
         except Exception as e:
@@ -91,39 +113,26 @@ class ContentTypeService(VerificationBaseService):
         Returns:
             Lista de tipos de contenido
         """
-        query = {"status": "active"}
-        if subcategory:
-            query["subcategory"] = subcategory
-            
-        content_types = list(self.collection.find(query))
-        for ct in content_types:
-            ct["_id"] = str(ct["_id"])
-        return content_types
+        return self.registry.list(subcategory)
 
     def get_content_type(self, code: str) -> Optional[Dict]:
         """
-        Obtiene un tipo de contenido específico por código.
+        Obtiene un tipo de contenido específico por código o alias (desde el registro en memoria).
         """
-        if not code:
-            return None
+        return self.registry.get(code)
 
-        normalized_code = code.strip().lower()
+    def get_content_types_by_codes(self, codes: List[str]) -> Dict[str, Dict]:
+        """
+        Obtiene varios tipos de contenido activos sin consultar la base de datos.
 
-        # Soportar tipos internos no registrados en la colección
-        if normalized_code == "slide_template":
-            return {
-                "code": "slide_template",
-                "name": "Slide Template",
-                "description": "Plantilla base reutilizable para renderizar diapositivas",
-                "status": "active",
-                "subcategory": "template",
-                "builtin": True
-            }
+        Args:
+            codes: Códigos a resolver (se normalizan como en get_content_type)
 
-        content_type = self.collection.find_one({"code": normalized_code, "status": "active"})
-        if content_type:
-            content_type["_id"] = str(content_type["_id"])
-        return content_type
+        Returns:
+            Dict[str, Dict]: {código normalizado: tipo de contenido}; los códigos
+            inexistentes o inactivos no aparecen en el resultado
+        """
+        return self.registry.get_many(codes)
 
 # Default status mapping by content type
 DEFAULT_STATUS_BY_TYPE = {
@@ -138,25 +147,10 @@ class ContentService(VerificationBaseService):
     Servicio unificado para gestionar TODO tipo de contenido.
     Reemplaza GameService, SimulationService, QuizService, etc.
     """
-    _CONTENT_TYPE_ALIASES = {
-        'document': 'documents',
-        'documents': 'documents',
-        'doc': 'documents',
-        'docx': 'documents',
-        'pdf': 'documents',
-        'video_content': 'video',
-        'image_content': 'image',
-        'audio_content': 'audio',
-        'external_link': 'link',
-        'link': 'link',
-        'slide-template': 'slide_template'
-    }
+    _CONTENT_TYPE_ALIASES = CONTENT_TYPE_ALIASES
 
     def _normalize_content_type(self, content_type: Optional[str]) -> Optional[str]:
-        if not content_type:
-            return content_type
-        normalized = content_type.strip().lower()
-        return self._CONTENT_TYPE_ALIASES.get(normalized, normalized)
+        return normalize_content_type_code(content_type)
 
     def _apply_content_type_alias(self, payload: Dict[str, Any]) -> Optional[str]:
         raw_type = payload.get('content_type')
@@ -173,12 +167,6 @@ class ContentService(VerificationBaseService):
         self.template_recommendation_service = TemplateRecommendationService()
         self.embedded_content_service = EmbeddedContentService(self.db)
 
-        # Simple in-memory caches for expensive aggregated stats
-        # Structure: { cache_key: { "ts": datetime, "value": ... } }
-        self._stats_cache: Dict[str, Dict[str, Any]] = {}
-        self._cache_lock = threading.Lock()
-        # Default TTL (seconds) for stats cache
-        self._stats_cache_ttl = 10
         self._eval_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="content_eval")
 
     def _normalize_content_field(self, doc: Dict[str, Any]) -> Dict[str, Any]:
@@ -220,130 +208,32 @@ class ContentService(VerificationBaseService):
             - No debe usar esquemas 'javascript:' en href/src ni data: que pueda incrustar HTML/scripts
             - No debe contener expresiones CSS peligrosas (expression(), url(javascript:...))
             - Comprobación básica de equilibrio de '<' y '>' para detectar fragmentos rotos
+        Todas las reglas se evalúan en un único recorrido (ver html_safety.scan_slide_html).
+        Los resultados se memorizan por hash del contenido y flags (LRU acotada).
         Retorna (True, "") si es válido, o (False, "mensaje de error") si no.
         """
-        try:
-            if not isinstance(html_content, str):
-                logging.debug("validate_slide_html_content: contenido no es str")
-                return False, "HTML debe ser una cadena de texto"
-            raw = html_content
-            if not raw.strip():
-                logging.debug("validate_slide_html_content: contenido vacío o solo espacios")
-                return False, "HTML no debe estar vacío"
-
-            # Tamaño razonable para una slide individual (150 KB = 153,600 bytes)
-            max_bytes = (2 * 1024 * 1024) if allow_full_document else (150 * 1024)  # 150KB or 2MB
-            current_bytes = len(html_content.encode('utf-8'))
-            if current_bytes > max_bytes:
-                logging.warning(f"validate_slide_html_content: HTML demasiado largo ({current_bytes} bytes > {max_bytes} bytes)")
-                return False, f"HTML excede el tamaño máximo permitido de 150 KB ({current_bytes:,} bytes de {max_bytes:,} bytes permitidos)"
-
-            low = raw.lower()
-
-            # Prohibir tags peligrosos explícitos
-            base_dangerous = ["object", "embed"]
-            if not allow_iframe:
-                base_dangerous.append("iframe")
-
-            # link se valida por whitelist (igual que script), no se prohíbe categóricamente
-            dangerous_tags = base_dangerous if allow_full_document else base_dangerous + ["meta", "base"]
-            for tag in dangerous_tags:
-                if f"<{tag}" in low or f"</{tag}" in low:
-                    logging.warning(f"validate_slide_html_content: encontrado tag prohibido <{tag}>")
-                    return False, f"HTML contiene etiqueta <{tag}> prohibida"
-
-            # Validar <link> con whitelist de CDNs permitidos
-            if "<link" in low:
-                link_tags = re.findall(r"<link[^>]*>", raw, flags=re.IGNORECASE)
-                for tag in link_tags:
-                    href_match = re.search(r'href\s*=\s*"([^"]+)"|href\s*=\s*\'([^\']+)\'', tag, flags=re.IGNORECASE)
-                    href_value = None
-                    if href_match:
-                        href_value = href_match.group(1) or href_match.group(2)
-                    if not href_value:
-                        # Links sin href (ej: <link rel="preconnect">) se permiten
-                        continue
-                    normalized_href = href_value.strip().lower()
-                    # Validar que el href esté en la whitelist de CDNs
-                    if not any(allowed in normalized_href for allowed in SLIDE_LINK_WHITELIST):
-                        logging.warning(f"validate_slide_html_content: link href no permitido {href_value}")
-                        return False, f"HTML contiene etiqueta <link> con href no autorizado: {href_value}"
-
-            # Validar scripts: permitir inline si allow_full_document, o externos autorizados
-            if "<script" in low:
-                script_tags = re.findall(r"<script[^>]*>", raw, flags=re.IGNORECASE)
-                if not script_tags:
-                    logging.warning("validate_slide_html_content: <script> sin tag de apertura reconocido")
-                    return False, "HTML contiene etiqueta <script> prohibida"
-                for tag in script_tags:
-                    src_match = re.search(r'src\s*=\s*"([^"]+)"|src\s*=\s*\'([^\']+)\'', tag, flags=re.IGNORECASE)
-                    src_value = None
-                    if src_match:
-                        src_value = src_match.group(1) or src_match.group(2)
-                    
-                    if not src_value:
-                        # Script inline (sin src) - permitir solo si allow_full_document
-                        if not allow_full_document:
-                            logging.warning("validate_slide_html_content: <script> sin atributo src (no permitido sin allow_full_document)")
-                            return False, "HTML contiene etiqueta <script> sin src (prohibido)"
-                        # Scripts inline permitidos para documentos completos (ej: videos interactivos)
-                        logging.debug("validate_slide_html_content: script inline permitido (allow_full_document=True)")
-                        continue
+        cache_key = None
+        if isinstance(html_content, str):
+            cache_key = (content_hash(html_content), bool(allow_full_document), bool(allow_iframe))
+            hit, cached = _slide_html_validation_cache.get(cache_key)
+            if hit:
+                return cached
 
-                    # Script con src - validar whitelist
-                    normalized_src = src_value.strip()
-                    normalized_src_base = normalized_src.split("?")[0].lower()
-                    if not any(normalized_src_base.startswith(allowed.lower()) for allowed in SLIDE_SCRIPT_WHITELIST):
-                        logging.warning(f"validate_slide_html_content: script src no permitido {normalized_src}")
-                        return False, "HTML contiene etiqueta <script> con src no autorizado"
-
-            # Prohibir eventos inline (on*) salvo cuando se permite documento completo
-            if not allow_full_document:
-                if re.search(r'on[a-z]+\s*=', low):
-                    logging.warning("validate_slide_html_content: encontrado atributo de evento inline (on*)")
-                    return False, "HTML contiene atributos de evento inline (on*) que estan prohibidos"
-            # Prohibir javascript: URIs
-            if "javascript:" in low:
-                logging.warning("validate_slide_html_content: encontrado javascript: URI")
-                return False, "HTML contiene URIs javascript: que están prohibidas"
-
-            # Prohibir data: URIs that could embed scripts or HTML (basic)
-            if re.search(r'data:\s*text\/html', low) or re.search(r'data:\s*text\/javascript', low):
-                logging.warning("validate_slide_html_content: encontrado data:text/html o data:text/javascript")
-                return False, "HTML contiene data: URIs potencialmente peligrosas"
-
-            # CSS expression() and javascript in url()
-            if "expression(" in low or re.search(r'url\(\s*javascript:', low):
-                logging.warning("validate_slide_html_content: encontrado expression() o url(javascript:...) en CSS")
-                return False, "HTML contiene expresiones CSS potencialmente peligrosas"
-
-            # Comprobar equilibrio básico de <> para detectar HTML truncado
-            # Nota: Para documentos completos (allow_full_document), omitir este check porque
-            # el JavaScript puede contener muchos operadores < y > que no son etiquetas HTML
-            if not allow_full_document:
-                lt_count = raw.count("<")
-                gt_count = raw.count(">")
-                if abs(lt_count - gt_count) > 5:  # allow small imbalance for fragments, but not large mismatches
-                    logging.debug(f"validate_slide_html_content: desequilibrio en etiquetas (<: {lt_count}, >: {gt_count})")
-                    return False, "HTML parece estar mal formado (desequilibrio de etiquetas)"
-
-            # Comprobar número de etiquetas para evitar payloads excesivos
-            tag_count = len(re.findall(r"<[a-zA-Z]+[^\>]*>", raw))
-            if tag_count > 500:
-                logging.warning(f"validate_slide_html_content: demasiadas etiquetas HTML ({tag_count})")
-                return False, "HTML contiene demasiadas etiquetas; posiblemente intento de abuso"
-
-            # Comprobar existencia de contenido significativo (texto o tags comunes)
-            if not re.search(r"[A-Za-z0-9]", raw) and tag_count == 0:
-                logging.debug("validate_slide_html_content: sin texto alfanumérico ni etiquetas detectadas")
-                return False, "HTML no contiene contenido válido"
-
-            # Es aceptable si el HTML es un fragmento ligero; registrar advertencias cuando aplica
-            if tag_count == 0:
-                logging.debug("validate_slide_html_content: HTML parece ser texto plano o fragmento sin etiquetas")
-
-            logging.debug("validate_slide_html_content: HTML validado correctamente")
-            return True, ""
+        try:
+            violations = scan_slide_html(html_content, allow_full_document, allow_iframe)
+            if violations:
+                first = violations[0]
+                logging.warning(
+                    f"validate_slide_html_content: {first['code']} "
+                    f"({len(violations)} violacion(es): {', '.join(v['code'] for v in violations)})"
+                )
+                result = (False, first["message"])
+            else:
+                logging.debug("validate_slide_html_content: HTML validado correctamente")
+                result = (True, "")
+            if cache_key is not None:
+                _slide_html_validation_cache.set(cache_key, result)
+            return result
         except Exception as e:
             logging.error(f"Error validando HTML de slide: {str(e)}")
             return False, f"Error validando HTML: {str(e)}"
@@ -352,11 +242,16 @@ class ContentService(VerificationBaseService):
         """
         Sanitiza el HTML de una diapositiva removiendo tags y atributos peligrosos.
         Usa bleach con una allowlist para limpiar el contenido.
+        El resultado se memoriza por hash del contenido (LRU acotada).
         """
-        try:
-            if not html or not isinstance(html, str):
-                return ""
+        if not html or not isinstance(html, str):
+            return ""
+        cache_key = content_hash(html)
+        hit, cached = _slide_html_sanitize_cache.get(cache_key)
+        if hit:
+            return cached
 
+        try:
             # Pre filtrar scripts permitidos y eliminar el resto
             def _sanitize_script_tag(match):
                 attrs = match.group(1) or ""
@@ -395,38 +290,12 @@ class ContentService(VerificationBaseService):
                 protocols=allowed_protocols,
                 strip=True  # Remover tags no permitidos en lugar de escapar
             )
+            _slide_html_sanitize_cache.set(cache_key, cleaned)
             return cleaned
         except Exception as e:
             logging.error(f"Error sanitizando HTML: {str(e)}")
             return ""  # Retornar vacío en caso de error para evitar inyección
 
-    def _is_path_whitelisted_for_forbidden_keys(self, path: str) -> bool:
-        """
-        Determina si una ruta está en la lista blanca donde provider/model son permitidos.
-        Estas rutas corresponden a datos históricos o plantillas donde estos campos son legítimos.
-
-        Args:
-            path: Ruta actual en formato "a.b.c" o "a[0].b"
-
-        Returns:
-            bool: True si la ruta está en lista blanca (permitida), False si debe validarse
-        """
-        # Lista blanca de rutas donde provider/model son permitidos
-        # Normalizar la ruta quitando índices de array para comparación
-        # Usar regex para reemplazar cualquier índice de array [número] con un punto
-        normalized_path = re.sub(r'\[\d+\]', '.', path)
-        # Eliminar puntos consecutivos que puedan resultar de la normalización
-        normalized_path = re.sub(r'\.+', '.', normalized_path)
-        # Eliminar punto final si existe (excepto si es el único carácter)
-        if normalized_path.endswith('.') and len(normalized_path) > 1:
-            normalized_path = normalized_path.rstrip('.')
-
-        whitelist_patterns = [
-            # No whitelist patterns needed for template_snapshot as it has been removed
-        ]
-
-        return any(normalized_path.startswith(pattern) for pattern in whitelist_patterns)
-
     def _is_path_allowed_for_detection(self, path: str) -> bool:
         """
         Determina si una ruta debe ser validada para detección de provider/model.
@@ -439,11 +308,12 @@ class ContentService(VerificationBaseService):
         """
         return True
 
-    def _detect_forbidden_keys_recursive(self, data: Any, forbidden_fields: List[str], current_path: str = "", context: str = "", user_id: Optional[str] = None, topic_id: Optional[str] = None) -> Tuple[bool, str]:
+    def _detect_forbidden_keys(self, data: Any, forbidden_fields: List[str], context: str = "", user_id: Optional[str] = None, topic_id: Optional[str] = None) -> Tuple[bool, str]:
         """
-        Función auxiliar recursiva que recorre dicts y listas para detectar claves prohibidas.
-        Aplica restricciones de ruta específicas para evitar falsos positivos.
-        Registra el context y ruta de clave en el log para auditoría.
+        Recorre dicts y listas (iterativamente, ver payload_policy.iter_forbidden_keys)
+        para detectar claves prohibidas y se detiene en la primera violación.
+        La ruta de la clave solo se construye cuando hay una violación y se registra
+        junto con el contexto para auditoría.
 
         RUTAS INCLUIDAS PARA DETECCIÓN:
         - Raíz (sin prefijo): provider, model
@@ -452,12 +322,11 @@ class ContentService(VerificationBaseService):
         - slides[*].*: provider, model (para bulk slides)
 
         RUTAS EXCLUIDAS (lista blanca donde no se aplica detección):
-        - Ninguna actualmente (template_snapshot ha sido eliminado)
+        - payload_policy.FORBIDDEN_KEYS_WHITELIST_PATTERNS (ninguna actualmente)
 
         Args:
             data: Estructura de datos a analizar (dict, list, o cualquier tipo)
             forbidden_fields: Lista de campos prohibidos a buscar
-            current_path: Ruta actual dentro de la estructura (para logging)
             context: Contexto de la operación para auditoría
             user_id: ID del usuario para auditoría
             topic_id: ID del topic para auditoría
@@ -467,54 +336,17 @@ class ContentService(VerificationBaseService):
                              (False, "Campo prohibido encontrado en ruta: X") si se encontraron
         """
         try:
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    # Construir nueva ruta
-                    new_path = f"{current_path}.{key}" if current_path else key
-
-                    # Verificar si la clave actual está prohibida Y está en una ruta permitida
-                    if key in forbidden_fields:
-                        # Verificar si la ruta actual está en la lista blanca (excluida de detección)
-                        if self._is_path_whitelisted_for_forbidden_keys(new_path):
-                            # Está en lista blanca, permitir y continuar recursión
-                            is_valid, error_msg = self._detect_forbidden_keys_recursive(
-                                value, forbidden_fields, new_path, context, user_id, topic_id
-                            )
-                            if not is_valid:
-                                return False, error_msg
-                            continue
-
-                        # Cualquier aparición de clave prohibida fuera de lista blanca dispara violación
-                        full_path = new_path
-                        logging.warning(f"POLICY_VIOLATION: Intento de enviar campo prohibido '{key}' en ruta '{full_path}' en {context}. user_id={user_id}, topic_id={topic_id}, timestamp={datetime.now().isoformat()}")
-                        return False, f"Campo prohibido '{key}' encontrado en ruta: {full_path}"
-
-                    # Recursión para valores anidados
-                    is_valid, error_msg = self._detect_forbidden_keys_recursive(
-                        value, forbidden_fields, new_path, context, user_id, topic_id
-                    )
-                    if not is_valid:
-                        return False, error_msg
-
-            elif isinstance(data, list):
-                # Para listas, iterar sobre cada elemento con índice en la ruta
-                for index, item in enumerate(data):
-                    new_path = f"{current_path}[{index}]" if current_path else f"[{index}]"
+            violation = find_forbidden_key(data, forbidden_fields)
+            if violation is None:
+                return True, ""
 
-                    # Recursión para elementos de la lista
-                    is_valid, error_msg = self._detect_forbidden_keys_recursive(
-                        item, forbidden_fields, new_path, context, user_id, topic_id
-                    )
-                    if not is_valid:
-                        return False, error_msg
-
-            # Para otros tipos (str, int, etc.), no hacer nada - no pueden contener claves prohibidas
-
-            return True, ""
+            key, full_path = violation
+            logging.warning(f"POLICY_VIOLATION: Intento de enviar campo prohibido '{key}' en ruta '{full_path}' en {context}. user_id={user_id}, topic_id={topic_id}, timestamp={datetime.now().isoformat()}")
+            return False, f"Campo prohibido '{key}' encontrado en ruta: {full_path}"
 
         except Exception as e:
-            logging.error(f"Error en detección recursiva de claves prohibidas en ruta '{current_path}' en {context}: {str(e)}")
-            return False, f"Error interno validando estructura anidada en ruta {current_path}: {str(e)}"
+            logging.error(f"Error en detección de claves prohibidas en {context}: {str(e)}")
+            return False, f"Error interno validando estructura anidada: {str(e)}"
 
     def _validate_content_payload_policy(self, payload_data: Dict, context: str, user_id: Optional[str] = None, topic_id: Optional[str] = None) -> Tuple[bool, str]:
         """
@@ -531,18 +363,15 @@ class ContentService(VerificationBaseService):
         mantiene la seguridad en rutas críticas del payload.
         """
         try:
-            # Definir campos prohibidos
-            forbidden_fields = ['provider', 'model']
-
-            # Validación recursiva con restricciones de ruta para detectar campos prohibidos solo en ubicaciones específicas
-            is_recursive_valid, recursive_error = self._detect_forbidden_keys_recursive(
-                payload_data, forbidden_fields, "", context, user_id, topic_id
+            # Detección de campos prohibidos (provider/model) en toda la estructura anidada
+            is_recursive_valid, recursive_error = self._detect_forbidden_keys(
+                payload_data, FORBIDDEN_PAYLOAD_KEYS, context, user_id, topic_id
             )
             if not is_recursive_valid:
                 return False, f"Violación de política: {recursive_error}. El sistema gestiona automáticamente la selección de proveedores. Los campos 'provider'/'model' no están permitidos en payloads de contenido."
 
             # Validación específica a nivel raíz (solo slide_plan)
-            # Las validaciones de provider/model ya están cubiertas por _detect_forbidden_keys_recursive
+            # Las validaciones de provider/model ya están cubiertas por _detect_forbidden_keys
 
             # Validar que 'content' sea un objeto si está presente
             content_field = payload_data.get('content')
@@ -967,7 +796,15 @@ class ContentService(VerificationBaseService):
                             return False, f"Error al crear quiz: {str(e)}"
             else:
                 # Para otros tipos de contenido, usar inserción normal
-                result = self.collection.insert_one(content.to_dict())
+                content_doc = content.to_dict()
+                if content_type == "slide":
+                    content_doc["content"] = content_blob_store.externalize_fields(content_doc.get("content"))
+                try:
+                    result = self.collection.insert_one(content_doc)
+                except Exception:
+                    if isinstance(content_doc.get("content"), dict):
+                        content_blob_store.release_many(content_doc["content"].get(field) for field in BLOB_FIELDS)
+                    raise
                 content_id = str(result.inserted_id)
 
                 # Logging específico para creación de diapositivas con nuevos campos
@@ -976,6 +813,9 @@ class ContentService(VerificationBaseService):
                     has_html = 'content_html' in slide_fields or 'content_html' in content_data
                     has_narrative = 'narrative_text' in slide_fields or 'narrative_text' in content_data
                     logging.info(f"Slide creado para topic {topic_id} con id {content_id}. status={initial_status}, has_html={has_html}, has_narrative={has_narrative}")
+                    invalidate_topic_slide_stats(topic_id)
+
+            invalidate_topic_sequence(topic_id)
 
             # Actualizar métricas del tipo de contenido
             # Para quiz, siempre incrementar usage_count ya que siempre es una inserción nueva
@@ -1008,6 +848,7 @@ class ContentService(VerificationBaseService):
         try:
             if not content_type:
                 return True, None
+            content_type = normalize_content_type_code(content_type)
             # Chequear si está en la lista de deprecated definida en modelos
             if DeprecatedContentTypes.is_deprecated(content_type):
                 info = DeprecatedContentTypes.info_for(content_type) or {}
@@ -1318,6 +1159,12 @@ class ContentService(VerificationBaseService):
     def create_bulk_content(self, contents_data: List[Dict]) -> Tuple[bool, List[str]]:
         """
         Crea múltiples contenidos en una sola transacción.
+
+        Se ejecuta en dos fases: primero se validan todos los elementos en memoria
+        (los tipos de contenido se resuelven con una sola consulta $in) y después se
+        escriben con un único bulk_write ordenado (eliminación de quizzes previos +
+        inserciones), más un bulk_write para los contadores de uso por tipo.
+        Los errores siguen reportándose por elemento ("Contenido N: ...").
         
         Args:
             contents_data: Lista de datos de contenidos a crear
@@ -1328,17 +1175,13 @@ class ContentService(VerificationBaseService):
         if not contents_data:
             return False, "No se proporcionaron contenidos para crear"
         
-        # Iniciar sesión de transacción
-        session = self.db.client.start_session()
+        session = None
         transaction_active = False
+        externalized_blobs: List[Any] = []
         
         try:
-            session.start_transaction()
-            transaction_active = True
-            
             created_ids = []
             content_types_usage = {}
-            quiz_deleted_topics = set()  # Local variable to track quiz deletions in this batch (thread-safe)
 
             # IMPLEMENTACIÓN "ÚLTIMO GANA": Preprocesar quizzes para mantener solo el último por topic_id
             # Esto evita conflictos con el índice único idx_unique_quiz_per_topic y asegura el comportamiento documentado
@@ -1398,7 +1241,13 @@ class ContentService(VerificationBaseService):
                     f"Total de elementos en batch después de filtrado: {len(contents_data)}."
                 )
 
-            # Validaciones previas
+            # Resolver todos los tipos de contenido del lote en una sola consulta
+            content_type_defs = self.content_type_service.get_content_types_by_codes([
+                self._normalize_content_type(content_data.get("content_type"))
+                for content_data in contents_data
+            ])
+
+            # Fase 1: validaciones en memoria (sin escrituras)
             for i, content_data in enumerate(contents_data):
                 topic_id = content_data.get("topic_id")
                 content_type = self._apply_content_type_alias(content_data) or content_data.get("content_type")
@@ -1410,7 +1259,7 @@ class ContentService(VerificationBaseService):
                     raise ValueError(f"Contenido {i+1}: content_type es requerido")
                 
                 # Verificar que el tipo de contenido existe
-                content_type_def = self.content_type_service.get_content_type(content_type)
+                content_type_def = content_type_defs.get(content_type)
                 if not content_type_def:
                     raise ValueError(f"Contenido {i+1}: Tipo de contenido '{content_type}' no válido")
 
@@ -1518,8 +1367,12 @@ class ContentService(VerificationBaseService):
             # Validar orden secuencial si se proporciona
             self._validate_sequential_order(contents_data)
             
-            # Preparar documentos para inserción masiva
+            # Fase 2: preparar operaciones en memoria. Cada operación guarda el índice
+            # del elemento que la originó para reportar errores de escritura por elemento.
+            quiz_delete_ops = []
+            quiz_deleted_topics = set()  # Topics cuyo quiz previo se elimina en este batch
             documents_to_insert = []
+            op_item_indexes = []
 
             for i, content_data in enumerate(contents_data):
                 # Garantizar un solo quiz por topic en bulk creation
@@ -1527,30 +1380,15 @@ class ContentService(VerificationBaseService):
                     topic_id_for_quiz = content_data.get("topic_id")
                     if topic_id_for_quiz:
                         topic_id_obj = ObjectId(topic_id_for_quiz) if not isinstance(topic_id_for_quiz, ObjectId) else topic_id_for_quiz
-                        
-                        # Verificar si ya procesamos eliminación de quiz para este topic en este batch
-                        # (para evitar múltiples deletes si el batch tiene múltiples quizzes del mismo topic)
+
+                        # Un solo DeleteMany por topic aunque el batch traiga varios quizzes del mismo topic
                         topic_key = str(topic_id_obj)
                         if topic_key not in quiz_deleted_topics:
-                            # Eliminar quiz(zes) existente(s) para este topic
-                            existing_count = self.collection.count_documents({
+                            quiz_delete_ops.append(DeleteMany({
                                 "topic_id": topic_id_obj,
                                 "content_type": "quiz"
-                            }, session=session)
-                            
-                            if existing_count > 0:
-                                delete_result = self.collection.delete_many({
-                                    "topic_id": topic_id_obj,
-                                    "content_type": "quiz"
-                                }, session=session)
-                                
-                                logging.warning(
-                                    f"create_bulk_content: Eliminado(s) {delete_result.deleted_count} quiz(zes) existente(s) "
-                                    f"para topic {topic_id_for_quiz} antes de crear nuevo quiz en batch. "
-                                    f"Elemento {i+1} del batch."
-                                )
-                            
-                            # Marcar que ya eliminamos quiz para este topic en este batch
+                            }))
+                            op_item_indexes.append(i)
                             quiz_deleted_topics.add(topic_key)
 
                 # Extraer marcadores de personalización
@@ -1654,12 +1492,39 @@ class ContentService(VerificationBaseService):
                 
                 documents_to_insert.append(content.to_dict())
 
-            # Insertar masivamente si hay documentos
-            if documents_to_insert:
-                # ordered=True (default) se define explícitamente para garantizar que inserted_ids preserve el orden
-                # de documents_to_insert, ya que el frontend mapea por índice.
-                result = self.collection.insert_many(documents_to_insert, ordered=True, session=session)
-                created_ids = [str(id) for id in result.inserted_ids]
+            # Asignar _id en memoria para devolver los IDs en el mismo orden de entrada,
+            # ya que el frontend mapea por índice.
+            for doc in documents_to_insert:
+                doc.setdefault("_id", ObjectId())
+                if doc.get("content_type") == "slide" and isinstance(doc.get("content"), dict):
+                    doc["content"] = content_blob_store.externalize_fields(doc["content"])
+                    externalized_blobs.extend(doc["content"].get(field) for field in BLOB_FIELDS)
+            op_item_indexes.extend(range(len(documents_to_insert)))
+
+            # Fase 3: escrituras. Un bulk_write ordenado (eliminaciones de quiz antes
+            # de las inserciones) y otro para los contadores de uso por tipo.
+            session = self.db.client.start_session()
+            session.start_transaction()
+            transaction_active = True
+
+            operations = quiz_delete_ops + [InsertOne(doc) for doc in documents_to_insert]
+            if operations:
+                try:
+                    result = self.collection.bulk_write(operations, ordered=True, session=session)
+                except BulkWriteError as bwe:
+                    write_errors = bwe.details.get("writeErrors") or []
+                    if write_errors:
+                        failed_op = write_errors[0].get("index", 0)
+                        item_index = op_item_indexes[failed_op] if failed_op < len(op_item_indexes) else failed_op
+                        raise ValueError(f"Contenido {item_index+1}: error de escritura: {write_errors[0].get('errmsg', str(bwe))}")
+                    raise
+
+                if result.deleted_count:
+                    logging.warning(
+                        f"create_bulk_content: Eliminado(s) {result.deleted_count} quiz(zes) existente(s) "
+                        f"para topic(s) {sorted(quiz_deleted_topics)} antes de crear nuevos quizzes en batch."
+                    )
+                created_ids = [str(doc["_id"]) for doc in documents_to_insert]
 
                 # Logging para cada slide insertada
                 # Iteramos sobre documents_to_insert para logging, asumiendo orden preservado
@@ -1672,16 +1537,21 @@ class ContentService(VerificationBaseService):
                         logging.info(f"Bulk: Slide creado para topic {doc.get('topic_id')} con id {content_id}. status={initial_status}, has_html={has_html}, has_narrative={has_narrative}")
             
             # Actualizar métricas de tipos de contenido
-            for content_type, count in content_types_usage.items():
-                self.content_type_service.collection.update_one(
-                    {"code": content_type},
-                    {"$inc": {"usage_count": count}},
-                    session=session
-                )
-  
+            if content_types_usage:
+                self.content_type_service.collection.bulk_write([
+                    UpdateOne({"code": content_type}, {"$inc": {"usage_count": count}})
+                    for content_type, count in content_types_usage.items()
+                ], ordered=False, session=session)
+
             # Confirmar transacción
             session.commit_transaction()
             transaction_active = False
+            externalized_blobs = []
+
+            for topic_id in {doc.get("topic_id") for doc in documents_to_insert if doc.get("content_type") == "slide"}:
+                invalidate_topic_slide_stats(topic_id)
+            for topic_id in {doc.get("topic_id") for doc in documents_to_insert}:
+                invalidate_topic_sequence(topic_id)
 
             logging.info(f"Creados {len(created_ids)} contenidos en lote exitosamente")
             return True, created_ids
@@ -1694,12 +1564,16 @@ class ContentService(VerificationBaseService):
                 except Exception:
                     pass  # Ignorar errores en abort si ya fue abortada
 
+            # Los blobs se guardan fuera de la transacción: devolver sus referencias
+            content_blob_store.release_many(externalized_blobs)
+
             error_msg = str(e)
             logging.error(f"Error en creación bulk: {error_msg}")
             return False, error_msg
 
         finally:
-            session.end_session()
+            if session is not None:
+                session.end_session()
     
     def create_bulk_slides_skeleton(self, slides_data: List[Dict]) -> Tuple[bool, List[str]]:
         """
@@ -1710,6 +1584,11 @@ class ContentService(VerificationBaseService):
          - Cada slide debe incluir full_text (string) y slide_plan (string) en el campo content
          - El orden (order) debe existir para cada slide y ser una secuencia consecutiva comenzando en 1
          - Las diapositivas serán creadas con status='skeleton' sin importar lo que envíe el cliente
+
+        Todas las validaciones (incluida la política de payload) se hacen en memoria
+        antes de escribir. Las escrituras son una lectura de los _id existentes por
+        (topic_id, order) y un único bulk_write ordenado con los upserts y la
+        eliminación de slides sobrantes.
         """
         if not slides_data:
             return False, "No se proporcionaron diapositivas para crear"
@@ -1731,8 +1610,6 @@ class ContentService(VerificationBaseService):
             if not full_text or not isinstance(full_text, str) or not full_text.strip():
                 return False, f"Elemento {i+1}: full_text es requerido en payload.content para crear una slide skeleton y debe ser una cadena no vacía"
 
-
-
         # Validar secuencia de orders: deben ser únicos y consecutivos comenzando en 1
         orders = sorted([s["order"] for s in slides_data])
         if orders[0] != 1:
@@ -1741,206 +1618,196 @@ class ContentService(VerificationBaseService):
             if val != idx:
                 return False, f"La secuencia de 'order' debe ser consecutiva sin gaps. Esperado {idx}, encontrado {val}"
 
-        # Preparar inserciones en transacción
-        session = self.db.client.start_session()
-        transaction_active = False
-        try:
-            session.start_transaction()
-            transaction_active = True
-
-            logging.info(
-                f"create_bulk_slides_skeleton: Iniciando upsert de {len(slides_data)} slides para topic {first_topic}. "
-                f"Modo idempotente: actualizará slides existentes por (topic_id, order)"
+        # Validar políticas de payload y preparar los upserts en memoria
+        topic_oid = normalize_objectid(first_topic)
+        operations = []
+        for slide in slides_data:
+            user_id = slide.get('creator_id')
+            topic_id = slide.get('topic_id')
+            valid_policy, policy_msg = self._validate_content_payload_policy(
+                slide,
+                context=f'create_bulk_slides_skeleton[{slide.get("order", "N/A")}]',
+                user_id=user_id,
+                topic_id=topic_id
             )
+            if not valid_policy:
+                return False, f"Elemento {slide.get('order', 'N/A')}: {policy_msg}"
 
-            upserted_count = 0
-            inserted_count = 0
-            updated_count = 0
-            final_ids = []
-            sentinel_ids = []  # Track IDs that had the _was_inserted sentinel for cleanup
+            # Get payload from content field
+            payload = slide.get('content') or {}
 
-            for slide in slides_data:
-                # Validar políticas de payload
-                user_id = slide.get('creator_id')
-                topic_id = slide.get('topic_id')
-                valid_policy, policy_msg = self._validate_content_payload_policy(
-                    slide,
-                    context=f'create_bulk_slides_skeleton[{slide.get("order", "N/A")}]',
-                    user_id=user_id,
-                    topic_id=topic_id
-                )
-                if not valid_policy:
-                    return False, f"Elemento {slide.get('order', 'N/A')}: {policy_msg}"
+            # Extract markers
+            content_for_markers = payload
+            if isinstance(content_for_markers, dict):
+                content_for_markers = json.dumps(content_for_markers, ensure_ascii=False)
+            markers = ContentPersonalizationService.extract_markers(
+                content_for_markers or json.dumps(slide.get("interactive_data", {}))
+            )
 
-                # Get payload from content field
-                payload = slide.get('content') or {}
+            # Prepare kwargs for slide fields from payload
+            kwargs = {}
+            if payload.get("full_text") is not None:
+                kwargs["full_text"] = payload.get("full_text")
+            if payload.get("slide_plan") is not None:
+                kwargs["slide_plan"] = payload.get("slide_plan")
+
+            baseline_mix = self._resolve_baseline_mix(slide)
+            content_obj = TopicContent(
+                topic_id=slide.get("topic_id"),
+                content_type="slide",
+                content=payload,
+                interactive_data=slide.get("interactive_data"),
+                learning_methodologies=slide.get("learning_methodologies"),
+                adaptation_options=slide.get("metadata"),
+                resources=slide.get("resources"),
+                web_resources=slide.get("web_resources"),
+                generation_prompt=slide.get("generation_prompt"),
+                ai_credits=slide.get("ai_credits", True),
+                personalization_markers=markers,
+                learning_mix=slide.get("learning_mix"),
+                baseline_mix=baseline_mix,
+                # Force skeleton status regardless of provided status
+                status="skeleton",
+                order=slide.get("order"),
+                parent_content_id=slide.get("parent_content_id"),
+                **kwargs
+            )
+            d = content_obj.to_dict()
 
-                # Extract markers
-                content_for_markers = payload
-                if isinstance(content_for_markers, dict):
-                    content_for_markers = json.dumps(content_for_markers, ensure_ascii=False)
-                markers = ContentPersonalizationService.extract_markers(
-                    content_for_markers or json.dumps(slide.get("interactive_data", {}))
-                )
+            filter_query = {
+                "topic_id": topic_oid,
+                "content_type": "slide",
+                "order": slide.get("order")
+            }
 
+            # Preparar documento para upsert separando campos de actualización e inserción
+            upsert_doc = d.copy()
+            if "_id" in upsert_doc:
+                del upsert_doc["_id"]
 
+            # Eliminar updated_at si existe para evitar conflicto con $currentDate
+            if "updated_at" in upsert_doc:
+                del upsert_doc["updated_at"]
 
-                # Prepare kwargs for slide fields from payload
-                kwargs = {}
-                if payload.get("full_text") is not None:
-                    kwargs["full_text"] = payload.get("full_text")
-                if payload.get("slide_plan") is not None:
-                    kwargs["slide_plan"] = payload.get("slide_plan")
-
-                baseline_mix = self._resolve_baseline_mix(slide)
-                content_obj = TopicContent(
-                    topic_id=slide.get("topic_id"),
-                    content_type="slide",
-                    content=payload,
-                    interactive_data=slide.get("interactive_data"),
-                    learning_methodologies=slide.get("learning_methodologies"),
-                    adaptation_options=slide.get("metadata"),
-                    resources=slide.get("resources"),
-                    web_resources=slide.get("web_resources"),
-                    generation_prompt=slide.get("generation_prompt"),
-                    ai_credits=slide.get("ai_credits", True),
-                    personalization_markers=markers,
-                    learning_mix=slide.get("learning_mix"),
-                    baseline_mix=baseline_mix,
-                    # Force skeleton status regardless of provided status
-                    status="skeleton",
-                    order=slide.get("order"),
-                    parent_content_id=slide.get("parent_content_id"),
-                    **kwargs
-                )
-                d = content_obj.to_dict()
+            # Campos que siempre se deben actualizar (excluyendo campos inmutables)
+            update_doc = {}
+            # Campos que solo se deben establecer en inserción (campos inmutables)
+            insert_only_doc = {}
 
-                filter_query = {
-                    "topic_id": normalize_objectid(slide.get("topic_id")),
-                    "content_type": "slide",
-                    "order": slide.get("order")
-                }
-                
-                # Preparar documento para upsert separando campos de actualización e inserción
-                upsert_doc = d.copy()
-                if "_id" in upsert_doc:
-                    del upsert_doc["_id"]
+            # Lista de campos inmutables que no deben ser actualizados
+            immutable_fields = ["created_at", "status", "updated_at"]
 
-                # Eliminar updated_at si existe para evitar conflicto con $currentDate
-                if "updated_at" in upsert_doc:
-                    del upsert_doc["updated_at"]
+            # Extraer campos de content para actualización con notación punteada (solo skeleton)
+            content_updates = {}
+            content_data = upsert_doc.pop('content', {})
 
-                # Campos que siempre se deben actualizar (excluyendo campos inmutables)
-                update_doc = {}
-                # Campos que solo se deben establecer en inserción (campos inmutables)
-                insert_only_doc = {}
+            # Solo actualizar campos específicos de skeleton, preservando content_html y narrative_text
+            skeleton_fields = ['full_text', 'slide_plan']  # template_snapshot removed
+            for field in skeleton_fields:
+                if field in content_data:
+                    content_updates[f'content.{field}'] = content_data[field]
 
-                # Lista de campos inmutables que no deben ser actualizados
-                immutable_fields = ["created_at", "status", "updated_at"]
+            for key, value in upsert_doc.items():
+                if key in immutable_fields:
+                    insert_only_doc[key] = value
+                else:
+                    update_doc[key] = value
+
+            # Agregar actualizaciones de content con notación punteada
+            update_doc.update(content_updates)
+
+            # Para nuevos inserts, establecer created_at solo si no existe
+            insert_only_doc["created_at"] = datetime.now()
+
+            operations.append(UpdateOne(
+                filter_query,
+                {"$set": update_doc, "$setOnInsert": insert_only_doc, "$currentDate": {"updated_at": True}},
+                upsert=True
+            ))
+
+        # Eliminar slides sobrantes si el nuevo lote tiene menos slides
+        max_order = max(s.get("order") for s in slides_data)
+        operations.append(DeleteMany({
+            "topic_id": topic_oid,
+            "content_type": "slide",
+            "order": {"$gt": max_order},
+            "$or": [
+                {"parent_content_id": None},
+                {"parent_content_id": {"$exists": False}}
+            ]
+        }))
 
-                # Extraer campos de content para actualización con notación punteada (solo skeleton)
-                content_updates = {}
-                content_data = upsert_doc.pop('content', {})
+        # Escrituras en transacción
+        session = self.db.client.start_session()
+        transaction_active = False
+        try:
+            session.start_transaction()
+            transaction_active = True
 
-                # Solo actualizar campos específicos de skeleton, preservando content_html y narrative_text
-                skeleton_fields = ['full_text', 'slide_plan']  # template_snapshot removed
-                for field in skeleton_fields:
-                    if field in content_data:
-                        content_updates[f'content.{field}'] = content_data[field]
+            logging.info(
+                f"create_bulk_slides_skeleton: Iniciando upsert de {len(slides_data)} slides para topic {first_topic}. "
+                f"Modo idempotente: actualizará slides existentes por (topic_id, order)"
+            )
 
-                for key, value in upsert_doc.items():
-                    if key in immutable_fields:
-                        insert_only_doc[key] = value
-                    else:
-                        update_doc[key] = value
-
-                # Agregar actualizaciones de content con notación punteada
-                update_doc.update(content_updates)
-
-                # Para nuevos inserts, establecer created_at solo si no existe y agregar sentinel
-                insert_only_doc["created_at"] = datetime.now()
-                insert_only_doc["_was_inserted"] = True  # Sentinel to track insert vs update
-
-                # Usar find_one_and_update para obtener el _id en una sola operación
-                doc = self.collection.find_one_and_update(
-                    filter_query,
-                    {"$set": update_doc, "$setOnInsert": insert_only_doc, "$currentDate": {"updated_at": True}},
-                    upsert=True,
-                    return_document=ReturnDocument.AFTER,
-                    projection={"_id": 1, "_was_inserted": 1},
+            # _id de las slides existentes por order (las insertadas salen de upserted_ids)
+            existing_ids = {
+                doc.get("order"): doc["_id"]
+                for doc in self.collection.find(
+                    {"topic_id": topic_oid, "content_type": "slide", "order": {"$in": orders}},
+                    {"_id": 1, "order": 1},
                     session=session
                 )
+            }
 
-                # Siempre tenemos un documento con _id thanks to ReturnDocument.AFTER
-                doc_id = str(doc["_id"])
-                final_ids.append(doc_id)
+            try:
+                result = self.collection.bulk_write(operations, ordered=True, session=session)
+            except BulkWriteError as bwe:
+                write_errors = bwe.details.get("writeErrors") or []
+                if write_errors and write_errors[0].get("index", len(slides_data)) < len(slides_data):
+                    failed = slides_data[write_errors[0]["index"]]
+                    if write_errors[0].get("code") == 11000:
+                        raise DuplicateKeyError(write_errors[0].get("errmsg", ""), 11000)
+                    raise ValueError(f"Elemento {failed.get('order', 'N/A')}: error de escritura: {write_errors[0].get('errmsg', str(bwe))}")
+                raise
 
-                # Determinar si fue insert o update usando el sentinel
-                if doc.get("_was_inserted"):
+            final_ids = []
+            inserted_count = 0
+            updated_count = 0
+            for index, slide in enumerate(slides_data):
+                if index in result.upserted_ids:
+                    doc_id = str(result.upserted_ids[index])
                     inserted_count += 1
-                    sentinel_ids.append(doc_id)
                     logging.info(f"create_bulk_slides_skeleton: Insertado nuevo slide order={slide.get('order')} para topic {first_topic}, id={doc_id}")
                 else:
+                    doc_id = str(existing_ids.get(slide.get("order")))
                     updated_count += 1
                     logging.info(f"create_bulk_slides_skeleton: Actualizado slide existente order={slide.get('order')} para topic {first_topic}")
-                
-                upserted_count += 1
+                final_ids.append(doc_id)
+            upserted_count = inserted_count + updated_count
 
-            # Eliminar slides sobrantes si el nuevo lote tiene menos slides
-            max_order = max(s.get("order") for s in slides_data)
-            delete_filter = {
-                "topic_id": normalize_objectid(first_topic),
-                "content_type": "slide",
-                "order": {"$gt": max_order},
-                "$or": [
-                    {"parent_content_id": None},
-                    {"parent_content_id": {"$exists": False}}
-                ]
-            }
-            
-            delete_result = self.collection.delete_many(delete_filter, session=session)
-            
-            if delete_result.deleted_count > 0:
+            if result.deleted_count > 0:
                 logging.warning(
-                    f"create_bulk_slides_skeleton: Eliminados {delete_result.deleted_count} slides sobrantes "
+                    f"create_bulk_slides_skeleton: Eliminados {result.deleted_count} slides sobrantes "
                     f"con order > {max_order} para topic {first_topic} (regeneración con menos slides)"
                 )
 
-            # Limpiar los campos sentinel de las inserciones en una sola operación bulk
-            if sentinel_ids:
-                # Convertir string IDs a ObjectId para el query
-                sentinel_object_ids = []
-                for sid in sentinel_ids:
-                    try:
-                        sentinel_object_ids.append(ObjectId(sid))
-                    except Exception:
-                        # Skip invalid IDs but continue with valid ones
-                        continue
-
-                if sentinel_object_ids:
-                    cleanup_result = self.collection.update_many(
-                        {"_id": {"$in": sentinel_object_ids}},
-                        {"$unset": {"_was_inserted": ""}},
-                        session=session
-                    )
-                    if cleanup_result.modified_count > 0:
-                        logging.debug(f"create_bulk_slides_skeleton: Limpiados {cleanup_result.modified_count} campos _was_inserted")
-
             # Actualizar contador de uso para slides
-            self.content_type_service.collection.update_one(
-                {"code": "slide"},
-                {"$inc": {"usage_count": inserted_count}},  # Solo contar nuevas inserciones
-                session=session
-            )
+            if inserted_count:
+                self.content_type_service.collection.update_one(
+                    {"code": "slide"},
+                    {"$inc": {"usage_count": inserted_count}},  # Solo contar nuevas inserciones
+                    session=session
+                )
 
             session.commit_transaction()
             transaction_active = False
+            invalidate_topic_slide_stats(first_topic)
+            invalidate_topic_sequence(first_topic)
 
             logging.info(
                 f"create_bulk_slides_skeleton: Procesados {upserted_count} slides para topic {first_topic}: "
-                f"{inserted_count} nuevos, {updated_count} actualizados, {delete_result.deleted_count if 'delete_result' in locals() else 0} eliminados"
+                f"{inserted_count} nuevos, {updated_count} actualizados, {result.deleted_count} eliminados"
             )
-            # template_snapshot logging removed - field no longer used
 
             return True, final_ids
         except DuplicateKeyError as e:
@@ -2083,6 +1950,8 @@ class ContentService(VerificationBaseService):
 
             contents_cursor = self.collection.aggregate(pipeline)
             contents = list(contents_cursor)
+            if include_metadata:
+                content_blob_store.resolve(contents)
 
             # Convertir ObjectIds a strings y fechas a ISO format
             for content in contents:
@@ -2120,10 +1989,12 @@ class ContentService(VerificationBaseService):
             Lista de contenidos en secuencia estructurada
         """
         try:
-            return self.structured_sequence_service.get_structured_content_sequence(
+            sequence = self.structured_sequence_service.get_structured_content_sequence(
                 topic_id=topic_id,
                 student_id=student_id
             )
+            content_blob_store.resolve(sequence)
+            return sequence
         except Exception as e:
             logging.error(f"Error obteniendo secuencia estructurada: {str(e)}")
             # Fallback al método tradicional si falla la secuencia estructurada
@@ -2157,7 +2028,10 @@ class ContentService(VerificationBaseService):
             Tuple[bool, str]: (éxito, mensaje)
         """
         try:
-            return self.structured_sequence_service.reorder_slides(topic_id, slide_order_mapping)
+            success, message = self.structured_sequence_service.reorder_slides(topic_id, slide_order_mapping)
+            if success:
+                invalidate_topic_slide_stats(topic_id)
+            return success, message
         except Exception as e:
             logging.error(f"Error reordenando diapositivas: {str(e)}")
             return False, f"Error interno: {str(e)}"
@@ -2239,10 +2113,11 @@ class ContentService(VerificationBaseService):
             Dict con recomendaciones por diapositiva
         """
         try:
-            return self.template_recommendation_service.get_topic_recommendations(
+            success, result = self.template_recommendation_service.get_template_recommendations_for_topic(
                 topic_id=topic_id,
                 student_id=student_id
             )
+            return result if success else {}
         except Exception as e:
             logging.error(f"Error obteniendo recomendaciones de plantillas: {str(e)}")
             return {}
@@ -2327,7 +2202,7 @@ class ContentService(VerificationBaseService):
         """
         try:
             # Obtener contenido actual para validaciones
-            current_content = self.get_content(content_id)
+            current_content = self.get_content(content_id, resolve_blobs=False)
             if not current_content:
                 return False, "Contenido no encontrado"
 
@@ -2484,6 +2359,11 @@ class ContentService(VerificationBaseService):
             # Esto evita sobrescribir el subdocumento 'content' completo
             set_ops = {}
 
+            # HTML grande como referencia al almacén de blobs (no-op si está desactivado)
+            previous_content = current_content.get("content") if isinstance(current_content.get("content"), dict) else {}
+            replaced_blobs = [previous_content.get(field) for field in BLOB_FIELDS if field in content_updates]
+            content_updates = content_blob_store.externalize_fields(content_updates)
+
             # Expandir content_updates unificado en claves punteadas
             if content_updates:
                 for k, v in content_updates.items():
@@ -2496,14 +2376,23 @@ class ContentService(VerificationBaseService):
             # Fusionar set_ops con el resto de update_data para el $set final
             final_set_data = {**update_data, **set_ops}
 
-            result = self.collection.update_one(
-                {"_id": ObjectId(content_id)},
-                {"$set": final_set_data}
-            )
+            try:
+                result = self.collection.update_one(
+                    {"_id": ObjectId(content_id)},
+                    {"$set": final_set_data}
+                )
+            except Exception:
+                content_blob_store.release_many(content_updates.get(field) for field in BLOB_FIELDS)
+                raise
             
             if result.modified_count > 0:
+                content_blob_store.release_many(replaced_blobs)
+                if content_type == "slide":
+                    invalidate_topic_slide_stats(topic_id)
+                invalidate_topic_sequence(topic_id)
                 return True, "Contenido actualizado exitosamente"
             else:
+                content_blob_store.release_many(content_updates.get(field) for field in BLOB_FIELDS)
                 return False, "No se encontró el contenido o no hubo cambios"
                 
         except Exception as e:
@@ -2527,6 +2416,8 @@ class ContentService(VerificationBaseService):
                 if not cascade_result.get('success', False):
                     return False, cascade_result.get('error', 'No se pudo eliminar el contenido en cascada')
 
+                invalidate_topic_slide_stats(content.get("topic_id"))
+                invalidate_topic_sequence(content.get("topic_id"))
                 total_deleted = cascade_result.get('total_deleted', 0)
                 dependencies_deleted = max(total_deleted - 1, 0)
                 message = "Contenido eliminado en cascada"
@@ -2552,6 +2443,8 @@ class ContentService(VerificationBaseService):
             )
 
             if result.modified_count > 0:
+                invalidate_topic_slide_stats(content.get("topic_id"))
+                invalidate_topic_sequence(content.get("topic_id"))
                 message = "Contenido eliminado exitosamente"
                 if child_count > 0:
                     message += f" (incluyendo {child_count} contenidos hijos)"
@@ -2563,12 +2456,17 @@ class ContentService(VerificationBaseService):
             logging.error(f"Error eliminando contenido: {str(e)}")
             return False, f"Error interno: {str(e)}"
 
-    def get_content(self, content_id: str) -> Optional[Dict]:
-        """Obtiene un contenido específico por su ID."""
+    def get_content(self, content_id: str, resolve_blobs: bool = True) -> Optional[Dict]:
+        """
+        Obtiene un contenido específico por su ID.
+        Con resolve_blobs=False las referencias a blobs de HTML se devuelven sin expandir.
+        """
         try:
             content = self.collection.find_one({"_id": ObjectId(content_id)})
             if not content:
                 return None
+            if resolve_blobs:
+                content_blob_store.resolve([content])
 
             content["_id"] = str(content["_id"])
             content["topic_id"] = str(content["topic_id"])
@@ -2600,14 +2498,10 @@ class ContentService(VerificationBaseService):
         Implementa cache temporal para mejorar rendimiento en consultas frecuentes.
         """
         try:
-            cache_key = f"slide_status::{topic_id}"
-            with self._cache_lock:
-                cached = self._stats_cache.get(cache_key)
-                if cached:
-                    ts = cached.get("ts")
-                    if ts and (datetime.utcnow() - ts).total_seconds() < self._stats_cache_ttl:
-                        logging.debug(f"get_slide_generation_status: returning cached status for topic {topic_id}")
-                        return cached.get("value", {})
+            hit, cached_status, version = _slide_stats_cache.get_with_version(str(topic_id), "generation_status")
+            if hit:
+                logging.debug(f"get_slide_generation_status: returning cached status for topic {topic_id}")
+                return cached_status or {}
 
             # Build base query
             base_query = {
@@ -2647,8 +2541,7 @@ class ContentService(VerificationBaseService):
                     "quality_metrics": {},
                     "bottleneck_analysis": []
                 }
-                with self._cache_lock:
-                    self._stats_cache[cache_key] = {"ts": datetime.utcnow(), "value": result_empty}
+                _slide_stats_cache.set(str(topic_id), result_empty, "generation_status", version=version)
                 return result_empty
 
             by_status_counts: Dict[str, int] = {}
@@ -2672,7 +2565,7 @@ class ContentService(VerificationBaseService):
 
                 if has_html:
                     slides_with_html += 1
-                    html_lengths.append(len(content.get("content_html") or ""))
+                    html_lengths.append(blob_text_length(content.get("content_html")))
                 if has_narr:
                     slides_with_narrative += 1
                     narrative_lengths.append(len(content.get("narrative_text") or ""))
@@ -2824,8 +2717,7 @@ class ContentService(VerificationBaseService):
             }
 
             # cache result
-            with self._cache_lock:
-                self._stats_cache[cache_key] = {"ts": datetime.utcnow(), "value": result}
+            _slide_stats_cache.set(str(topic_id), result, "generation_status", version=version)
 
             return result
         except Exception as e:
@@ -2844,7 +2736,7 @@ class ContentService(VerificationBaseService):
             if not isinstance(html_content, str):
                 return False, "content_html debe ser una cadena de texto"
 
-            current = self.get_content(content_id)
+            current = self.get_content(content_id, resolve_blobs=False)
             if not current:
                 logging.debug(f"update_slide_html: contenido {content_id} no encontrado")
                 return False, "Contenido no encontrado"
@@ -2858,8 +2750,9 @@ class ContentService(VerificationBaseService):
                 logging.info(f"update_slide_html: validacion fallida para slide {content_id}: {msg} (documento completo)")
                 return False, f"content_html invalido: {msg}"
 
+            stored_html = content_blob_store.externalize(raw_html)
             update_data = {
-                "content.content_html": raw_html,
+                "content.content_html": stored_html,
                 "updated_at": datetime.now(),
                 "render_engine": "raw_html"
             }
@@ -2881,18 +2774,14 @@ class ContentService(VerificationBaseService):
             )
 
             if result.modified_count > 0:
+                content_blob_store.release(current.get("content", {}).get("content_html"))
                 logging.info(f"update_slide_html: slide {content_id} actualizado a status {update_data.get('status')} by {updater_id or 'unknown'}")
                 # Invalidate relevant caches for the topic
-                try:
-                    current_topic = current.get("topic_id")
-                    cache_key = f"slide_status::{current_topic}"
-                    with self._cache_lock:
-                        if cache_key in self._stats_cache:
-                            del self._stats_cache[cache_key]
-                except Exception:
-                    pass
+                invalidate_topic_slide_stats(current.get("topic_id"))
+                invalidate_topic_sequence(current.get("topic_id"))
                 return True, "HTML de la diapositiva actualizado exitosamente"
             else:
+                content_blob_store.release(stored_html)
                 logging.debug(f"update_slide_html: no hubo cambios al actualizar slide {content_id}")
                 return False, "No se realizaron cambios en el contenido"
         except Exception as e:
@@ -2914,7 +2803,7 @@ class ContentService(VerificationBaseService):
             if len(full_html.encode('utf-8')) > max_bytes:
                 return False, "full_html excede el tamaño máximo permitido de 2MB"
 
-            current = self.get_content(content_id)
+            current = self.get_content(content_id, resolve_blobs=False)
             if not current:
                 logging.debug(f"update_slide_full_html: contenido {content_id} no encontrado")
                 return False, "Contenido no encontrado"
@@ -2922,8 +2811,9 @@ class ContentService(VerificationBaseService):
                 logging.debug(f"update_slide_full_html: contenido {content_id} no es tipo slide")
                 return False, "El contenido no es una diapositiva"
 
+            stored_full_html = content_blob_store.externalize(full_html)
             update_data = {
-                "content.full_html": full_html,
+                "content.full_html": stored_full_html,
                 "updated_at": datetime.now()
             }
 
@@ -2936,18 +2826,13 @@ class ContentService(VerificationBaseService):
             )
 
             if result.modified_count > 0:
+                content_blob_store.release(current.get("content", {}).get("full_html"))
                 logging.info(f"update_slide_full_html: slide {content_id} full_html actualizado by {updater_id or 'unknown'}")
                 # Invalidate caches de estado si aplica (no cambia status, pero refrescar por updated_at)
-                try:
-                    current_topic = current.get("topic_id")
-                    cache_key = f"slide_status::{current_topic}"
-                    with self._cache_lock:
-                        if cache_key in self._stats_cache:
-                            del self._stats_cache[cache_key]
-                except Exception:
-                    pass
+                invalidate_topic_slide_stats(current.get("topic_id"))
                 return True, "Full HTML de la diapositiva guardado exitosamente"
             else:
+                content_blob_store.release(stored_full_html)
                 logging.debug(f"update_slide_full_html: no hubo cambios al actualizar slide {content_id}")
                 return False, "No se realizaron cambios en el contenido"
         except Exception as e:
@@ -2975,7 +2860,7 @@ class ContentService(VerificationBaseService):
                 logging.warning(f"update_slide_narrative: narrative_text demasiado largo ({len(narrative_trim)} > {max_len})")
                 return False, f"narrative_text excede el tamaño máximo permitido de {max_len} caracteres"
 
-            current = self.get_content(content_id)
+            current = self.get_content(content_id, resolve_blobs=False)
             if not current:
                 logging.debug(f"update_slide_narrative: contenido {content_id} no encontrado")
                 return False, "Contenido no encontrado"
@@ -3007,14 +2892,8 @@ class ContentService(VerificationBaseService):
             if result.modified_count > 0:
                 logging.info(f"update_slide_narrative: slide {content_id} narrative actualizado. nuevo_status={update_data.get('status')}")
                 # Invalidate relevant caches for the topic
-                try:
-                    current_topic = current.get("topic_id")
-                    cache_key = f"slide_status::{current_topic}"
-                    with self._cache_lock:
-                        if cache_key in self._stats_cache:
-                            del self._stats_cache[cache_key]
-                except Exception:
-                    pass
+                invalidate_topic_slide_stats(current.get("topic_id"))
+                invalidate_topic_sequence(current.get("topic_id"))
                 return True, "Narrativa de la diapositiva actualizada exitosamente"
             else:
                 logging.debug(f"update_slide_narrative: no hubo cambios al actualizar narrativa slide {content_id}")
@@ -3030,7 +2909,7 @@ class ContentService(VerificationBaseService):
         Useful para polling desde el frontend para ver avance de generación.
         """
         try:
-            current = self.get_content(content_id)
+            current = self.get_content(content_id, resolve_blobs=False)
             if not current:
                 logging.debug(f"get_slide_status_details: contenido {content_id} no encontrado")
                 return {}
@@ -3069,7 +2948,7 @@ class ContentService(VerificationBaseService):
                 "has_content_html": has_html,
                 "has_narrative_text": has_narrative,
                 "has_full_text": has_full_text,
-                "content_html_length": len(content.get("content_html") or ""),
+                "content_html_length": blob_text_length(content.get("content_html")),
                 "narrative_text_length": len(content.get("narrative_text") or ""),
                 "full_text_length": len(content.get("full_text") or ""),
                 "progress_estimate": progress,
@@ -3296,6 +3175,7 @@ class ContentService(VerificationBaseService):
 
             data = result[0]
             slides = data.get("slides", [])
+            content_blob_store.resolve(slides)
 
             # Encontrar el último slide completado
             last_completed_slide = None
@@ -3355,26 +3235,31 @@ class ContentService(VerificationBaseService):
 
     def get_topic_slides_optimized(self, topic_id: str, status_filter: Optional[List[str]] = None,
                                    render_engine: Optional[str] = None, group_by_parent: bool = False,
-                                   include_progress: bool = True, limit: Optional[int] = None, skip: int = 0) -> Dict:
+                                   include_progress: bool = True, limit: Optional[int] = None, skip: int = 0,
+                                   cursor: Optional[str] = None) -> Dict:
         """
         Método optimizado para consultas de diapositivas con filtros avanzados.
         Soporta:
             - filtros por status (lista),
             - filtro por render_engine (ej: 'raw_html'),
             - agrupamiento por parent_content_id,
-            - inclusión de metadatos de progreso (total, completed, pending),
-            - paginación (limit, skip)
+            - inclusión de metadatos de progreso (última slide completa, tendencia, eficiencia),
+            - paginación keyset (limit, cursor) ordenada por (order, _id); skip se mantiene
+              por compatibilidad y se ignora si se envía cursor
 
         Retorna:
             {
-                "stats": { total, completed, pending, slides_with_html, slides_with_narrative },
+                "stats": { total, slides_with_html, slides_with_narrative, slides_complete, pending, ... },
                 "slides": [ ... ]  # lista de slides (paginada si se solicita)
-                "by_parent": { parent_id: { stats:..., slides: [...] } }  # opcional
+                "next_cursor": str | None,
+                "by_parent": { parent_id: { total, with_html, with_narrative, complete, orders } }  # opcional
                 "last_completed_slide": {...},
                 "completion_trend": [...],
                 "generation_efficiency": {...}
             }
-        Implementa validaciones adicionales, caching para stats y optimizaciones cuando se solicitan sólo slides completas.
+        Todo se resuelve en una sola agregación con $facet (slides, estadísticas,
+        agrupación por padre, última slide completa y tendencia). Las estadísticas
+        se cachean por versión del topic; con caché vigente el $facet solo trae la página.
         """
         try:
             # Validate topic_id
@@ -3389,6 +3274,7 @@ class ContentService(VerificationBaseService):
 
             # Normalize group_by_parent to bool
             group_by_parent = bool(group_by_parent)
+            include_progress = bool(include_progress)
 
             match: Dict[str, Any] = {
                 "topic_id": topic_obj_id,
@@ -3398,62 +3284,82 @@ class ContentService(VerificationBaseService):
             if render_engine:
                 match["render_engine"] = render_engine
 
-            # If caller only wants completed slides (both html and narrative present), route to specialized fast method
-            only_completed = set(status_filter) == {"narrative_ready"} or (status_filter == ["narrative_ready"])
-            if only_completed and not group_by_parent and not include_progress and limit is None and skip == 0 and not render_engine:
-                # Very fast path: use specialized query to retrieve completed slides
-                try:
-                    comp = self.get_complete_slides_only(topic_id)
-                    return {
-                        "stats": {
-                            "total": len(comp.get("slides", [])),
-                            "slides_complete": len(comp.get("slides", []))
-                        },
-                        "slides": comp.get("slides", []),
-                        "last_completed_slide": comp.get("last_completed_slide"),
-                        "completion_trend": comp.get("completion_trend", []),
-                        "generation_efficiency": comp.get("generation_efficiency")
-                    }
-                except Exception as e:
-                    logging.debug(f"get_topic_slides_optimized: fast path get_complete_slides_only failed: {e}")
-                    # fallback to full pipeline
+            has_html_expr = {"$ifNull": ["$content.content_html", False]}
+            has_narrative_expr = {"$ifNull": ["$content.narrative_text", False]}
+
+            # Slides page: keyset sobre (order, _id)
+            slides_facet: List[Dict[str, Any]] = []
+            keyset_filter = build_keyset_filter(SLIDE_PAGE_SORT, decode_cursor(cursor))
+            if keyset_filter:
+                slides_facet.append({"$match": keyset_filter})
+            slides_facet.append({"$sort": dict(SLIDE_PAGE_SORT)})
+            if skip and skip > 0 and not cursor:
+                slides_facet.append({"$skip": int(skip)})
+            if limit and limit > 0:
+                slides_facet.append({"$limit": int(limit) + 1})
+            slides_facet.append({"$project": {
+                "order": 1,
+                "parent_content_id": 1,
+                "status": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "render_engine": 1,
+                "has_html": {"$cond": [has_html_expr, True, False]},
+                "has_narrative": {"$cond": [has_narrative_expr, True, False]}
+            }})
+            facets: Dict[str, Any] = {"slides": slides_facet}
 
-            # Base projection pipeline
-            pipeline = [
-                {"$match": match},
-                {"$project": {
-                    "_id": 1,
-                    "order": 1,
-                    "parent_content_id": 1,
-                    "status": 1,
-                    "content.content_html": 1,
-                    "content.narrative_text": 1,
-                    "created_at": 1,
-                    "updated_at": 1,
-                    "render_engine": 1,
-                    "has_html": {"$cond": [{"$ifNull": ["$content.content_html", False]}, 1, 0]},
-                    "has_narrative": {"$cond": [{"$ifNull": ["$content.narrative_text", False]}, 1, 0]},
-                    "gen_time_ms": {
-                        "$cond": [
-                            {"$and": [{"$ifNull": ["$created_at", False]}, {"$ifNull": ["$updated_at", False]}]},
-                            {"$subtract": ["$updated_at", "$created_at"]},
-                            None
-                        ]
-                    }
-                }},
-                {"$sort": {"order": 1, "created_at": 1}}
-            ]
+            # Stats: try to use cached aggregated stats
+            cache_suffix = f"optimized::{render_engine}::{','.join(sorted(status_filter))}::{group_by_parent}::{include_progress}"
+            hit, cached_stats, version = _slide_stats_cache.get_with_version(str(topic_id), cache_suffix)
+            if hit:
+                logging.debug(f"get_topic_slides_optimized: using cached stats for topic {topic_id} ({cache_suffix})")
+            else:
+                facets["stats"] = [{"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "slides_with_html": {"$sum": {"$cond": [has_html_expr, 1, 0]}},
+                    "slides_with_narrative": {"$sum": {"$cond": [has_narrative_expr, 1, 0]}},
+                    "slides_complete": {"$sum": {"$cond": [{"$and": [has_html_expr, has_narrative_expr]}, 1, 0]}},
+                    "avg_gen_time_ms": {"$avg": {"$cond": [
+                        {"$and": [{"$ifNull": ["$created_at", False]}, {"$ifNull": ["$updated_at", False]}]},
+                        {"$subtract": ["$updated_at", "$created_at"]},
+                        None
+                    ]}}
+                }}]
+                if include_progress:
+                    facets["last_completed"] = [
+                        {"$match": {"content.content_html": {"$ne": None}, "content.narrative_text": {"$ne": None}}},
+                        {"$sort": {"updated_at": -1}},
+                        {"$limit": 1},
+                        {"$project": {"_id": 1, "updated_at": 1}}
+                    ]
+                    facets["trend"] = [
+                        {"$match": {"updated_at": {"$gte": datetime.utcnow() - timedelta(days=6)}}},
+                        {"$group": {
+                            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$updated_at", "$created_at"]}}},
+                            "count": {"$sum": 1}
+                        }},
+                        {"$sort": {"_id": 1}}
+                    ]
+                if group_by_parent:
+                    facets["by_parent"] = [
+                        {"$sort": {"order": 1}},
+                        {"$group": {
+                            "_id": {"$ifNull": ["$parent_content_id", None]},
+                            "total": {"$sum": 1},
+                            "with_html": {"$sum": {"$cond": [has_html_expr, 1, 0]}},
+                            "with_narrative": {"$sum": {"$cond": [has_narrative_expr, 1, 0]}},
+                            "complete": {"$sum": {"$cond": [{"$and": [has_html_expr, has_narrative_expr]}, 1, 0]}},
+                            "orders": {"$push": "$order"}
+                        }}
+                    ]
 
-            # Slides retrieval pipeline with pagination
-            slides_pipeline = list(pipeline)
-            if skip and skip > 0:
-                slides_pipeline.append({"$skip": int(skip)})
-            if limit and limit > 0:
-                slides_pipeline.append({"$limit": int(limit)})
+            facet_result = next(iter(self.collection.aggregate([{"$match": match}, {"$facet": facets}])), {})
 
-            slides_cursor = self.collection.aggregate(slides_pipeline)
+            slides_docs, next_cursor = paginate_results(facet_result.get("slides", []), SLIDE_PAGE_SORT, limit)
             slides_list = []
-            for s in slides_cursor:
+            for s in slides_docs:
                 try:
                     slide_item = {
                         "content_id": str(s["_id"]),
@@ -3470,107 +3376,9 @@ class ContentService(VerificationBaseService):
                     slide_item = {"content_id": str(s.get("_id"))}
                 slides_list.append(slide_item)
 
-            # Stats: try to use cached aggregated stats
-            cache_key = f"slides_optimized_stats::{topic_id}::{render_engine}::{','.join(sorted(status_filter))}::{group_by_parent}::{include_progress}"
-            with self._cache_lock:
-                cached = self._stats_cache.get(cache_key)
-                if cached and (datetime.utcnow() - cached.get("ts")).total_seconds() < self._stats_cache_ttl:
-                    logging.debug(f"get_topic_slides_optimized: using cached stats for key {cache_key}")
-                    cached_stats = cached.get("value", {})
-                else:
-                    # Compute stats
-                    stats_pipeline = [
-                        {"$match": match},
-                        {"$group": {
-                            "_id": None,
-                            "total": {"$sum": 1},
-                            "slides_with_html": {"$sum": {"$cond": [{"$ifNull": ["$content.content_html", False]}, 1, 0]}},
-                            "slides_with_narrative": {"$sum": {"$cond": [{"$ifNull": ["$content.narrative_text", False]}, 1, 0]}},
-                            "slides_complete": {"$sum": {"$cond": [{"$and": [{"$ifNull": ["$content.content_html", False]}, {"$ifNull": ["$content.narrative_text", False]}]}, 1, 0]}} ,
-                            "avg_gen_time_ms": {"$avg": {"$cond": [
-                                {"$and": [{"$ifNull": ["$created_at", False]}, {"$ifNull": ["$updated_at", False]}]},
-                                {"$subtract": ["$updated_at", "$created_at"]},
-                                None
-                            ]}}
-                        }}
-                    ]
-                    stats_res = list(self.collection.aggregate(stats_pipeline))
-                    if stats_res:
-                        st = stats_res[0]
-                        total = int(st.get("total", 0))
-                        slides_with_html = int(st.get("slides_with_html", 0))
-                        slides_with_narrative = int(st.get("slides_with_narrative", 0))
-                        slides_complete = int(st.get("slides_complete", 0))
-                        avg_gen_time = st.get("avg_gen_time_ms")
-                    else:
-                        total = slides_with_html = slides_with_narrative = slides_complete = 0
-                        avg_gen_time = None
-
-                    pending = total - slides_with_html
-                    completion_percentage = round((slides_complete / total * 100), 2) if total > 0 else 0.0
-                    estimated_time_remaining_ms = int(avg_gen_time * pending) if (avg_gen_time is not None and pending > 0) else None
-
-                    # Determine last completed slide
-                    last_completed = None
-                    try:
-                        last_doc = self.collection.find_one({
-                            "topic_id": topic_obj_id,
-                            "content_type": "slide",
-                            "content.content_html": {"$ne": None},
-                            "content.narrative_text": {"$ne": None},
-                        }, sort=[("updated_at", -1)], projection={"_id": 1, "updated_at": 1})
-                        if last_doc:
-                            last_completed = {
-                                "content_id": str(last_doc["_id"]),
-                                "updated_at": last_doc.get("updated_at").isoformat() if isinstance(last_doc.get("updated_at"), datetime) else last_doc.get("updated_at")
-                            }
-                    except Exception:
-                        last_completed = None
-
-                    # completion trend last 7 days
-                    try:
-                        from_date = datetime.utcnow() - timedelta(days=6)
-                        trend_pipeline = [
-                            {"$match": {
-                                "topic_id": topic_obj_id,
-                                "content_type": "slide",
-                                "updated_at": {"$gte": from_date}
-                            }},
-                            {"$project": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$updated_at", "$created_at"]}}}}},
-                            {"$group": {"_id": "$day", "count": {"$sum": 1}}},
-                            {"$sort": {"_id": 1}}
-                        ]
-                        trend_docs = list(self.collection.aggregate(trend_pipeline))
-                        progress_trend = [{ "date": t["_id"], "count": t["count"] } for t in trend_docs]
-                    except Exception:
-                        progress_trend = []
-
-                    # generation_efficiency heuristic: slides_complete / (avg_gen_time_ms + 1)
-                    try:
-                        generation_efficiency = None
-                        if avg_gen_time is not None and avg_gen_time > 0:
-                            generation_efficiency = round((slides_complete / total) / (avg_gen_time / 1000.0 + 1e-6), 6) if total > 0 else None
-                        else:
-                            generation_efficiency = None
-                    except Exception:
-                        generation_efficiency = None
-
-                    cached_stats = {
-                        "total": total,
-                        "slides_with_html": slides_with_html,
-                        "slides_with_narrative": slides_with_narrative,
-                        "slides_complete": slides_complete,
-                        "pending": pending,
-                        "completion_percentage": completion_percentage,
-                        "average_generation_time_ms": avg_gen_time,
-                        "estimated_time_remaining_ms": estimated_time_remaining_ms,
-                        "last_completed_slide": last_completed,
-                        "completion_trend": progress_trend,
-                        "generation_efficiency": generation_efficiency
-                    }
-
-                    with self._cache_lock:
-                        self._stats_cache[cache_key] = {"ts": datetime.utcnow(), "value": cached_stats}
+            if not hit:
+                cached_stats = self._build_optimized_slide_stats(facet_result, include_progress, group_by_parent)
+                _slide_stats_cache.set(str(topic_id), cached_stats, cache_suffix, version=version)
 
             result = {
                 "stats": {
@@ -3584,53 +3392,83 @@ class ContentService(VerificationBaseService):
                     "estimated_time_remaining_ms": cached_stats.get("estimated_time_remaining_ms")
                 },
                 "slides": slides_list,
+                "next_cursor": next_cursor,
                 "last_completed_slide": cached_stats.get("last_completed_slide"),
                 "completion_trend": cached_stats.get("completion_trend"),
                 "generation_efficiency": cached_stats.get("generation_efficiency")
             }
-
             if group_by_parent:
-                # Group slides by parent_content_id and compute per-parent stats
-                group_pipeline = [
-                    {"$match": match},
-                    {"$project": {
-                        "parent_content_id": {"$ifNull": ["$parent_content_id", None]},
-                        "has_html": {"$cond": [{"$ifNull": ["$content.content_html", False]}, 1, 0]},
-                        "has_narrative": {"$cond": [{"$ifNull": ["$content.narrative_text", False]}, 1, 0]},
-                        "complete": {"$cond": [{"$and": [{"$ifNull": ["$content.content_html", False]}, {"$ifNull": ["$content.narrative_text", False]}]}, 1, 0]},
-                        "order": 1
-                    }},
-                    {"$group": {
-                        "_id": {"parent": "$parent_content_id"},
-                        "total": {"$sum": 1},
-                        "with_html": {"$sum": "$has_html"},
-                        "with_narrative": {"$sum": "$has_narrative"},
-                        "complete": {"$sum": "$complete"},
-                        "orders": {"$push": "$order"}
-                    }}
-                ]
-                grouped = list(self.collection.aggregate(group_pipeline))
-                by_parent = {}
-                for g in grouped:
-                    parent_key = str(g["_id"]["parent"]) if g["_id"]["parent"] else "root"
-                    total_p = int(g.get("total", 0))
-                    with_html_p = int(g.get("with_html", 0))
-                    with_narrative_p = int(g.get("with_narrative", 0))
-                    complete_p = int(g.get("complete", 0))
-                    by_parent[parent_key] = {
-                        "total": total_p,
-                        "with_html": with_html_p,
-                        "with_narrative": with_narrative_p,
-                        "complete": complete_p,
-                        "orders": sorted([o for o in g.get("orders", []) if isinstance(o, int)])
-                    }
-                result["by_parent"] = by_parent
+                result["by_parent"] = cached_stats.get("by_parent", {})
 
             return result
+        except AppException:
+            raise
         except Exception as e:
             logging.error(f"Error en get_topic_slides_optimized para topic {topic_id}: {e}")
             return {}
 
+    @staticmethod
+    def _build_optimized_slide_stats(facet_result: Dict, include_progress: bool, group_by_parent: bool) -> Dict:
+        """Convierte las ramas de estadísticas del $facet en el dict que se cachea."""
+        stats_res = facet_result.get("stats") or []
+        if stats_res:
+            st = stats_res[0]
+            total = int(st.get("total", 0))
+            slides_with_html = int(st.get("slides_with_html", 0))
+            slides_with_narrative = int(st.get("slides_with_narrative", 0))
+            slides_complete = int(st.get("slides_complete", 0))
+            avg_gen_time = st.get("avg_gen_time_ms")
+        else:
+            total = slides_with_html = slides_with_narrative = slides_complete = 0
+            avg_gen_time = None
+
+        pending = total - slides_with_html
+        completion_percentage = round((slides_complete / total * 100), 2) if total > 0 else 0.0
+        estimated_time_remaining_ms = int(avg_gen_time * pending) if (avg_gen_time is not None and pending > 0) else None
+
+        last_completed = None
+        last_docs = facet_result.get("last_completed") or []
+        if last_docs:
+            last_doc = last_docs[0]
+            last_completed = {
+                "content_id": str(last_doc["_id"]),
+                "updated_at": last_doc.get("updated_at").isoformat() if isinstance(last_doc.get("updated_at"), datetime) else last_doc.get("updated_at")
+            }
+
+        progress_trend = [{"date": t["_id"], "count": t["count"]} for t in (facet_result.get("trend") or [])]
+
+        # generation_efficiency heuristic: slides_complete / (avg_gen_time_ms + 1)
+        generation_efficiency = None
+        if include_progress and avg_gen_time is not None and avg_gen_time > 0 and total > 0:
+            generation_efficiency = round((slides_complete / total) / (avg_gen_time / 1000.0 + 1e-6), 6)
+
+        stats = {
+            "total": total,
+            "slides_with_html": slides_with_html,
+            "slides_with_narrative": slides_with_narrative,
+            "slides_complete": slides_complete,
+            "pending": pending,
+            "completion_percentage": completion_percentage,
+            "average_generation_time_ms": avg_gen_time,
+            "estimated_time_remaining_ms": estimated_time_remaining_ms,
+            "last_completed_slide": last_completed,
+            "completion_trend": progress_trend,
+            "generation_efficiency": generation_efficiency
+        }
+
+        if group_by_parent:
+            by_parent = {}
+            for g in facet_result.get("by_parent") or []:
+                parent_key = str(g["_id"]) if g.get("_id") else "root"
+                by_parent[parent_key] = {
+                    "total": int(g.get("total", 0)),
+                    "with_html": int(g.get("with_html", 0)),
+                    "with_narrative": int(g.get("with_narrative", 0)),
+                    "complete": int(g.get("complete", 0)),
+                    "orders": sorted([o for o in g.get("orders", []) if isinstance(o, int)])
+                }
+            stats["by_parent"] = by_parent
+        return stats
 
 class ContentResultService:
     """
@@ -3645,8 +3483,6 @@ class ContentResultService:
         self.virtual_contents = self.db.virtual_topic_contents
         self.virtual_topics = self.db.virtual_topics
         self.topic_contents = self.db.topic_contents
-        # ThreadPoolExecutor para procesamiento asíncrono de evaluaciones
-        self._eval_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="content_result_eval")
 
     # ---------------------------------------------------------------------
     # Public API
@@ -3660,11 +3496,7 @@ class ContentResultService:
             content_result = ContentResult(**normalized)
             insert_result = self.collection.insert_one(content_result.to_dict())
             self._update_linked_content_evaluations_best_effort(normalized)
-            self._refresh_vakr_async(str(content_result.student_id))
-            self._trigger_evaluation_processing_async(
-                str(content_result.student_id),
-                normalized.get("topic_id"),
-            )
+            self._schedule_side_effects(str(content_result.student_id), normalized.get("topic_id"))
             return True, str(insert_result.inserted_id)
         except ValueError as ve:
             logging.warning(f"ContentResult inválido: {ve}")
@@ -3673,6 +3505,106 @@ class ContentResultService:
             logging.error(f"Error guardando ContentResult: {exc}")
             return False, "Error interno al guardar el resultado"
 
+    def record_results_batch(
+        self,
+        results_data: List[Dict],
+        student_id: Optional[str] = None,
+        prefetched: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Inserta varios ContentResult en una sola operación.
+
+        - Los metadatos de todos los virtual_content_id se resuelven con $in
+          (o se reciben ya resueltos en `prefetched`).
+        - Los resultados válidos se insertan con insert_many(ordered=False).
+        - Los efectos secundarios (VAKR, calificación) se programan una vez por
+          estudiante y por (estudiante, topic).
+
+        Args:
+            results_data: Lista de payloads (mismo formato que record_result)
+            student_id: Si se indica, todos los contenidos virtuales deben pertenecer a este estudiante
+            prefetched: Resultado de _prefetch_virtual_content_metadata (opcional)
+
+        Returns:
+            {"inserted": [{"index", "result_id"}], "errors": [{"index", "error"}]}
+        """
+        inserted: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        if not results_data:
+            return {"inserted": inserted, "errors": errors}
+
+        if prefetched is None:
+            prefetched = self._prefetch_virtual_content_metadata([
+                item.get("virtual_content_id") for item in results_data
+                if isinstance(item, dict) and item.get("virtual_content_id")
+            ])
+
+        documents = []
+        document_indexes = []
+        normalized_items = []
+        for index, item in enumerate(results_data):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Payload inválido para ContentResult")
+                metadata = None
+                virtual_content_id = item.get("virtual_content_id")
+                if virtual_content_id:
+                    entry = prefetched.get(str(virtual_content_id))
+                    if not entry:
+                        raise ValueError("Contenido virtual no encontrado")
+                    metadata = entry["metadata"]
+                    if student_id and metadata.get("student_id") != str(student_id):
+                        raise PermissionError("No tienes permiso para enviar resultados de este contenido")
+                normalized = self._normalize_payload(item, metadata=metadata)
+                content_result = ContentResult(**normalized)
+                documents.append(content_result.to_dict())
+                document_indexes.append(index)
+                normalized_items.append(normalized)
+            except (ValueError, PermissionError) as exc:
+                errors.append({"index": index, "error": str(exc)})
+            except Exception as exc:
+                logging.error(f"Error normalizando ContentResult #{index}: {exc}")
+                errors.append({"index": index, "error": "Error interno al procesar el resultado"})
+
+        failed_positions = set()
+        if documents:
+            try:
+                self.collection.insert_many(documents, ordered=False)
+            except BulkWriteError as bwe:
+                for write_error in bwe.details.get("writeErrors") or []:
+                    position = write_error.get("index")
+                    failed_positions.add(position)
+                    errors.append({
+                        "index": document_indexes[position],
+                        "error": write_error.get("errmsg", "Error de escritura"),
+                    })
+            except Exception as exc:
+                logging.error(f"Error insertando lote de ContentResult: {exc}")
+                failed_positions = set(range(len(documents)))
+                errors.extend(
+                    {"index": index, "error": "Error interno al guardar el resultado"}
+                    for index in document_indexes
+                )
+
+        side_effect_keys = set()
+        latest_by_content = {}
+        for position, document in enumerate(documents):
+            if position in failed_positions:
+                continue
+            normalized = normalized_items[position]
+            inserted.append({"index": document_indexes[position], "result_id": str(document["_id"])})
+            side_effect_keys.add((normalized.get("student_id"), normalized.get("topic_id")))
+            # El último resultado por contenido es el que prevalece en evaluaciones vinculadas
+            latest_by_content[(normalized.get("student_id"), normalized.get("content_id"))] = normalized
+
+        for normalized in latest_by_content.values():
+            self._update_linked_content_evaluations_best_effort(normalized)
+        for result_student_id, topic_id in side_effect_keys:
+            self._schedule_side_effects(result_student_id, topic_id)
+
+        errors.sort(key=lambda error: error["index"])
+        return {"inserted": inserted, "errors": errors}
+
     def _update_linked_content_evaluations_best_effort(self, normalized: Dict[str, Any]) -> None:
         """
         Propaga resultados de contenido a evaluaciones vinculadas a un contenido especÌfico.
@@ -3979,7 +3911,7 @@ class ContentResultService:
     # ---------------------------------------------------------------------
     # Normalización y helpers
     # ---------------------------------------------------------------------
-    def _normalize_payload(self, data: Dict) -> Dict[str, Any]:
+    def _normalize_payload(self, data: Dict, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         if not isinstance(data, dict):
             raise ValueError("Payload inválido para ContentResult")
 
@@ -4026,9 +3958,11 @@ class ContentResultService:
         if completion_percentage is not None:
             metrics.setdefault("completion_percentage", completion_percentage)
 
-        metadata = {}
-        if payload.get("virtual_content_id"):
-            metadata = self._extract_virtual_content_metadata(payload["virtual_content_id"])
+        # metadata puede venir precargada (ingesta por lotes)
+        if metadata is None:
+            metadata = {}
+            if payload.get("virtual_content_id"):
+                metadata = self._extract_virtual_content_metadata(payload["virtual_content_id"])
 
         student_id = payload.get("student_id") or metadata.get("student_id")
         if not student_id:
@@ -4144,7 +4078,6 @@ class ContentResultService:
         return normalized
 
     def _extract_virtual_content_metadata(self, virtual_content_id: str) -> Dict[str, Any]:
-        metadata: Dict[str, Any] = {}
         vc_oid = self._safe_object_id(virtual_content_id)
         if not vc_oid:
             raise ValueError("virtual_content_id inválido")
@@ -4153,6 +4086,73 @@ class ContentResultService:
         if not virtual_content:
             raise ValueError("Contenido virtual no encontrado")
 
+        virtual_topic = None
+        if virtual_content.get("virtual_topic_id"):
+            virtual_topic = self.virtual_topics.find_one({"_id": virtual_content["virtual_topic_id"]})
+
+        topic_content = None
+        content_oid = self._safe_object_id(
+            virtual_content.get("content_id") or virtual_content.get("original_content_id")
+        )
+        if content_oid:
+            topic_content = self.topic_contents.find_one({"_id": content_oid})
+
+        return self._build_virtual_content_metadata(virtual_content, virtual_topic, topic_content)
+
+    def _prefetch_virtual_content_metadata(self, virtual_content_ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Resuelve los metadatos de varios contenidos virtuales con una consulta $in por
+        colección (virtual_topic_contents, virtual_topics, topic_contents).
+
+        Returns:
+            {virtual_content_id: {"virtual_content": doc, "metadata": dict}}; los IDs
+            inválidos o inexistentes no aparecen en el resultado
+        """
+        vc_oids = list({oid for oid in (self._safe_object_id(v) for v in virtual_content_ids) if oid})
+        if not vc_oids:
+            return {}
+
+        virtual_contents = list(self.virtual_contents.find({"_id": {"$in": vc_oids}}))
+
+        topic_oids = list({vc["virtual_topic_id"] for vc in virtual_contents if vc.get("virtual_topic_id")})
+        virtual_topics = {}
+        if topic_oids:
+            virtual_topics = {
+                vt["_id"]: vt
+                for vt in self.virtual_topics.find(
+                    {"_id": {"$in": topic_oids}},
+                    {"topic_id": 1, "virtual_module_id": 1, "order": 1},
+                )
+            }
+
+        content_oids = list({
+            oid for oid in (
+                self._safe_object_id(vc.get("content_id") or vc.get("original_content_id"))
+                for vc in virtual_contents
+            ) if oid
+        })
+        topic_contents = {}
+        if content_oids:
+            topic_contents = {tc["_id"]: tc for tc in self.topic_contents.find({"_id": {"$in": content_oids}})}
+
+        prefetched = {}
+        for vc in virtual_contents:
+            content_oid = self._safe_object_id(vc.get("content_id") or vc.get("original_content_id"))
+            metadata = self._build_virtual_content_metadata(
+                vc,
+                virtual_topics.get(vc.get("virtual_topic_id")),
+                topic_contents.get(content_oid) if content_oid else None,
+            )
+            prefetched[str(vc["_id"])] = {"virtual_content": vc, "metadata": metadata}
+        return prefetched
+
+    def _build_virtual_content_metadata(
+        self,
+        virtual_content: Dict[str, Any],
+        virtual_topic: Optional[Dict[str, Any]],
+        topic_content: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {}
         personalization_data = virtual_content.get("personalization_data") or {}
         metadata["virtual_content_id"] = str(virtual_content["_id"])
         metadata["content_id"] = self._stringify_object_id(
@@ -4179,49 +4179,42 @@ class ContentResultService:
             virtual_content.get("instance_id") or personalization_data.get("template_instance_id")
         )
 
-        virtual_topic_id = virtual_content.get("virtual_topic_id")
-        if virtual_topic_id:
-            virtual_topic = self.virtual_topics.find_one({"_id": virtual_topic_id})
-            if virtual_topic:
-                metadata["topic_id"] = self._stringify_object_id(virtual_topic.get("topic_id"))
-                metadata["virtual_module_id"] = self._stringify_object_id(virtual_topic.get("virtual_module_id"))
-                metadata["topic_order"] = virtual_topic.get("order")
-
-        content_id = metadata.get("content_id")
-        content_oid = self._safe_object_id(content_id)
-        if content_oid:
-            topic_content = self.topic_contents.find_one({"_id": content_oid})
-            if topic_content:
-                # Extraer render_engine del contenido original
-                metadata["render_engine"] = topic_content.get("render_engine")
-                # Extraer original_content para deteccion de interactividad
-                metadata["original_content"] = topic_content.get("content", {})
-                metadata["content_type"] = metadata.get("content_type") or topic_content.get("content_type")
-                metadata["topic_id"] = metadata.get("topic_id") or self._stringify_object_id(topic_content.get("topic_id"))
-                metadata["baseline_mix"] = (
-                    metadata.get("baseline_mix")
-                    or topic_content.get("baseline_mix")
-                    or (topic_content.get("content", {}).get("baseline_mix") if isinstance(topic_content.get("content"), dict) else None)
-                    or topic_content.get("learning_mix")
+        if virtual_topic:
+            metadata["topic_id"] = self._stringify_object_id(virtual_topic.get("topic_id"))
+            metadata["virtual_module_id"] = self._stringify_object_id(virtual_topic.get("virtual_module_id"))
+            metadata["topic_order"] = virtual_topic.get("order")
+
+        if topic_content:
+            # Extraer render_engine del contenido original
+            metadata["render_engine"] = topic_content.get("render_engine")
+            # Extraer original_content para deteccion de interactividad
+            metadata["original_content"] = topic_content.get("content", {})
+            metadata["content_type"] = metadata.get("content_type") or topic_content.get("content_type")
+            metadata["topic_id"] = metadata.get("topic_id") or self._stringify_object_id(topic_content.get("topic_id"))
+            metadata["baseline_mix"] = (
+                metadata.get("baseline_mix")
+                or topic_content.get("baseline_mix")
+                or (topic_content.get("content", {}).get("baseline_mix") if isinstance(topic_content.get("content"), dict) else None)
+                or topic_content.get("learning_mix")
+            )
+            variant = topic_content.get("variant") or {}
+            metadata["variant_label"] = metadata.get("variant_label") or variant.get("variant_label")
+            metadata["variant_index"] = variant.get("variant_index")
+            metadata["parent_order"] = variant.get("parent_order")
+            attachment = topic_content.get("attachment") or {}
+            if not metadata.get("template_instance_id"):
+                metadata["template_instance_id"] = self._stringify_object_id(
+                    attachment.get("template_instance_id") or topic_content.get("instance_id")
                 )
-                variant = topic_content.get("variant") or {}
-                metadata["variant_label"] = metadata.get("variant_label") or variant.get("variant_label")
-                metadata["variant_index"] = variant.get("variant_index")
-                metadata["parent_order"] = variant.get("parent_order")
-                attachment = topic_content.get("attachment") or {}
-                if not metadata.get("template_instance_id"):
-                    metadata["template_instance_id"] = self._stringify_object_id(
-                        attachment.get("template_instance_id") or topic_content.get("instance_id")
-                    )
-                metadata["template_version"] = attachment.get("template_version") or topic_content.get("template_version")
+            metadata["template_version"] = attachment.get("template_version") or topic_content.get("template_version")
 
-                content_field = topic_content.get("content")
-                if isinstance(content_field, dict):
-                    metadata["content_title"] = content_field.get("title")
-                else:
-                    metadata["content_title"] = topic_content.get("title")
-                if not metadata.get("template_usage_id"):
-                    metadata["template_usage_id"] = self._stringify_object_id(topic_content.get("_id"))
+            content_field = topic_content.get("content")
+            if isinstance(content_field, dict):
+                metadata["content_title"] = content_field.get("title")
+            else:
+                metadata["content_title"] = topic_content.get("title")
+            if not metadata.get("template_usage_id"):
+                metadata["template_usage_id"] = self._stringify_object_id(topic_content.get("_id"))
 
         return metadata
 
@@ -4513,26 +4506,21 @@ class ContentResultService:
         result["rl_context"] = self._convert_objectids(result.get("rl_context") or {})
         return result
 
-    def _refresh_vakr_async(self, student_id: str) -> None:
-        def worker():
-            try:
-                service = AdaptivePersonalizationService()
-                service.get_vakr_statistics(student_id, force_refresh=True)
-                logging.info(f"VAKR stats refreshed for student {student_id}")
-            except Exception as exc:
-                logging.warning(f"Unable to refresh VAKR stats for {student_id}: {exc}")
-
-        thread = threading.Thread(target=worker, daemon=True)
-        thread.start()
-
-    def _trigger_evaluation_processing_async(self, student_id: str, topic_id: Optional[str]) -> None:
-        if not student_id or not topic_id:
-            return
-
+    def _schedule_side_effects(self, student_id: str, topic_id: Optional[str]) -> None:
+        """
+        Programa los efectos secundarios de un resultado en el ejecutor compartido.
+        Se fusionan por clave: un refresco VAKR por estudiante y una pasada de
+        calificación por (estudiante, topic) dentro de la ventana de debounce.
+        """
         try:
-            self._eval_executor.submit(self._process_evaluation_updates, student_id, topic_id)
+            background_runner.submit(VAKR_REFRESH_TASK, student_id, student_id=student_id)
+            if student_id and topic_id:
+                background_runner.submit(
+                    EVALUATION_GRADING_TASK, f"{student_id}:{topic_id}",
+                    student_id=student_id, topic_id=topic_id,
+                )
         except Exception as exc:
-            logging.warning(f"Unable to submit evaluation processing task: {exc}")
+            logging.warning(f"Unable to schedule content result side effects: {exc}")
 
     def _process_evaluation_updates(self, student_id: str, topic_id: str) -> None:
         try:
@@ -4600,3 +4588,16 @@ class ContentResultService:
         if isinstance(value, dict):
             return {key: self._convert_objectids(val) for key, val in value.items()}
         return value
+
+
+def _run_vakr_refresh(student_id: str) -> None:
+    AdaptivePersonalizationService().get_vakr_statistics(student_id, force_refresh=True)
+    logging.info(f"VAKR stats refreshed for student {student_id}")
+
+
+def _run_evaluation_grading(student_id: str, topic_id: str) -> None:
+    ContentResultService()._process_evaluation_updates(student_id, topic_id)
+
+
+background_runner.register(VAKR_REFRESH_TASK, _run_vakr_refresh, debounce_seconds=VAKR_REFRESH_DEBOUNCE_SECONDS)
+background_runner.register(EVALUATION_GRADING_TASK, _run_evaluation_grading, debounce_seconds=EVALUATION_GRADING_DEBOUNCE_SECONDS)
@@ -1,9 +1,80 @@
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 from bson import ObjectId
 from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
 from src.content.models import ContentTypes
+from src.shared.background_tasks import background_runner
+from src.shared.cache import content_hash
+from src.shared.database import get_db
+
+# Secuencias precalculadas por tema: {_id: topic_id, version, items, digest,
+# write_seq, built_seq, built_at}. Cada escritura de contenidos incrementa
+# write_seq (invalidate_topic_sequence); la secuencia es vigente mientras
+# built_seq == write_seq. `version` solo cambia si cambian los items.
+SEQUENCES_COLLECTION = "topic_content_sequences"
+SEQUENCE_REBUILD_TASK = "content.sequence_rebuild"
+SEQUENCE_REBUILD_DEBOUNCE_SECONDS = 2
+# Acota cambios hechos sin pasar por los servicios (scripts, otras colecciones)
+SEQUENCE_MAX_AGE_SECONDS = 3600
+
+SEQUENCE_KIND_SLIDE = "slide"
+SEQUENCE_KIND_OPTIONAL = "optional"
+SEQUENCE_KIND_EVALUATION = "evaluation"
+
+SEQUENCE_STATUSES = ["draft", "active", "published", "narrative_ready", "skeleton", "html_ready"]
+
+# Tipos de contenido que pueden ser opcionales (no diapositivas ni evaluaciones)
+OPTIONAL_CONTENT_TYPES = [
+    ContentTypes.TEXT, ContentTypes.FEYNMAN, ContentTypes.STORY,
+    ContentTypes.EXAMPLES, ContentTypes.DIAGRAM, ContentTypes.INFOGRAPHIC,
+    ContentTypes.VIDEO, ContentTypes.AUDIO, ContentTypes.GAME,
+    ContentTypes.SIMULATION, ContentTypes.INTERACTIVE_EXERCISE,
+    ContentTypes.FLASHCARDS, ContentTypes.MINI_GAME
+]
+
+EVALUATION_CONTENT_TYPES = [
+    ContentTypes.QUIZ, ContentTypes.EXAM, ContentTypes.PROJECT,
+    ContentTypes.FORMATIVE_TEST, ContentTypes.PEER_REVIEW,
+    ContentTypes.PORTFOLIO, ContentTypes.RUBRIC
+]
+
+SEQUENCE_CONTENT_TYPES = [ContentTypes.SLIDE] + OPTIONAL_CONTENT_TYPES + EVALUATION_CONTENT_TYPES
+
+
+def _order_or_last(content: Dict):
+    order = content.get("order")
+    return order if isinstance(order, (int, float)) else 999
+
+
+def invalidate_topic_sequence(topic_id, db: Database = None) -> None:
+    """
+    Marca la secuencia precalculada de un tema como desactualizada y programa
+    su reconstrucción en segundo plano (las ráfagas de escrituras se coalescen).
+    El mismo write_seq marca pendiente la entrada del tema en la instantánea de
+    preparación de su módulo, que se recuenta al leerla.
+    """
+    if not topic_id or not ObjectId.is_valid(str(topic_id)):
+        return
+    try:
+        (db if db is not None else get_db())[SEQUENCES_COLLECTION].update_one(
+            {"_id": ObjectId(str(topic_id))},
+            {"$inc": {"write_seq": 1}},
+            upsert=True
+        )
+        background_runner.submit(SEQUENCE_REBUILD_TASK, str(topic_id), topic_id=str(topic_id))
+    except Exception as e:
+        logging.warning(f"No se pudo invalidar la secuencia del tema {topic_id}: {str(e)}")
+
+
+def _run_sequence_rebuild(topic_id: str) -> None:
+    StructuredSequenceService(get_db()).rebuild_topic_sequence(topic_id)
+
+
+background_runner.register(SEQUENCE_REBUILD_TASK, _run_sequence_rebuild,
+                           debounce_seconds=SEQUENCE_REBUILD_DEBOUNCE_SECONDS)
+
 
 class StructuredSequenceService:
     """
@@ -16,6 +87,7 @@ class StructuredSequenceService:
     def __init__(self, db: Database):
         self.db = db
         self.collection = db.topic_contents
+        self.sequences = db[SEQUENCES_COLLECTION]
         
     def get_structured_content_sequence(self, topic_id: str, student_id: str = None) -> List[Dict]:
         """
@@ -26,6 +98,9 @@ class StructuredSequenceService:
         2. Contenidos opcionales asociados a cada diapositiva (parent_content_id)
         3. Contenidos de evaluación al final
         
+        El orden sale de la secuencia precalculada del tema (get_topic_sequence);
+        solo se consultan los documentos completos, con un único $in.
+        
         Args:
             topic_id: ID del tema
             student_id: ID del estudiante (para personalización futura)
@@ -34,53 +109,32 @@ class StructuredSequenceService:
             Lista ordenada de contenidos siguiendo la secuencia estructurada
         """
         try:
-            # 1. Obtener todas las diapositivas ordenadas
-            slides = self._get_slides_in_order(topic_id)
-            
-            # 2. Obtener contenidos opcionales asociados a diapositivas
-            optional_contents = self._get_optional_contents(topic_id)
-            
-            # 3. Obtener contenidos de evaluación
-            evaluation_contents = self._get_evaluation_contents(topic_id)
-            
-            # 4. Construir secuencia estructurada
+            sequence = self.get_topic_sequence(topic_id)
+            items = sequence["items"]
+            if not items:
+                return []
+
+            documents = {
+                str(doc["_id"]): doc
+                for doc in self.collection.find({
+                    "_id": {"$in": [ObjectId(item["content_id"]) for item in items]},
+                    # Excluye contenidos borrados o migrados antes de reconstruir la secuencia
+                    "status": {"$in": SEQUENCE_STATUSES}
+                })
+            }
+
             structured_sequence = []
-            
-            # Insertar diapositivas con sus contenidos opcionales
-            for slide in slides:
-                # Agregar la diapositiva
-                structured_sequence.append(slide)
-                
-                # Agregar contenidos opcionales asociados a esta diapositiva
-                slide_id = slide["_id"]
-                associated_contents = [
-                    content for content in optional_contents 
-                    if content.get("parent_content_id") == slide_id
-                ]
-                
-                # Ordenar contenidos asociados por order si existe
-                associated_contents.sort(key=lambda x: x.get("order", 999))
-
-                parent_order = slide.get("order")
-                if parent_order is None:
-                    # Si la diapositiva no tiene order explícito, calcularlo a partir de la posición actual
-                    parent_order = len(structured_sequence)
-
-                for idx, content in enumerate(associated_contents):
-                    try:
-                        base_order = float(parent_order)
-                    except (TypeError, ValueError):
-                        base_order = float(len(structured_sequence))
+            for item in items:
+                content = documents.get(item["content_id"])
+                if content is None:
+                    # Borrado entre la construcción de la secuencia y esta lectura
+                    continue
+                self._stringify_ids(content)
+                if item["kind"] == SEQUENCE_KIND_OPTIONAL:
                     # Insertar inmediatamente después de la diapositiva usando fracciones
-                    intercalated_order = base_order + (idx + 1) / 100.0
-                    content["order"] = intercalated_order
-                    content["_intercalated_parent_order"] = base_order
-
-                structured_sequence.extend(associated_contents)
-            
-            # Agregar contenidos de evaluación al final
-            evaluation_contents.sort(key=lambda x: x.get("order", 999))
-            structured_sequence.extend(evaluation_contents)
+                    content["order"] = item["order"]
+                    content["_intercalated_parent_order"] = item["parent_order"]
+                structured_sequence.append(content)
             
             logging.info(f"Secuencia estructurada generada: {len(structured_sequence)} contenidos para tema {topic_id}")
             return structured_sequence
@@ -88,6 +142,198 @@ class StructuredSequenceService:
         except Exception as e:
             logging.error(f"Error generando secuencia estructurada: {str(e)}")
             return []
+
+    # ------------------------------------------------------------------
+    # Secuencia precalculada
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _stringify_ids(content: Dict) -> None:
+        content["_id"] = str(content["_id"])
+        content["topic_id"] = str(content["topic_id"])
+        if content.get("creator_id"):
+            content["creator_id"] = str(content["creator_id"])
+        if content.get("parent_content_id"):
+            content["parent_content_id"] = str(content["parent_content_id"])
+
+    @staticmethod
+    def build_sequence_items(contents: List[Dict]) -> List[Dict]:
+        """
+        Ordena contenidos compactos de un tema (diapositivas → opcionales de cada
+        diapositiva → evaluaciones), con las mismas reglas que la secuencia completa.
+        
+        Args:
+            contents: Documentos con _id, content_type, order y parent_content_id
+            
+        Returns:
+            Lista de items {content_id, content_type, kind, order, parent_content_id[, parent_order]}
+        """
+        def _item(content: Dict, kind: str) -> Dict:
+            parent_id = content.get("parent_content_id")
+            return {
+                "content_id": str(content["_id"]),
+                "content_type": content.get("content_type"),
+                "kind": kind,
+                "order": content.get("order"),
+                "parent_content_id": str(parent_id) if parent_id else None,
+            }
+
+        slides = []
+        optional_by_parent: Dict[str, List[Dict]] = {}
+        evaluations = []
+        for content in contents:
+            content_type = content.get("content_type")
+            if content_type == ContentTypes.SLIDE:
+                slides.append(content)
+            elif content_type in OPTIONAL_CONTENT_TYPES and content.get("parent_content_id"):
+                optional_by_parent.setdefault(str(content["parent_content_id"]), []).append(content)
+            elif content_type in EVALUATION_CONTENT_TYPES:
+                evaluations.append(content)
+
+        # Mismo criterio que sort("order", 1) en Mongo: sin order primero
+        slides.sort(key=lambda x: (x.get("order") is not None, x.get("order") or 0))
+
+        items = []
+        for slide in slides:
+            items.append(_item(slide, SEQUENCE_KIND_SLIDE))
+            associated_contents = sorted(
+                optional_by_parent.get(str(slide["_id"]), []),
+                key=_order_or_last
+            )
+
+            parent_order = slide.get("order")
+            if parent_order is None:
+                # Si la diapositiva no tiene order explícito, calcularlo a partir de la posición actual
+                parent_order = len(items)
+
+            for idx, content in enumerate(associated_contents):
+                try:
+                    base_order = float(parent_order)
+                except (TypeError, ValueError):
+                    base_order = float(len(items))
+                item = _item(content, SEQUENCE_KIND_OPTIONAL)
+                item["order"] = base_order + (idx + 1) / 100.0
+                item["parent_order"] = base_order
+                items.append(item)
+
+        evaluations.sort(key=_order_or_last)
+        items.extend(_item(content, SEQUENCE_KIND_EVALUATION) for content in evaluations)
+        return items
+
+    @staticmethod
+    def _sequence_response(topic_id: str, doc: Dict, persisted: bool = True) -> Dict:
+        # Sin ETag si la secuencia no quedó guardada: su versión podría repetirse con otros items
+        return {
+            "topic_id": topic_id,
+            "version": doc.get("version", 0),
+            "etag": f'W/"seq-{topic_id}-{doc.get("version", 0)}"' if persisted else None,
+            "items": doc.get("items", []),
+            "built_at": doc.get("built_at"),
+        }
+
+    def _rebuild_sequences(self, docs_by_topic: Dict[str, Optional[Dict]]) -> Dict[str, Dict]:
+        """
+        Reconstruye con una sola consulta las secuencias de varios temas y las
+        persiste. La escritura es condicional sobre write_seq: si llegó una
+        invalidación durante la reconstrucción, no se marca como vigente y la
+        respuesta se devuelve sin ETag.
+        """
+        topic_oids = [ObjectId(topic_id) for topic_id in docs_by_topic]
+        contents_by_topic: Dict[str, List[Dict]] = {topic_id: [] for topic_id in docs_by_topic}
+        for content in self.collection.find(
+            {
+                "topic_id": {"$in": topic_oids} if len(topic_oids) > 1 else topic_oids[0],
+                "content_type": {"$in": SEQUENCE_CONTENT_TYPES},
+                "status": {"$in": SEQUENCE_STATUSES}
+            },
+            {"content_type": 1, "order": 1, "parent_content_id": 1, "topic_id": 1}
+        ):
+            contents_by_topic[str(content["topic_id"])].append(content)
+
+        now = datetime.utcnow()
+        result = {}
+        for topic_id, previous in docs_by_topic.items():
+            previous = previous or {}
+            items = self.build_sequence_items(contents_by_topic[topic_id])
+            digest = content_hash(items)
+            write_seq = previous.get("write_seq", 0)
+            version = previous.get("version", 0)
+            if digest != previous.get("digest") or not version:
+                version += 1
+            doc = {
+                "_id": ObjectId(topic_id),
+                "write_seq": write_seq,
+                "built_seq": write_seq,
+                "version": version,
+                "digest": digest,
+                "items": items,
+                "built_at": now,
+            }
+            persisted = False
+            try:
+                if previous:
+                    persisted = bool(self.sequences.update_one(
+                        {"_id": doc["_id"], "write_seq": write_seq},
+                        {"$set": {k: v for k, v in doc.items() if k not in ("_id", "write_seq")}}
+                    ).matched_count)
+                else:
+                    self.sequences.insert_one(doc)
+                    persisted = True
+            except DuplicateKeyError:
+                # Otra instancia la creó a la vez; la siguiente lectura usará la suya
+                pass
+            except Exception as e:
+                logging.warning(f"No se pudo persistir la secuencia del tema {topic_id}: {str(e)}")
+            result[topic_id] = self._sequence_response(topic_id, doc, persisted)
+        return result
+
+    def _is_fresh(self, doc: Optional[Dict]) -> bool:
+        if not doc or "items" not in doc or doc.get("built_seq") != doc.get("write_seq", 0):
+            return False
+        built_at = doc.get("built_at")
+        return bool(built_at) and datetime.utcnow() - built_at < timedelta(seconds=SEQUENCE_MAX_AGE_SECONDS)
+
+    def get_topic_sequences(self, topic_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Secuencias compactas de varios temas (vistas de módulo): una consulta a
+        las secuencias precalculadas y, solo para las ausentes o invalidadas,
+        una consulta de reconstrucción compartida.
+        
+        Returns:
+            Dict {topic_id: {topic_id, version, etag, items, built_at}}
+        """
+        topic_ids = list(dict.fromkeys(str(t) for t in topic_ids if t and ObjectId.is_valid(str(t))))
+        if not topic_ids:
+            return {}
+
+        stored = {
+            str(doc["_id"]): doc
+            for doc in self.sequences.find({"_id": {"$in": [ObjectId(t) for t in topic_ids]}})
+        }
+        result = {}
+        to_rebuild = {}
+        for topic_id in topic_ids:
+            doc = stored.get(topic_id)
+            if self._is_fresh(doc):
+                result[topic_id] = self._sequence_response(topic_id, doc)
+            else:
+                to_rebuild[topic_id] = doc
+        if to_rebuild:
+            result.update(self._rebuild_sequences(to_rebuild))
+        return {topic_id: result[topic_id] for topic_id in topic_ids}
+
+    def get_topic_sequence(self, topic_id: str) -> Dict:
+        """
+        Secuencia compacta precalculada de un tema (ids, tipos, orden y padres)
+        con su versión, que cambia solo cuando cambia la secuencia (apta para ETag).
+        """
+        if not ObjectId.is_valid(str(topic_id)):
+            raise ValueError(f"ID de tema inválido: {topic_id}")
+        return self.get_topic_sequences([topic_id])[str(topic_id)]
+
+    def rebuild_topic_sequence(self, topic_id: str) -> Dict:
+        """Fuerza la reconstrucción de la secuencia de un tema."""
+        doc = self.sequences.find_one({"_id": ObjectId(topic_id)})
+        return self._rebuild_sequences({str(topic_id): doc})[str(topic_id)]
     
     def _get_slides_in_order(self, topic_id: str) -> List[Dict]:
         """
@@ -97,7 +343,7 @@ class StructuredSequenceService:
             query = {
                 "topic_id": ObjectId(topic_id),
                 "content_type": ContentTypes.SLIDE,
-                "status": {"$in": ["draft", "active", "published", "narrative_ready", "skeleton", "html_ready"]}
+                "status": {"$in": SEQUENCE_STATUSES}
             }
             
             slides = list(self.collection.find(query).sort("order", 1))
@@ -122,20 +368,13 @@ class StructuredSequenceService:
         Obtiene contenidos opcionales que están asociados a diapositivas (tienen parent_content_id).
         """
         try:
-            # Tipos de contenido que pueden ser opcionales (no diapositivas ni evaluaciones)
-            optional_types = [
-                ContentTypes.TEXT, ContentTypes.FEYNMAN, ContentTypes.STORY,
-                ContentTypes.EXAMPLES, ContentTypes.DIAGRAM, ContentTypes.INFOGRAPHIC,
-                ContentTypes.VIDEO, ContentTypes.AUDIO, ContentTypes.GAME,
-                ContentTypes.SIMULATION, ContentTypes.INTERACTIVE_EXERCISE,
-                ContentTypes.FLASHCARDS, ContentTypes.MINI_GAME
-            ]
+            optional_types = OPTIONAL_CONTENT_TYPES
             
             query = {
                 "topic_id": ObjectId(topic_id),
                 "content_type": {"$in": optional_types},
                 "parent_content_id": {"$exists": True, "$ne": None},
-                "status": {"$in": ["draft", "active", "published", "narrative_ready", "skeleton", "html_ready"]}
+                "status": {"$in": SEQUENCE_STATUSES}
             }
             
             contents = list(self.collection.find(query))
@@ -160,16 +399,12 @@ class StructuredSequenceService:
         Obtiene contenidos de evaluación que van al final de la secuencia.
         """
         try:
-            evaluation_types = [
-                ContentTypes.QUIZ, ContentTypes.EXAM, ContentTypes.PROJECT,
-                ContentTypes.FORMATIVE_TEST, ContentTypes.PEER_REVIEW,
-                ContentTypes.PORTFOLIO, ContentTypes.RUBRIC
-            ]
+            evaluation_types = EVALUATION_CONTENT_TYPES
             
             query = {
                 "topic_id": ObjectId(topic_id),
                 "content_type": {"$in": evaluation_types},
-                "status": {"$in": ["draft", "active", "published", "narrative_ready", "skeleton", "html_ready"]}
+                "status": {"$in": SEQUENCE_STATUSES}
             }
             
             contents = list(self.collection.find(query))
@@ -233,7 +468,7 @@ class StructuredSequenceService:
                 "topic_id": ObjectId(topic_id),
                 "content_type": ContentTypes.SLIDE,
                 "order": {"$exists": False},
-                "status": {"$in": ["draft", "active", "published", "narrative_ready", "skeleton", "html_ready"]}
+                "status": {"$in": SEQUENCE_STATUSES}
             })
             
             orphan_count = orphan_slides.count()
@@ -280,6 +515,7 @@ class StructuredSequenceService:
                     updated_count += 1
             
             if updated_count > 0:
+                invalidate_topic_sequence(topic_id, self.db)
                 return True, f"Se reordenaron {updated_count} diapositivas exitosamente"
             else:
                 return False, "No se pudo reordenar ninguna diapositiva"
@@ -296,9 +532,10 @@ class StructuredSequenceService:
             Dict con estadísticas de la secuencia
         """
         try:
-            slides = self._get_slides_in_order(topic_id)
-            optional_contents = self._get_optional_contents(topic_id)
-            evaluation_contents = self._get_evaluation_contents(topic_id)
+            items = self.get_topic_sequence(topic_id)["items"]
+            slides = [item for item in items if item["kind"] == SEQUENCE_KIND_SLIDE]
+            optional_contents = [item for item in items if item["kind"] == SEQUENCE_KIND_OPTIONAL]
+            evaluation_contents = [item for item in items if item["kind"] == SEQUENCE_KIND_EVALUATION]
             
             # Contar contenidos opcionales por diapositiva
             slide_content_count = {}
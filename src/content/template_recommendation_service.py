@@ -4,10 +4,42 @@ from typing import Dict, List, Optional, Any, Tuple
 from bson import ObjectId
 from datetime import datetime
 
+import numpy as np
+
 from src.shared.database import get_db
+from src.shared.cache import LRUCache, content_hash
 from .template_services import TemplateService
 from src.personalization.services import AdaptivePersonalizationService
 
+VARK_STYLES = ("V", "A", "K", "R")
+COMPLEXITY_LEVELS = ("low", "medium", "high")
+# Compatibilidad [complejidad de la diapositiva][complejidad de la plantilla]
+COMPLEXITY_MATCH = np.array([
+    [1.0, 0.7, 0.3],
+    [0.8, 1.0, 0.8],
+    [0.4, 0.7, 1.0],
+])
+# Pesos del score de compatibilidad
+WEIGHT_TAGS = 0.3
+WEIGHT_VARK = 0.25
+WEIGHT_COMPLEXITY = 0.2
+WEIGHT_DURATION = 0.15
+WEIGHT_POSITION = 0.1
+# Penalización de plantillas ya seleccionadas en diapositivas anteriores
+REPEAT_PENALTY = 1.0
+
+# Features por versión de plantilla (clave: id + version + updated_at), el HTML
+# solo se descarga cuando la versión no está en caché
+TEMPLATE_FEATURES_CACHE_SIZE = 4096
+_template_features_cache = LRUCache("template_features", max_size=TEMPLATE_FEATURES_CACHE_SIZE)
+# Contexto de tema y perfil de estudiante: cambian poco, TTL corto
+_topic_context_cache = LRUCache("template_rec_topic_context", max_size=1024, ttl_seconds=120)
+_student_profile_cache = LRUCache("template_rec_student_profile", max_size=2048, ttl_seconds=120)
+
+# Proyección ligera del catálogo (sin HTML)
+_TEMPLATE_LIGHT_PROJECTION = {"html": 0, "versions.html": 0}
+
+
 class TemplateRecommendationService:
     """
     Servicio para recomendar plantillas de IA basadas en el contenido de diapositivas específicas.
@@ -44,46 +76,31 @@ class TemplateRecommendationService:
             if not slides:
                 return {}
             
-            # Obtener plantillas disponibles para el usuario
-            available_templates = self._get_available_templates(user_id)
-            if not available_templates:
+            # Features precalculadas de las plantillas disponibles para el usuario
+            template_features = self._get_available_template_features(user_id)
+            if not template_features:
                 return {}
             
             # Obtener información del tema para contexto
             topic_info = self._get_topic_context(topic_id)
             
-            recommendations = {}
-            used_templates = set()  # Para evitar repetir plantillas
-            vark_balance = {"V": 0, "A": 0, "K": 0, "R": 0}  # Balance acumulado
+            slide_analyses = [self._analyze_slide_content(slide) for slide in slides]
+            scored = self._score_slides(slide_analyses, template_features, topic_info, max_recommendations)
             
-            for i, slide in enumerate(slides):
-                slide_id = str(slide["_id"])
-                
-                # Analizar contenido de la diapositiva
-                slide_analysis = self._analyze_slide_content(slide)
-                
-                # Generar recomendaciones para esta diapositiva
-                slide_recommendations = self._generate_slide_recommendations(
-                    slide=slide,
-                    slide_analysis=slide_analysis,
-                    available_templates=available_templates,
-                    topic_context=topic_info,
-                    used_templates=used_templates,
-                    current_vark_balance=vark_balance,
-                    slide_position=i + 1,
-                    total_slides=len(slides),
-                    max_recommendations=max_recommendations
-                )
-                
-                recommendations[slide_id] = slide_recommendations
-                
-                # Actualizar templates usados y balance VARK
-                for rec in slide_recommendations:
-                    if rec.get("selected", False):
-                        used_templates.add(rec["template_id"])
-                        template_vark = rec.get("baseline_mix", {})
-                        for key in vark_balance:
-                            vark_balance[key] += template_vark.get(key, 0)
+            recommendations = {}
+            for slide, slide_scores in zip(slides, scored):
+                recommendations[str(slide["_id"])] = [
+                    {
+                        "template_id": template_features[j]["template_id"],
+                        "template_name": template_features[j]["name"],
+                        "score": round(score, 4),
+                        "baseline_mix": template_features[j]["baseline_mix"],
+                        "score_breakdown": breakdown,
+                        "reasoning": self._generate_reasoning(template_features[j], {}, score),
+                        "selected": rank == 0
+                    }
+                    for rank, (j, score, breakdown) in enumerate(slide_scores)
+                ]
             
             logging.info(f"Generated recommendations for {len(slides)} slides in topic {topic_id}")
             return recommendations
@@ -91,6 +108,205 @@ class TemplateRecommendationService:
         except Exception as e:
             logging.error(f"Error generating template recommendations: {str(e)}")
             raise e
+
+    # ------------------------------------------------------------------
+    # Features precalculadas y scoring matricial
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _template_feature_key(template: Dict) -> str:
+        return content_hash(str(template.get("_id")), template.get("version"), str(template.get("updated_at")))
+
+    def _build_template_features(self, template: Dict) -> Dict:
+        """
+        Features de una versión de plantilla usadas por el scoring (requiere el HTML).
+        """
+        style_tags = template.get("style_tags", []) or []
+        baseline_mix = template.get("baseline_mix", {}) or {}
+
+        if baseline_mix:
+            dominant = max(baseline_mix, key=baseline_mix.get)
+            dominant_index = VARK_STYLES.index(dominant) if dominant in VARK_STYLES else len(VARK_STYLES)
+        else:
+            dominant_index = len(VARK_STYLES) + 1  # Score neutro
+
+        template_html = template.get("html", "")
+        if isinstance(template.get("versions"), list) and template["versions"]:
+            template_html = template["versions"][-1].get("html", "")
+        template_html = template_html or ""
+        complexity = "low"
+        if len(template_html) > 1000 or "javascript" in template_html.lower():
+            complexity = "high"
+        elif len(template_html) > 500:
+            complexity = "medium"
+
+        # Mismas reglas que _calculate_position_score por tramo de la secuencia
+        if "informative" in style_tags or "theoretical" in style_tags:
+            position_early = 1.0
+        elif "interactive" in style_tags:
+            position_early = 0.6
+        else:
+            position_early = 0.7
+        if "interactive" in style_tags or "game" in style_tags:
+            position_late = 1.0
+        elif "assessment" in style_tags:
+            position_late = 0.9
+        else:
+            position_late = 0.7
+
+        return {
+            "template_id": str(template["_id"]),
+            "name": template.get("name"),
+            "content_type": self._infer_template_content_type(template),
+            "baseline_mix": baseline_mix,
+            "dominant_vark": dominant_index,
+            "complexity": COMPLEXITY_LEVELS.index(complexity),
+            "duration": self._estimate_template_duration(template),
+            "position_early": position_early,
+            "position_late": position_late,
+            "style_tags": list(style_tags),
+            "subject_tags": list(template.get("subject_tags", []) or []),
+            "defaults": template.get("defaults", {}) or {},
+        }
+
+    def _get_available_template_features(self, user_id: str = None) -> List[Dict]:
+        """
+        Features de las plantillas disponibles. El catálogo se lee sin HTML y solo
+        las versiones que no están en caché se descargan completas (un único $in).
+        """
+        try:
+            catalog = self._get_available_templates(user_id, projection=_TEMPLATE_LIGHT_PROJECTION)
+            features: Dict[str, Dict] = {}
+            missing = {}
+            for template in catalog:
+                key = self._template_feature_key(template)
+                hit, cached = _template_features_cache.get(key)
+                if hit:
+                    features[key] = cached
+                else:
+                    missing[template["_id"]] = key
+
+            if missing:
+                for template in self.templates_collection.find({"_id": {"$in": list(missing)}}):
+                    template_features = self._build_template_features(template)
+                    _template_features_cache.set(missing[template["_id"]], template_features)
+                    features[missing[template["_id"]]] = template_features
+
+            return [
+                features[key]
+                for key in (self._template_feature_key(template) for template in catalog)
+                if key in features
+            ]
+
+        except Exception as e:
+            logging.error(f"Error getting available template features: {str(e)}")
+            return []
+
+    def _score_matrix(self, slide_analyses: List[Dict], template_features: List[Dict],
+                      topic_context: Dict) -> Dict[str, np.ndarray]:
+        """
+        Componentes del score independientes de la secuencia, como matrices
+        [diapositivas × plantillas] (tags, complejidad, duración, posición).
+        """
+        total_slides = len(slide_analyses)
+        topic_tags = set(topic_context.get("tags", []) or [])
+
+        tag_scores = np.zeros(len(template_features))
+        if topic_tags:
+            for j, features in enumerate(template_features):
+                subject_tags = set(features["subject_tags"])
+                if subject_tags:
+                    tag_scores[j] = len(subject_tags & topic_tags) / max(len(subject_tags), len(topic_tags))
+
+        slide_complexity = np.array([
+            COMPLEXITY_LEVELS.index(a.get("complexity", "medium")) if a.get("complexity", "medium") in COMPLEXITY_LEVELS else 1
+            for a in slide_analyses
+        ])
+        slide_duration = np.array([a.get("estimated_duration", 60) for a in slide_analyses], dtype=float)
+        template_complexity = np.array([f["complexity"] for f in template_features])
+        template_duration = np.array([f["duration"] for f in template_features], dtype=float)
+
+        complexity = COMPLEXITY_MATCH[slide_complexity[:, None], template_complexity[None, :]]
+        total_duration = slide_duration[:, None] + template_duration[None, :]
+        duration = np.where(total_duration > 300, 0.2, np.where(total_duration > 180, 0.6, 1.0))
+
+        positions = np.arange(1, total_slides + 1)
+        early = (positions <= total_slides * 0.3)[:, None]
+        late = (positions >= total_slides * 0.7)[:, None]
+        position = np.where(
+            early, np.array([f["position_early"] for f in template_features])[None, :],
+            np.where(late, np.array([f["position_late"] for f in template_features])[None, :], 0.8)
+        )
+
+        return {
+            "tags": np.broadcast_to(tag_scores[None, :], complexity.shape),
+            "complexity": complexity,
+            "duration": duration,
+            "position": position,
+        }
+
+    @staticmethod
+    def _vark_balance_scores(current_balance: Dict, dominant_vark: np.ndarray) -> np.ndarray:
+        """
+        Versión vectorizada de _calculate_vark_balance_score para todas las plantillas.
+        """
+        balance = np.array([current_balance.get(style, 0) for style in VARK_STYLES], dtype=float)
+        style_scores = np.where(balance == balance.min(), 1.0, np.where(balance < balance.sum() / 4, 0.8, 0.3))
+        # Índice 4: estilo dominante desconocido (balance 0); índice 5: plantilla sin mix
+        unknown = 1.0 if balance.min() == 0 else (0.8 if balance.sum() > 0 else 0.3)
+        return np.append(style_scores, [unknown, 0.5])[dominant_vark]
+
+    def _score_slides(self, slide_analyses: List[Dict], template_features: List[Dict],
+                      topic_context: Dict, max_recommendations: int,
+                      boosts: Optional[np.ndarray] = None) -> List[List[Tuple[int, float, Dict]]]:
+        """
+        Puntúa todas las diapositivas contra todas las plantillas y aplica en una
+        pasada secuencial el balance VARK y la penalización por repetición.
+        
+        Args:
+            boosts: Matriz [diapositivas × plantillas] sumada al score final (RL)
+            
+        Returns:
+            Por diapositiva, lista de (índice de plantilla, score final, desglose)
+        """
+        components = self._score_matrix(slide_analyses, template_features, topic_context)
+        static = (
+            WEIGHT_TAGS * components["tags"]
+            + WEIGHT_COMPLEXITY * components["complexity"]
+            + WEIGHT_DURATION * components["duration"]
+            + WEIGHT_POSITION * components["position"]
+        )
+        dominant_vark = np.array([f["dominant_vark"] for f in template_features])
+        mixes = np.array([[f["baseline_mix"].get(style, 0) for style in VARK_STYLES] for f in template_features], dtype=float)
+        used = np.zeros(len(template_features), dtype=bool)
+        vark_balance = {style: 0 for style in VARK_STYLES}
+        top_k = max(1, min(max_recommendations, len(template_features)))
+
+        results = []
+        for i in range(len(slide_analyses)):
+            vark = self._vark_balance_scores(vark_balance, dominant_vark)
+            scores = np.minimum(1.0, static[i] + WEIGHT_VARK * vark)
+            if boosts is not None:
+                scores = scores + boosts[i]
+            ranking = scores - REPEAT_PENALTY * used
+            top = np.argpartition(-ranking, top_k - 1)[:top_k]
+            top = top[np.argsort(-ranking[top], kind="stable")]
+
+            results.append([
+                (int(j), float(scores[j]), {
+                    "tags": float(components["tags"][i, j]),
+                    "vark_balance": float(vark[j]),
+                    "complexity": float(components["complexity"][i, j]),
+                    "duration": float(components["duration"][i, j]),
+                    "position": float(components["position"][i, j]),
+                })
+                for j in top
+            ])
+
+            selected = top[0]
+            used[selected] = True
+            for k, style in enumerate(VARK_STYLES):
+                vark_balance[style] += mixes[selected, k]
+        return results
     
     def _calculate_rl_boost(self, template: Dict, slide_index: int, rl_context: Dict) -> Tuple[float, Dict]:
         """
@@ -196,7 +412,7 @@ class TemplateRecommendationService:
             logging.error(f"Error getting topic slides: {str(e)}")
             return []
     
-    def _get_available_templates(self, user_id: str = None) -> List[Dict]:
+    def _get_available_templates(self, user_id: str = None, projection: Optional[Dict] = None) -> List[Dict]:
         """
         Obtiene plantillas disponibles para el usuario (propias + públicas).
         """
@@ -212,7 +428,7 @@ class TemplateRecommendationService:
             else:
                 query = {"scope": "public", "status": {"$in": ["usable", "certified"]}}
             
-            templates = list(self.templates_collection.find(query))
+            templates = list(self.templates_collection.find(query, projection))
             return templates
             
         except Exception as e:
@@ -224,18 +440,24 @@ class TemplateRecommendationService:
         Obtiene información contextual del tema.
         """
         try:
+            hit, cached = _topic_context_cache.get(str(topic_id))
+            if hit:
+                return dict(cached)
+
             # Obtener información del tema desde la colección topics
             topic = self.db.topics.find_one({"_id": ObjectId(topic_id)})
             if not topic:
                 return {}
             
-            return {
+            context = {
                 "title": topic.get("title", ""),
                 "subject": topic.get("subject", ""),
                 "difficulty_level": topic.get("difficulty_level", "medium"),
                 "tags": topic.get("tags", []),
                 "target_audience": topic.get("target_audience", "general")
             }
+            _topic_context_cache.set(str(topic_id), context)
+            return dict(context)
             
         except Exception as e:
             logging.error(f"Error getting topic context: {str(e)}")
@@ -325,9 +547,9 @@ class TemplateRecommendationService:
             if not slides:
                 return False, {"error": "No se encontraron diapositivas para el tema"}
             
-            # 2. Obtener plantillas disponibles
-            available_templates = self._get_available_templates()
-            if not available_templates:
+            # 2. Obtener plantillas disponibles (features precalculadas por versión)
+            template_features = self._get_available_template_features()
+            if not template_features:
                 return False, {"error": "No hay plantillas disponibles"}
             
             # 3. Obtener contexto del tema
@@ -356,13 +578,10 @@ class TemplateRecommendationService:
             if student_id:
                 student_profile = self._get_student_profile(student_id)
             
-            # 6. Generar recomendaciones para cada diapositiva
-            recommendations = {}
-            for i, slide in enumerate(slides):
-                slide_recommendations = self._generate_slide_recommendations(
-                    slide, available_templates, topic_context, student_profile, rl_recommendations, i
-                )
-                recommendations[str(slide["_id"])] = slide_recommendations
+            # 6. Generar recomendaciones para todas las diapositivas en una sola matriz
+            recommendations = self._generate_slide_recommendations(
+                slides, template_features, topic_context, student_profile, rl_recommendations
+            )
             
             response_payload = {
                 "topic_id": topic_id,
@@ -382,72 +601,72 @@ class TemplateRecommendationService:
             logging.error(f"Error generando recomendaciones de plantillas: {str(e)}")
             return False, {"error": "Error interno del servidor", "message": str(e)}
     
-    def _generate_slide_recommendations(self, slide: Dict, available_templates: List[Dict], 
+    def _rl_boost_matrix(self, template_features: List[Dict], total_slides: int,
+                         rl_recommendations: Dict) -> Tuple[np.ndarray, List[List[Dict]]]:
+        """
+        Boost RL por (diapositiva, plantilla). Solo el formato legacy con
+        position_recommendations depende de la diapositiva; en los demás casos
+        se calcula una vez por plantilla.
+        """
+        templates = [{"_id": f["template_id"], "content_type": f["content_type"], "style_tags": f["style_tags"]}
+                     for f in template_features]
+        boosts = np.zeros((total_slides, len(templates)))
+        details = [[{} for _ in templates] for _ in range(total_slides)]
+        per_slide = bool(rl_recommendations.get("position_recommendations"))
+        for j, template in enumerate(templates):
+            if per_slide:
+                for i in range(total_slides):
+                    boosts[i, j], details[i][j] = self._calculate_rl_boost(template, i, rl_recommendations)
+            else:
+                boost, detail = self._calculate_rl_boost(template, 0, rl_recommendations)
+                boosts[:, j] = boost
+                for i in range(total_slides):
+                    details[i][j] = detail
+        return boosts, details
+
+    def _generate_slide_recommendations(self, slides: List[Dict], template_features: List[Dict],
                                        topic_context: Dict, student_profile: Dict = None,
-                                       rl_recommendations: Dict = None, slide_index: int = 0) -> Dict:
+                                       rl_recommendations: Dict = None) -> Dict[str, Dict]:
         """
-        Genera recomendaciones de plantillas para una diapositiva específica
+        Genera recomendaciones de plantillas para todas las diapositivas de un tema
         incorporando recomendaciones del sistema RL
         """
-        try:
-            # Analizar contenido de la diapositiva
-            slide_analysis = self._analyze_slide_content(slide)
-            
-            # Calcular compatibilidad con cada plantilla
-            template_scores = []
-            for template in available_templates:
-                compatibility_score = self._calculate_template_compatibility(
-                    slide_analysis, template, topic_context, student_profile
-                )
-                template_type = self._infer_template_content_type(template)
-
-                # Aplicar boost del sistema RL si está disponible
-                rl_boost = 0.0
-                rl_boost_details = {}
-                if rl_recommendations:
-                    rl_boost, rl_boost_details = self._calculate_rl_boost(
-                        template, slide_index, rl_recommendations
-                    )
-                
-                final_score = compatibility_score["total_score"] + rl_boost
-                
-                template_scores.append({
-                    "template_id": str(template["_id"]),
-                    "template_name": template["name"],
-                    "template_content_type": template_type,
-                    "compatibility_score": compatibility_score["total_score"],
+        slide_analyses = [self._analyze_slide_content(slide) for slide in slides]
+        boosts, boost_details = None, None
+        if rl_recommendations:
+            boosts, boost_details = self._rl_boost_matrix(template_features, len(slides), rl_recommendations)
+
+        # Ordenadas por puntuación final (compatibilidad + RL), top 3 por diapositiva
+        scored = self._score_slides(slide_analyses, template_features, topic_context, 3, boosts=boosts)
+
+        recommendations = {}
+        for i, (slide, slide_scores) in enumerate(zip(slides, scored)):
+            top_recommendations = []
+            for j, final_score, breakdown in slide_scores:
+                features = template_features[j]
+                rl_boost = float(boosts[i, j]) if boosts is not None else 0.0
+                top_recommendations.append({
+                    "template_id": features["template_id"],
+                    "template_name": features["name"],
+                    "template_content_type": features["content_type"],
+                    "compatibility_score": final_score - rl_boost,
                     "rl_boost": rl_boost,
-                    "rl_boost_details": rl_boost_details,
+                    "rl_boost_details": boost_details[i][j] if boost_details else {},
                     "final_score": final_score,
-                    "score_breakdown": compatibility_score["breakdown"],
-                    "recommended_props": self._generate_template_props(
-                        slide, template, compatibility_score
-                    )
+                    "score_breakdown": breakdown,
+                    "recommended_props": dict(features["defaults"])
                 })
-            
-            # Ordenar por puntuación final (compatibilidad + RL)
-            template_scores.sort(key=lambda x: x["final_score"], reverse=True)
-            
-            # Seleccionar top 3 recomendaciones
-            top_recommendations = template_scores[:3]
-            
-            return {
+
+            recommendations[str(slide["_id"])] = {
                 "slide_id": str(slide["_id"]),
                 "slide_title": slide.get("title", "Sin título"),
-                "slide_index": slide_index,
-                "slide_analysis": slide_analysis,
+                "slide_index": i,
+                "slide_analysis": slide_analyses[i],
                 "recommendations": top_recommendations,
-                "total_templates_analyzed": len(available_templates),
+                "total_templates_analyzed": len(template_features),
                 "rl_enhanced": rl_recommendations is not None
             }
-            
-        except Exception as e:
-            logging.error(f"Error generating slide recommendations: {str(e)}")
-            return {
-                "slide_id": str(slide["_id"]),
-                "error": str(e),
-                "recommendations": []
-            }
+        return recommendations
     
     def _calculate_compatibility_score(self, template: Dict, slide_analysis: Dict,
                                      topic_context: Dict, current_vark_balance: Dict,
@@ -803,16 +1022,22 @@ class TemplateRecommendationService:
         Obtiene el perfil del estudiante para personalización.
         """
         try:
+            hit, cached = _student_profile_cache.get(str(student_id))
+            if hit:
+                return dict(cached)
+
             student = self.db.students.find_one({"_id": ObjectId(student_id)})
             if not student:
                 return {}
             
-            return {
+            profile = {
                 "learning_style": student.get("learning_style", {}),
                 "performance_history": student.get("performance_history", []),
                 "preferences": student.get("preferences", {}),
                 "difficulty_level": student.get("difficulty_level", "medium")
             }
+            _student_profile_cache.set(str(student_id), profile)
+            return dict(profile)
             
         except Exception as e:
             logging.error(f"Error getting student profile: {str(e)}")
@@ -1,11 +1,11 @@
 import logging
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, make_response
 from flask_jwt_extended import get_jwt_identity, get_jwt
 from bson import ObjectId
 from typing import Dict, Any
 import traceback
 
-from .template_services import TemplateService, TemplateMarkupExtractor
+from .template_services import TemplateService, TemplateInstanceService, TemplateMarkupExtractor, TemplateRenderer
 from .template_integration_service import TemplateIntegrationService
 from .template_validator import validate_template_html, validate_template_reporting_compliance
 from .template_models import Template
@@ -14,6 +14,9 @@ from .models import ContentTypes
 from src.shared.decorators import auth_required, role_required
 from src.shared.constants import ROLES
 from src.shared.utils import ensure_json_serializable
+from src.shared.exceptions import AppException
+from src.shared.pagination import parse_page_limit
+from src.shared.cache import content_hash
 import json
 
 template_bp = Blueprint('templates', __name__, url_prefix='/api/templates')
@@ -21,6 +24,7 @@ preview_bp = Blueprint('templates_preview', __name__, url_prefix='/preview')
 
 # Inicializar servicios
 template_service = TemplateService()
+template_instance_service = TemplateInstanceService()
 template_integration_service = TemplateIntegrationService()
 
 @template_bp.route('', methods=['POST'])
@@ -267,6 +271,8 @@ def list_templates():
     - scope: "public" | "org" | "private"
     - style_tags: filtro por tags de estilo (comma separated)
     - subject_tags: filtro por tags de materia (comma separated)
+    - limit: tamaño de página (default: 100)
+    - cursor: cursor keyset devuelto como next_cursor
     """
     try:
         user_id = get_jwt_identity()
@@ -278,22 +284,26 @@ def list_templates():
         scope_filter = request.args.get('scope')
         style_tags = request.args.get('style_tags', '').split(',') if request.args.get('style_tags') else None
         subject_tags = request.args.get('subject_tags', '').split(',') if request.args.get('subject_tags') else None
+        limit = parse_page_limit(request.args.get('limit'), default=100)
+        cursor = request.args.get('cursor')
         
-        # Obtener plantillas
-        templates = template_service.list_templates(
+        # Obtener plantillas (subject_tags es coincidencia ANY también en la consulta;
+        # style_tags solo se delega con un único tag porque la consulta usa $all)
+        templates, next_cursor = template_service.list_templates_page(
             owner_filter=owner_filter,
             scope_filter=scope_filter,
             user_id=user_id,
-            workspace_id=workspace_id
+            workspace_id=workspace_id,
+            style_tags=style_tags if style_tags and len(style_tags) == 1 else None,
+            subject_tags=subject_tags,
+            limit=limit,
+            cursor=cursor
         )
         
         # Aplicar filtros adicionales
-        if style_tags:
+        if style_tags and len(style_tags) > 1:
             templates = [t for t in templates if any(tag in t.style_tags for tag in style_tags)]
         
-        if subject_tags:
-            templates = [t for t in templates if any(tag in t.subject_tags for tag in subject_tags)]
-        
         # Convertir a dict para respuesta
         templates_data = ensure_json_serializable([template.to_dict() for template in templates])
         
@@ -301,10 +311,17 @@ def list_templates():
             "success": True,
             "data": {
                 "templates": templates_data,
-                "total": len(templates_data)
+                "total": len(templates_data),
+                "next_cursor": next_cursor
             }
         }), 200
         
+    except AppException as e:
+        return jsonify({
+            "success": False,
+            "error": "VALIDATION_ERROR",
+            "message": e.message
+        }), e.code
     except Exception as e:
         logging.error(f"Error listing templates: {str(e)}")
         return jsonify({
@@ -392,6 +409,7 @@ def get_available_templates():
       - learning_methodology: visual|kinesthetic|gamification etc.
       - compatibility: modo de compatibilidad (p.ej. kinesthetic)
       - limit, skip: paginación
+      - cursor: cursor keyset devuelto como next_cursor (reemplaza a skip)
     """
     try:
         user_id = get_jwt_identity()
@@ -405,8 +423,9 @@ def get_available_templates():
         compatibility = request.args.get('compatibility')
         limit = int(request.args.get('limit', 50))
         skip = int(request.args.get('skip', 0))
+        cursor = request.args.get('cursor')
 
-        templates = template_service.get_available_templates_for_teacher(
+        templates, next_cursor = template_service.get_available_templates_page_for_teacher(
             teacher_id=user_id,
             workspace_id=workspace_id,
             subject=subject,
@@ -415,7 +434,8 @@ def get_available_templates():
             learning_methodology=learning_methodology,
             compatibility=compatibility,
             limit=limit,
-            skip=skip
+            skip=skip,
+            cursor=cursor
         )
 
         # Asegurar serialización
@@ -425,10 +445,17 @@ def get_available_templates():
             "success": True,
             "data": {
                 "templates": templates_serializable,
-                "total": len(templates_serializable)
+                "total": len(templates_serializable),
+                "next_cursor": next_cursor
             }
         }), 200
 
+    except AppException as e:
+        return jsonify({
+            "success": False,
+            "error": "VALIDATION_ERROR",
+            "message": e.message
+        }), e.code
     except Exception as e:
         logging.error(f"Error in get_available_templates: {e}")
         traceback.print_exc()
@@ -675,6 +702,23 @@ def delete_template(template_id):
             "message": "Error interno del servidor"
         }), 500
 
+def _preview_response(html: str, etag: str):
+    """
+    Respuesta HTML del preview con ETag fuerte; 304 sin cuerpo si If-None-Match
+    coincide. no-cache obliga al iframe a revalidar en cada carga.
+    """
+    if_none_match = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    if etag in if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(html, 200)
+        response.headers['Content-Type'] = 'text/html'
+        response.headers['Content-Security-Policy'] = "sandbox allow-scripts allow-same-origin"
+        response.headers['X-Frame-Options'] = 'SAMEORIGIN'
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @preview_bp.route('/template/<template_id>')
 def preview_template(template_id):
     """
@@ -682,19 +726,15 @@ def preview_template(template_id):
     Devuelve HTML para mostrar en iframe.
     """
     try:
-        template = template_service.get_template(template_id)
+        preview = template_service.get_template_preview(template_id)
         
-        if not template:
+        if not preview:
             return "<html><body><h1>Plantilla no encontrada</h1></body></html>", 404
         
         # TODO: Aplicar Content Security Policy para sandbox
         # TODO: Envolver en iframe seguro si es necesario
         
-        return template.get_latest_html(), 200, {
-            'Content-Type': 'text/html',
-            'Content-Security-Policy': "sandbox allow-scripts allow-same-origin",
-            'X-Frame-Options': 'SAMEORIGIN'
-        }
+        return _preview_response(preview["html"], preview["etag"])
         
     except Exception as e:
         logging.error(f"Error previewing template {template_id}: {str(e)}")
@@ -707,23 +747,21 @@ def preview_instance(instance_id):
     Devuelve HTML personalizado listo para mostrar.
     """
     try:
-        instance = instance_service.get_instance(instance_id)
+        try:
+            preview = template_instance_service.get_instance_preview(instance_id)
+        except ValueError:
+            return "<html><body><h1>Plantilla base no encontrada</h1></body></html>", 404
         
-        if not instance:
+        if not preview:
             return "<html><body><h1>Instancia no encontrada</h1></body></html>", 404
         
-        # Obtener plantilla base
-        template = template_service.get_template(str(instance.template_id))
-        if not template:
-            return "<html><body><h1>Plantilla base no encontrada</h1></body></html>", 404
-        
-        # Aplicar props a la plantilla
-        processed_html = _apply_props_to_template(template.get_latest_html(), instance.props)
+        processed_html = preview["html"]
+        etag = preview["etag"]
 
         # Construir contexto para el runtime del iframe (IDs y metadatos)
         context_payload = {
-            "templateInstanceId": str(getattr(instance, "_id", instance_id)),
-            "templateId": str(getattr(instance, "template_id", template._id)),
+            "templateInstanceId": instance_id,
+            "templateId": preview["template_id"],
             "virtualContentId": request.args.get("virtual_content_id"),
             "templateUsageId": request.args.get("template_usage_id"),
             "contentId": request.args.get("content_id"),
@@ -731,8 +769,7 @@ def preview_instance(instance_id):
         context_payload = {k: v for k, v in context_payload.items() if v}
         if context_payload:
             context_script = f"<script>window.__sapiensTemplateContext = {json.dumps(context_payload)};</script>"
-            lower_html = processed_html.lower()
-            closing_body_index = lower_html.rfind("</body>")
+            closing_body_index = preview["body_index"]
             if closing_body_index != -1:
                 processed_html = (
                     processed_html[:closing_body_index]
@@ -741,12 +778,10 @@ def preview_instance(instance_id):
                 )
             else:
                 processed_html = processed_html + context_script
+            # El contexto depende de la URL: forma parte del ETag
+            etag = f'"{content_hash(etag, context_script)}"'
         
-        return processed_html, 200, {
-            'Content-Type': 'text/html',
-            'Content-Security-Policy': "sandbox allow-scripts allow-same-origin",
-            'X-Frame-Options': 'SAMEORIGIN'
-        }
+        return _preview_response(processed_html, etag)
         
     except Exception as e:
         logging.error(f"Error previewing instance {instance_id}: {str(e)}")
@@ -1010,27 +1045,7 @@ def _apply_props_to_template(html: str, props: Dict[str, Any]) -> str:
     Aplica las propiedades de una instancia al HTML de la plantilla.
     """
     try:
-        import re
-        
-        processed_html = html
-        
-        # Reemplazar marcadores de parámetros
-        for prop_name, prop_value in props.items():
-            # Buscar data-sapiens-param="prop_name" y reemplazar el contenido
-            param_pattern = rf'(<[^>]*data-sapiens-param=["\']?{re.escape(prop_name)}["\']?[^>]*>)([^<]*)'
-            
-            def replace_param_content(match):
-                tag_opening = match.group(1)
-                # Mantener la etiqueta pero reemplazar el contenido
-                return f"{tag_opening}{prop_value}"
-            
-            processed_html = re.sub(param_pattern, replace_param_content, processed_html, flags=re.IGNORECASE)
-            
-            # También buscar atributos que usen el parámetro
-            attr_pattern = rf'({prop_name})'
-            processed_html = re.sub(attr_pattern, str(prop_value), processed_html)
-        
-        return processed_html
+        return TemplateRenderer.apply_props(html, props)
         
     except Exception as e:
         logging.error(f"Error applying props to template: {str(e)}")
@@ -11,7 +11,34 @@ import os
 
 from .template_models import Template, TemplateInstance
 from src.shared.database import get_db
+from src.shared.cache import LRUCache, VersionedCache, content_hash
+from src.shared.exceptions import AppException
+from src.shared.pagination import build_keyset_filter, decode_cursor, merge_filters, paginate_results
 from .models import LearningMethodologyTypes, DeprecatedContentTypes, ContentTypes
+from .structured_sequence_service import invalidate_topic_sequence
+
+# Caché del catálogo de plantillas (list_templates / get_available_templates_for_teacher).
+# Particiones de invalidación: "public" (global), "org:<workspace_id>" y
+# "user:<user_id>". Cada entrada vive en el ámbito público y su sufijo incluye
+# las versiones de las particiones org/usuario visibles para quien consulta, así
+# que una escritura solo invalida las consultas que podían contener la plantilla.
+TEMPLATE_CATALOG_CACHE_TTL_SECONDS = 60
+TEMPLATE_CATALOG_CACHE_SIZE = 512
+TEMPLATE_CATALOG_PUBLIC_SCOPE = "public"
+_template_catalog_cache = VersionedCache("template_catalog", ttl_seconds=TEMPLATE_CATALOG_CACHE_TTL_SECONDS,
+                                         max_size=TEMPLATE_CATALOG_CACHE_SIZE)
+
+# Orden estable de la paginación keyset del catálogo (índices idx_templates_*_created)
+TEMPLATE_PAGE_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def _catalog_user_scope(user_id: Any) -> Optional[str]:
+    return f"user:{user_id}" if user_id else None
+
+
+def _catalog_org_scope(workspace_id: Any) -> Optional[str]:
+    return f"org:{workspace_id}" if workspace_id else None
+
 
 class TemplateService:
     """
@@ -51,6 +78,7 @@ class TemplateService:
             # Insertar en base de datos
             result = self.templates_collection.insert_one(template.to_dict())
             template._id = result.inserted_id
+            self._invalidate_catalog(user_id, [template.scope])
             
             logging.info(f"Template created with ID: {template._id}")
             return template
@@ -76,6 +104,24 @@ class TemplateService:
             logging.error(f"Error getting template {template_id}: {str(e)}")
             raise e
 
+    def get_template_preview(self, template_id: str) -> Optional[Dict]:
+        """
+        HTML bruto de la plantilla con su ETag, desde la caché de render
+        (se invalida en update_template/delete_template). None si no existe.
+        """
+        scope = _render_template_scope(template_id)
+        hit, preview, version = _template_render_cache.get_with_version(scope, "preview")
+        if hit:
+            return preview
+
+        template = self.get_template(template_id)
+        if not template:
+            return None
+        html = template.get_latest_html()
+        preview = {"html": html, "etag": TemplateRenderer.strong_etag(html)}
+        _template_render_cache.set(scope, preview, "preview", version=version)
+        return preview
+
     def _clean_template_data(self, template_data: Dict) -> Dict:
         """
         Limpia y valida los datos de la plantilla para evitar errores de construcción.
@@ -183,7 +229,8 @@ class TemplateService:
                       migration_recommended: Optional[bool] = None,
                       limit: int = 100,
                       skip: int = 0,
-                      sort: Optional[List[Tuple[str, int]]] = None) -> List[Template]:
+                      sort: Optional[List[Tuple[str, int]]] = None,
+                      cursor: Optional[str] = None) -> List[Template]:
         """
         Lista plantillas con filtros optimizados. Mueve la lógica de filtrado por tags al nivel de consulta MongoDB.
         
@@ -198,118 +245,40 @@ class TemplateService:
             compatibility_mode: modo de compatibilidad (p.ej. "kinesthetic") para incluir plantillas mapeadas
             migration_recommended: si True, solo plantillas marcadas como recomendadas para migración legacy
             limit: número máximo de resultados
-            skip: offset
+            skip: offset (se ignora si se entrega cursor)
             sort: lista de tuplas (campo, dir) para sort
+            cursor: cursor keyset devuelto por list_templates_page
+        """
+        templates, _ = self.list_templates_page(
+            owner_filter=owner_filter,
+            scope_filter=scope_filter,
+            user_id=user_id,
+            workspace_id=workspace_id,
+            style_tags=style_tags,
+            subject_tags=subject_tags,
+            learning_methodology=learning_methodology,
+            compatibility_mode=compatibility_mode,
+            migration_recommended=migration_recommended,
+            limit=limit,
+            skip=skip,
+            sort=sort,
+            cursor=cursor
+        )
+        return templates
+
+    def list_templates_page(self, cursor: Optional[str] = None, **filters) -> Tuple[List[Template], Optional[str]]:
+        """
+        Igual que list_templates pero retorna (plantillas, next_cursor).
+
+        Las páginas se ordenan por (created_at, _id) descendente y el cursor
+        filtra a partir de la última fila entregada (índices
+        idx_templates_scope_status_created / idx_templates_owner_created).
+        Los documentos se sirven desde la caché del catálogo cuando las
+        particiones visibles para el usuario no han cambiado.
         """
         try:
-            query = {}
-            
-            # Filtro de propietario
-            if owner_filter == "me" and user_id:
-                try:
-                    query["owner_id"] = ObjectId(user_id)
-                except Exception:
-                    query["owner_id"] = user_id
-            elif owner_filter == "all":
-                # Para "all", incluir públicas y del usuario/org
-                scope_conditions = [{"scope": "public"}]
-                
-                if user_id:
-                    try:
-                        scope_conditions.append({"owner_id": ObjectId(user_id)})
-                    except Exception:
-                        scope_conditions.append({"owner_id": user_id})
-                
-                    # Añadir plantillas privadas del usuario
-                    scope_conditions.append({"scope": {"$in": ["public", "org", "private"]}})
-                
-                # Si workspace_id disponible, preferir org scope también
-                if workspace_id:
-                    # Buscar plantillas de scope org asociadas al workspace (campo workspace_id)
-                    try:
-                        scope_conditions.append({"workspace_id": ObjectId(workspace_id), "scope": "org"})
-                    except Exception:
-                        scope_conditions.append({"workspace_id": workspace_id, "scope": "org"})
-                
-                query["$or"] = scope_conditions
-            
-            # Filtro de scope explícito
-            if scope_filter:
-                # Combinar correctamente con posibles $or preexistentes
-                if "$or" in query:
-                    query = {"$and": [query, {"scope": scope_filter}]}
-                else:
-                    query["scope"] = scope_filter
-            
-            # Filtrado por style_tags: requerir que el array style_tags del documento contenga al menos todos los solicitados
-            if style_tags:
-                if isinstance(style_tags, str):
-                    style_tags = [style_tags]
-                # usar $all para requerir todos los tags; si se desea $in, cambiar a {"$in": style_tags}
-                query["style_tags"] = {"$all": style_tags}
-            
-            # Filtrado por subject_tags: coincidencia ANY (al menos uno)
-            if subject_tags:
-                if isinstance(subject_tags, str):
-                    subject_tags = [subject_tags]
-                query["subject_tags"] = {"$in": subject_tags}
-            
-            # Filtrado por metodología de aprendizaje: mirar en capabilities.compatible_methodologies o en capabilities.learning_methodologies
-            if learning_methodology:
-                # buscar en posibles ubicaciones dentro de capabilities
-                query["$or"] = query.get("$or", []) + [
-                    {"capabilities.compatible_methodologies": learning_methodology},
-                    {"capabilities.learning_methodologies": learning_methodology},
-                    {"capabilities.methodologies": learning_methodology}
-                ]
-                # Si previously had a top-level $and container we must keep consistent, but Mongo will accept multiple $or as list
-                
-            # compatibility_mode: por ejemplo 'kinesthetic' -> map to recommended template tags/mappings
-            if compatibility_mode:
-                # Map methodology keywords to template name hints using LearningMethodologyTypes mapping
-                mapped = LearningMethodologyTypes.map_kinesthetic_to_templates().get(compatibility_mode, [])
-                if mapped:
-                    # Buscar por name o por capabilities.recommendation
-                    query["$or"] = query.get("$or", []) + [
-                        {"name": {"$in": mapped}},
-                        {"capabilities.recommended_aliases": {"$in": mapped}},
-                        {"capabilities.modes": compatibility_mode}
-                    ]
-                else:
-                    # Fallback: attempt to match capability flag
-                    query["capabilities.mode"] = compatibility_mode
-            
-            # migration_recommended: buscar plantillas marcadas para reemplazar legacy games/simulations
-            if migration_recommended is not None:
-                if migration_recommended:
-                    # Buscar campo capabilities.replaces_legacy o migration_recommended = True
-                    query["$or"] = query.get("$or", []) + [
-                        {"capabilities.replaces_legacy": True},
-                        {"migration_recommended": True},
-                        {"capabilities.legacy_compatibility": True}
-                    ]
-                else:
-                    # Explicit negative filter
-                    query["$and"] = query.get("$and", []) + [
-                        {"capabilities.replaces_legacy": {"$ne": True}},
-                        {"migration_recommended": {"$ne": True}},
-                        {"capabilities.legacy_compatibility": {"$ne": True}}
-                    ]
-            
-            # Ejecutar consulta con paginación y sort opcional
-            cursor = self.templates_collection.find(query)
-            # aplicar sort por defecto si no se entrega sort
-            if sort:
-                cursor = cursor.sort(sort)
-            else:
-                cursor = cursor.sort("created_at", -1)
-            if skip and skip > 0:
-                cursor = cursor.skip(int(skip))
-            if limit and limit > 0:
-                cursor = cursor.limit(int(limit))
-            
-            templates_data = list(cursor)
-            
+            templates_data, next_cursor = self._find_catalog_documents(cursor=cursor, **filters)
+
             # Construir objetos Template (se usa _clean_template_data en get_template; aquí usamos Template(**data) similar a antes)
             result = []
             for td in templates_data:
@@ -325,12 +294,193 @@ class TemplateService:
                         logging.warning(f"list_templates: no se pudo construir Template para documento {_id if ( _id := td.get('_id')) else 'unknown'}; se omite")
                         continue
             
-            return result
+            return result, next_cursor
             
+        except AppException:
+            raise
         except Exception as e:
             logging.error(f"Error listing templates: {str(e)}")
             raise e
-    
+
+    def _build_catalog_query(self,
+                             owner_filter: str = "all",
+                             scope_filter: str = None,
+                             user_id: str = None,
+                             workspace_id: str = None,
+                             style_tags: Optional[List[str]] = None,
+                             subject_tags: Optional[List[str]] = None,
+                             learning_methodology: Optional[str] = None,
+                             compatibility_mode: Optional[str] = None,
+                             migration_recommended: Optional[bool] = None) -> Dict:
+        """
+        Construye el filtro de list_templates. Cada filtro es una cláusula
+        independiente combinada con $and, de modo que los filtros opcionales
+        nunca amplían el conjunto de plantillas visibles para el usuario.
+        """
+        clauses: List[Dict] = []
+
+        # Filtro de propietario
+        if owner_filter == "me" and user_id:
+            clauses.append({"owner_id": self._object_id_or_str(user_id)})
+        elif owner_filter == "all":
+            # Para "all": públicas, las del usuario (cualquier scope) y las org de su workspace
+            scope_conditions: List[Dict] = [{"scope": "public"}]
+            if user_id:
+                scope_conditions.append({"owner_id": self._object_id_or_str(user_id)})
+            if workspace_id:
+                scope_conditions.append({"workspace_id": self._object_id_or_str(workspace_id), "scope": "org"})
+            clauses.append({"$or": scope_conditions})
+
+        # Filtro de scope explícito
+        if scope_filter:
+            clauses.append({"scope": scope_filter})
+
+        # Filtrado por style_tags: requerir que el array style_tags del documento contenga al menos todos los solicitados
+        if style_tags:
+            if isinstance(style_tags, str):
+                style_tags = [style_tags]
+            clauses.append({"style_tags": {"$all": style_tags}})
+
+        # Filtrado por subject_tags: coincidencia ANY (al menos uno)
+        if subject_tags:
+            if isinstance(subject_tags, str):
+                subject_tags = [subject_tags]
+            clauses.append({"subject_tags": {"$in": subject_tags}})
+
+        # Filtrado por metodología de aprendizaje: mirar en capabilities.compatible_methodologies o en capabilities.learning_methodologies
+        if learning_methodology:
+            clauses.append({"$or": [
+                {"capabilities.compatible_methodologies": learning_methodology},
+                {"capabilities.learning_methodologies": learning_methodology},
+                {"capabilities.methodologies": learning_methodology}
+            ]})
+
+        # compatibility_mode: por ejemplo 'kinesthetic' -> map to recommended template tags/mappings
+        if compatibility_mode:
+            mapped = LearningMethodologyTypes.map_kinesthetic_to_templates().get(compatibility_mode, [])
+            if mapped:
+                # Buscar por name o por capabilities.recommendation
+                clauses.append({"$or": [
+                    {"name": {"$in": mapped}},
+                    {"capabilities.recommended_aliases": {"$in": mapped}},
+                    {"capabilities.modes": compatibility_mode}
+                ]})
+            else:
+                # Fallback: attempt to match capability flag
+                clauses.append({"capabilities.mode": compatibility_mode})
+
+        # migration_recommended: buscar plantillas marcadas para reemplazar legacy games/simulations
+        if migration_recommended is not None:
+            if migration_recommended:
+                clauses.append({"$or": [
+                    {"capabilities.replaces_legacy": True},
+                    {"migration_recommended": True},
+                    {"capabilities.legacy_compatibility": True}
+                ]})
+            else:
+                clauses.extend([
+                    {"capabilities.replaces_legacy": {"$ne": True}},
+                    {"migration_recommended": {"$ne": True}},
+                    {"capabilities.legacy_compatibility": {"$ne": True}}
+                ])
+
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def _find_catalog_documents(self,
+                                owner_filter: str = "all",
+                                scope_filter: str = None,
+                                user_id: str = None,
+                                workspace_id: str = None,
+                                style_tags: Optional[List[str]] = None,
+                                subject_tags: Optional[List[str]] = None,
+                                learning_methodology: Optional[str] = None,
+                                compatibility_mode: Optional[str] = None,
+                                migration_recommended: Optional[bool] = None,
+                                limit: int = 100,
+                                skip: int = 0,
+                                sort: Optional[List[Tuple[str, int]]] = None,
+                                cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Documentos crudos de una página del catálogo y su next_cursor (con caché)."""
+        sort_spec = [tuple(s) for s in sort] if sort else list(TEMPLATE_PAGE_SORT)
+        if "_id" not in [field for field, _ in sort_spec]:
+            sort_spec.append(("_id", -1))
+        cursor_values = decode_cursor(cursor)
+
+        query = self._build_catalog_query(
+            owner_filter=owner_filter,
+            scope_filter=scope_filter,
+            user_id=user_id,
+            workspace_id=workspace_id,
+            style_tags=style_tags,
+            subject_tags=subject_tags,
+            learning_methodology=learning_methodology,
+            compatibility_mode=compatibility_mode,
+            migration_recommended=migration_recommended
+        )
+        cache_key = self._catalog_cache_key(
+            user_id, workspace_id, query, sort_spec, cursor_values, limit,
+            skip if not cursor else 0
+        )
+        version = None
+        if cache_key:
+            hit, cached, version = _template_catalog_cache.get_with_version(TEMPLATE_CATALOG_PUBLIC_SCOPE, cache_key)
+            if hit:
+                docs, next_cursor = cached
+                # Copia: Template(**doc) comparte los dicts anidados con el llamador
+                return copy.deepcopy(docs), next_cursor
+
+        query = merge_filters(query, build_keyset_filter(sort_spec, cursor_values))
+
+        # Ejecutar consulta con paginación y sort
+        db_cursor = self.templates_collection.find(query).sort(sort_spec)
+        if skip and skip > 0 and not cursor:
+            db_cursor = db_cursor.skip(int(skip))
+        if limit and limit > 0:
+            db_cursor = db_cursor.limit(int(limit) + 1)
+
+        docs, next_cursor = paginate_results(list(db_cursor), sort_spec, limit if limit and limit > 0 else None)
+        if cache_key:
+            _template_catalog_cache.set(TEMPLATE_CATALOG_PUBLIC_SCOPE, (copy.deepcopy(docs), next_cursor), cache_key,
+                                       version=version)
+        return docs, next_cursor
+
+    def _catalog_cache_key(self, user_id: Optional[str], workspace_id: Optional[str], *parts: Any) -> Optional[str]:
+        """
+        Sufijo de caché de una consulta del catálogo. Incluye las versiones de
+        las particiones org/usuario visibles; la partición pública es el ámbito
+        de la entrada. None si el backend no responde (no se cachea).
+        """
+        versions = []
+        for scope in (_catalog_org_scope(workspace_id), _catalog_user_scope(user_id)):
+            if scope is None:
+                versions.append("-")
+                continue
+            version = _template_catalog_cache.version(scope)
+            if version is None:
+                return None
+            versions.append(str(version))
+        return f"{':'.join(versions)}:{content_hash(user_id, workspace_id, *parts)}"
+
+    def _template_workspace_id(self, template_id: str) -> Any:
+        """workspace_id del documento (el modelo Template no lo conserva)."""
+        doc = self.templates_collection.find_one({"_id": ObjectId(template_id)}, {"workspace_id": 1})
+        return doc.get("workspace_id") if doc else None
+
+    def _invalidate_catalog(self, owner_id: Any, scopes: List[Optional[str]], workspace_id: Any = None) -> None:
+        """
+        Invalida las particiones del catálogo que podían contener la plantilla:
+        siempre la del propietario, la del workspace si tiene uno y la pública
+        si la plantilla era o pasa a ser pública.
+        """
+        partitions = {_catalog_user_scope(owner_id), _catalog_org_scope(workspace_id)}
+        if TEMPLATE_CATALOG_PUBLIC_SCOPE in scopes:
+            partitions.add(TEMPLATE_CATALOG_PUBLIC_SCOPE)
+        for partition in partitions:
+            if partition:
+                _template_catalog_cache.bump_version(partition)
+
     def update_template(self, template_id: str, update_data: Dict, user_id: str) -> Template:
         """
         Actualiza una plantilla existente.
@@ -444,6 +594,13 @@ class TemplateService:
             
             if result.modified_count == 0:
                 raise ValueError("No se pudo actualizar la plantilla")
+
+            self._invalidate_catalog(
+                template.owner_id,
+                [template.scope, update_dict["$set"].get("scope")],
+                self._template_workspace_id(template_id)
+            )
+            invalidate_template_render(template_id)
             
             # Retornar plantilla actualizada
             return self.get_template(template_id)
@@ -490,6 +647,7 @@ class TemplateService:
             # Insertar en base de datos
             result = self.templates_collection.insert_one(fork_template.to_dict())
             fork_template._id = result.inserted_id
+            self._invalidate_catalog(user_id, [fork_template.scope])
             
             logging.info(f"Template forked: {template_id} -> {fork_template._id}")
             return fork_template
@@ -513,8 +671,13 @@ class TemplateService:
             
             # TODO: Verificar que no hay instancias activas de esta plantilla
             
+            workspace_id = self._template_workspace_id(template_id)
+
             # Eliminar de base de datos
             result = self.templates_collection.delete_one({"_id": ObjectId(template_id)})
+            if result.deleted_count > 0:
+                self._invalidate_catalog(template.owner_id, [template.scope], workspace_id)
+                invalidate_template_render(template_id)
             
             return result.deleted_count > 0
             
@@ -532,18 +695,52 @@ class TemplateService:
                                             learning_methodology: Optional[str] = None,
                                             compatibility: Optional[str] = None,
                                             limit: int = 50,
-                                            skip: int = 0) -> List[Dict]:
+                                            skip: int = 0,
+                                            cursor: Optional[str] = None) -> List[Dict]:
         """
         Retorna una lista de plantillas optimizadas para profesores, incluyendo metadata adicional:
         usage_statistics, effectiveness_metrics, migration_compatibility.
         Usa list_templates() internamente para los filtros principales.
         """
+        templates, _ = self.get_available_templates_page_for_teacher(
+            teacher_id=teacher_id,
+            workspace_id=workspace_id,
+            subject=subject,
+            style=style,
+            scope=scope,
+            learning_methodology=learning_methodology,
+            compatibility=compatibility,
+            limit=limit,
+            skip=skip,
+            cursor=cursor
+        )
+        return templates
+
+    def get_available_templates_page_for_teacher(self,
+                                                 teacher_id: str,
+                                                 workspace_id: Optional[str] = None,
+                                                 subject: Optional[str] = None,
+                                                 style: Optional[str] = None,
+                                                 scope: Optional[str] = "public",
+                                                 learning_methodology: Optional[str] = None,
+                                                 compatibility: Optional[str] = None,
+                                                 limit: int = 50,
+                                                 skip: int = 0,
+                                                 cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Igual que get_available_templates_for_teacher pero retorna (plantillas, next_cursor).
+
+        El conteo de uso sale de una sola agregación $group sobre
+        template_instances y las métricas de un único find con $in. El resultado
+        enriquecido se cachea con las mismas particiones que list_templates,
+        más un TTL corto que acota el desfase de usage_count.
+        """
         try:
             style_tags = [style] if style else None
             subject_tags = [subject] if subject else None
 
             # Llamar a list_templates con parámetros apropiados
-            templates = self.list_templates(
+            filters = dict(
                 owner_filter="all",
                 scope_filter=scope,
                 user_id=teacher_id,
@@ -554,37 +751,26 @@ class TemplateService:
                 compatibility_mode=compatibility,
                 migration_recommended=None,
                 limit=limit,
-                skip=skip
+                skip=skip,
+                cursor=cursor
             )
-
-            # Preparar colecciones auxiliares para métricas
-            instances_coll = self.db.template_instances
-            metrics_coll = self.db.template_metrics if "template_metrics" in self.db.list_collection_names() else None
+            cache_key = self._catalog_cache_key(teacher_id, workspace_id, "available", filters)
+            version = None
+            if cache_key:
+                hit, cached, version = _template_catalog_cache.get_with_version(TEMPLATE_CATALOG_PUBLIC_SCOPE, cache_key)
+                if hit:
+                    enriched, next_cursor = cached
+                    return copy.deepcopy(enriched), next_cursor
+
+            templates, next_cursor = self.list_templates_page(**filters)
+            template_ids = [t._id for t in templates if getattr(t, "_id", None)]
+            usage_counts = self._get_template_usage_counts(template_ids)
+            effectiveness = self._get_template_effectiveness(template_ids)
 
             enriched = []
             for t in templates:
                 try:
                     tid = t._id if hasattr(t, "_id") else None
-                    tid_obj = ObjectId(tid) if tid else None
-
-                    # usage_count: cantidad de instancias basadas en esta plantilla
-                    usage_count = 0
-                    if tid_obj:
-                        try:
-                            usage_count = instances_coll.count_documents({"template_id": tid_obj})
-                        except Exception:
-                            # fallback: count by string id
-                            usage_count = instances_coll.count_documents({"template_id": str(tid_obj)})
-                    
-                    # effectiveness_score: intentar leer de template_metrics collection si existe
-                    effectiveness_score = None
-                    if metrics_coll and tid_obj:
-                        try:
-                            m = metrics_coll.find_one({"template_id": tid_obj})
-                            if m and "effectiveness_score" in m:
-                                effectiveness_score = float(m.get("effectiveness_score"))
-                        except Exception:
-                            effectiveness_score = None
 
                     # migration_compatibility: heurística simple
                     caps = getattr(t, "capabilities", {}) or {}
@@ -599,10 +785,10 @@ class TemplateService:
                         "style_tags": getattr(t, "style_tags", []),
                         "subject_tags": getattr(t, "subject_tags", []),
                         "usage_statistics": {
-                            "usage_count": usage_count
+                            "usage_count": usage_counts.get(str(tid), 0)
                         },
                         "effectiveness_metrics": {
-                            "effectiveness_score": effectiveness_score
+                            "effectiveness_score": effectiveness.get(str(tid))
                         },
                         "migration_compatibility": migration_compatibility,
                         "owner_id": str(getattr(t, "owner_id", "")),
@@ -616,11 +802,50 @@ class TemplateService:
 
             # Priorizar plantillas compatibles con migración (si las hay)
             enriched.sort(key=lambda x: (not x.get("migration_compatibility", False), -(x.get("usage_statistics", {}).get("usage_count", 0))),)
-            return enriched
+            if cache_key:
+                _template_catalog_cache.set(TEMPLATE_CATALOG_PUBLIC_SCOPE, (copy.deepcopy(enriched), next_cursor), cache_key,
+                                           version=version)
+            return enriched, next_cursor
 
+        except AppException:
+            raise
         except Exception as e:
             logging.error(f"Error in get_available_templates_for_teacher: {e}")
-            return []
+            return [], None
+
+    def _get_template_usage_counts(self, template_ids: List[Any]) -> Dict[str, int]:
+        """Instancias por plantilla ({template_id: n}) con una sola agregación."""
+        if not template_ids:
+            return {}
+        # template_id puede estar guardado como ObjectId o como string
+        keys = [ObjectId(tid) for tid in template_ids] + [str(tid) for tid in template_ids]
+        counts: Dict[str, int] = {}
+        try:
+            for row in self.db.template_instances.aggregate([
+                {"$match": {"template_id": {"$in": keys}}},
+                {"$group": {"_id": "$template_id", "count": {"$sum": 1}}}
+            ]):
+                key = str(row["_id"])
+                counts[key] = counts.get(key, 0) + int(row.get("count", 0))
+        except Exception as e:
+            logging.warning(f"No se pudo calcular el uso de plantillas: {e}")
+        return counts
+
+    def _get_template_effectiveness(self, template_ids: List[Any]) -> Dict[str, float]:
+        """effectiveness_score por plantilla desde template_metrics con un único $in."""
+        if not template_ids:
+            return {}
+        scores: Dict[str, float] = {}
+        try:
+            for m in self.db.template_metrics.find(
+                {"template_id": {"$in": [ObjectId(tid) for tid in template_ids]}},
+                {"template_id": 1, "effectiveness_score": 1}
+            ):
+                if m.get("effectiveness_score") is not None:
+                    scores[str(m["template_id"])] = float(m["effectiveness_score"])
+        except Exception as e:
+            logging.warning(f"No se pudieron leer las métricas de plantillas: {e}")
+        return scores
 
     def create_template_instance_for_topic(self,
                                            template_id: str,
@@ -707,6 +932,7 @@ class TemplateService:
                     }
                     result = self.db.topic_contents.insert_one(content_doc)
                     created_content_id = str(result.inserted_id)
+                    invalidate_topic_sequence(topic_id, self.db)
                 except Exception as e:
                     logging.warning(f"create_template_instance_for_topic: no se pudo crear TopicContent vinculado: {e}")
 
@@ -978,6 +1204,7 @@ class TemplateService:
             }
             result = self.db.topic_contents.insert_one(new_content_doc)
             new_content_id = str(result.inserted_id)
+            invalidate_topic_sequence(content.get("topic_id"), self.db)
 
             # Marcar legacy content como migrado si aplica
             if mark_legacy:
@@ -986,6 +1213,7 @@ class TemplateService:
                         {"_id": ObjectId(content_id)},
                         {"$set": {"status": "migrated", "migrated_at": datetime.now(), "migrated_to": ObjectId(new_content_id)}}
                     )
+                    invalidate_topic_sequence(content.get("topic_id"), self.db)
                 except Exception as e:
                     logging.warning(f"execute_content_migration: no se pudo marcar legacy como migrado: {e}")
 
@@ -1151,6 +1379,40 @@ class TemplateInstanceService:
             logging.error(f"Error getting template instance {instance_id}: {str(e)}")
             raise e
     
+    def get_instance_preview(self, instance_id: str) -> Optional[Dict]:
+        """
+        HTML de la instancia con props aplicadas, su ETag y la posición de
+        </body>. La entrada cacheada guarda la versión de render de la plantilla
+        base con la que se generó, así un cambio de plantilla también la invalida.
+
+        Returns:
+            Dict con html, etag y body_index; None si la instancia no existe
+
+        Raises:
+            ValueError: Si la plantilla base no existe
+        """
+        scope = _render_instance_scope(instance_id)
+        hit, preview, version = _template_render_cache.get_with_version(scope, "render")
+        if hit:
+            template_version = _template_render_cache.version(_render_template_scope(preview["template_id"]))
+            if template_version is not None and template_version == preview["template_render_version"]:
+                return preview
+
+        instance = self.get_instance(instance_id)
+        if not instance:
+            return None
+        template_id = str(instance.template_id)
+        # Leer la versión antes de cargar la plantilla: una escritura intermedia deja la entrada obsoleta
+        template_render_version = _template_render_cache.version(_render_template_scope(template_id))
+        template = self.template_service.get_template(template_id)
+        if not template:
+            raise ValueError("Plantilla base no encontrada")
+
+        preview = TemplateRenderer.render_instance(template, instance.props)
+        preview.update({"template_id": template_id, "template_render_version": template_render_version})
+        _template_render_cache.set(scope, preview, "render", version=version)
+        return preview
+
     def get_instances_by_topic(self, topic_id: str) -> List[TemplateInstance]:
         """
         Obtiene todas las instancias de un tema.
@@ -1188,6 +1450,7 @@ class TemplateInstanceService:
             
             if result.modified_count == 0:
                 raise ValueError("No se pudo actualizar la instancia")
+            invalidate_instance_render(instance_id)
             
             return self.get_instance(instance_id)
             
@@ -1214,6 +1477,8 @@ class TemplateInstanceService:
             # TODO: Verificar que no hay VirtualTopicContent referenciando esta instancia
             
             result = self.instances_collection.delete_one({"_id": ObjectId(instance_id)})
+            if result.deleted_count > 0:
+                invalidate_instance_render(instance_id)
             return result.deleted_count > 0
             
         except Exception as e:
@@ -1386,11 +1651,49 @@ class TemplateInstanceService:
             logging.error(f"Error updating content templates: {str(e)}")
             return False, f"Error actualizando plantillas: {str(e)}"
 
+# Escáner de una sola pasada: cada coincidencia es un marcador data-sapiens-* o
+# el script de defaults (que se consume entero, así su JSON no se re-escanea).
+_SAPIENS_MARKUP_PATTERN = re.compile(
+    r'data-sapiens-(?P<kind>param|asset|slot|if)=["\'](?P<value>[^"\']+)["\']'
+    r'|<script[^>]*id=["\']sapiens-defaults["\'][^>]*type=["\']application/json["\'][^>]*>(?P<defaults>.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+MARKER_EXTRACTION_CACHE_SIZE = 256
+_marker_extraction_cache = LRUCache("template_markers", max_size=MARKER_EXTRACTION_CACHE_SIZE)
+
+
 class TemplateMarkupExtractor:
     """
     Servicio para extraer marcadores de personalización del HTML de plantillas.
     """
     
+    @staticmethod
+    def scan_markers(html_content: str) -> Dict:
+        """
+        Recorre el HTML una sola vez y agrupa los marcadores data-sapiens-* por tipo.
+        
+        Returns:
+            Dict con:
+                - markers: {"param"|"asset"|"slot"|"if": {nombre: contexto de la primera aparición}}
+                - defaults_json: contenido del script sapiens-defaults (o None)
+        """
+        markers = {"param": {}, "asset": {}, "slot": {}, "if": {}}
+        defaults_json = None
+        for match in _SAPIENS_MARKUP_PATTERN.finditer(html_content or ""):
+            if match.group("kind") is None:
+                if defaults_json is None:
+                    defaults_json = match.group("defaults")
+                continue
+            found = markers[match.group("kind").lower()]
+            name = match.group("value")
+            if name in found:
+                continue
+            # Contexto: la etiqueta desde su último '>' previo hasta el siguiente '<'
+            context_start = html_content.rfind('>', 0, match.start()) + 1
+            context_end = html_content.find('<', match.end())
+            found[name] = html_content[context_start:context_end if context_end != -1 else len(html_content)]
+        return {"markers": markers, "defaults_json": defaults_json}
+
     @staticmethod
     def extract_markers(html_content: str) -> Dict:
         """
@@ -1401,97 +1704,94 @@ class TemplateMarkupExtractor:
         - data-sapiens-asset="assetName" -> recursos externos requeridos
         - data-sapiens-slot="slotName" -> contenido personalizable por IA
         - data-sapiens-if="condition" -> lógica condicional
+        
+        El resultado se cachea por hash del HTML (cada versión de plantilla se
+        extrae una sola vez); se retorna una copia que el llamador puede modificar.
         """
         try:
-            schema = {
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-            
-            # Buscar parámetros
-            param_pattern = r'data-sapiens-param=["\']([^"\']+)["\']'
-            param_matches = re.findall(param_pattern, html_content, re.IGNORECASE)
-            
-            for param_name in set(param_matches):
-                # Inferir tipo básico del contexto
-                param_type = TemplateMarkupExtractor._infer_param_type(html_content, param_name)
-                
-                schema["properties"][param_name] = {
-                    "type": param_type,
-                    "title": param_name.replace("_", " ").title(),
-                    "description": f"Parámetro configurable: {param_name}"
-                }
-            
-            # Buscar assets
-            asset_pattern = r'data-sapiens-asset=["\']([^"\']+)["\']'
-            asset_matches = re.findall(asset_pattern, html_content, re.IGNORECASE)
-            
-            for asset_name in set(asset_matches):
-                schema["properties"][asset_name] = {
-                    "type": "string",
-                    "format": "uri",
-                    "title": asset_name.replace("_", " ").title(),
-                    "description": f"Recurso requerido: {asset_name}"
-                }
-            
-            # Buscar slots de contenido personalizable
-            slot_pattern = r'data-sapiens-slot=["\']([^"\']+)["\']'
-            slot_matches = re.findall(slot_pattern, html_content, re.IGNORECASE)
-            
-            for slot_name in set(slot_matches):
-                schema["properties"][slot_name] = {
-                    "type": "string",
-                    "format": "textarea",
-                    "title": slot_name.replace("_", " ").title(),
-                    "description": f"Contenido personalizable: {slot_name}"
-                }
-            
-            # Buscar condiciones
-            condition_pattern = r'data-sapiens-if=["\']([^"\']+)["\']'
-            condition_matches = re.findall(condition_pattern, html_content, re.IGNORECASE)
-            
-            for condition in set(condition_matches):
-                # Las condiciones suelen ser booleanas
-                condition_param = f"show_{condition}"
-                schema["properties"][condition_param] = {
-                    "type": "boolean",
-                    "title": f"Mostrar {condition}",
-                    "description": f"Controla la visibilidad de: {condition}",
-                    "default": True
-                }
-            
-            # Buscar defaults en script
-            defaults = TemplateMarkupExtractor._extract_defaults(html_content)
-            
-            return {
-                "props_schema": schema,
-                "defaults": defaults,
-                "markers_found": {
-                    "params": list(set(param_matches)),
-                    "assets": list(set(asset_matches)),
-                    "slots": list(set(slot_matches)),
-                    "conditions": list(set(condition_matches))
-                }
-            }
+            cache_key = content_hash(html_content or "")
+            hit, cached = _marker_extraction_cache.get(cache_key)
+            if not hit:
+                cached = TemplateMarkupExtractor._build_extraction(html_content or "")
+                _marker_extraction_cache.set(cache_key, cached)
+            return copy.deepcopy(cached)
             
         except Exception as e:
             logging.error(f"Error extracting markers: {str(e)}")
             raise e
+
+    @staticmethod
+    def _build_extraction(html_content: str) -> Dict:
+        scan = TemplateMarkupExtractor.scan_markers(html_content)
+        markers = scan["markers"]
+        schema = {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+        
+        # Parámetros: tipo inferido del contexto de su primera aparición
+        for param_name, context in markers["param"].items():
+            schema["properties"][param_name] = {
+                "type": TemplateMarkupExtractor._infer_param_type_from_context(param_name, context),
+                "title": param_name.replace("_", " ").title(),
+                "description": f"Parámetro configurable: {param_name}"
+            }
+        
+        for asset_name in markers["asset"]:
+            schema["properties"][asset_name] = {
+                "type": "string",
+                "format": "uri",
+                "title": asset_name.replace("_", " ").title(),
+                "description": f"Recurso requerido: {asset_name}"
+            }
+        
+        # Slots de contenido personalizable
+        for slot_name in markers["slot"]:
+            schema["properties"][slot_name] = {
+                "type": "string",
+                "format": "textarea",
+                "title": slot_name.replace("_", " ").title(),
+                "description": f"Contenido personalizable: {slot_name}"
+            }
+        
+        for condition in markers["if"]:
+            # Las condiciones suelen ser booleanas
+            condition_param = f"show_{condition}"
+            schema["properties"][condition_param] = {
+                "type": "boolean",
+                "title": f"Mostrar {condition}",
+                "description": f"Controla la visibilidad de: {condition}",
+                "default": True
+            }
+        
+        return {
+            "props_schema": schema,
+            "defaults": TemplateMarkupExtractor._parse_defaults(scan["defaults_json"]),
+            "markers_found": {
+                "params": list(markers["param"]),
+                "assets": list(markers["asset"]),
+                "slots": list(markers["slot"]),
+                "conditions": list(markers["if"])
+            }
+        }
     
     @staticmethod
     def _infer_param_type(html_content: str, param_name: str) -> str:
         """
         Infiere el tipo de un parámetro basado en el contexto HTML.
         """
-        # Buscar el contexto donde aparece el parámetro
-        context_pattern = rf'[^>]*data-sapiens-param=["\']?{re.escape(param_name)}["\']?[^<]*'
-        context_match = re.search(context_pattern, html_content, re.IGNORECASE)
-        
-        if not context_match:
+        context = TemplateMarkupExtractor.scan_markers(html_content)["markers"]["param"].get(param_name)
+        if context is None:
             return "string"
-        
-        context = context_match.group(0).lower()
+        return TemplateMarkupExtractor._infer_param_type_from_context(param_name, context)
+
+    @staticmethod
+    def _infer_param_type_from_context(param_name: str, context: str) -> str:
+        """
+        Infiere el tipo de un parámetro a partir del fragmento HTML donde aparece.
+        """
+        context = context.lower()
         
         # Inferir tipo por contexto
         if 'color' in param_name.lower() or 'background' in context or 'color' in context:
@@ -1504,23 +1804,176 @@ class TemplateMarkupExtractor:
             return "string"
         else:
             return "string"
+
+    @staticmethod
+    def _parse_defaults(defaults_json: Optional[str]) -> Dict:
+        if not defaults_json:
+            return {}
+        try:
+            return json.loads(defaults_json.strip())
+        except (json.JSONDecodeError, Exception) as e:
+            logging.warning(f"Could not extract defaults from HTML: {str(e)}")
+            return {}
     
     @staticmethod
     def _extract_defaults(html_content: str) -> Dict:
         """
         Extrae valores por defecto del script de configuración en el HTML.
         """
-        try:
-            # Buscar script con defaults
-            script_pattern = r'<script[^>]*id=["\']sapiens-defaults["\'][^>]*type=["\']application/json["\'][^>]*>(.*?)</script>'
-            script_match = re.search(script_pattern, html_content, re.IGNORECASE | re.DOTALL)
-            
-            if script_match:
-                defaults_json = script_match.group(1).strip()
-                return json.loads(defaults_json)
-            
-            return {}
-            
-        except (json.JSONDecodeError, Exception) as e:
-            logging.warning(f"Could not extract defaults from HTML: {str(e)}")
-            return {}
+        return TemplateMarkupExtractor._parse_defaults(
+            TemplateMarkupExtractor.scan_markers(html_content)["defaults_json"]
+        )
+
+
+# Previews de plantillas e instancias (/preview/template y /preview/instance).
+# Niveles de caché:
+#   - _template_render_cache: entrada por plantilla/instancia con su ETag; los
+#     ámbitos "template:<id>" e "instance:<id>" se invalidan al escribir, así una
+#     recarga del iframe no consulta Mongo.
+#   - _rendered_output_cache: HTML con props aplicadas por (versión de plantilla,
+#     hash de props); instancias con las mismas props comparten el resultado.
+#   - _render_plan_cache: plan de sustitución precompilado por (HTML, props).
+TEMPLATE_RENDER_CACHE_TTL_SECONDS = 300
+TEMPLATE_RENDER_CACHE_SIZE = 256
+RENDERED_OUTPUT_CACHE_SIZE = 128
+RENDER_PLAN_CACHE_SIZE = 128
+_template_render_cache = VersionedCache("template_render", ttl_seconds=TEMPLATE_RENDER_CACHE_TTL_SECONDS,
+                                        max_size=TEMPLATE_RENDER_CACHE_SIZE)
+_rendered_output_cache = LRUCache("template_rendered_output", max_size=RENDERED_OUTPUT_CACHE_SIZE,
+                                  ttl_seconds=TEMPLATE_RENDER_CACHE_TTL_SECONDS)
+_render_plan_cache = LRUCache("template_render_plans", max_size=RENDER_PLAN_CACHE_SIZE)
+
+_CLOSING_BODY_PATTERN = re.compile(r'</body>', re.IGNORECASE)
+
+
+def _render_template_scope(template_id: Any) -> str:
+    return f"template:{template_id}"
+
+
+def _render_instance_scope(instance_id: Any) -> str:
+    return f"instance:{instance_id}"
+
+
+def invalidate_template_render(template_id: Any) -> None:
+    """Invalida el preview cacheado de una plantilla y el de sus instancias."""
+    if template_id:
+        _template_render_cache.bump_version(_render_template_scope(template_id))
+
+
+def invalidate_instance_render(instance_id: Any) -> None:
+    """Invalida el preview cacheado de una instancia."""
+    if instance_id:
+        _template_render_cache.bump_version(_render_instance_scope(instance_id))
+
+
+class TemplateRenderer:
+    """
+    Aplica las props de una instancia al HTML de su plantilla.
+
+    Sustituciones (las mismas que aplicaba _apply_props_to_template en las rutas):
+        - el texto que sigue a una etiqueta con data-sapiens-param="<prop>" se
+          reemplaza por el valor de la prop,
+        - cualquier aparición literal del nombre de la prop se reemplaza por su valor.
+    El HTML se parte una sola vez en literales y huecos; renderizar es unir los
+    fragmentos. Los valores insertados no se vuelven a escanear.
+    """
+
+    @staticmethod
+    def compile_plan(html: str, prop_names: List[str]) -> List[Union[str, Tuple[str, str]]]:
+        """
+        Plan de sustitución: lista de literales y huecos ("param", nombre en
+        minúsculas) / ("name", nombre exacto). Nombres más largos primero para
+        que un prefijo no tape a otra prop.
+        """
+        names = sorted({name for name in prop_names if name}, key=len, reverse=True)
+        if not names:
+            return [html]
+        alternation = "|".join(re.escape(name) for name in names)
+        names_pattern = re.compile(alternation)
+        pattern = re.compile(
+            rf'(?P<tag>(?i:<[^>]*data-sapiens-param=["\']?(?P<param>{alternation})["\']?[^>]*>))[^<]*'
+            rf'|(?P<name>{alternation})'
+        )
+
+        plan: List[Union[str, Tuple[str, str]]] = []
+
+        def add_with_names(text: str) -> None:
+            pos = 0
+            for match in names_pattern.finditer(text):
+                plan.append(text[pos:match.start()])
+                plan.append(("name", match.group(0)))
+                pos = match.end()
+            plan.append(text[pos:])
+
+        pos = 0
+        for match in pattern.finditer(html):
+            plan.append(html[pos:match.start()])
+            if match.group("tag") is not None:
+                # La etiqueta conserva su forma salvo los nombres de props que contenga
+                add_with_names(match.group("tag"))
+                plan.append(("param", match.group("param").lower()))
+            else:
+                plan.append(("name", match.group("name")))
+            pos = match.end()
+        plan.append(html[pos:])
+        return [part for part in plan if part != ""]
+
+    @staticmethod
+    def get_plan(html: str, prop_names: List[str]) -> List[Union[str, Tuple[str, str]]]:
+        key = content_hash(html, *sorted(prop_names))
+        hit, plan = _render_plan_cache.get(key)
+        if not hit:
+            plan = TemplateRenderer.compile_plan(html, prop_names)
+            _render_plan_cache.set(key, plan)
+        return plan
+
+    @staticmethod
+    def apply_props(html: str, props: Optional[Dict[str, Any]]) -> str:
+        """HTML con las props aplicadas según el plan precompilado."""
+        if not props:
+            return html
+        by_lower_name: Dict[str, str] = {}
+        for name, value in props.items():
+            by_lower_name.setdefault(str(name).lower(), str(value))
+        values = {str(name): str(value) for name, value in props.items()}
+
+        rendered = []
+        for part in TemplateRenderer.get_plan(html, list(values)):
+            if isinstance(part, str):
+                rendered.append(part)
+            elif part[0] == "param":
+                rendered.append(by_lower_name[part[1]])
+            else:
+                rendered.append(values[part[1]])
+        return "".join(rendered)
+
+    @staticmethod
+    def closing_body_index(html: str) -> int:
+        """Posición del último </body> (-1 si no hay) sin copiar el HTML en minúsculas."""
+        index = -1
+        for match in _CLOSING_BODY_PATTERN.finditer(html):
+            index = match.start()
+        return index
+
+    @staticmethod
+    def strong_etag(html: str) -> str:
+        return f'"{content_hash(html)}"'
+
+    @staticmethod
+    def render_instance(template: Template, props: Optional[Dict[str, Any]]) -> Dict:
+        """
+        HTML de la instancia con su ETag y la posición de </body>, cacheado por
+        (plantilla, versión, hash de props).
+        """
+        props_fingerprint = json.dumps(props or {}, sort_keys=True, default=str)
+        key = content_hash(str(template._id), template.version, props_fingerprint)
+        hit, rendered = _rendered_output_cache.get(key)
+        if not hit:
+            html = TemplateRenderer.apply_props(template.get_latest_html(), props)
+            rendered = {
+                "html": html,
+                "etag": TemplateRenderer.strong_etag(html),
+                "body_index": TemplateRenderer.closing_body_index(html)
+            }
+            _rendered_output_cache.set(key, rendered)
+        return dict(rendered)
@@ -7,6 +7,7 @@ import time
 from src.shared.database import get_db
 from src.shared.standardization import VerificationBaseService, ErrorCodes
 from src.shared.exceptions import AppException
+from src.shared.evaluation_statistics import invalidate_evaluation_statistics
 from src.shared.constants import ROLES
 from .models import CorrectionTask
 
@@ -104,6 +105,7 @@ class CorrectionService(VerificationBaseService):
                 return False, {"error": "Submission not found", "status_code": 404}
 
             updated = self.submissions_collection.find_one({"_id": ObjectId(submission_id)})
+            invalidate_evaluation_statistics(updated.get("evaluation_id") if updated else None)
             if not updated:
                 return True, {"submission_id": submission_id, "status": "graded"}
 
@@ -13,6 +13,7 @@ from src.evaluations.services import EvaluationService
 from src.evaluations.weighted_grading_service import weighted_grading_service
 from src.resources.services import ResourceFolderService, ResourceService
 from src.shared.constants import ROLES
+from src.shared.evaluation_statistics import invalidate_evaluation_statistics
 from src.shared.standardization import APIBlueprint, APIRoute, ErrorCodes
 from src.shared.validators import validate_object_id
 
@@ -275,6 +276,7 @@ def _upsert_submission_from_resource(*, evaluation_id: str, student_id: str, res
                 "updated_at": now,
             }},
         )
+        invalidate_evaluation_statistics(evaluation_id)
         return str(existing["_id"])
 
     submission_id = evaluation_service.create_submission({
@@ -1159,6 +1161,7 @@ def upsert_evaluation_result(evaluation_id: str):
         {"$set": doc},
         upsert=True,
     )
+    invalidate_evaluation_statistics(doc["evaluation_id"])
     return APIRoute.success(data={"result": doc}, message="Resultado registrado.")
 
 
@@ -1177,6 +1180,7 @@ def delete_evaluation_result(evaluation_id: str):
     if result.deleted_count == 0:
         return APIRoute.error(ErrorCodes.NOT_FOUND, "Resultado no encontrado.", status_code=404)
 
+    invalidate_evaluation_statistics(evaluation_id)
     return APIRoute.success(message="Resultado eliminado.")
 
 
@@ -1307,13 +1311,20 @@ def bulk_create_evaluations():
 
     created: List[Dict[str, Any]] = []
     errors: List[Dict[str, Any]] = []
+    # Todos los topic_ids del lote se comprueban con una sola consulta
+    topic_validator = evaluation_service.topic_reference_validator()
+    topic_validator.prefetch([
+        tid for ev_data in evaluations
+        if isinstance(ev_data, dict) and isinstance(ev_data.get("topic_ids"), list)
+        for tid in ev_data["topic_ids"]
+    ])
     for i, ev_data in enumerate(evaluations):
         try:
             ev_data = dict(ev_data or {})
             ev_data["created_by"] = _current_user_id()
             ev_data["created_at"] = datetime.now()
             ev_data["updated_at"] = datetime.now()
-            ev_id = evaluation_service.create_evaluation(ev_data)
+            ev_id = evaluation_service.create_evaluation(ev_data, topic_validator=topic_validator)
             created.append({"index": i, "id": ev_id})
         except Exception as e:
             errors.append({"index": i, "error": str(e)})
@@ -1346,14 +1357,43 @@ def update_submission_grade_weighted(evaluation_id: str, student_id: str):
 @evaluation_routes.route("/<evaluation_id>/recalculate-all-grades", methods=["POST"])
 @APIRoute.standard(auth_required_flag=True)
 def recalculate_all_grades(evaluation_id: str):
+    """
+    Recalcula las notas ponderadas de todos los estudiantes.
+
+    Query params:
+        mode: "job" encola el recálculo (respuesta 202 con el estado del job)
+        score_policy: "latest" (por defecto) o "best"
+        resume_token: Continúa un recálculo síncrono que respondió completed=false
+    """
     if not validate_object_id(evaluation_id):
         return APIRoute.error(ErrorCodes.INVALID_ID, "ID de evaluación inválido.")
-    result = weighted_grading_service.recalculate_all_students_for_evaluation(evaluation_id)
+    score_policy = request.args.get("score_policy", "latest")
+    if request.args.get("mode") == "job":
+        job = weighted_grading_service.start_recalculation_job(
+            evaluation_id, user_id=_current_user_id(), score_policy=score_policy
+        )
+        if "error" in job:
+            return APIRoute.error(ErrorCodes.OPERATION_FAILED, job["error"])
+        return APIRoute.success(data=job, message="Recálculo de calificaciones encolado.", status_code=202)
+    result = weighted_grading_service.recalculate_all_students_for_evaluation(
+        evaluation_id, score_policy, resume_token=request.args.get("resume_token")
+    )
     if "error" in result:
         return APIRoute.error(ErrorCodes.OPERATION_FAILED, result["error"])
     return APIRoute.success(data=result)
 
 
+@evaluation_routes.route("/<evaluation_id>/recalculate-all-grades/status", methods=["GET"])
+@APIRoute.standard(auth_required_flag=True)
+def get_recalculation_status(evaluation_id: str):
+    if not validate_object_id(evaluation_id):
+        return APIRoute.error(ErrorCodes.INVALID_ID, "ID de evaluación inválido.")
+    job = weighted_grading_service.get_recalculation_job(evaluation_id)
+    if not job:
+        return APIRoute.error(ErrorCodes.NOT_FOUND, "No hay recálculos para esta evaluación.", status_code=404)
+    return APIRoute.success(data=job)
+
+
 @evaluation_routes.route("/validate-topic-weights", methods=["POST"])
 @APIRoute.standard(auth_required_flag=True, required_fields=["topic_weights"])
 def validate_topic_weights():
@@ -11,6 +11,10 @@ from src.evaluations.models import (
 )
 from src.shared.database import get_db
 from src.shared.constants import STATUS
+from src.study_plans.plan_tree_service import invalidate_study_plan_tree
+from src.shared.evaluation_statistics import invalidate_evaluation_statistics
+from src.shared.validators import ReferenceValidator
+from src.shared.grade_recalculation import grade_recalculator
 
 class EvaluationService:
     """
@@ -29,12 +33,15 @@ class EvaluationService:
 
     # ==================== CRUD Operations ====================
     
-    def create_evaluation(self, evaluation_data: Dict) -> str:
+    def create_evaluation(self, evaluation_data: Dict,
+                          topic_validator: Optional[ReferenceValidator] = None) -> str:
         """
         Crear una nueva evaluación.
         
         Args:
             evaluation_data: Datos de la evaluación
+            topic_validator: Validador de temas compartido por un lote (ver
+                topic_reference_validator); evita una consulta por evaluación
             
         Returns:
             ID de la evaluación creada
@@ -43,14 +50,16 @@ class EvaluationService:
             evaluation = Evaluation(**evaluation_data)
 
             # Validar que los topic_ids existen
-            if not self._validate_topic_ids(evaluation.topic_ids):
-                raise ValueError("Uno o más topic_ids no son válidos")
+            missing_topics = self._find_missing_topic_ids(evaluation.topic_ids, topic_validator)
+            if missing_topics:
+                raise ValueError(f"Temas no encontrados: {', '.join(missing_topics)}")
             
             # Validar ponderaciones para evaluaciones multi-tema
             if evaluation.is_multi_topic() and not evaluation.validate_weightings():
                 raise ValueError("Las ponderaciones deben sumar 1.0 para evaluaciones multi-tema")
             
             result = self.evaluations_collection.insert_one(evaluation.to_dict())
+            invalidate_study_plan_tree(topic_ids=evaluation.topic_ids, db=self.db)
             return str(result.inserted_id)
             
         except Exception as e:
@@ -123,11 +132,17 @@ class EvaluationService:
         Actualizar una evaluación.
         """
         try:
+            previous = self.evaluations_collection.find_one({"_id": ObjectId(evaluation_id)}, {"topic_ids": 1}) or {}
             update_data["updated_at"] = datetime.now()
             result = self.evaluations_collection.update_one(
                 {"_id": ObjectId(evaluation_id)},
                 {"$set": update_data}
             )
+            if result.modified_count > 0:
+                invalidate_study_plan_tree(
+                    topic_ids=list(previous.get("topic_ids", [])) + list(update_data.get("topic_ids", [])),
+                    db=self.db
+                )
             return result.modified_count > 0
         except Exception as e:
             raise Exception(f"Error al actualizar evaluación: {str(e)}")
@@ -139,6 +154,7 @@ class EvaluationService:
         try:
             # Eliminar submissions relacionadas
             self.submissions_collection.delete_many({"evaluation_id": ObjectId(evaluation_id)})
+            invalidate_evaluation_statistics(evaluation_id)
             
             # Eliminar recursos relacionados
             self.resources_collection.delete_many({"evaluation_id": ObjectId(evaluation_id)})
@@ -147,7 +163,10 @@ class EvaluationService:
             self.rubrics_collection.delete_many({"evaluation_id": ObjectId(evaluation_id)})
             
             # Eliminar la evaluación
+            previous = self.evaluations_collection.find_one({"_id": ObjectId(evaluation_id)}, {"topic_ids": 1}) or {}
             result = self.evaluations_collection.delete_one({"_id": ObjectId(evaluation_id)})
+            if result.deleted_count > 0:
+                invalidate_study_plan_tree(topic_ids=previous.get("topic_ids", []), db=self.db)
             return result.deleted_count > 0
             
         except Exception as e:
@@ -162,6 +181,7 @@ class EvaluationService:
         try:
             submission = EvaluationSubmission(**submission_data)
             result = self.submissions_collection.insert_one(submission.to_dict())
+            invalidate_evaluation_statistics(submission_data.get("evaluation_id"))
             return str(result.inserted_id)
         except Exception as e:
             raise Exception(f"Error al crear entrega: {str(e)}")
@@ -220,6 +240,7 @@ class EvaluationService:
             updated = result.modified_count > 0
 
             if updated:
+                invalidate_evaluation_statistics(submission["evaluation_id"])
                 self._upsert_evaluation_result(
                     evaluation_id=str(submission["evaluation_id"]),
                     student_id=submission["student_id"],
@@ -406,6 +427,7 @@ class EvaluationService:
                     {"_id": ObjectId(submission_id)},
                     {"$set": submission_data}
                 )
+                invalidate_evaluation_statistics(evaluation_id)
             else:
                 # Crear nueva entrega
                 submission_id = self.create_submission(submission_data)
@@ -644,6 +666,7 @@ class EvaluationService:
                 {"$set": result.to_dict()},
                 upsert=True,
             )
+            invalidate_evaluation_statistics(evaluation_id)
         except Exception as exc:
             raise Exception(f"Error al guardar evaluation_result: {str(exc)}")
     
@@ -669,34 +692,28 @@ class EvaluationService:
     
     # ==================== Helper Methods ====================
     
-    def _validate_topic_ids(self, topic_ids: List[ObjectId]) -> bool:
+    def topic_reference_validator(self) -> ReferenceValidator:
         """
-        Validar que todos los topic_ids existen en la base de datos.
+        Validador de topic_ids reutilizable en un lote de creaciones.
         """
-        try:
-            count = self.topics_collection.count_documents({
-                "_id": {"$in": topic_ids}
-            })
-            return count == len(topic_ids)
-        except:
-            return False
+        return ReferenceValidator(self.topics_collection, "Tema")
+
+    def _find_missing_topic_ids(self, topic_ids: List[ObjectId],
+                                validator: Optional[ReferenceValidator] = None) -> List[str]:
+        """
+        IDs de temas que no existen en la base de datos (una consulta $in).
+        """
+        return (validator or self.topic_reference_validator()).find_missing(topic_ids)
     
     def _recalculate_all_grades(self, evaluation_id: str):
         """
         Recalcular todas las calificaciones para una evaluación después de cambiar ponderaciones.
+
+        Las entregas con topic_scores se reponderan en el servidor con un único
+        update_many, sin recorrer las entregas.
         """
         try:
-            # Obtener todas las entregas para esta evaluación
-            submissions = list(self.submissions_collection.find({
-                "evaluation_id": ObjectId(evaluation_id),
-                "grade": {"$ne": None}
-            }))
-            
-            # Recalcular cada una
-            for submission in submissions:
-                student_id = submission["student_id"]
-                self.calculate_weighted_grade(evaluation_id, student_id)
-                
+            grade_recalculator.reweight_submissions(evaluation_id)
         except Exception as e:
             print(f"Error al recalcular calificaciones: {str(e)}")
 
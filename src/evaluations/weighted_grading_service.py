@@ -3,6 +3,9 @@ from typing import Dict, List, Optional, Tuple
 from bson import ObjectId
 from src.shared.database import get_db
 from src.shared.constants import STATUS
+from src.shared.evaluation_statistics import invalidate_evaluation_statistics
+from src.shared.exceptions import AppException
+from src.shared.grade_recalculation import grade_recalculator, resolve_topic_weights, SCORE_POLICY_LATEST
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,14 +49,8 @@ class WeightedGradingService:
             if not evaluation.get("topic_ids") or len(evaluation["topic_ids"]) <= 1:
                 return {"error": "Esta evaluación no es multi-tema"}
             
-            # Obtener pesos de los temas
-            topic_weights = evaluation.get("topic_weights", {})
-            
-            if not topic_weights:
-                # Si no hay pesos definidos, usar pesos iguales
-                num_topics = len(evaluation["topic_ids"])
-                equal_weight = 1.0 / num_topics
-                topic_weights = {str(topic_id): equal_weight for topic_id in evaluation["topic_ids"]}
+            # Obtener pesos de los temas (iguales si no hay pesos definidos)
+            topic_weights = resolve_topic_weights(evaluation)
             
             # Validar que los pesos sumen 1.0
             total_weight = sum(topic_weights.values())
@@ -203,69 +200,60 @@ class WeightedGradingService:
                 )
                 logger.info(f"Submission actualizada: {submission['_id']}")
             
+            invalidate_evaluation_statistics(evaluation_id)
             return True
             
         except Exception as e:
             logger.error(f"Error actualizando submission: {str(e)}")
             return False
     
-    def recalculate_all_students_for_evaluation(self, evaluation_id: str) -> Dict:
+    def recalculate_all_students_for_evaluation(self, evaluation_id: str,
+                                                score_policy: str = SCORE_POLICY_LATEST,
+                                                resume_token: Optional[str] = None) -> Dict:
         """
         Recalcula las calificaciones ponderadas para todos los estudiantes de una evaluación.
+
+        Los estudiantes se procesan por lotes con WeightedGradeRecalculator
+        (agregación de notas por tema, cálculo vectorizado y un bulk_write por
+        lote) con un presupuesto de tiempo; si no terminan, el resumen trae
+        completed=False y el resume_token para continuar. Para evaluaciones muy
+        grandes usar start_recalculation_job.
         
         Args:
             evaluation_id: ID de la evaluación
+            score_policy: Nota por tema: "latest" (más reciente) o "best" (mejor)
+            resume_token: Token de una llamada anterior que no terminó
             
         Returns:
             Diccionario con el resumen del proceso
         """
         try:
-            # Obtener todos los estudiantes que tienen ContentResults para los temas de esta evaluación
-            evaluation = self.evaluations_collection.find_one({"_id": ObjectId(evaluation_id)})
-            
-            if not evaluation:
-                return {"error": "Evaluación no encontrada"}
-            
-            # Obtener estudiantes únicos con ContentResults para los temas de la evaluación
-            students = self.content_results_collection.distinct(
-                "student_id",
-                {
-                    "topic_id": {"$in": evaluation["topic_ids"]},
-                    "status": STATUS["ACTIVE"]
-                }
-            )
-            
-            successful_updates = 0
-            failed_updates = 0
-            results = []
-            
-            for student_id in students:
-                success = self.update_evaluation_submission_grade(evaluation_id, student_id)
-                
-                if success:
-                    successful_updates += 1
-                    # Obtener el resultado del cálculo para incluir en el resumen
-                    weighted_result = self.calculate_weighted_grade_for_student(evaluation_id, student_id)
-                    results.append({
-                        "student_id": student_id,
-                        "final_score": weighted_result.get("final_weighted_score", 0),
-                        "topics_with_results": weighted_result.get("topics_with_results", 0)
-                    })
-                else:
-                    failed_updates += 1
-            
-            return {
-                "evaluation_id": evaluation_id,
-                "total_students": len(students),
-                "successful_updates": successful_updates,
-                "failed_updates": failed_updates,
-                "results": results,
-                "recalculation_date": datetime.now()
-            }
-            
+            return grade_recalculator.recalculate(evaluation_id, score_policy, resume_token=resume_token)
+        except AppException as e:
+            return {"error": e.message}
         except Exception as e:
             logger.error(f"Error en recálculo masivo: {str(e)}")
             return {"error": f"Error interno: {str(e)}"}
+
+    def start_recalculation_job(self, evaluation_id: str, user_id: str = None,
+                                score_policy: str = SCORE_POLICY_LATEST) -> Dict:
+        """
+        Encola el recálculo masivo como job con progreso y resume token.
+
+        Returns:
+            Estado del job o {"error": ...}
+        """
+        try:
+            return grade_recalculator.start_job(evaluation_id, user_id=user_id, score_policy=score_policy)
+        except AppException as e:
+            return {"error": e.message}
+        except Exception as e:
+            logger.error(f"Error encolando el recálculo masivo: {str(e)}")
+            return {"error": f"Error interno: {str(e)}"}
+
+    def get_recalculation_job(self, evaluation_id: str) -> Optional[Dict]:
+        """Estado del último job de recálculo de la evaluación."""
+        return grade_recalculator.get_job(evaluation_id)
     
     def validate_topic_weights(self, topic_weights: Dict[str, float]) -> Tuple[bool, str]:
         """
@@ -8,6 +8,7 @@ from src.shared.standardization import VerificationBaseService, ErrorCodes
 from src.shared.exceptions import AppException
 from src.shared.logging import log_error
 from .models import Resource, ResourceFolder
+from src.study_plans.recommendation_index import content_recommendation_index
 
 class ResourceService(VerificationBaseService):
     def __init__(self):
@@ -75,6 +76,7 @@ class ResourceService(VerificationBaseService):
             # Crear recurso
             resource = Resource(**resource_data)
             result = self.collection.insert_one(resource.to_dict())
+            content_recommendation_index.upsert_resource(result.inserted_id)
             return True, str(result.inserted_id)
         except Exception as e:
             log_error(f"Error al crear recurso: {str(e)}")
@@ -286,6 +288,7 @@ class ResourceService(VerificationBaseService):
             )
             
             if result.modified_count > 0:
+                content_recommendation_index.upsert_resource(resource_id)
                 return True, "Recurso actualizado correctamente"
             return False, "No se realizaron cambios"
         except Exception as e:
@@ -312,6 +315,7 @@ class ResourceService(VerificationBaseService):
             result = self.collection.delete_one({"_id": ObjectId(resource_id)})
             
             if result.deleted_count > 0:
+                content_recommendation_index.remove_resource(resource_id)
                 return True, f"Recurso eliminado correctamente. {topic_links_deleted} vinculaciones eliminadas."
             
             # Si el recurso no se encontró pero sí había links, podría ser un estado inconsistente
@@ -0,0 +1,75 @@
+"""
+Background Task Routes - Procesamiento de la cola durable de tareas en segundo plano.
+
+En Vercel (modo durable) la cola debe vaciarse periódicamente: vercel.json
+define un cron que llama a GET /api/background-tasks/cron cada minuto. Vercel
+envía "Authorization: Bearer <CRON_SECRET>", por lo que la variable de entorno
+CRON_SECRET debe estar configurada en el proyecto; sin ella el endpoint
+rechaza las llamadas.
+"""
+
+import hmac
+import logging
+import os
+
+from flask import Blueprint, request
+
+from src.shared.standardization import APIRoute, ErrorCodes
+from src.shared.constants import ROLES
+from src.shared.background_tasks import background_runner
+
+background_tasks_bp = Blueprint('background_tasks', __name__, url_prefix='/api/background-tasks')
+
+
+def _parse_limit() -> int:
+    try:
+        return max(1, min(int(request.args.get('limit', 50)), 200))
+    except (TypeError, ValueError):
+        return 50
+
+
+@background_tasks_bp.route('/process', methods=['POST'])
+@APIRoute.standard(auth_required_flag=True, roles=[ROLES["ADMIN"]])
+def process_background_tasks():
+    """
+    Procesa tareas durables vencidas (modo serverless).
+    Versión manual (administradores) del cron /api/background-tasks/cron,
+    igual que /api/virtual/process-queue.
+
+    Query params:
+    - limit: Máximo de tareas a procesar (default 50, máx 200)
+    """
+    result = background_runner.drain_durable_tasks(limit=_parse_limit(), time_budget_seconds=40)
+    return APIRoute.success(data=result, message="Cola de tareas procesada")
+
+
+@background_tasks_bp.route('/cron', methods=['GET'])
+@APIRoute.standard()
+def cron_process_background_tasks():
+    """
+    Procesa tareas durables vencidas desde el cron de Vercel.
+    Autenticado con el header "Authorization: Bearer <CRON_SECRET>".
+    """
+    secret = os.getenv('CRON_SECRET')
+    provided = request.headers.get('Authorization', '')
+    if not secret or not hmac.compare_digest(provided, f"Bearer {secret}"):
+        return APIRoute.error(ErrorCodes.UNAUTHORIZED, "Credencial de cron inválida", status_code=401)
+    result = background_runner.drain_durable_tasks(limit=_parse_limit(), time_budget_seconds=40)
+    return APIRoute.success(data=result, message="Cola de tareas procesada")
+
+
+def register_inline_task_drain(app) -> None:
+    """
+    Procesa al final de cada petición las tareas durables que encoló y cuyo
+    debounce ya venció (ver CoalescingTaskRunner.drain_submitted_tasks). No hace nada en modo thread
+    o si BACKGROUND_TASKS_INLINE_SECONDS es 0.
+    """
+    if background_runner.mode != "durable" or background_runner.inline_drain_seconds <= 0:
+        return
+
+    @app.teardown_request
+    def drain_background_tasks(exc=None):
+        try:
+            background_runner.drain_submitted_tasks()
+        except Exception as e:
+            logging.warning(f"No se pudieron procesar las tareas en segundo plano de la petición: {e}")
@@ -0,0 +1,421 @@
+"""
+Ejecutor compartido de tareas en segundo plano con debounce y coalescencia.
+
+Cada tarea se identifica por (tipo, clave). Mientras una tarea está pendiente,
+los nuevos envíos con la misma clave se fusionan en ella (se conservan los
+últimos argumentos) en lugar de crear trabajo nuevo; si llega un envío mientras
+la tarea se ejecuta, se programa exactamente una re-ejecución al terminar.
+Así una ráfaga de 20 resultados de quiz produce un único recálculo por estudiante.
+
+Modos:
+    - "thread": cola en memoria acotada + un hilo despachador + pool de workers.
+    - "durable": cada envío se fusiona (upsert) en la colección `background_tasks`
+      de MongoDB y se procesa con drain_durable_tasks(), pensado para instancias
+      serverless (Vercel) donde los hilos no sobreviven a la respuesta. Se usa
+      por defecto cuando existe la variable VERCEL, o con BACKGROUND_TASKS_MODE.
+    Si la cola en memoria se llena, los envíos se desvían a la colección durable.
+
+En modo durable la cola se vacía por dos vías:
+    - Al final de cada petición que encoló tareas se procesan inline las que
+      ya vencieron su debounce (run_after), durante BACKGROUND_TASKS_INLINE_SECONDS
+      (por defecto 8 s en Vercel, 0 en otros entornos); ver
+      register_inline_task_drain(). Las tareas con debounce no se adelantan.
+    - El cron de vercel.json llama cada minuto a GET /api/background-tasks/cron
+      (autenticado con CRON_SECRET) para lo que quede: tareas con debounce,
+      tareas que exceden el presupuesto inline, reintentos y jobs que se re-encolan.
+
+Ejemplo de uso:
+    from src.shared.background_tasks import background_runner
+
+    background_runner.register("vakr_refresh", refresh_vakr, debounce_seconds=5)
+    background_runner.submit("vakr_refresh", student_id, student_id=student_id)
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from src.shared.database import get_db
+from src.shared.metrics import increment, register_metrics_provider
+
+DURABLE_COLLECTION = "background_tasks"
+DURABLE_MAX_ATTEMPTS = 3
+# Una tarea en "processing" más antigua que esto se considera abandonada
+DURABLE_STALE_SECONDS = 300
+# Segundos que una petición dedica a procesar sus propias tareas durables al terminar
+INLINE_DRAIN_SECONDS = float(os.getenv("BACKGROUND_TASKS_INLINE_SECONDS", "8" if os.getenv("VERCEL") else "0"))
+
+TaskKey = Tuple[str, str]
+
+
+class _Handler:
+    def __init__(self, func: Callable[..., Any], debounce_seconds: float):
+        self.func = func
+        self.debounce_seconds = debounce_seconds
+
+
+class CoalescingTaskRunner:
+    """
+    Ejecutor de tareas con debounce por clave, coalescencia y cola acotada.
+    """
+
+    def __init__(self, name: str, max_workers: int = 2, max_pending: int = 1000,
+                 mode: Optional[str] = None, inline_drain_seconds: float = INLINE_DRAIN_SECONDS):
+        """
+        Args:
+            name: Nombre del ejecutor (prefijo de métricas e hilos)
+            max_workers: Workers que ejecutan las tareas
+            max_pending: Máximo de claves pendientes en memoria antes de desviar a Mongo
+            mode: "thread" o "durable" (por defecto según entorno)
+            inline_drain_seconds: Presupuesto de drain_submitted_tasks() (0 = desactivado)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        if mode is None:
+            mode = os.getenv("BACKGROUND_TASKS_MODE") or ("durable" if os.getenv("VERCEL") else "thread")
+        self.mode = mode
+        self.inline_drain_seconds = inline_drain_seconds
+        # Tareas durables encoladas por la petición en curso (por hilo)
+        self._local = threading.local()
+
+        self._handlers: Dict[str, _Handler] = {}
+        self._lock = threading.Condition()
+        self._pending: Dict[TaskKey, Dict[str, Any]] = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = set()
+        self._rerun: Dict[TaskKey, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+        register_metrics_provider(f"background_tasks.{name}", self.stats)
+
+    # ------------------------------------------------------------------
+    # Registro y envío
+    # ------------------------------------------------------------------
+    def register(self, task_type: str, func: Callable[..., Any], debounce_seconds: float = 2.0) -> None:
+        """Registra el handler de un tipo de tarea. Recibe los kwargs del envío."""
+        self._handlers[task_type] = _Handler(func, debounce_seconds)
+
+    def submit(self, task_type: str, key: str, **kwargs) -> str:
+        """
+        Programa una tarea o la fusiona con una pendiente de la misma clave.
+
+        Returns:
+            "scheduled", "coalesced", "rerun", "durable" o "dropped"
+        """
+        handler = self._handlers.get(task_type)
+        if handler is None:
+            raise ValueError(f"Tipo de tarea no registrado: {task_type}")
+
+        if self.mode == "durable":
+            return self._submit_durable(task_type, key, kwargs, handler.debounce_seconds)
+
+        task_key = (task_type, str(key))
+        with self._lock:
+            if task_key in self._pending:
+                self._pending[task_key]["kwargs"] = kwargs
+                self._pending[task_key]["coalesced"] += 1
+                self._count("coalesced", task_type)
+                return "coalesced"
+            if task_key in self._running:
+                if task_key in self._rerun:
+                    self._count("coalesced", task_type)
+                self._rerun[task_key] = kwargs
+                return "rerun"
+            if len(self._pending) >= self.max_pending:
+                overflow = True
+            else:
+                overflow = False
+                due_at = time.monotonic() + handler.debounce_seconds
+                self._pending[task_key] = {"kwargs": kwargs, "due_at": due_at, "coalesced": 0}
+                heapq.heappush(self._heap, (due_at, next(self._seq), task_key))
+                self._ensure_started()
+                self._lock.notify()
+
+        if overflow:
+            self._count("overflow", task_type)
+            return self._submit_durable(task_type, key, kwargs, handler.debounce_seconds)
+        self._count("scheduled", task_type)
+        return "scheduled"
+
+    # ------------------------------------------------------------------
+    # Modo en memoria
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        # Llamado con self._lock tomado
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}_task")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name=f"{self.name}_dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._heap:
+                    self._lock.wait()
+                due_at, _, task_key = self._heap[0]
+                delay = due_at - time.monotonic()
+                if delay > 0:
+                    self._lock.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+                entry = self._pending.pop(task_key, None)
+                if entry is None:
+                    continue
+                self._running.add(task_key)
+            try:
+                self._executor.submit(self._run_entry, task_key, entry["kwargs"])
+            except Exception as exc:
+                logging.warning(f"{self.name}: no se pudo enviar la tarea {task_key}: {exc}")
+                with self._lock:
+                    self._running.discard(task_key)
+
+    def _run_entry(self, task_key: TaskKey, kwargs: Dict[str, Any]) -> None:
+        task_type = task_key[0]
+        try:
+            self._execute(task_type, kwargs)
+        finally:
+            with self._lock:
+                self._running.discard(task_key)
+                rerun_kwargs = self._rerun.pop(task_key, None)
+            if rerun_kwargs is not None:
+                self.submit(task_type, task_key[1], **rerun_kwargs)
+
+    def _execute(self, task_type: str, kwargs: Dict[str, Any]) -> bool:
+        handler = self._handlers.get(task_type)
+        if handler is None:
+            logging.warning(f"{self.name}: tarea sin handler registrado: {task_type}")
+            return False
+        started = time.monotonic()
+        try:
+            handler.func(**kwargs)
+            self._count("completed", task_type)
+            return True
+        except Exception as exc:
+            self._count("failed", task_type)
+            logging.warning(f"{self.name}: error ejecutando tarea {task_type}: {exc}")
+            return False
+        finally:
+            increment(f"background_tasks.{self.name}.{task_type}.seconds", time.monotonic() - started)
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Ejecuta de inmediato las tareas pendientes en memoria y espera a que terminen (pruebas/cierre)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending and not self._running and not self._rerun:
+                    return
+                # Adelantar también las re-ejecuciones programadas mientras se espera
+                now = time.monotonic()
+                self._heap = [(now, seq, key) for _, seq, key in self._heap]
+                heapq.heapify(self._heap)
+                self._lock.notify()
+            time.sleep(0.01)
+
+    # ------------------------------------------------------------------
+    # Modo durable (MongoDB)
+    # ------------------------------------------------------------------
+    def _submit_durable(self, task_type: str, key: str, kwargs: Dict[str, Any], debounce_seconds: float) -> str:
+        now = datetime.now()
+        task_filter = {"runner": self.name, "task_type": task_type, "key": str(key), "status": "pending",
+                       "attempts": {"$lt": DURABLE_MAX_ATTEMPTS}}
+        update = {
+            "$set": {"kwargs": kwargs, "updated_at": now},
+            "$setOnInsert": {
+                "created_at": now,
+                "run_after": now + timedelta(seconds=debounce_seconds),
+                "attempts": 0,
+            },
+            "$inc": {"submissions": 1},
+        }
+        try:
+            collection = get_db()[DURABLE_COLLECTION]
+            try:
+                collection.update_one(task_filter, update, upsert=True)
+            except DuplicateKeyError:
+                # Una tarea pendiente que agotó sus intentos ocupa la clave: cerrarla
+                # para que el envío cree una nueva en lugar de fusionarse en ella
+                collection.update_many({**task_filter, "attempts": {"$gte": DURABLE_MAX_ATTEMPTS}},
+                                       {"$set": {"status": "failed"}})
+                try:
+                    collection.update_one(task_filter, update, upsert=True)
+                except DuplicateKeyError:
+                    # Otro proceso insertó la misma tarea pendiente al mismo tiempo: fusionar en ella
+                    collection.update_one(task_filter, update)
+            self._count("durable", task_type)
+            if self.inline_drain_seconds > 0 and not getattr(self._local, "draining", False):
+                submitted = getattr(self._local, "submitted", None)
+                if submitted is None:
+                    submitted = self._local.submitted = []
+                if (task_type, str(key)) not in submitted:
+                    submitted.append((task_type, str(key)))
+            return "durable"
+        except Exception as exc:
+            self._count("dropped", task_type)
+            logging.warning(f"{self.name}: no se pudo persistir la tarea {task_type}/{key}: {exc}")
+            return "dropped"
+
+    def drain_durable_tasks(self, limit: int = 50, time_budget_seconds: float = 40.0) -> Dict[str, int]:
+        """
+        Procesa tareas durables vencidas (pensado para un webhook/cron periódico).
+
+        Args:
+            limit: Máximo de tareas a procesar
+            time_budget_seconds: Tiempo máximo de ejecución
+
+        Returns:
+            {"processed", "failed", "remaining"}
+        """
+        collection = get_db()[DURABLE_COLLECTION]
+        started = time.monotonic()
+        processed = failed = 0
+        self._local.deadline = started + time_budget_seconds
+        try:
+            self._recover_stale_tasks(collection)
+
+            while processed + failed < limit and (time.monotonic() - started) < time_budget_seconds:
+                task = collection.find_one_and_update(
+                    {"runner": self.name, "status": "pending", "run_after": {"$lte": datetime.now()},
+                     "attempts": {"$lt": DURABLE_MAX_ATTEMPTS}},
+                    {"$set": {"status": "processing", "processing_started_at": datetime.now()},
+                     "$inc": {"attempts": 1}},
+                    sort=[("run_after", 1)],
+                    return_document=ReturnDocument.AFTER,
+                )
+                if not task:
+                    break
+
+                if self._run_claimed(collection, task):
+                    processed += 1
+                else:
+                    failed += 1
+        finally:
+            self._local.deadline = None
+
+        remaining = collection.count_documents({"runner": self.name, "status": "pending"})
+        return {"processed": processed, "failed": failed, "remaining": remaining}
+
+    def _recover_stale_tasks(self, collection) -> None:
+        """
+        Recupera tareas abandonadas en "processing" por una instancia que terminó
+        a mitad de ejecución, de una en una: las que agotaron sus intentos pasan
+        a "failed"; el resto vuelve a "pending" salvo que ya exista una pendiente
+        con la misma clave (índice único parcial), en cuyo caso esa la sustituye.
+        """
+        stale_filter = {"runner": self.name, "status": "processing",
+                        "processing_started_at": {"$lt": datetime.now() - timedelta(seconds=DURABLE_STALE_SECONDS)}}
+        for task in collection.find(stale_filter, {"attempts": 1}):
+            current = {"_id": task["_id"], "status": "processing"}
+            if task.get("attempts", 0) >= DURABLE_MAX_ATTEMPTS:
+                collection.update_one(current, {"$set": {"status": "failed"}})
+                continue
+            try:
+                collection.update_one(current, {"$set": {"status": "pending"}})
+            except DuplicateKeyError:
+                # La pendiente tiene los argumentos más recientes: se descarta la abandonada
+                collection.delete_one(current)
+        # Tareas pendientes agotadas por versiones anteriores: liberan su clave
+        collection.update_many({"runner": self.name, "status": "pending", "attempts": {"$gte": DURABLE_MAX_ATTEMPTS}},
+                               {"$set": {"status": "failed"}})
+
+    def drain_submitted_tasks(self, time_budget_seconds: Optional[float] = None) -> Dict[str, int]:
+        """
+        Procesa las tareas durables encoladas por la petición en curso que ya
+        vencieron su run_after. Las que siguen en debounce (para coalescer
+        envíos de varias peticiones) y lo que no quepa en el presupuesto quedan
+        para el cron.
+
+        Returns:
+            {"processed", "failed", "deferred"}
+        """
+        submitted = getattr(self._local, "submitted", None) or []
+        self._local.submitted = []
+        budget = self.inline_drain_seconds if time_budget_seconds is None else time_budget_seconds
+        if not submitted or budget <= 0:
+            return {"processed": 0, "failed": 0, "deferred": len(submitted)}
+
+        collection = get_db()[DURABLE_COLLECTION]
+        started = time.monotonic()
+        processed = failed = deferred = 0
+        # Lo que encolen las propias tareas (p. ej. un job que se re-encola) queda para el cron
+        self._local.draining = True
+        self._local.deadline = started + budget
+        try:
+            for index, (task_type, key) in enumerate(submitted):
+                if time.monotonic() - started >= budget:
+                    return {"processed": processed, "failed": failed, "deferred": deferred + len(submitted) - index}
+                task = collection.find_one_and_update(
+                    {"runner": self.name, "task_type": task_type, "key": key, "status": "pending",
+                     "run_after": {"$lte": datetime.now()}, "attempts": {"$lt": DURABLE_MAX_ATTEMPTS}},
+                    {"$set": {"status": "processing", "processing_started_at": datetime.now()},
+                     "$inc": {"attempts": 1}},
+                    return_document=ReturnDocument.AFTER,
+                )
+                if not task:
+                    # En debounce o ya procesada por otra vía
+                    deferred += 1
+                    continue
+                if self._run_claimed(collection, task):
+                    processed += 1
+                else:
+                    failed += 1
+        finally:
+            self._local.draining = False
+            self._local.deadline = None
+        return {"processed": processed, "failed": failed, "deferred": deferred}
+
+    def remaining_seconds(self, default: float) -> float:
+        """
+        Presupuesto disponible para la tarea en curso: lo que queda del drain
+        que la ejecuta (inline o cron), acotado por `default`. Las tareas largas
+        (jobs por lotes) lo usan para guardar progreso y re-encolarse a tiempo.
+        """
+        deadline = getattr(self._local, "deadline", None)
+        if deadline is None:
+            return default
+        return max(0.0, min(default, deadline - time.monotonic()))
+
+    def _run_claimed(self, collection, task: Dict[str, Any]) -> bool:
+        """Ejecuta una tarea durable ya marcada como "processing" y la cierra."""
+        if self._execute(task["task_type"], task.get("kwargs") or {}):
+            collection.delete_one({"_id": task["_id"]})
+            return True
+        next_status = "failed" if task.get("attempts", 0) >= DURABLE_MAX_ATTEMPTS else "pending"
+        collection.update_one({"_id": task["_id"]}, {"$set": {"status": next_status}})
+        return False
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def _count(self, event: str, task_type: str) -> None:
+        increment(f"background_tasks.{self.name}.{task_type}.{event}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado actual del ejecutor en memoria."""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "reruns_scheduled": len(self._rerun),
+                "max_pending": self.max_pending,
+                "max_workers": self.max_workers,
+                "task_types": sorted(self._handlers.keys()),
+            }
+
+
+# Ejecutor compartido por los servicios
+background_runner = CoalescingTaskRunner("shared", max_workers=2, max_pending=1000)
@@ -0,0 +1,316 @@
+"""
+Almacén de blobs direccionado por contenido para HTML pesado.
+
+Cada blob se identifica por el SHA-256 de su texto, se guarda comprimido con
+zlib en la colección `content_blobs` y lleva un contador de referencias. Los
+blobs cuyo tamaño comprimido supera GRIDFS_MIN_BYTES se guardan en GridFS
+(bucket `content_blobs_fs`). Dos slides con el mismo HTML comparten un único
+blob.
+
+Los documentos de contenido guardan en lugar del texto una referencia
+    {"blob_ref": "<sha256>", "length": <caracteres>}
+que sigue siendo un valor no nulo, de modo que las consultas de existencia
+($ifNull, $ne: None) siguen funcionando sin cambios. resolve_blob_refs()
+expande las referencias de una lista de documentos con una sola consulta $in.
+
+Se activa con CONTENT_BLOB_STORE_ENABLED=1; los textos menores que
+CONTENT_BLOB_MIN_BYTES se mantienen en línea. La lectura de referencias
+funciona siempre, aunque la escritura esté desactivada.
+
+Ejemplo de uso:
+    from src.shared.blob_store import content_blob_store, resolve_blob_refs
+
+    doc["content"] = content_blob_store.externalize_fields(doc["content"])
+    ...
+    resolve_blob_refs(docs)
+"""
+
+import hashlib
+import logging
+import os
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from src.shared.cache import LRUCache
+from src.shared.database import get_db
+
+BLOB_COLLECTION = "content_blobs"
+GRIDFS_BUCKET = "content_blobs_fs"
+CODEC_ZLIB = "zlib"
+# Campos de `content` que se externalizan
+BLOB_FIELDS = ("content_html", "full_html")
+# Por encima de este tamaño comprimido el blob va a GridFS (límite de documento: 16 MB)
+GRIDFS_MIN_BYTES = 8 * 1024 * 1024
+DEFAULT_MIN_BYTES = 2048
+
+
+def is_blob_ref(value: Any) -> bool:
+    """Indica si un valor es una referencia a blob."""
+    return isinstance(value, dict) and isinstance(value.get("blob_ref"), str)
+
+
+def blob_text_length(value: Any) -> int:
+    """Longitud del texto, sea en línea o referencia (sin cargar el blob)."""
+    if is_blob_ref(value):
+        return int(value.get("length") or 0)
+    return len(value) if isinstance(value, str) else 0
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(data: bytes, codec: str = CODEC_ZLIB) -> str:
+    if codec != CODEC_ZLIB:
+        raise ValueError(f"Codec de blob no soportado: {codec}")
+    return zlib.decompress(data).decode("utf-8")
+
+
+class ContentBlobStore:
+    """
+    Blobs de texto deduplicados por SHA-256 con conteo de referencias.
+    """
+
+    def __init__(self, db=None, enabled: Optional[bool] = None, min_bytes: Optional[int] = None):
+        """
+        Args:
+            db: Base de datos (por defecto get_db(), resuelta de forma diferida)
+            enabled: Externalizar al escribir (por defecto CONTENT_BLOB_STORE_ENABLED)
+            min_bytes: Tamaño mínimo en bytes UTF-8 para externalizar
+        """
+        self._db = db
+        if enabled is None:
+            enabled = os.getenv("CONTENT_BLOB_STORE_ENABLED", "0") == "1"
+        self.enabled = enabled
+        if min_bytes is None:
+            min_bytes = int(os.getenv("CONTENT_BLOB_MIN_BYTES", DEFAULT_MIN_BYTES))
+        self.min_bytes = min_bytes
+        # Los blobs son inmutables: el texto descomprimido se puede cachear sin invalidación
+        self._text_cache = LRUCache("content_blobs", max_size=256)
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def collection(self):
+        return self.db[BLOB_COLLECTION]
+
+    def _gridfs(self):
+        import gridfs
+        return gridfs.GridFS(self.db, collection=GRIDFS_BUCKET)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def put(self, text: str) -> Dict[str, Any]:
+        """
+        Guarda el texto (o suma una referencia si ya existe) y retorna su referencia.
+        """
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        ref = {"blob_ref": sha, "length": len(text)}
+        now = datetime.utcnow()
+
+        if self.collection.find_one_and_update(
+            {"_id": sha}, {"$inc": {"ref_count": 1}, "$set": {"updated_at": now}}, projection={"_id": 1}
+        ):
+            return ref
+
+        data = compress_text(text)
+        blob_doc = {
+            "_id": sha,
+            "codec": CODEC_ZLIB,
+            "size": len(text.encode("utf-8")),
+            "compressed_size": len(data),
+            "ref_count": 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+        gridfs_id = None
+        if len(data) >= GRIDFS_MIN_BYTES:
+            gridfs_id = self._gridfs().put(data, filename=sha)
+            blob_doc["gridfs_id"] = gridfs_id
+        else:
+            blob_doc["data"] = data
+
+        try:
+            self.collection.insert_one(blob_doc)
+        except DuplicateKeyError:
+            # Otro proceso insertó el mismo blob a la vez: sumar la referencia al existente
+            self.collection.update_one({"_id": sha}, {"$inc": {"ref_count": 1}, "$set": {"updated_at": now}})
+            if gridfs_id is not None:
+                self._gridfs().delete(gridfs_id)
+        self._text_cache.set(sha, text)
+        return ref
+
+    def retain_many(self, values: Iterable[Any]) -> None:
+        """
+        Suma una referencia por cada referencia a blob de `values` (p. ej. al copiar
+        `content` de un documento a otro), agrupadas en un único bulk_write.
+        """
+        counts: Dict[str, int] = {}
+        for value in values:
+            if is_blob_ref(value):
+                counts[value["blob_ref"]] = counts.get(value["blob_ref"], 0) + 1
+        if not counts:
+            return
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne({"_id": sha}, {"$inc": {"ref_count": count}, "$set": {"updated_at": now}})
+            for sha, count in counts.items()
+        ], ordered=False)
+
+    def release(self, value: Any) -> None:
+        """Resta una referencia si el valor es una referencia a blob (no-op en otro caso)."""
+        if not is_blob_ref(value):
+            return
+        try:
+            self.collection.update_one(
+                {"_id": value["blob_ref"]},
+                {"$inc": {"ref_count": -1}, "$set": {"updated_at": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logging.warning(f"ContentBlobStore: no se pudo liberar el blob {value.get('blob_ref')}: {e}")
+
+    def release_many(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.release(value)
+
+    def externalize(self, value: Any) -> Any:
+        """Retorna una referencia si el texto supera el umbral; si no, el mismo valor."""
+        if not self.enabled or not isinstance(value, str) or len(value.encode("utf-8")) < self.min_bytes:
+            return value
+        return self.put(value)
+
+    def externalize_fields(self, content: Any, fields: Iterable[str] = BLOB_FIELDS) -> Any:
+        """
+        Retorna una copia de `content` con los campos HTML grandes reemplazados por referencias.
+        """
+        if not self.enabled or not isinstance(content, dict):
+            return content
+        result = dict(content)
+        for field in fields:
+            if isinstance(result.get(field), str):
+                result[field] = self.externalize(result[field])
+        return result
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def load_many(self, shas: Iterable[str]) -> Dict[str, str]:
+        """Carga varios blobs (caché + una consulta $in para los faltantes)."""
+        texts: Dict[str, str] = {}
+        missing: List[str] = []
+        for sha in set(shas):
+            hit, text = self._text_cache.get(sha)
+            if hit:
+                texts[sha] = text
+            else:
+                missing.append(sha)
+        if not missing:
+            return texts
+
+        for blob in self.collection.find({"_id": {"$in": missing}}, {"data": 1, "gridfs_id": 1, "codec": 1}):
+            try:
+                if blob.get("gridfs_id") is not None:
+                    data = self._gridfs().get(blob["gridfs_id"]).read()
+                else:
+                    data = bytes(blob.get("data") or b"")
+                text = decompress_text(data, blob.get("codec", CODEC_ZLIB))
+            except Exception as e:
+                logging.error(f"ContentBlobStore: blob {blob.get('_id')} ilegible: {e}")
+                continue
+            self._text_cache.set(blob["_id"], text)
+            texts[blob["_id"]] = text
+        return texts
+
+    def resolve(self, documents: Iterable[Dict], fields: Iterable[str] = BLOB_FIELDS) -> None:
+        """
+        Expande en sitio las referencias de `doc["content"][campo]` de todos los documentos.
+        Una referencia cuyo blob no existe se reemplaza por None.
+        """
+        fields = tuple(fields)
+        targets = []
+        for doc in documents:
+            content = doc.get("content") if isinstance(doc, dict) else None
+            if not isinstance(content, dict):
+                continue
+            for field in fields:
+                if is_blob_ref(content.get(field)):
+                    targets.append((content, field))
+        if not targets:
+            return
+
+        texts = self.load_many(content[field]["blob_ref"] for content, field in targets)
+        for content, field in targets:
+            sha = content[field]["blob_ref"]
+            if sha not in texts:
+                logging.warning(f"ContentBlobStore: referencia a blob inexistente {sha}")
+            content[field] = texts.get(sha)
+
+    def delete_documents(self, collection, ids: Iterable[Any], fields: Iterable[str] = BLOB_FIELDS) -> int:
+        """
+        Borra físicamente documentos con `content` (topic_contents,
+        virtual_topic_contents) y libera sus referencias a blobs. Cada borrado
+        usa find_one_and_delete para liberar exactamente las referencias del
+        documento eliminado, aunque se haya editado entre la lectura y el borrado.
+
+        Returns:
+            Número de documentos eliminados
+        """
+        fields = tuple(fields)
+        projection = {f"content.{field}": 1 for field in fields}
+        deleted = 0
+        for doc_id in ids:
+            doc = collection.find_one_and_delete({"_id": doc_id}, projection=projection)
+            if doc is None:
+                continue
+            deleted += 1
+            self.release_many(content_blob_refs(doc.get("content"), fields))
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def collect_garbage(self, limit: int = 500) -> int:
+        """
+        Elimina blobs sin referencias. El borrado es condicional (ref_count <= 0)
+        para no perder un blob que recibió una referencia nueva entre la lectura y el borrado.
+
+        Returns:
+            Número de blobs eliminados
+        """
+        removed = 0
+        for blob in self.collection.find({"ref_count": {"$lte": 0}}, {"_id": 1, "gridfs_id": 1}).limit(limit):
+            result = self.collection.delete_one({"_id": blob["_id"], "ref_count": {"$lte": 0}})
+            if result.deleted_count:
+                removed += 1
+                self._text_cache.delete(blob["_id"])
+                if blob.get("gridfs_id") is not None:
+                    try:
+                        self._gridfs().delete(blob["gridfs_id"])
+                    except Exception as e:
+                        logging.warning(f"ContentBlobStore: no se pudo borrar el archivo GridFS de {blob['_id']}: {e}")
+        return removed
+
+
+# Instancia compartida por los servicios
+content_blob_store = ContentBlobStore()
+
+
+def resolve_blob_refs(documents: Iterable[Dict], fields: Iterable[str] = BLOB_FIELDS) -> None:
+    """Atajo para content_blob_store.resolve()."""
+    content_blob_store.resolve(documents, fields)
+
+
+def content_blob_refs(content: Any, fields: Iterable[str] = BLOB_FIELDS) -> List[Dict[str, Any]]:
+    """Referencias a blobs presentes en un subdocumento `content`."""
+    if not isinstance(content, dict):
+        return []
+    return [content[field] for field in fields if is_blob_ref(content.get(field))]
@@ -0,0 +1,403 @@
+"""
+Cachés en memoria acotadas para servicios.
+
+LRUCache es un diccionario LRU thread-safe con tamaño máximo, TTL opcional y
+contadores de aciertos/fallos. Cada caché con nombre se registra en el registro
+de métricas (src/shared/metrics.py) para reportar su tasa de aciertos.
+
+VersionedCache añade claves con sello de versión por ámbito (p. ej. un topic):
+invalidar consiste en incrementar la versión del ámbito en el backend
+compartido, así todas las instancias dejan de servir valores anteriores sin
+necesidad de borrar entradas. Backends disponibles:
+    - LocalCacheBackend: en proceso (LRU acotado). También sirve como sustituto
+      en memoria del almacén compartido en pruebas.
+    - MongoCacheBackend: colección `cache_entries` compartida por todas las
+      instancias. Se activa con SHARED_CACHE_BACKEND=mongo.
+
+La invalidación solo cruza instancias con SHARED_CACHE_BACKEND=mongo: con el
+backend local por defecto cada proceso (p. ej. cada función serverless) tiene
+sus propias versiones y un bump_version() no llega a los demás, que siguen
+sirviendo su copia hasta que vence el TTL.
+
+Ejemplo de uso:
+    _cache = LRUCache("html_validation", max_size=2048)
+    hit, value = _cache.get(key)
+    if not hit:
+        value = compute()
+        _cache.set(key, value)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from src.shared.metrics import increment, register_metrics_provider
+
+_MISSING = object()
+
+
+def content_hash(*parts: Any) -> str:
+    """
+    Calcula un hash SHA-256 estable de uno o más fragmentos (str, bytes u otros
+    valores convertidos con repr). Útil como clave de caché basada en contenido.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode("utf-8", errors="surrogatepass")
+        else:
+            data = repr(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Caché LRU acotada y thread-safe con TTL opcional y estadísticas.
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, ttl_seconds: Optional[float] = None,
+                 register_metrics: bool = True):
+        """
+        Args:
+            name: Nombre de la caché (se usa en las métricas)
+            max_size: Número máximo de entradas
+            ttl_seconds: Tiempo de vida de cada entrada (None = sin expiración)
+            register_metrics: Publicar estadísticas en el registro de métricas
+        """
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        if register_metrics:
+            register_metrics_provider(f"cache.{name}", self.stats)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Obtiene una entrada.
+
+        Returns:
+            Tupla (encontrado, valor)
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self._misses += 1
+                return False, None
+            stored_at, value = entry
+            if self.ttl_seconds is not None and (time.monotonic() - stored_at) > self.ttl_seconds:
+                del self._data[key]
+                self._misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Guarda una entrada, expulsando la menos usada si se supera el tamaño."""
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Devuelve la entrada en caché o la calcula y la guarda."""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def delete(self, key: Hashable) -> bool:
+        """Elimina una entrada. Retorna True si existía."""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Elimina las entradas cuya clave cumple el predicado. Retorna cuántas se eliminaron."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Vacía la caché (las estadísticas se conservan)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class LocalCacheBackend:
+    """
+    Backend en proceso: valores en un LRUCache acotado y contadores de versión
+    en un diccionario LRU acotado. Compartir una misma instancia entre
+    servicios simula el almacén compartido (útil en pruebas).
+
+    Los contadores toman valores de una secuencia común y, al expulsar uno,
+    los contadores ausentes pasan a leerse como el último valor emitido. Así
+    una clave expulsada nunca vuelve a una versión anterior a su último bump
+    (a lo sumo provoca fallos de caché espurios).
+    """
+
+    def __init__(self, name: str, max_size: int = 1024, register_metrics: bool = True,
+                 max_counters: Optional[int] = None):
+        self._values = LRUCache(name, max_size=max_size, register_metrics=register_metrics)
+        self._counters: "OrderedDict[str, int]" = OrderedDict()
+        self._max_counters = max_counters or max_size * 4
+        self._sequence = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        hit, entry = self._values.get(key)
+        if not hit:
+            return False, None
+        expires_at, value = entry
+        if expires_at is not None and time.monotonic() > expires_at:
+            self._values.delete(key)
+            return False, None
+        return True, value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        self._values.set(key, (expires_at, value))
+
+    def delete(self, key: str) -> None:
+        self._values.delete(key)
+
+    def get_counter(self, key: str) -> int:
+        with self._lock:
+            if key in self._counters:
+                self._counters.move_to_end(key)
+                return self._counters[key]
+            return self._floor
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._sequence += 1
+            self._counters[key] = self._sequence
+            self._counters.move_to_end(key)
+            while len(self._counters) > self._max_counters:
+                self._counters.popitem(last=False)
+                self._floor = self._sequence
+            return self._sequence
+
+
+class MongoCacheBackend:
+    """
+    Backend compartido sobre la colección `cache_entries`. Las entradas llevan
+    `expires_at` (índice TTL) y los contadores de versión viven en la misma
+    colección, incrementados atómicamente con $inc.
+    """
+
+    COLLECTION = "cache_entries"
+
+    def __init__(self, collection=None):
+        self._collection = collection
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from src.shared.database import get_db
+            self._collection = get_db()[self.COLLECTION]
+        return self._collection
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        doc = self.collection.find_one({"_id": key, "kind": "value"}, {"value": 1, "expires_at": 1})
+        if not doc:
+            return False, None
+        # El monitor TTL de Mongo borra con retraso; descartar entradas vencidas aquí
+        expires_at = doc.get("expires_at")
+        if expires_at is not None and expires_at <= datetime.utcnow():
+            return False, None
+        return True, doc.get("value")
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        update = {"kind": "value", "value": value, "updated_at": datetime.utcnow()}
+        if ttl_seconds is not None:
+            update["expires_at"] = datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        self.collection.update_one({"_id": key}, {"$set": update}, upsert=True)
+
+    def delete(self, key: str) -> None:
+        self.collection.delete_one({"_id": key})
+
+    def get_counter(self, key: str) -> int:
+        doc = self.collection.find_one({"_id": key, "kind": "counter"}, {"value": 1})
+        return int(doc.get("value", 0)) if doc else 0
+
+    def incr(self, key: str) -> int:
+        doc = self.collection.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"value": 1}, "$set": {"kind": "counter", "updated_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return int(doc.get("value", 1)) if doc else 1
+
+
+_shared_backend = None
+_shared_backend_lock = threading.Lock()
+
+
+def get_shared_cache_backend():
+    """
+    Backend compartido configurado con SHARED_CACHE_BACKEND ("mongo" o "local").
+    Por defecto "local": cada proceso mantiene su propio estado.
+    """
+    global _shared_backend
+    with _shared_backend_lock:
+        if _shared_backend is None:
+            kind = (os.getenv("SHARED_CACHE_BACKEND") or "local").lower()
+            if kind == "mongo":
+                _shared_backend = MongoCacheBackend()
+            else:
+                _shared_backend = LocalCacheBackend("shared_backend", max_size=4096)
+        return _shared_backend
+
+
+def set_shared_cache_backend(backend) -> None:
+    """Reemplaza el backend compartido (pruebas o configuración explícita)."""
+    global _shared_backend
+    with _shared_backend_lock:
+        _shared_backend = backend
+
+
+class VersionedCache:
+    """
+    Caché con claves "namespace:ámbito:v<versión>:sufijo" en dos niveles: un LRU
+    local con TTL corto delante del backend compartido. La versión de cada
+    ámbito se lee del backend compartido en cada consulta, de modo que un
+    bump_version() en cualquier instancia invalida el valor en todas (solo si
+    el backend es compartido, es decir, SHARED_CACHE_BACKEND=mongo).
+
+    Para no guardar bajo una versión nueva un valor calculado con datos
+    anteriores a un bump concurrente, get_with_version() retorna la versión
+    observada y set(..., version=) guarda bajo esa misma versión.
+
+    Los fallos del backend compartido nunca se propagan: la consulta se trata
+    como fallo de caché y el valor se recalcula.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float = 10, max_size: int = 1024,
+                 backend=None):
+        """
+        Args:
+            namespace: Prefijo de las claves y nombre de las métricas
+            ttl_seconds: Vida máxima de una entrada (acota datos que cambian sin escrituras)
+            max_size: Tamaño del nivel local
+            backend: Backend compartido (por defecto get_shared_cache_backend())
+        """
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend
+        self._local = LocalCacheBackend(f"{namespace}.local", max_size=max_size)
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else get_shared_cache_backend()
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.namespace}:{scope}:version"
+
+    def _current_version(self, scope: str) -> Optional[int]:
+        try:
+            return self.backend.get_counter(self._version_key(scope))
+        except Exception as e:
+            logging.debug(f"VersionedCache[{self.namespace}]: no se pudo leer la versión de {scope}: {e}")
+            return None
+
+    def version(self, scope: str) -> Optional[int]:
+        """
+        Versión vigente del ámbito (None si el backend no responde). Permite
+        componer en el sufijo las versiones de otros ámbitos de los que
+        depende una entrada.
+        """
+        return self._current_version(scope)
+
+    def get(self, scope: str, suffix: str = "") -> Tuple[bool, Any]:
+        """Retorna (encontrado, valor) para la versión vigente del ámbito."""
+        hit, value, _ = self.get_with_version(scope, suffix)
+        return hit, value
+
+    def get_with_version(self, scope: str, suffix: str = "") -> Tuple[bool, Any, Optional[int]]:
+        """
+        Retorna (encontrado, valor, versión) para la versión vigente del ámbito.
+        La versión se pasa después a set() al guardar el valor recalculado.
+        """
+        version = self._current_version(scope)
+        if version is None:
+            increment(f"cache.{self.namespace}.misses")
+            return False, None, None
+        key = f"{self.namespace}:{scope}:v{version}:{suffix}"
+        hit, value = self._local.get(key)
+        if not hit:
+            try:
+                hit, value = self.backend.get(key)
+            except Exception as e:
+                logging.debug(f"VersionedCache[{self.namespace}]: error leyendo {key}: {e}")
+                hit = False
+            if hit:
+                self._local.set(key, value, self.ttl_seconds)
+        increment(f"cache.{self.namespace}.{'hits' if hit else 'misses'}")
+        return hit, value, version
+
+    def set(self, scope: str, value: Any, suffix: str = "", version: Optional[int] = None) -> None:
+        """
+        Guarda el valor bajo la versión indicada (la observada en
+        get_with_version) o, si no se indica, bajo la versión vigente.
+        Con un bump intermedio la entrada queda bajo la versión anterior y
+        nunca se sirve.
+        """
+        if version is None:
+            version = self._current_version(scope)
+        if version is None:
+            return
+        key = f"{self.namespace}:{scope}:v{version}:{suffix}"
+        self._local.set(key, value, self.ttl_seconds)
+        try:
+            self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logging.debug(f"VersionedCache[{self.namespace}]: error guardando {key}: {e}")
+
+    def bump_version(self, scope: str) -> None:
+        """Invalida todas las entradas del ámbito en todas las instancias."""
+        try:
+            self.backend.incr(self._version_key(scope))
+        except Exception as e:
+            logging.warning(f"VersionedCache[{self.namespace}]: no se pudo invalidar {scope}: {e}")
+        increment(f"cache.{self.namespace}.invalidations")
@@ -4,6 +4,10 @@ from typing import List, Dict, Optional, Set
 import logging
 from pymongo import MongoClient
 from src.shared.database import get_db
+from src.shared.blob_store import content_blob_store
+
+# Colecciones cuyo `content` puede referenciar blobs del ContentBlobStore
+BLOB_REF_COLLECTIONS = ('topic_contents', 'virtual_topic_contents')
 
 class CascadeDeletionService:
     """
@@ -281,6 +285,9 @@ class CascadeDeletionService:
             return 0
         
         try:
+            if collection in BLOB_REF_COLLECTIONS:
+                # Liberar las referencias a blobs para que collect_garbage los reclame
+                return content_blob_store.delete_documents(self.db[collection], entity_ids)
             result = self.db[collection].delete_many({'_id': {'$in': entity_ids}})
             return result.deleted_count
         except Exception as e:
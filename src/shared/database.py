@@ -231,7 +231,53 @@ def setup_database_indexes():
             
             # Índices de temas
             _ensure_index(db.topics, [("module_id", ASCENDING)], name="idx_topics_module")
-            
+
+            # Índices de módulos y temas virtuales (listados paginados por keyset)
+            _ensure_index(db.virtual_modules, [("student_id", ASCENDING), ("module_id", ASCENDING)],
+                         name="idx_virtual_modules_student_module")
+            _ensure_index(db.virtual_topics, [("virtual_module_id", ASCENDING), ("order", ASCENDING), ("_id", ASCENDING)],
+                         name="idx_virtual_topics_module_order")
+            _ensure_index(db.virtual_topics, [("student_id", ASCENDING), ("topic_id", ASCENDING)],
+                         name="idx_virtual_topics_student_topic")
+
+            # Cola durable de tareas en segundo plano (src/shared/background_tasks.py)
+            _ensure_index(db.background_tasks, [("runner", ASCENDING), ("task_type", ASCENDING), ("key", ASCENDING)],
+                         name="idx_background_tasks_pending_key", unique=True,
+                         partialFilterExpression={"status": "pending"})
+            _ensure_index(db.background_tasks, [("runner", ASCENDING), ("status", ASCENDING), ("run_after", ASCENDING)],
+                         name="idx_background_tasks_due")
+
+            # Caché compartida (src/shared/cache.py): expiración por TTL; los contadores de versión no llevan expires_at
+            _ensure_index(db.cache_entries, [("expires_at", ASCENDING)],
+                         name="idx_cache_entries_ttl", expireAfterSeconds=0)
+
+            # Almacén de blobs de HTML (src/shared/blob_store.py): recolección de blobs sin referencias
+            _ensure_index(db.content_blobs, [("ref_count", ASCENDING)], name="idx_content_blobs_ref_count")
+
+            # Catálogo de plantillas (list_templates): particiones por scope/owner/workspace
+            # con orden (created_at, _id) para la paginación keyset, y tags multikey
+            _ensure_index(db.templates, [("scope", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                         name="idx_templates_scope_status_created")
+            _ensure_index(db.templates, [("owner_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                         name="idx_templates_owner_created")
+            _ensure_index(db.templates, [("workspace_id", ASCENDING), ("scope", ASCENDING), ("created_at", DESCENDING)],
+                         name="idx_templates_workspace_scope")
+            _ensure_index(db.templates, [("style_tags", ASCENDING)], name="idx_templates_style_tags")
+            _ensure_index(db.templates, [("subject_tags", ASCENDING)], name="idx_templates_subject_tags")
+            _ensure_index(db.template_instances, [("template_id", ASCENDING)], name="idx_template_instances_template")
+
+            # Estado de evaluaciones por estudiante (EvaluationStatusBatch): $in sobre evaluaciones y estudiantes
+            _ensure_index(db.evaluation_submissions, [("evaluation_id", ASCENDING), ("student_id", ASCENDING)],
+                         name="idx_evaluation_submissions_evaluation_student")
+            # Estadísticas por evaluación (EvaluationStatisticsEngine) y upserts de resultados consolidados
+            _ensure_index(db.evaluation_results, [("evaluation_id", ASCENDING), ("student_id", ASCENDING)],
+                         name="idx_evaluation_results_evaluation_student")
+            # Recálculo de notas ponderadas (WeightedGradeRecalculator): lotes por temas y estudiante
+            _ensure_index(db.content_results, [("topic_id", ASCENDING), ("status", ASCENDING), ("student_id", ASCENDING), ("created_at", DESCENDING)],
+                         name="idx_content_results_topic_status_student")
+            _ensure_index(db.grade_recalculation_jobs, [("evaluation_id", ASCENDING)],
+                         name="idx_grade_recalculation_jobs_evaluation", unique=True)
+
             # Índices académicos
             _ensure_index(db.academic_periods, [("institute_id", ASCENDING)], name="idx_academic_periods_institute")
             _ensure_index(db.sections, [("academic_period_id", ASCENDING)], name="idx_sections_academic_period")
@@ -276,6 +322,9 @@ def setup_database_indexes():
                          name="idx_topic_content_type_order")
             _ensure_index(content_coll, [("topic_id", ASCENDING), ("status", ASCENDING)],
                          name="idx_topic_status")
+            # Listado de slides del editor (get_topic_slides_optimized): filtro por status y keyset por order
+            _ensure_index(content_coll, [("topic_id", ASCENDING), ("content_type", ASCENDING), ("status", ASCENDING), ("order", ASCENDING)],
+                         name="idx_topic_contents_slide_status_order")
             _ensure_index(content_coll, [("content_type", ASCENDING), ("status", ASCENDING)],
                          name="idx_content_type_status")
             
@@ -0,0 +1,281 @@
+"""
+Estadísticas de calificaciones de una evaluación (entregas o resultados
+consolidados) sin traer los documentos completos a Python.
+
+EvaluationService.get_evaluation_statistics y
+EvaluationAnalyticsService.analyze_evaluation cargaban todas las entregas (con
+una consulta de usuario por entrega) para calcular un promedio.
+EvaluationStatisticsEngine calcula conteo, media, desviación estándar
+(poblacional), mínimo/máximo, percentiles e histograma:
+
+    - en el servidor, con un único $group (+ $percentile, MongoDB >= 7.0)
+    - si el servidor no soporta $percentile, con NumPy sobre un cursor
+      proyectado solo a la nota y los indicadores (is_late, status)
+
+El resultado se cachea por evaluación en una VersionedCache con ámbito
+"evaluation:<id>"; las escrituras de entregas y resultados llaman a
+invalidate_evaluation_statistics(). El TTL acota los cambios hechos sin pasar
+por los servicios.
+
+Los percentiles del servidor usan el método 'approximate' de MongoDB y los de
+NumPy interpolación lineal: pueden diferir ligeramente con pocas notas.
+
+Ejemplo de uso:
+    from src.shared.evaluation_statistics import EvaluationStatisticsEngine
+
+    stats = EvaluationStatisticsEngine(db).submission_statistics(evaluation_id)
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from src.shared.cache import VersionedCache
+
+EVALUATION_STATS_CACHE_TTL_SECONDS = 300
+EVALUATION_STATS_CACHE_SIZE = 512
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+PASSING_SCORE = 60
+
+# (etiqueta, mínimo inclusivo, máximo exclusivo); None = sin límite
+GRADE_BUCKETS: Tuple[Tuple[str, Optional[float], Optional[float]], ...] = (
+    ("A (90-100)", 90, None),
+    ("B (80-89)", 80, 90),
+    ("C (70-79)", 70, 80),
+    ("D (60-69)", 60, 70),
+    ("F (0-59)", None, 60),
+)
+
+SOURCE_SERVER = "server"
+SOURCE_NUMPY = "numpy"
+
+# Códigos de MongoDB < 7.0 para un acumulador/expresión desconocidos ($percentile)
+PERCENTILE_UNSUPPORTED_CODES = (15952, 168)
+
+_statistics_cache = VersionedCache("evaluation_statistics", ttl_seconds=EVALUATION_STATS_CACHE_TTL_SECONDS,
+                                   max_size=EVALUATION_STATS_CACHE_SIZE)
+
+
+def _evaluation_scope(evaluation_id: Any) -> str:
+    return f"evaluation:{evaluation_id}"
+
+
+def invalidate_evaluation_statistics(evaluation_id: Any) -> None:
+    """Invalida las estadísticas cacheadas de una evaluación tras una escritura."""
+    if not evaluation_id:
+        return
+    try:
+        _statistics_cache.bump_version(_evaluation_scope(evaluation_id))
+    except Exception as e:
+        logging.warning(f"No se pudieron invalidar las estadísticas de la evaluación {evaluation_id}: {e}")
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _percentile_key(p: float) -> str:
+    return f"p{int(p) if float(p).is_integer() else p}"
+
+
+def compute_score_statistics(scores: Iterable[float],
+                             percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+    """
+    Estadísticas descriptivas de una lista de notas con NumPy.
+
+    Returns:
+        Dict con scored, mean, stddev, min, max, percentiles {pNN: valor} e
+        histogram [{label, min, max, count}] según GRADE_BUCKETS
+    """
+    values = np.fromiter((float(s) for s in scores), dtype=float)
+    if not values.size:
+        return _empty_statistics(percentiles)
+
+    histogram = []
+    for label, low, high in GRADE_BUCKETS:
+        mask = np.ones(values.size, dtype=bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values < high
+        histogram.append({"label": label, "min": low, "max": high, "count": int(mask.sum())})
+
+    return {
+        "scored": int(values.size),
+        "mean": _round(values.mean()),
+        "stddev": _round(values.std()),
+        "min": _round(values.min()),
+        "max": _round(values.max()),
+        "percentiles": {
+            _percentile_key(p): _round(v)
+            for p, v in zip(percentiles, np.percentile(values, list(percentiles)))
+        },
+        "histogram": histogram
+    }
+
+
+def _empty_statistics(percentiles: Sequence[float]) -> Dict[str, Any]:
+    return {
+        "scored": 0,
+        "mean": None,
+        "stddev": None,
+        "min": None,
+        "max": None,
+        "percentiles": {_percentile_key(p): None for p in percentiles},
+        "histogram": [{"label": label, "min": low, "max": high, "count": 0} for label, low, high in GRADE_BUCKETS]
+    }
+
+
+class EvaluationStatisticsEngine:
+    """
+    Calcula (y cachea) las estadísticas de notas de una evaluación.
+    """
+
+    # None = aún no se sabe si el servidor soporta $percentile
+    _server_percentiles: Optional[bool] = None
+
+    def __init__(self, db=None, percentiles: Sequence[float] = DEFAULT_PERCENTILES):
+        self._db = db
+        self.percentiles = tuple(percentiles)
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.shared.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def submission_statistics(self, evaluation_id: str) -> Dict[str, Any]:
+        """Estadísticas sobre evaluation_submissions (campo grade)."""
+        return self._cached(evaluation_id, "submissions", "evaluation_submissions", "grade")
+
+    def result_statistics(self, evaluation_id: str) -> Dict[str, Any]:
+        """Estadísticas sobre evaluation_results (campo score)."""
+        return self._cached(evaluation_id, "results", "evaluation_results", "score")
+
+    def _cached(self, evaluation_id: str, suffix: str, collection: str, score_field: str) -> Dict[str, Any]:
+        scope = _evaluation_scope(evaluation_id)
+        suffix = f"{suffix}:{','.join(str(p) for p in self.percentiles)}"
+        hit, stats, version = _statistics_cache.get_with_version(scope, suffix)
+        if hit:
+            return stats
+        stats = self.compute(collection, {"evaluation_id": ObjectId(str(evaluation_id))}, score_field)
+        _statistics_cache.set(scope, stats, suffix, version=version)
+        return stats
+
+    def compute(self, collection: str, match: Dict[str, Any], score_field: str) -> Dict[str, Any]:
+        """
+        Estadísticas de score_field para los documentos de match.
+
+        Returns:
+            Dict con count (documentos), late, completed, passing (nota >=
+            PASSING_SCORE), source y las claves de compute_score_statistics
+        """
+        cls = type(self)
+        if cls._server_percentiles is not False:
+            try:
+                stats = self._compute_server(collection, match, score_field)
+                cls._server_percentiles = True
+                return stats
+            except OperationFailure as e:
+                if e.code in PERCENTILE_UNSUPPORTED_CODES:
+                    # $percentile requiere MongoDB 7.0; se recuerda para no reintentar
+                    logging.info(f"$percentile no disponible, estadísticas con NumPy: {e}")
+                    cls._server_percentiles = False
+                else:
+                    # Fallo puntual (timeout, red...): NumPy solo para esta consulta
+                    logging.warning(f"Error en la agregación de estadísticas, se usa NumPy: {e}")
+        return self._compute_numpy(collection, match, score_field)
+
+    def _compute_server(self, collection: str, match: Dict[str, Any], score_field: str) -> Dict[str, Any]:
+        def flag(condition):
+            return {"$sum": {"$cond": [condition, 1, 0]}}
+
+        def bucket(low, high):
+            bounds: List[Dict] = [{"$isNumber": "$score"}]
+            if low is not None:
+                bounds.append({"$gte": ["$score", low]})
+            if high is not None:
+                bounds.append({"$lt": ["$score", high]})
+            return flag({"$and": bounds})
+
+        group: Dict[str, Any] = {
+            "_id": None,
+            "count": {"$sum": 1},
+            "scored": flag({"$isNumber": "$score"}),
+            "mean": {"$avg": "$score"},
+            "stddev": {"$stdDevPop": "$score"},
+            "min": {"$min": "$score"},
+            "max": {"$max": "$score"},
+            "late": flag({"$eq": ["$is_late", True]}),
+            "completed": flag({"$eq": ["$status", "completed"]}),
+            "passing": flag({"$and": [{"$isNumber": "$score"}, {"$gte": ["$score", PASSING_SCORE]}]}),
+            "percentiles": {"$percentile": {
+                "input": "$score", "p": [p / 100 for p in self.percentiles], "method": "approximate"
+            }}
+        }
+        for index, (_, low, high) in enumerate(GRADE_BUCKETS):
+            group[f"bucket_{index}"] = bucket(low, high)
+
+        pipeline = [
+            {"$match": match},
+            {"$project": {
+                "_id": 0, "is_late": 1, "status": 1,
+                # Solo notas numéricas: null queda fuera de $avg/$min/$max/$percentile
+                "score": {"$cond": [{"$isNumber": f"${score_field}"}, f"${score_field}", None]}
+            }},
+            {"$group": group}
+        ]
+        rows = list(self.db[collection].aggregate(pipeline))
+        if not rows or not rows[0].get("scored"):
+            row = rows[0] if rows else {}
+            return self._with_counts(_empty_statistics(self.percentiles), row.get("count", 0), row, SOURCE_SERVER)
+
+        row = rows[0]
+        stats = {
+            "scored": row["scored"],
+            "mean": _round(row.get("mean")),
+            "stddev": _round(row.get("stddev")),
+            "min": _round(row.get("min")),
+            "max": _round(row.get("max")),
+            "percentiles": {
+                _percentile_key(p): _round(v) for p, v in zip(self.percentiles, row.get("percentiles") or [])
+            },
+            "histogram": [
+                {"label": label, "min": low, "max": high, "count": row.get(f"bucket_{index}", 0)}
+                for index, (label, low, high) in enumerate(GRADE_BUCKETS)
+            ]
+        }
+        return self._with_counts(stats, row["count"], row, SOURCE_SERVER)
+
+    def _compute_numpy(self, collection: str, match: Dict[str, Any], score_field: str) -> Dict[str, Any]:
+        count = late = completed = 0
+        scores: List[float] = []
+        cursor = self.db[collection].find(match, {"_id": 0, score_field: 1, "is_late": 1, "status": 1})
+        for doc in cursor:
+            count += 1
+            late += doc.get("is_late") is True
+            completed += doc.get("status") == "completed"
+            score = doc.get(score_field)
+            if isinstance(score, (int, float)) and not isinstance(score, bool):
+                scores.append(score)
+
+        stats = compute_score_statistics(scores, self.percentiles)
+        passing = int(sum(1 for s in scores if s >= PASSING_SCORE))
+        return self._with_counts(stats, count, {"late": late, "completed": completed, "passing": passing},
+                                 SOURCE_NUMPY)
+
+    @staticmethod
+    def _with_counts(stats: Dict[str, Any], count: int, counts: Dict[str, Any], source: str) -> Dict[str, Any]:
+        stats.update({
+            "count": count,
+            "late": counts.get("late", 0),
+            "completed": counts.get("completed", 0),
+            "passing": counts.get("passing", 0),
+            "source": source
+        })
+        return stats
@@ -0,0 +1,434 @@
+"""
+Recálculo masivo de calificaciones ponderadas de evaluaciones multi-tema.
+
+WeightedGradingService.recalculate_all_students_for_evaluation recorría los
+estudiantes uno a uno (dos consultas por tema y estudiante, y el cálculo se
+repetía para el resumen), de modo que cambiar los pesos de una evaluación con
+muchos estudiantes agotaba el tiempo de la petición. WeightedGradeRecalculator
+procesa los estudiantes por lotes:
+
+    1. Una agregación obtiene los IDs del siguiente lote (orden por student_id)
+    2. Otra agregación obtiene la nota por (estudiante, tema) del lote, con la
+       misma normalización a 0-100 que calculate_weighted_grade_for_student
+    3. Las notas finales se calculan con NumPy (matriz estudiantes × temas por
+       el vector de pesos)
+    4. Todas las entregas del lote se escriben con un único bulk_write (upsert)
+
+Política de nota por tema: "latest" (resultado más reciente, la del cálculo
+individual) o "best" (mejor resultado).
+
+recalculate() procesa lotes dentro de la petición hasta agotar
+GRADE_RECALC_TIME_BUDGET_SECONDS; si quedan estudiantes retorna completed=False
+y el resume_token para continuar con otra llamada.
+
+Modo job: start_job() guarda el progreso en `grade_recalculation_jobs` (un
+documento por evaluación) y encola run_job() en el background_runner (en Vercel lo ejecuta el drenado
+inline de la petición y, si no termina, el cron de background_tasks, con el
+presupuesto que queda en cada drenado). Tras
+cada lote se persiste un resume_token (cursor opaco con el último student_id),
+así que un job interrumpido o que agota su presupuesto de tiempo continúa desde
+ahí. Si los pesos cambian con un job en curso, start_job() lo reinicia: el
+campo generation descarta las escrituras de progreso de la ejecución anterior.
+
+Ejemplo de uso:
+    from src.shared.grade_recalculation import grade_recalculator
+
+    summary = grade_recalculator.recalculate(evaluation_id)
+    job = grade_recalculator.start_job(evaluation_id, user_id=user_id)
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from src.shared.background_tasks import background_runner
+from src.shared.constants import STATUS
+from src.shared.evaluation_statistics import invalidate_evaluation_statistics
+from src.shared.exceptions import AppException
+from src.shared.pagination import decode_cursor, encode_cursor
+
+GRADE_RECALC_JOBS_COLLECTION = "grade_recalculation_jobs"
+GRADE_RECALC_TASK = "evaluations.grade_recalculation"
+GRADE_RECALC_BATCH_SIZE = 500
+GRADE_RECALC_TIME_BUDGET_SECONDS = 40.0
+
+SCORE_POLICY_LATEST = "latest"
+SCORE_POLICY_BEST = "best"
+SCORE_POLICIES = (SCORE_POLICY_LATEST, SCORE_POLICY_BEST)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# score > 1 ya está en escala 0-100 (se acota a 100); si no, se escala desde 0-1
+NORMALIZED_SCORE_EXPR = {
+    "$let": {
+        "vars": {"raw": {"$ifNull": ["$score", 0]}},
+        "in": {"$cond": [
+            {"$gt": ["$$raw", 1]},
+            {"$min": ["$$raw", 100]},
+            {"$multiply": ["$$raw", 100]}
+        ]}
+    }
+}
+
+
+def resolve_topic_weights(evaluation: Dict) -> Dict[str, float]:
+    """
+    Pesos por tema de una evaluación: topic_weights, si no weightings (el campo
+    que guarda el modelo Evaluation) y, si no hay ninguno, pesos iguales.
+    """
+    weights = evaluation.get("topic_weights") or evaluation.get("weightings")
+    if weights:
+        return {str(topic_id): float(weight) for topic_id, weight in weights.items()}
+    topic_ids = evaluation.get("topic_ids") or []
+    return {str(topic_id): 1.0 / len(topic_ids) for topic_id in topic_ids} if topic_ids else {}
+
+
+def compute_weighted_grades(topic_ids: List[str], weights: Dict[str, float],
+                            student_scores: List[Dict[str, float]]) -> np.ndarray:
+    """
+    Notas finales ponderadas (redondeadas a 2 decimales) de varios estudiantes.
+
+    Args:
+        topic_ids: Orden de las columnas
+        weights: Pesos por tema
+        student_scores: Por estudiante, {topic_id: nota 0-100}; un tema sin nota cuenta 0
+    """
+    scores = np.zeros((len(student_scores), len(topic_ids)), dtype=float)
+    columns = {topic_id: index for index, topic_id in enumerate(topic_ids)}
+    for row, topic_scores in enumerate(student_scores):
+        for topic_id, score in topic_scores.items():
+            if topic_id in columns:
+                scores[row, columns[topic_id]] = score
+    weight_vector = np.array([weights.get(topic_id, 0.0) for topic_id in topic_ids], dtype=float)
+    return np.round(scores @ weight_vector, 2)
+
+
+class WeightedGradeRecalculator:
+    """
+    Recalcula por lotes las calificaciones ponderadas de una evaluación a
+    partir de los ContentResults de sus temas.
+    """
+
+    def __init__(self, db=None, batch_size: int = GRADE_RECALC_BATCH_SIZE):
+        self._db = db
+        self.batch_size = batch_size
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.shared.database import get_db
+            self._db = get_db()
+        return self._db
+
+    # ------------------------------------------------------------------
+    # Cálculo por lotes
+    # ------------------------------------------------------------------
+    def load_evaluation(self, evaluation_id: str) -> Dict:
+        """
+        Raises:
+            AppException: Si la evaluación no existe, no es multi-tema o sus pesos no suman 1.0
+        """
+        if not ObjectId.is_valid(str(evaluation_id)):
+            raise AppException(f"ID de evaluación inválido: {evaluation_id}", AppException.BAD_REQUEST)
+        evaluation = self.db.evaluations.find_one(
+            {"_id": ObjectId(str(evaluation_id))},
+            {"topic_ids": 1, "topic_weights": 1, "weightings": 1}
+        )
+        if not evaluation:
+            raise AppException("Evaluación no encontrada", AppException.NOT_FOUND)
+        if not evaluation.get("topic_ids") or len(evaluation["topic_ids"]) <= 1:
+            raise AppException("Esta evaluación no es multi-tema", AppException.BAD_REQUEST)
+        total_weight = sum(resolve_topic_weights(evaluation).values())
+        if abs(total_weight - 1.0) > 0.01:
+            raise AppException(f"Los pesos de los temas deben sumar 1.0, actual: {total_weight}",
+                               AppException.BAD_REQUEST)
+        return evaluation
+
+    def _results_match(self, evaluation: Dict) -> Dict:
+        return {"topic_id": {"$in": evaluation["topic_ids"]}, "status": STATUS["ACTIVE"]}
+
+    def count_students(self, evaluation: Dict) -> int:
+        """Estudiantes distintos con resultados en los temas de la evaluación."""
+        rows = list(self.db.content_results.aggregate([
+            {"$match": self._results_match(evaluation)},
+            {"$group": {"_id": "$student_id"}},
+            {"$count": "total"}
+        ], allowDiskUse=True))
+        return rows[0]["total"] if rows else 0
+
+    def _next_student_ids(self, evaluation: Dict, after: Any, has_after: bool) -> List[Any]:
+        pipeline: List[Dict] = [{"$match": self._results_match(evaluation)}]
+        if has_after:
+            # $expr compara con el orden BSON completo: student_id puede ser string u ObjectId
+            pipeline.append({"$match": {"$expr": {"$gt": ["$student_id", after]}}})
+        pipeline += [
+            {"$group": {"_id": "$student_id"}},
+            {"$sort": {"_id": 1}},
+            {"$limit": self.batch_size}
+        ]
+        return [row["_id"] for row in self.db.content_results.aggregate(pipeline, allowDiskUse=True)]
+
+    def _topic_scores(self, evaluation: Dict, student_ids: List[Any],
+                      score_policy: str) -> Dict[str, Dict[str, float]]:
+        accumulator = "$first" if score_policy == SCORE_POLICY_LATEST else "$max"
+        pipeline = [
+            {"$match": {**self._results_match(evaluation), "student_id": {"$in": student_ids}}},
+            {"$project": {"student_id": 1, "topic_id": 1, "created_at": 1, "score": NORMALIZED_SCORE_EXPR}},
+            {"$sort": {"student_id": 1, "topic_id": 1, "created_at": -1}},
+            {"$group": {
+                "_id": {"student_id": "$student_id", "topic_id": "$topic_id"},
+                "score": {accumulator: "$score"}
+            }}
+        ]
+        scores: Dict[str, Dict[str, float]] = {}
+        for row in self.db.content_results.aggregate(pipeline, allowDiskUse=True):
+            scores.setdefault(str(row["_id"]["student_id"]), {})[str(row["_id"]["topic_id"])] = row["score"]
+        return scores
+
+    def recalculate_batch(self, evaluation: Dict, resume_token: Optional[str] = None,
+                          score_policy: str = SCORE_POLICY_LATEST) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Recalcula y guarda las notas del siguiente lote de estudiantes.
+
+        Returns:
+            (resultados del lote [{student_id, final_score, topics_with_results}],
+             resume_token del siguiente lote o None si no quedan estudiantes)
+        """
+        if score_policy not in SCORE_POLICIES:
+            raise AppException(f"Política de nota inválida: {score_policy}", AppException.BAD_REQUEST)
+        cursor_values = decode_cursor(resume_token)
+        student_ids = self._next_student_ids(evaluation, cursor_values[0] if cursor_values else None,
+                                             bool(cursor_values))
+        if not student_ids:
+            return [], None
+
+        topic_ids = [str(tid) for tid in evaluation["topic_ids"]]
+        weights = resolve_topic_weights(evaluation)
+        scores_by_student = self._topic_scores(evaluation, student_ids, score_policy)
+        student_scores = [scores_by_student.get(str(sid), {}) for sid in student_ids]
+        final_scores = compute_weighted_grades(topic_ids, weights, student_scores)
+
+        now = datetime.now()
+        operations = []
+        results = []
+        for student_id, topic_scores, final_score in zip(student_ids, student_scores, final_scores.tolist()):
+            with_results = len([tid for tid in topic_ids if tid in topic_scores])
+            operations.append(UpdateOne(
+                {"evaluation_id": evaluation["_id"], "student_id": student_id},
+                {
+                    "$set": {
+                        "grade": final_score,
+                        "topic_scores": {tid: topic_scores.get(tid, 0) for tid in topic_ids},
+                        "ai_score": final_score,
+                        "ai_feedback": f"Calificación calculada automáticamente basada en {with_results} de {len(topic_ids)} temas.",
+                        "ai_corrected_at": now,
+                        "updated_at": now
+                    },
+                    "$setOnInsert": {
+                        "submission_type": "auto_calculated",
+                        "status": "auto_graded",
+                        "created_at": now
+                    }
+                },
+                upsert=True
+            ))
+            results.append({
+                "student_id": str(student_id),
+                "final_score": final_score,
+                "topics_with_results": with_results
+            })
+
+        self.db.evaluation_submissions.bulk_write(operations, ordered=False)
+        invalidate_evaluation_statistics(evaluation["_id"])
+
+        next_token = encode_cursor([student_ids[-1]]) if len(student_ids) == self.batch_size else None
+        return results, next_token
+
+    def recalculate(self, evaluation_id: str, score_policy: str = SCORE_POLICY_LATEST,
+                    resume_token: Optional[str] = None,
+                    time_budget_seconds: float = GRADE_RECALC_TIME_BUDGET_SECONDS) -> Dict[str, Any]:
+        """
+        Recalcula los estudiantes de una evaluación en la petición actual
+        (formato de recalculate_all_students_for_evaluation), lote a lote hasta
+        terminar o agotar el presupuesto de tiempo.
+
+        Returns:
+            Resumen con completed y resume_token (None al terminar) para
+            continuar el recálculo en otra llamada
+        """
+        evaluation = self.load_evaluation(evaluation_id)
+        results: List[Dict] = []
+        started = time.monotonic()
+        token = resume_token
+        while True:
+            batch, token = self.recalculate_batch(evaluation, token, score_policy)
+            results.extend(batch)
+            if token is None or time.monotonic() - started >= time_budget_seconds:
+                break
+        return {
+            "evaluation_id": str(evaluation_id),
+            "total_students": len(results),
+            "successful_updates": len(results),
+            "failed_updates": 0,
+            "results": results,
+            "completed": token is None,
+            "resume_token": token,
+            "recalculation_date": datetime.now()
+        }
+
+    def reweight_submissions(self, evaluation_id: str) -> int:
+        """
+        Recalcula grade/final_grade de las entregas que ya tienen topic_scores
+        con los pesos vigentes, en el servidor (un update_many con pipeline).
+
+        Returns:
+            Número de entregas modificadas
+        """
+        evaluation = self.load_evaluation(evaluation_id)
+        weights = resolve_topic_weights(evaluation)
+        weighted_sum = {"$add": [
+            {"$multiply": [{"$ifNull": [f"$topic_scores.{tid}", 0]}, weights.get(str(tid), 0.0)]}
+            for tid in evaluation["topic_ids"]
+        ]}
+        result = self.db.evaluation_submissions.update_many(
+            {"evaluation_id": evaluation["_id"], "topic_scores": {"$type": "object"}},
+            [{"$set": {
+                "grade": {"$round": [weighted_sum, 2]},
+                "final_grade": {"$round": [weighted_sum, 2]},
+                "updated_at": datetime.now()
+            }}]
+        )
+        invalidate_evaluation_statistics(evaluation["_id"])
+        return result.modified_count
+
+    # ------------------------------------------------------------------
+    # Modo job
+    # ------------------------------------------------------------------
+    @property
+    def jobs(self):
+        return self.db[GRADE_RECALC_JOBS_COLLECTION]
+
+    def start_job(self, evaluation_id: str, user_id: str = None,
+                  score_policy: str = SCORE_POLICY_LATEST) -> Dict[str, Any]:
+        """
+        Crea (o reinicia) el job de recálculo de la evaluación y lo encola.
+
+        Returns:
+            Estado del job (ver get_job)
+        """
+        if score_policy not in SCORE_POLICIES:
+            raise AppException(f"Política de nota inválida: {score_policy}", AppException.BAD_REQUEST)
+        evaluation = self.load_evaluation(evaluation_id)
+        now = datetime.now()
+        job = self.jobs.find_one_and_update(
+            {"evaluation_id": evaluation["_id"]},
+            {
+                "$set": {
+                    "status": JOB_PENDING,
+                    "score_policy": score_policy,
+                    "resume_token": None,
+                    "processed": 0,
+                    "total_students": self.count_students(evaluation),
+                    "error": None,
+                    "requested_by": user_id,
+                    "requested_at": now,
+                    "finished_at": None,
+                    "updated_at": now
+                },
+                "$inc": {"generation": 1},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        background_runner.submit(GRADE_RECALC_TASK, str(evaluation["_id"]), evaluation_id=str(evaluation["_id"]))
+        return self._serialize_job(job)
+
+    def get_job(self, evaluation_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del job de recálculo de la evaluación (None si nunca se lanzó)."""
+        if not ObjectId.is_valid(str(evaluation_id)):
+            raise AppException(f"ID de evaluación inválido: {evaluation_id}", AppException.BAD_REQUEST)
+        job = self.jobs.find_one({"evaluation_id": ObjectId(str(evaluation_id))})
+        return self._serialize_job(job) if job else None
+
+    def run_job(self, evaluation_id: str,
+                time_budget_seconds: float = GRADE_RECALC_TIME_BUDGET_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Procesa lotes del job desde su resume_token hasta terminar o agotar el
+        presupuesto de tiempo; en ese caso se vuelve a encolar y continúa después.
+        """
+        job = self.jobs.find_one({"evaluation_id": ObjectId(str(evaluation_id))})
+        if not job or job.get("status") not in (JOB_PENDING, JOB_RUNNING):
+            return self._serialize_job(job) if job else None
+
+        generation = job.get("generation")
+        job_filter = {"_id": job["_id"], "generation": generation}
+        try:
+            evaluation = self.load_evaluation(evaluation_id)
+        except AppException as e:
+            self.jobs.update_one(job_filter, {"$set": {"status": JOB_FAILED, "error": e.message,
+                                                       "finished_at": datetime.now(), "updated_at": datetime.now()}})
+            return self.get_job(evaluation_id)
+
+        self.jobs.update_one(job_filter, {"$set": {"status": JOB_RUNNING, "updated_at": datetime.now()}})
+        started = time.monotonic()
+        token = job.get("resume_token")
+        while True:
+            try:
+                batch, token = self.recalculate_batch(evaluation, token, job.get("score_policy", SCORE_POLICY_LATEST))
+            except Exception as e:
+                logging.error(f"Error en el recálculo de calificaciones de la evaluación {evaluation_id}: {e}")
+                self.jobs.update_one(job_filter, {"$set": {"status": JOB_FAILED, "error": str(e),
+                                                           "updated_at": datetime.now()}})
+                return self.get_job(evaluation_id)
+
+            update: Dict[str, Any] = {"$set": {"resume_token": token, "updated_at": datetime.now()},
+                                      "$inc": {"processed": len(batch)}}
+            if token is None:
+                update["$set"].update({"status": JOB_COMPLETED, "finished_at": datetime.now()})
+            if self.jobs.update_one(job_filter, update).matched_count == 0:
+                # El job se reinició (nueva generation): la ejecución encolada lo retoma
+                return self.get_job(evaluation_id)
+            if token is None:
+                return self.get_job(evaluation_id)
+            if time.monotonic() - started >= time_budget_seconds:
+                background_runner.submit(GRADE_RECALC_TASK, str(evaluation_id), evaluation_id=str(evaluation_id))
+                return self.get_job(evaluation_id)
+
+    @staticmethod
+    def _serialize_job(job: Dict) -> Dict[str, Any]:
+        total = job.get("total_students") or 0
+        processed = job.get("processed") or 0
+        return {
+            "job_id": str(job["_id"]),
+            "evaluation_id": str(job["evaluation_id"]),
+            "status": job.get("status"),
+            "score_policy": job.get("score_policy"),
+            "processed": processed,
+            "total_students": total,
+            "progress": round(min(processed / total, 1.0) * 100, 2) if total else (
+                100.0 if job.get("status") == JOB_COMPLETED else 0.0),
+            "resume_token": job.get("resume_token"),
+            "error": job.get("error"),
+            "requested_at": job.get("requested_at"),
+            "finished_at": job.get("finished_at"),
+            "updated_at": job.get("updated_at")
+        }
+
+
+def _run_grade_recalculation(evaluation_id: str) -> None:
+    grade_recalculator.run_job(
+        evaluation_id, time_budget_seconds=background_runner.remaining_seconds(GRADE_RECALC_TIME_BUDGET_SECONDS)
+    )
+
+
+grade_recalculator = WeightedGradeRecalculator()
+background_runner.register(GRADE_RECALC_TASK, _run_grade_recalculation, debounce_seconds=1)
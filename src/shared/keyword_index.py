@@ -0,0 +1,180 @@
+"""
+Índice invertido en proceso con ranking BM25.
+
+Cada documento se indexa como un conjunto de campos de texto con peso (por
+ejemplo título ×3, etiquetas ×2, descripción ×1): la frecuencia de un término
+es la suma de sus apariciones ponderadas. Las listas de postings se mantienen
+incrementalmente (upsert/remove por documento), de modo que una escritura
+solo toca los términos del documento afectado.
+
+El estado serializable (to_state/from_state) contiene solo las frecuencias por
+documento y su payload; los postings y las longitudes se reconstruyen al cargar.
+
+Ejemplo de uso:
+    from src.shared.keyword_index import BM25Index, tokenize
+
+    index = BM25Index()
+    index.upsert("r1", {"title": "Fotosíntesis"}, {"kind": "pdf"}, weights={"title": 3})
+    index.search(tokenize("fotosintesis en plantas"), limit=5)
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9ñ]{3,}")
+
+# Palabras vacías (sin tildes, tras normalizar)
+STOP_WORDS = frozenset([
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'a', 'de', 'del', 'en', 'con',
+    'por', 'para', 'es', 'son', 'al', 'e', 'u', 'que', 'se', 'su', 'sus', 'como', 'mas', 'pero',
+    'sin', 'sobre', 'entre', 'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'lo', 'le', 'les',
+    'the', 'and', 'for', 'with', 'http', 'https', 'www', 'com'
+])
+
+
+def normalize_text(text: Any) -> str:
+    """Minúsculas y sin tildes (la ñ se conserva)."""
+    if not isinstance(text, str):
+        text = " ".join(str(v) for v in text) if isinstance(text, (list, tuple)) else str(text or "")
+    text = text.lower().replace("ñ", "\x00")
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+    return text.replace("\x00", "ñ")
+
+
+def tokenize(text: Any) -> List[str]:
+    """Términos normalizados de al menos 3 caracteres, sin palabras vacías."""
+    return [token for token in TOKEN_PATTERN.findall(normalize_text(text)) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    Índice invertido término → {documento: frecuencia} con puntuación BM25.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self._total_len = 0.0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_terms
+
+    @staticmethod
+    def term_frequencies(fields: Dict[str, Any], weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Frecuencias ponderadas de los términos de los campos."""
+        frequencies: Counter = Counter()
+        for field, text in fields.items():
+            weight = (weights or {}).get(field, 1.0)
+            for token in tokenize(text):
+                frequencies[token] += weight
+        return dict(frequencies)
+
+    def upsert(self, doc_id: str, fields: Dict[str, Any], payload: Optional[Dict[str, Any]] = None,
+               weights: Optional[Dict[str, float]] = None) -> None:
+        """Indexa (o reindexa) un documento."""
+        self.upsert_terms(doc_id, self.term_frequencies(fields, weights), payload)
+
+    def upsert_terms(self, doc_id: str, terms: Dict[str, float], payload: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self._remove_locked(doc_id)
+            if not terms:
+                return
+            self._doc_terms[doc_id] = dict(terms)
+            self._payloads[doc_id] = dict(payload or {})
+            length = sum(terms.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = frequency
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str) -> bool:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        self._payloads.pop(doc_id, None)
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+        return True
+
+    def payload(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        payload = self._payloads.get(doc_id)
+        return dict(payload) if payload is not None else None
+
+    def idf(self, term: str) -> float:
+        """IDF de BM25 (siempre positivo); 0 si el término no está indexado."""
+        df = len(self._postings.get(term, ()))
+        if not df:
+            return 0.0
+        n = len(self._doc_terms)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query_terms: Iterable[str], limit: int = 10,
+               predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[str, float]]:
+        """
+        Documentos ordenados por puntuación BM25 descendente.
+
+        Args:
+            query_terms: Términos ya normalizados (ver tokenize); los repetidos cuentan una vez
+            limit: Máximo de resultados
+            predicate: Filtro opcional sobre el payload del documento
+
+        Returns:
+            Lista de (doc_id, puntuación) con puntuación > 0
+        """
+        with self._lock:
+            n = len(self._doc_terms)
+            if not n:
+                return []
+            avg_len = self._total_len / n if self._total_len else 1.0
+            scores: Dict[str, float] = {}
+            for term in set(query_terms):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = self.idf(term)
+                for doc_id, frequency in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            if predicate is not None:
+                scores = {doc_id: s for doc_id, s in scores.items() if predicate(self._payloads[doc_id])}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def to_state(self) -> Dict[str, Any]:
+        """Estado serializable en JSON."""
+        with self._lock:
+            return {
+                "k1": self.k1,
+                "b": self.b,
+                "documents": {
+                    doc_id: {"terms": terms, "payload": self._payloads.get(doc_id, {})}
+                    for doc_id, terms in self._doc_terms.items()
+                }
+            }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "BM25Index":
+        index = cls(k1=state.get("k1", 1.5), b=state.get("b", 0.75))
+        for doc_id, document in (state.get("documents") or {}).items():
+            index.upsert_terms(doc_id, document.get("terms") or {}, document.get("payload"))
+        return index
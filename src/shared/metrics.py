@@ -0,0 +1,65 @@
+"""
+Registro de métricas en proceso.
+
+Permite que cualquier servicio publique contadores simples o un proveedor
+(callable) que devuelva un diccionario con su estado actual (p. ej. las
+estadísticas de una caché). Las métricas se exponen vía GET /api/metrics.
+
+Ejemplo de uso:
+    from src.shared.metrics import increment, register_metrics_provider
+
+    increment("content_results.batch.inserted", 5)
+    register_metrics_provider("html_validation_cache", cache.stats)
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_providers: Dict[str, Callable[[], Dict]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Incrementa un contador con nombre."""
+    with _lock:
+        _counters[name] += value
+
+
+def register_metrics_provider(name: str, provider: Callable[[], Dict]) -> None:
+    """
+    Registra (o reemplaza) un proveedor de métricas.
+
+    Args:
+        name: Nombre con el que se expondrán las métricas
+        provider: Callable sin argumentos que devuelve un dict serializable
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def get_metrics_snapshot() -> Dict:
+    """
+    Devuelve una instantánea de todos los contadores y proveedores registrados.
+    Un proveedor que falle no impide reportar el resto.
+    """
+    with _lock:
+        counters = dict(_counters)
+        providers = dict(_providers)
+
+    snapshot = {"counters": counters, "providers": {}}
+    for name, provider in providers.items():
+        try:
+            snapshot["providers"][name] = provider()
+        except Exception as e:
+            logging.warning(f"Error obteniendo métricas de '{name}': {str(e)}")
+            snapshot["providers"][name] = {"error": str(e)}
+    return snapshot
+
+
+def reset_counters() -> None:
+    """Reinicia los contadores (útil en pruebas)."""
+    with _lock:
+        _counters.clear()
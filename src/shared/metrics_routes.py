@@ -0,0 +1,22 @@
+"""
+Metrics Routes - Exposición de métricas internas en proceso (cachés, contadores).
+"""
+
+from flask import Blueprint
+
+from src.shared.standardization import APIRoute
+from src.shared.constants import ROLES
+from src.shared.metrics import get_metrics_snapshot
+
+metrics_bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+
+@metrics_bp.route('', methods=['GET'])
+@APIRoute.standard(auth_required_flag=True, roles=[ROLES["ADMIN"]])
+def get_metrics():
+    """
+    Obtiene una instantánea de las métricas del proceso actual:
+    contadores y estadísticas de cachés (tamaño, aciertos, fallos, tasa de aciertos).
+    Las métricas son por proceso/worker y se reinician con el servidor.
+    """
+    return APIRoute.success(data=get_metrics_snapshot())
@@ -0,0 +1,170 @@
+"""
+Utilidades de paginación por cursor (keyset) para consultas MongoDB.
+
+A diferencia de skip/limit, la paginación keyset filtra a partir de la última
+fila entregada usando una clave de orden estable (por ejemplo ``(order, _id)``),
+por lo que el costo de cada página no crece con el desplazamiento.
+
+Ejemplo de uso:
+    cursor_values = decode_cursor(request.args.get('cursor'))
+    query.update(build_keyset_filter([("order", 1), ("_id", 1)], cursor_values))
+    docs = list(collection.find(query).sort([("order", 1), ("_id", 1)]).limit(limit + 1))
+    page, next_cursor = paginate_results(docs, [("order", 1), ("_id", 1)], limit)
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from src.shared.exceptions import AppException
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+_OID_MARKER = "$oid"
+_DATE_MARKER = "$date"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return {_OID_MARKER: str(value)}
+    if isinstance(value, datetime):
+        return {_DATE_MARKER: value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and _OID_MARKER in value:
+        return ObjectId(value[_OID_MARKER])
+    if isinstance(value, dict) and _DATE_MARKER in value:
+        return datetime.fromisoformat(value[_DATE_MARKER])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Codifica los valores de la clave de orden de la última fila en un cursor opaco.
+
+    Args:
+        values: Valores de la clave de orden (en el mismo orden que sort_spec)
+
+    Returns:
+        str: Cursor en base64 url-safe
+    """
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[List[Any]]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Args:
+        cursor: Cursor opaco recibido del cliente (o None)
+
+    Returns:
+        Lista de valores de la clave de orden o None si no hay cursor
+
+    Raises:
+        AppException: Si el cursor no es válido
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        if not isinstance(raw, list):
+            raise ValueError("cursor no es una lista")
+        return [_decode_value(v) for v in raw]
+    except Exception:
+        raise AppException("Cursor de paginación inválido", AppException.BAD_REQUEST)
+
+
+def parse_page_limit(raw_limit: Any, default: Optional[int] = DEFAULT_PAGE_LIMIT,
+                     maximum: int = MAX_PAGE_LIMIT) -> Optional[int]:
+    """
+    Normaliza el parámetro 'limit' de una petición dentro de [1, maximum].
+
+    Returns:
+        int o el valor por defecto (que puede ser None = sin paginar)
+
+    Raises:
+        AppException: Si el valor no es numérico
+    """
+    if raw_limit is None or raw_limit == "":
+        return default
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise AppException("Parámetro 'limit' inválido", AppException.BAD_REQUEST)
+    return min(max(limit, 1), maximum)
+
+
+def build_keyset_filter(sort_spec: Sequence[Tuple[str, int]],
+                        cursor_values: Optional[Sequence[Any]]) -> Dict:
+    """
+    Construye el filtro que selecciona las filas posteriores al cursor.
+
+    Para sort_spec [(a, 1), (b, 1)] y cursor [va, vb] produce
+    {"$or": [{a: {"$gt": va}}, {a: va, b: {"$gt": vb}}]}.
+
+    MongoDB ordena null (o campo ausente) antes que cualquier valor, y
+    $gt/$lt nunca coinciden con null: en orden ascendente, después de un null
+    va todo valor no nulo ($ne: None); en descendente, después de un valor van
+    también los null y después de un null no va nada.
+
+    Returns:
+        Dict: Filtro MongoDB (vacío si no hay cursor)
+    """
+    if not cursor_values:
+        return {}
+    if len(cursor_values) != len(sort_spec):
+        raise AppException("Cursor de paginación inválido", AppException.BAD_REQUEST)
+
+    clauses = []
+    for idx, (field, direction) in enumerate(sort_spec):
+        clause = {sort_spec[i][0]: cursor_values[i] for i in range(idx)}
+        value = cursor_values[idx]
+        if direction >= 0:
+            clause[field] = {"$ne": None} if value is None else {"$gt": value}
+        elif value is None:
+            continue
+        else:
+            clause["$or"] = [{field: {"$lt": value}}, {field: None}]
+        clauses.append(clause)
+    if not clauses:
+        # Cursor en el último null de un orden descendente: no quedan filas
+        return {"_id": {"$in": []}}
+    return {"$or": clauses} if len(clauses) > 1 else clauses[0]
+
+
+def merge_filters(query: Dict, extra: Dict) -> Dict:
+    """Combina dos filtros con $and sin pisar claves existentes."""
+    if not extra:
+        return query
+    if not query:
+        return extra
+    return {"$and": [query, extra]}
+
+
+def paginate_results(docs: List[Dict], sort_spec: Sequence[Tuple[str, int]],
+                     limit: Optional[int]) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Recorta una lista leída con limit + 1 y calcula el siguiente cursor.
+
+    Args:
+        docs: Documentos leídos con .limit(limit + 1)
+        sort_spec: Especificación de orden usada en la consulta
+        limit: Tamaño de página (None = sin paginar)
+
+    Returns:
+        Tupla (documentos de la página, next_cursor o None)
+    """
+    if not limit or len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    last = page[-1]
+    return page, encode_cursor([last.get(field) for field, _ in sort_spec])
@@ -60,6 +60,53 @@ def validate_object_id(id_str: str, entity_name: str = "objeto") -> None:
         log_error(f"ID inválido: {id_str} para {entity_name}")
         raise AppException(f"ID de {entity_name} inválido: {id_str}", AppException.BAD_REQUEST)
 
+def find_missing_references(collection, ids) -> list:
+    """
+    Comprueba que una lista de IDs existe en una colección.
+
+    Hace un único count_documents con $in; solo si faltan documentos se
+    consultan los _id existentes para identificar cuáles faltan.
+
+    Args:
+        collection: Colección de MongoDB donde deben existir los IDs
+        ids: IDs como string u ObjectId (los repetidos se comprueban una vez)
+
+    Returns:
+        list: IDs (string) que no existen o no son ObjectId válidos, en el orden recibido
+    """
+    return ReferenceValidator(collection).find_missing(ids)
+
+class ReferenceValidator:
+    """
+    Validador de referencias contra una colección que recuerda los IDs ya
+    confirmados. Con prefetch() se comprueban de una vez las referencias de un
+    lote (p. ej. todas las evaluaciones de /bulk/create) y cada elemento se
+    valida después sin nuevas consultas.
+    """
+
+    def __init__(self, collection, entity_name: str = "objeto"):
+        self.collection = collection
+        self.entity_name = entity_name
+        self._existing = set()
+
+    def prefetch(self, ids) -> list:
+        """Confirma un lote de IDs y retorna los que no existen."""
+        return self.find_missing(ids)
+
+    def find_missing(self, ids) -> list:
+        requested = list(dict.fromkeys(str(i) for i in (ids or [])))
+        missing = [i for i in requested if not is_valid_object_id(i)]
+        pending = [ObjectId(i) for i in requested if is_valid_object_id(i) and ObjectId(i) not in self._existing]
+        if pending:
+            if self.collection.count_documents({"_id": {"$in": pending}}) == len(pending):
+                self._existing.update(pending)
+            else:
+                found = {doc["_id"] for doc in self.collection.find({"_id": {"$in": pending}}, {"_id": 1})}
+                self._existing.update(found)
+                missing.extend(str(oid) for oid in pending if oid not in found)
+        missing = set(missing)
+        return [i for i in requested if i in missing]
+
 def validate_schema(data, schema):
     """
     Valida un objeto de datos contra un esquema
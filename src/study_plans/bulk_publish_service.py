@@ -0,0 +1,203 @@
+"""
+Publicación en bloque de los temas de un módulo o de un plan completo.
+
+TopicService.publish_topic verifica los requisitos tema por tema (varias
+consultas cada uno), y publicar un plan entero obligaba al profesor a decenas
+de llamadas secuenciales. BulkTopicPublisher evalúa los requisitos de todos los
+temas con consultas agrupadas (temas por $in, diapositivas narrative_ready y
+evaluaciones con una agregación cada una), publica los que cumplen en un único
+bulk_write y encola la sincronización de módulos virtuales una vez por módulo.
+
+Requisitos (los mismos de check_publish_prerequisites más la validez de
+theory_content de validate_theory_content_integrity):
+    - theory_content presente y válido
+    - al menos una diapositiva en estado 'narrative_ready'
+    - al menos una evaluación asociada
+
+Ejemplo de uso:
+    from src.study_plans.bulk_publish_service import BulkTopicPublisher
+
+    report = BulkTopicPublisher().publish(study_plan_id=plan_id)
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from src.shared.background_tasks import background_runner
+from src.shared.exceptions import AppException
+from src.study_plans.plan_tree_service import invalidate_study_plan_tree
+from src.study_plans.readiness_snapshot_service import aggregate_slide_status_counts, topics_with_evaluations
+
+MODULE_VIRTUAL_SYNC_TASK = "study_plans.module_virtual_sync"
+MODULE_VIRTUAL_SYNC_DEBOUNCE_SECONDS = 5
+
+# Valores de theory_content producidos por serializaciones erróneas del frontend
+INVALID_THEORY_VALUES = ('[object Object]', '[Object object]', 'undefined', 'null')
+
+BULK_PUBLISH_PUBLISHED = "published"
+BULK_PUBLISH_ALREADY_PUBLISHED = "already_published"
+BULK_PUBLISH_BLOCKED = "blocked"
+
+
+def _run_module_virtual_sync(module_id: str) -> None:
+    """Detecta cambios del módulo y encola las actualizaciones incrementales de sus módulos virtuales."""
+    from src.virtual.services import ContentChangeDetector
+
+    change_detector = ContentChangeDetector()
+    change_info = change_detector.detect_changes(module_id)
+    if change_info.get("has_changes"):
+        change_detector.schedule_incremental_updates(module_id, change_info)
+        logging.info(f"Cambios detectados en el módulo {module_id} tras publicación en bloque. Actualizaciones encoladas.")
+
+
+background_runner.register(MODULE_VIRTUAL_SYNC_TASK, _run_module_virtual_sync,
+                           debounce_seconds=MODULE_VIRTUAL_SYNC_DEBOUNCE_SECONDS)
+
+
+class BulkTopicPublisher:
+    """
+    Evalúa y publica en bloque los temas de un módulo o de un plan.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.shared.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def _resolve_module_ids(self, module_id: Optional[str], study_plan_id: Optional[str]) -> List[ObjectId]:
+        if bool(module_id) == bool(study_plan_id):
+            raise AppException("Debe indicar module_id o study_plan_id (solo uno)", AppException.BAD_REQUEST)
+        target_id = module_id or study_plan_id
+        if not ObjectId.is_valid(str(target_id)):
+            raise AppException(f"ID inválido: {target_id}", AppException.BAD_REQUEST)
+
+        if module_id:
+            module = self.db.modules.find_one({"_id": ObjectId(module_id)}, {"_id": 1})
+            if not module:
+                raise AppException("Módulo no encontrado", AppException.NOT_FOUND)
+            return [module["_id"]]
+
+        if not self.db.study_plans_per_subject.find_one({"_id": ObjectId(study_plan_id)}, {"_id": 1}):
+            raise AppException("Plan de estudio no encontrado", AppException.NOT_FOUND)
+        return [m["_id"] for m in self.db.modules.find({"study_plan_id": ObjectId(study_plan_id)}, {"_id": 1})]
+
+    @staticmethod
+    def evaluate_topic(topic: Dict, narrative_ready_slides: int, has_evaluation: bool) -> Dict[str, Any]:
+        """
+        Evalúa los requisitos de publicación de un tema con los datos ya cargados.
+        """
+        theory = topic.get("theory_content") or ""
+        theory = theory.strip() if isinstance(theory, str) else str(theory)
+        has_theory = bool(theory)
+
+        missing_requirements = []
+        if not has_theory:
+            missing_requirements.append("theory_content")
+        elif theory in INVALID_THEORY_VALUES:
+            missing_requirements.append("valid_theory_content")
+        if narrative_ready_slides <= 0:
+            missing_requirements.append("narrative_ready_slide")
+        if not has_evaluation:
+            missing_requirements.append("evaluation_quiz")
+
+        already_published = bool(topic.get("published", False))
+        if missing_requirements:
+            status = BULK_PUBLISH_BLOCKED
+        elif already_published:
+            status = BULK_PUBLISH_ALREADY_PUBLISHED
+        else:
+            status = BULK_PUBLISH_PUBLISHED
+
+        return {
+            "topic_id": str(topic["_id"]),
+            "module_id": str(topic.get("module_id")),
+            "name": topic.get("name"),
+            "status": status,
+            "meets_requirements": not missing_requirements,
+            "missing_requirements": missing_requirements,
+            "has_theory": has_theory,
+            "narrative_ready_slides": narrative_ready_slides,
+            "has_evaluation": has_evaluation,
+            "already_published": already_published
+        }
+
+    def publish(self, module_id: str = None, study_plan_id: str = None,
+                user_id: str = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Publica los temas de un módulo o plan que cumplen los requisitos.
+
+        Args:
+            module_id: Módulo a publicar (excluyente con study_plan_id)
+            study_plan_id: Plan cuyos módulos se publican
+            user_id: Usuario que realiza la acción (para logging)
+            dry_run: Si es True solo evalúa los requisitos, sin publicar
+
+        Returns:
+            Dict con el informe por tema (topics) y el resumen de la operación
+
+        Raises:
+            AppException: Si los IDs son inválidos o el módulo/plan no existe
+        """
+        module_oids = self._resolve_module_ids(module_id, study_plan_id)
+        topics = list(self.db.topics.find(
+            {"module_id": {"$in": module_oids}},
+            {"name": 1, "module_id": 1, "theory_content": 1, "published": 1}
+        )) if module_oids else []
+        topic_oids = [t["_id"] for t in topics]
+
+        slide_counts = aggregate_slide_status_counts(self.db, topic_oids)
+        evaluated_topics = topics_with_evaluations(self.db, topic_oids)
+
+        report = [
+            self.evaluate_topic(
+                topic,
+                slide_counts.get(str(topic["_id"]), {}).get("narrative_ready", 0),
+                str(topic["_id"]) in evaluated_topics
+            )
+            for topic in topics
+        ]
+
+        to_publish = [item for item in report if item["status"] == BULK_PUBLISH_PUBLISHED]
+        published_count = 0
+        synced_modules: List[str] = []
+        if to_publish and not dry_run:
+            now = datetime.now()
+            # published != True evita pisar publicaciones concurrentes
+            result = self.db.topics.bulk_write([
+                UpdateOne({"_id": ObjectId(item["topic_id"]), "published": {"$ne": True}},
+                          {"$set": {"published": True, "auto_published_at": now, "updated_at": now}})
+                for item in to_publish
+            ], ordered=False)
+            published_count = result.modified_count
+
+            synced_modules = sorted({item["module_id"] for item in to_publish})
+            invalidate_study_plan_tree(module_ids=synced_modules, db=self.db)
+            for synced_module_id in synced_modules:
+                try:
+                    background_runner.submit(MODULE_VIRTUAL_SYNC_TASK, synced_module_id, module_id=synced_module_id)
+                except Exception as e:
+                    logging.error(f"No se pudo encolar la sincronización del módulo {synced_module_id}: {e}")
+
+            logging.info(f"Publicación en bloque: {published_count} temas publicados en {len(synced_modules)} módulos" +
+                         (f" por usuario {user_id}" if user_id else ""))
+
+        return {
+            "module_id": module_id,
+            "study_plan_id": study_plan_id,
+            "dry_run": dry_run,
+            "total_topics": len(report),
+            "published": published_count,
+            "already_published": len([i for i in report if i["status"] == BULK_PUBLISH_ALREADY_PUBLISHED]),
+            "blocked": len([i for i in report if i["status"] == BULK_PUBLISH_BLOCKED]),
+            "virtual_sync_enqueued": synced_modules,
+            "topics": report
+        }
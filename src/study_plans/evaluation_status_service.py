@@ -0,0 +1,144 @@
+"""
+Estado de entregas de evaluaciones para uno o varios estudiantes.
+
+get_evaluations_status_for_student hacía un find_one en evaluation_submissions
+por evaluación, y las vistas de calificaciones del profesor lo repetían por
+estudiante (miles de consultas para una clase de 40). EvaluationStatusBatch
+obtiene todas las entregas de (estudiantes × evaluaciones) con una sola
+consulta $in y arma:
+    - statuses_for_student(): la lista histórica [{evaluation, submitted, ...}]
+    - matrix(): una matriz compacta estudiantes × evaluaciones para el profesor
+
+student_id se guarda como string (create_submission) o como ObjectId (modelo
+EvaluationSubmission, datos antiguos): la consulta incluye ambas formas. Si hay
+varias entregas para el mismo par se usa la más reciente.
+
+Ejemplo de uso:
+    from src.study_plans.evaluation_status_service import EvaluationStatusBatch
+
+    matrix = EvaluationStatusBatch(db).matrix(evaluations, student_ids)
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+
+SUBMISSION_STATUS_PROJECTION = {
+    "evaluation_id": 1, "student_id": 1, "status": 1, "grade": 1, "final_grade": 1,
+    "feedback": 1, "attempts": 1, "is_late": 1, "created_at": 1, "updated_at": 1
+}
+
+
+def _id_variants(values: Iterable[Any]) -> List[Any]:
+    """Cada ID como string y, si es válido, también como ObjectId."""
+    variants: List[Any] = []
+    for value in values:
+        text = str(value)
+        variants.append(text)
+        if ObjectId.is_valid(text):
+            variants.append(ObjectId(text))
+    return variants
+
+
+def _submission_time(submission: Dict) -> datetime:
+    return submission.get("updated_at") or submission.get("created_at") or datetime.min
+
+
+class EvaluationStatusBatch:
+    """
+    Carga en lote las entregas de un conjunto de estudiantes y evaluaciones.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def load_submissions(self, evaluation_ids: Iterable[Any],
+                         student_ids: Iterable[Any]) -> Dict[Tuple[str, str], Dict]:
+        """
+        Entrega más reciente por (evaluation_id, student_id), ambos como string.
+        """
+        evaluation_oids = [ObjectId(str(eid)) for eid in evaluation_ids if ObjectId.is_valid(str(eid))]
+        student_variants = _id_variants(student_ids)
+        if not evaluation_oids or not student_variants:
+            return {}
+
+        latest: Dict[Tuple[str, str], Dict] = {}
+        for submission in self.db.evaluation_submissions.find(
+            {"evaluation_id": {"$in": evaluation_oids}, "student_id": {"$in": student_variants}},
+            SUBMISSION_STATUS_PROJECTION
+        ):
+            key = (str(submission["evaluation_id"]), str(submission["student_id"]))
+            current = latest.get(key)
+            if current is None or _submission_time(submission) >= _submission_time(current):
+                latest[key] = submission
+        return latest
+
+    def statuses_for_student(self, evaluations: List[Dict], student_id: str) -> List[Dict]:
+        """
+        Estado de cada evaluación para un estudiante (formato de
+        get_evaluations_status_for_student).
+        """
+        submissions = self.load_submissions([ev["_id"] for ev in evaluations], [student_id])
+        results = []
+        for ev in evaluations:
+            submission = submissions.get((str(ev["_id"]), str(student_id)))
+            results.append({
+                "evaluation": ev,
+                "submitted": submission is not None,
+                "submitted_at": submission.get("updated_at") if submission else None,
+                "grade": submission.get("grade") if submission else None,
+                "feedback": submission.get("feedback") if submission else None
+            })
+        return results
+
+    @staticmethod
+    def _cell(submission: Optional[Dict]) -> Optional[Dict]:
+        if submission is None:
+            return None
+        grade = submission.get("final_grade")
+        return {
+            "status": submission.get("status") or "submitted",
+            "grade": grade if grade is not None else submission.get("grade"),
+            "submitted_at": submission.get("updated_at") or submission.get("created_at"),
+            "attempts": submission.get("attempts", 1),
+            "is_late": bool(submission.get("is_late", False))
+        }
+
+    def matrix(self, evaluations: List[Dict], student_ids: List[str]) -> Dict[str, Any]:
+        """
+        Matriz compacta estudiantes × evaluaciones.
+
+        Returns:
+            Dict con:
+            - evaluations: [{id, title, weight, due_date}] (orden de las columnas)
+            - student_ids: IDs de estudiante (orden de las filas)
+            - cells: filas alineadas con evaluations; None si no hay entrega
+            - summary: por estudiante, entregas y promedio de notas calificadas
+        """
+        evaluation_ids = [str(ev["_id"]) for ev in evaluations]
+        student_ids = list(dict.fromkeys(str(sid) for sid in student_ids))
+        submissions = self.load_submissions(evaluation_ids, student_ids)
+
+        cells = []
+        summary = []
+        for student_id in student_ids:
+            row = [self._cell(submissions.get((evaluation_id, student_id))) for evaluation_id in evaluation_ids]
+            grades = [cell["grade"] for cell in row if cell and isinstance(cell["grade"], (int, float))]
+            cells.append(row)
+            summary.append({
+                "submitted": len([cell for cell in row if cell]),
+                "pending": len([cell for cell in row if not cell]),
+                "average_grade": round(sum(grades) / len(grades), 2) if grades else None
+            })
+
+        return {
+            "evaluations": [
+                {"id": str(ev["_id"]), "title": ev.get("title"), "weight": ev.get("weight"),
+                 "due_date": ev.get("due_date")}
+                for ev in evaluations
+            ],
+            "student_ids": student_ids,
+            "cells": cells,
+            "summary": summary
+        }
@@ -0,0 +1,201 @@
+"""
+Carga del árbol plan → módulos → temas → evaluaciones.
+
+get_study_plan consultaba los temas y las evaluaciones módulo por módulo (dos
+consultas por módulo). StudyPlanTreeLoader construye el árbol completo con tres
+consultas $in (módulos del plan, temas de esos módulos y evaluaciones de esos
+temas) más la lectura del plan, y lo agrupa en memoria.
+
+Perfiles de proyección:
+    - "full": documentos completos (respuesta histórica de get_study_plan)
+    - "outline": solo los campos necesarios para navegar el plan (sin
+      theory_content, rúbricas ni criterios)
+
+El árbol se cachea por plan en una VersionedCache con ámbito "plan:<id>". Las
+escrituras de planes, módulos, temas y evaluaciones llaman a
+invalidate_study_plan_tree() con los IDs que conocen; la función resuelve a qué
+planes pertenecen y los invalida.
+
+Ejemplo de uso:
+    from src.study_plans.plan_tree_service import StudyPlanTreeLoader
+
+    plan = StudyPlanTreeLoader().load(plan_id, profile="outline")
+"""
+
+import copy
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+
+from src.shared.cache import VersionedCache
+
+PLAN_TREE_CACHE_TTL_SECONDS = 60
+PLAN_TREE_CACHE_SIZE = 256
+PLAN_TREE_PROFILE_FULL = "full"
+PLAN_TREE_PROFILE_OUTLINE = "outline"
+
+# Proyecciones por perfil (None = documento completo)
+PLAN_TREE_PROFILES: Dict[str, Dict[str, Optional[Dict]]] = {
+    PLAN_TREE_PROFILE_FULL: {"modules": None, "topics": None, "evaluations": None},
+    PLAN_TREE_PROFILE_OUTLINE: {
+        "modules": {"study_plan_id": 1, "name": 1, "date_start": 1, "date_end": 1, "created_at": 1,
+                    "updated_at": 1, "content_completeness_score": 1},
+        "topics": {"module_id": 1, "name": 1, "difficulty": 1, "date_start": 1, "date_end": 1,
+                   "created_at": 1, "updated_at": 1, "published": 1},
+        "evaluations": {"topic_ids": 1, "module_id": 1, "title": 1, "weight": 1, "due_date": 1,
+                        "evaluation_type": 1},
+    },
+}
+
+_plan_tree_cache = VersionedCache("study_plan_tree", ttl_seconds=PLAN_TREE_CACHE_TTL_SECONDS,
+                                  max_size=PLAN_TREE_CACHE_SIZE)
+
+
+def _plan_scope(plan_id: Any) -> str:
+    return f"plan:{plan_id}"
+
+
+def _object_ids(values: Iterable[Any]) -> List[ObjectId]:
+    result = []
+    for value in values:
+        if isinstance(value, ObjectId):
+            result.append(value)
+        elif value and ObjectId.is_valid(str(value)):
+            result.append(ObjectId(str(value)))
+    return result
+
+
+def _fill_dates(document: Dict) -> None:
+    """Rellena date_start y date_end si faltan (registros antiguos)."""
+    if document.get('date_start') is None:
+        document['date_start'] = document.get('created_at')
+    if document.get('date_end') is None:
+        document['date_end'] = document.get('created_at')
+
+
+def invalidate_study_plan_tree(plan_ids: Iterable[Any] = (), module_ids: Iterable[Any] = (),
+                               topic_ids: Iterable[Any] = (), db=None) -> None:
+    """
+    Invalida el árbol cacheado de los planes afectados por una escritura.
+
+    Args:
+        plan_ids: Planes conocidos por el llamador
+        module_ids: Módulos escritos (se resuelve su plan con una consulta)
+        topic_ids: Temas escritos o referenciados por una evaluación
+            (se resuelve su módulo y luego su plan)
+        db: Base de datos (por defecto get_db())
+    """
+    try:
+        plans = set(str(pid) for pid in plan_ids if pid)
+        module_oids = set(_object_ids(module_ids))
+        topic_oids = _object_ids(topic_ids)
+        if topic_oids or module_oids:
+            if db is None:
+                from src.shared.database import get_db
+                db = get_db()
+            if topic_oids:
+                for topic in db.topics.find({"_id": {"$in": topic_oids}}, {"module_id": 1}):
+                    module_oids.update(_object_ids([topic.get("module_id")]))
+            if module_oids:
+                for module in db.modules.find({"_id": {"$in": list(module_oids)}}, {"study_plan_id": 1}):
+                    if module.get("study_plan_id"):
+                        plans.add(str(module["study_plan_id"]))
+        for plan_id in plans:
+            _plan_tree_cache.bump_version(_plan_scope(plan_id))
+    except Exception as e:
+        logging.warning(f"No se pudo invalidar el árbol de planes de estudio: {e}")
+
+
+class StudyPlanTreeLoader:
+    """
+    Construye el árbol de un plan de estudios con tres consultas $in.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.shared.database import get_db
+            self._db = get_db()
+        return self._db
+
+    def load(self, plan_id: str, profile: str = PLAN_TREE_PROFILE_FULL) -> Optional[Dict]:
+        """
+        Árbol plan → módulos (con topics y evaluations) con los IDs como strings.
+
+        Args:
+            plan_id: ID del plan de estudios
+            profile: "full" u "outline"
+
+        Returns:
+            Dict del plan con la clave "modules", o None si no existe
+
+        Raises:
+            ValueError: Si el perfil no existe
+        """
+        if profile not in PLAN_TREE_PROFILES:
+            raise ValueError(f"Perfil de proyección inválido: {profile}")
+        scope = _plan_scope(plan_id)
+        hit, tree, version = _plan_tree_cache.get_with_version(scope, profile)
+        if hit:
+            return copy.deepcopy(tree)
+
+        tree = self._build_tree(plan_id, PLAN_TREE_PROFILES[profile])
+        if tree is not None:
+            _plan_tree_cache.set(scope, copy.deepcopy(tree), profile, version=version)
+        return tree
+
+    def _build_tree(self, plan_id: str, projections: Dict[str, Optional[Dict]]) -> Optional[Dict]:
+        plan_oid = ObjectId(plan_id)
+        plan = self.db.study_plans_per_subject.find_one({"_id": plan_oid})
+        if not plan:
+            return None
+
+        # Convertir _id a string para que sea JSON serializable
+        plan["_id"] = str(plan["_id"])
+        for field in ("author_id", "workspace_id", "institute_id"):
+            if isinstance(plan.get(field), ObjectId):
+                plan[field] = str(plan[field])
+
+        modules = list(self.db.modules.find({"study_plan_id": plan_oid}, projections["modules"]))
+        module_oids = [module["_id"] for module in modules]
+
+        topics_by_module: Dict[str, List[Dict]] = {str(oid): [] for oid in module_oids}
+        module_by_topic: Dict[ObjectId, str] = {}
+        if module_oids:
+            for topic in self.db.topics.find({"module_id": {"$in": module_oids}}, projections["topics"]):
+                module_key = str(topic["module_id"])
+                module_by_topic[topic["_id"]] = module_key
+                topic["_id"] = str(topic["_id"])
+                topic["module_id"] = module_key
+                _fill_dates(topic)
+                topics_by_module.setdefault(module_key, []).append(topic)
+
+        # Una evaluación aparece en cada módulo que contiene alguno de sus temas, una vez por módulo
+        evaluations_by_module: Dict[str, Dict[str, Dict]] = {key: {} for key in topics_by_module}
+        if module_by_topic:
+            for evaluation in self.db.evaluations.find(
+                {"topic_ids": {"$in": list(module_by_topic)}}, projections["evaluations"]
+            ):
+                evaluation_modules = {
+                    module_by_topic[tid] for tid in evaluation.get("topic_ids", []) if tid in module_by_topic
+                }
+                evaluation["_id"] = str(evaluation["_id"])
+                evaluation["topic_ids"] = [str(tid) for tid in evaluation.get("topic_ids", [])]
+                for module_key in evaluation_modules:
+                    evaluations_by_module[module_key].setdefault(evaluation["_id"], evaluation)
+
+        for module in modules:
+            module_key = str(module["_id"])
+            module["_id"] = module_key
+            if "study_plan_id" in module:
+                module["study_plan_id"] = str(module["study_plan_id"])
+            _fill_dates(module)
+            module["topics"] = topics_by_module.get(module_key, [])
+            module["evaluations"] = list(evaluations_by_module.get(module_key, {}).values())
+
+        plan["modules"] = modules
+        return plan
@@ -0,0 +1,181 @@
+"""
+Conteo de diapositivas por (tema, estado) para los informes de completitud y
+preparación para virtualización de un módulo.
+
+Los conteos se obtienen con una sola agregación $group y se persisten en una
+instantánea por módulo: {_id: module_id, topics: {<topic_id>: {estado: n}},
+write_seqs: {<topic_id>: n}, built_at, updated_at}. La UI del profesor (que
+pide la preparación de todos los módulos al cargar el plan) no recorre las
+diapositivas en cada llamada.
+
+El refresco es perezoso: cada escritura de contenidos de un tema ya incrementa
+su write_seq en topic_content_sequences (invalidate_topic_sequence). Al leer,
+los temas cuyo write_seq difiere del guardado en la instantánea (o sin entrada,
+p. ej. un tema recién movido al módulo) se recuentan con una sola agregación,
+sin coste en el camino de escritura. La instantánea completa se reconstruye si
+no existe o supera SNAPSHOT_MAX_AGE_SECONDS, lo que acota los cambios hechos
+sin pasar por los servicios (scripts, migraciones).
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Set
+
+from bson import ObjectId
+from pymongo.database import Database
+
+from src.content.structured_sequence_service import SEQUENCES_COLLECTION
+
+READINESS_SNAPSHOTS_COLLECTION = "module_readiness_snapshots"
+SNAPSHOT_MAX_AGE_SECONDS = 3600
+
+SLIDE_STATUS_DEFAULT = "draft"
+
+
+def aggregate_slide_status_counts(db: Database, topic_ids: Iterable[ObjectId]) -> Dict[str, Dict[str, int]]:
+    """
+    Cuenta las diapositivas no eliminadas de los temas agrupando por (tema, estado).
+
+    Returns:
+        Dict {topic_id: {estado: cantidad}}; los temas sin diapositivas no aparecen
+    """
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return {}
+
+    pipeline = [
+        {"$match": {
+            "topic_id": {"$in": topic_ids},
+            "content_type": "slide",
+            "status": {"$ne": "deleted"}
+        }},
+        {"$group": {
+            "_id": {"topic_id": "$topic_id", "status": {"$ifNull": ["$status", SLIDE_STATUS_DEFAULT]}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    counts: Dict[str, Dict[str, int]] = {}
+    for row in db.topic_contents.aggregate(pipeline):
+        topic_counts = counts.setdefault(str(row["_id"]["topic_id"]), {})
+        topic_counts[row["_id"]["status"]] = row["count"]
+    return counts
+
+
+def topics_with_evaluations(db: Database, topic_ids: Iterable[ObjectId]) -> Set[str]:
+    """IDs (str) de los temas que tienen al menos una evaluación, con una agregación."""
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return set()
+    pipeline = [
+        {"$match": {"topic_ids": {"$in": topic_ids}}},
+        {"$unwind": "$topic_ids"},
+        {"$match": {"topic_ids": {"$in": topic_ids}}},
+        {"$group": {"_id": "$topic_ids"}}
+    ]
+    return {str(row["_id"]) for row in db.evaluations.aggregate(pipeline)}
+
+
+def topic_write_seqs(db: Database, topic_ids: Iterable[ObjectId]) -> Dict[str, int]:
+    """write_seq vigente de cada tema (0 si nunca se escribió), con una consulta $in."""
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return {}
+    seqs = {str(tid): 0 for tid in topic_ids}
+    for doc in db[SEQUENCES_COLLECTION].find({"_id": {"$in": topic_ids}}, {"write_seq": 1}):
+        seqs[str(doc["_id"])] = int(doc.get("write_seq") or 0)
+    return seqs
+
+
+def invalidate_topic_readiness(topic_id: Any, module_ids: Iterable[Any], db: Database = None) -> None:
+    """
+    Descarta la entrada de un tema en las instantáneas de los módulos indicados
+    (p. ej. el módulo anterior y el nuevo cuando cambia su module_id).
+    """
+    if not topic_id or not ObjectId.is_valid(str(topic_id)):
+        return
+    module_oids = list({ObjectId(str(mid)) for mid in module_ids if mid and ObjectId.is_valid(str(mid))})
+    if not module_oids:
+        return
+    try:
+        if db is None:
+            from src.shared.database import get_db
+            db = get_db()
+        db[READINESS_SNAPSHOTS_COLLECTION].update_many(
+            {"_id": {"$in": module_oids}},
+            {"$unset": {f"topics.{topic_id}": "", f"write_seqs.{topic_id}": ""}}
+        )
+    except Exception as e:
+        logging.warning(f"No se pudo invalidar la preparación del tema {topic_id}: {str(e)}")
+
+
+class ModuleReadinessSnapshot:
+    """
+    Lee (y reconstruye cuando hace falta) la instantánea de conteos de
+    diapositivas de un módulo.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.collection = db[READINESS_SNAPSHOTS_COLLECTION]
+
+    def _is_fresh(self, snapshot: Dict) -> bool:
+        built_at = snapshot.get("built_at") if snapshot else None
+        if not isinstance(built_at, datetime):
+            return False
+        return datetime.now() - built_at < timedelta(seconds=SNAPSHOT_MAX_AGE_SECONDS)
+
+    def get_slide_counts(self, module_id: Any, topic_ids: List[ObjectId]) -> Dict[str, Dict[str, int]]:
+        """
+        Conteos por tema y estado de las diapositivas del módulo.
+
+        Args:
+            module_id: ID del módulo
+            topic_ids: Temas actuales del módulo (las entradas de temas que ya
+                no pertenecen al módulo se ignoran)
+
+        Returns:
+            Dict {topic_id: {estado: cantidad}} con una entrada por tema de topic_ids
+        """
+        module_oid = ObjectId(str(module_id))
+        snapshot = self.collection.find_one({"_id": module_oid})
+        if self._is_fresh(snapshot):
+            stored = dict(snapshot.get("topics") or {})
+            stored.update(self._refresh_stale_topics(module_oid, topic_ids, snapshot.get("write_seqs") or {}))
+        else:
+            stored = self.rebuild(module_oid, topic_ids)
+        return {str(tid): dict(stored.get(str(tid)) or {}) for tid in topic_ids}
+
+    def _refresh_stale_topics(self, module_id: ObjectId, topic_ids: List[ObjectId],
+                              seen_seqs: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        """Recuenta los temas escritos desde que se guardó su entrada."""
+        current_seqs = topic_write_seqs(self.db, topic_ids)
+        stale = [tid for tid in topic_ids if seen_seqs.get(str(tid)) != current_seqs[str(tid)]]
+        if not stale:
+            return {}
+        counts = aggregate_slide_status_counts(self.db, stale)
+        refreshed = {str(tid): counts.get(str(tid), {}) for tid in stale}
+        update = {"updated_at": datetime.now()}
+        for tid, topic_counts in refreshed.items():
+            update[f"topics.{tid}"] = topic_counts
+            update[f"write_seqs.{tid}"] = current_seqs[tid]
+        try:
+            self.collection.update_one({"_id": module_id}, {"$set": update})
+        except Exception as e:
+            logging.warning(f"No se pudo actualizar la instantánea de preparación del módulo {module_id}: {str(e)}")
+        return refreshed
+
+    def rebuild(self, module_id: Any, topic_ids: List[ObjectId]) -> Dict[str, Dict[str, int]]:
+        """Recalcula la instantánea completa del módulo con una agregación."""
+        # Leer write_seq antes de contar: una escritura intermedia deja el tema pendiente
+        write_seqs = topic_write_seqs(self.db, topic_ids)
+        counts = aggregate_slide_status_counts(self.db, topic_ids)
+        now = datetime.now()
+        try:
+            self.collection.update_one(
+                {"_id": ObjectId(str(module_id))},
+                {"$set": {"topics": counts, "write_seqs": write_seqs, "built_at": now, "updated_at": now}},
+                upsert=True
+            )
+        except Exception as e:
+            logging.warning(f"No se pudo guardar la instantánea de preparación del módulo {module_id}: {str(e)}")
+        return counts
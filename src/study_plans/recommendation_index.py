@@ -0,0 +1,452 @@
+"""
+Índice de palabras clave en proceso para ContentRecommendationService.
+
+Las recomendaciones de PDFs, recursos web y diagramas se resolvían con
+búsquedas $regex sobre `resources` y `topic_contents` en cada llamada. Este
+módulo mantiene un índice invertido BM25 (src/shared/keyword_index.py) de:
+    - recursos PDF y web (título/nombre ×3, etiquetas ×2, descripción y URL ×1)
+    - diagramas de topic_contents (título ×3, contenido y descripción ×1)
+y las recomendaciones pasan a ser una búsqueda en el índice más una consulta
+$in de los pocos documentos devueltos.
+
+Mantenimiento incremental:
+    - ResourceService llama a upsert_resource()/remove_resource() en cada
+      escritura; el índice local se actualiza al instante y se incrementa el
+      sello compartido `recommendations:index:version`.
+    - Cada RECOMMENDATION_INDEX_CATCH_UP_SECONDS, o cuando cambia el sello, se
+      reindexan los recursos y diagramas con updated_at/created_at posterior a
+      la última sincronización (cubre las demás instancias y los diagramas).
+    - Los recursos borrados se retiran del índice al no encontrarse en la
+      consulta $in de resultados.
+
+Arranque en caliente: el estado del índice se persiste comprimido (tarea en
+segundo plano con debounce) en la colección `recommendation_index_snapshots`,
+o en el archivo RECOMMENDATION_INDEX_PATH si está definido; al arrancar se
+carga la instantánea y solo se sincroniza lo posterior a ella.
+
+Arranque en frío: sin instantánea, el índice se construye por tramos de
+RECOMMENDATION_INDEX_COLD_BUILD_BATCH documentos en orden de _id, uno por
+consulta, y cada tramo se persiste de forma síncrona junto con su cursor. Entre
+tramos pasan al menos RECOMMENDATION_INDEX_COLD_BUILD_INTERVAL_SECONDS, de modo
+que una petición (que consulta el índice varias veces) avanza como mucho un
+tramo. Así ninguna petición recorre el corpus completo y el avance sobrevive a instancias
+efímeras (Vercel): la siguiente instancia carga la instantánea y continúa el
+tramo pendiente. Mientras la construcción no termina, las búsquedas usan el
+índice parcial.
+
+Ejemplo de uso:
+    from src.study_plans.recommendation_index import content_recommendation_index, KIND_PDF
+
+    ranked = content_recommendation_index.search(["fotosintesis"], KIND_PDF, limit=5)
+    pdfs = content_recommendation_index.fetch_ranked(ranked)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import Binary, ObjectId
+
+from src.shared.background_tasks import background_runner
+from src.shared.cache import get_shared_cache_backend
+from src.shared.keyword_index import BM25Index
+from src.shared.metrics import increment, register_metrics_provider
+
+RECOMMENDATION_INDEX_COLLECTION = "recommendation_index_snapshots"
+RECOMMENDATION_INDEX_ID = "content_recommendations"
+INDEX_VERSION_KEY = "recommendations:index:version"
+INDEX_PERSIST_TASK = "study_plans.recommendation_index_persist"
+INDEX_PERSIST_DEBOUNCE_SECONDS = 30
+DEFAULT_CATCH_UP_SECONDS = 30
+VERSION_CHECK_SECONDS = 2
+# Margen para escrituras concurrentes con la sincronización y relojes desfasados
+CATCH_UP_OVERLAP_SECONDS = 5
+# Límite de documento de MongoDB (16 MB) con margen
+MAX_SNAPSHOT_BYTES = 15 * 1024 * 1024
+SNAPSHOT_FORMAT_VERSION = 1
+DEFAULT_COLD_BUILD_BATCH = 2000
+DEFAULT_COLD_BUILD_INTERVAL_SECONDS = 1.0
+BUILD_DONE = "done"
+
+KIND_PDF = "pdf"
+KIND_WEB = "web"
+KIND_DIAGRAM = "diagram"
+
+RESOURCE_FIELD_WEIGHTS = {"title": 3, "tags": 2, "description": 1, "url": 1}
+DIAGRAM_FIELD_WEIGHTS = {"title": 3, "description": 1, "content": 1}
+
+_RESOURCE_PROJECTION = {"title": 1, "name": 1, "tags": 1, "description": 1, "url": 1, "status": 1,
+                        "type": 1, "resource_type": 1, "file_type": 1, "content_type": 1}
+_DIAGRAM_PROJECTION = {"title": 1, "description": 1, "content": 1, "status": 1, "content_type": 1}
+
+
+def resource_kind(resource: Dict) -> Optional[str]:
+    """KIND_PDF, KIND_WEB o None según los campos de tipo del recurso (modelo actual y legados)."""
+    values = {str(resource.get(field) or "").lower()
+              for field in ("type", "resource_type", "file_type", "content_type")}
+    if "pdf" in values:
+        return KIND_PDF
+    if values & {"link", "web", "external_link"}:
+        return KIND_WEB
+    return None
+
+
+def _doc_key(collection: str, document_id: Any) -> str:
+    return f"{collection}:{document_id}"
+
+
+class ContentRecommendationIndex:
+    """
+    Índice BM25 de recursos y diagramas con sincronización incremental.
+    """
+
+    def __init__(self, db=None, backend=None, snapshot_path: Optional[str] = None,
+                 catch_up_seconds: Optional[float] = None, version_check_seconds: float = VERSION_CHECK_SECONDS,
+                 register_metrics: bool = True, cold_build_batch: Optional[int] = None,
+                 cold_build_interval_seconds: Optional[float] = None):
+        """
+        Args:
+            db: Base de datos (por defecto get_db(), diferida)
+            backend: Backend compartido del sello de versión (por defecto get_shared_cache_backend())
+            snapshot_path: Archivo de la instantánea (por defecto RECOMMENDATION_INDEX_PATH o Mongo)
+            catch_up_seconds: Intervalo máximo entre sincronizaciones incrementales
+            cold_build_batch: Documentos indexados por consulta durante el arranque en frío
+            cold_build_interval_seconds: Tiempo mínimo entre tramos del arranque en frío
+        """
+        self._db = db
+        self._backend = backend
+        self.snapshot_path = snapshot_path if snapshot_path is not None else os.getenv("RECOMMENDATION_INDEX_PATH")
+        if catch_up_seconds is None:
+            catch_up_seconds = float(os.getenv("RECOMMENDATION_INDEX_CATCH_UP_SECONDS", DEFAULT_CATCH_UP_SECONDS))
+        self.catch_up_seconds = catch_up_seconds
+        self.version_check_seconds = version_check_seconds
+        if cold_build_batch is None:
+            cold_build_batch = int(os.getenv("RECOMMENDATION_INDEX_COLD_BUILD_BATCH", DEFAULT_COLD_BUILD_BATCH))
+        self.cold_build_batch = max(1, cold_build_batch)
+        if cold_build_interval_seconds is None:
+            cold_build_interval_seconds = float(os.getenv("RECOMMENDATION_INDEX_COLD_BUILD_INTERVAL_SECONDS",
+                                                          DEFAULT_COLD_BUILD_INTERVAL_SECONDS))
+        self.cold_build_interval_seconds = cold_build_interval_seconds
+        self._lock = threading.RLock()
+        self._index: Optional[BM25Index] = None
+        self._synced_at: Optional[datetime] = None
+        # Último _id indexado por colección durante el arranque en frío (None = construido)
+        self._build_cursor: Optional[Dict[str, str]] = None
+        self._last_slice_at = 0.0
+        self._caught_up_at = 0.0
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+        self._stats = {"full_builds": 0, "warm_starts": 0, "catch_ups": 0, "searches": 0, "pruned": 0}
+        if register_metrics:
+            register_metrics_provider("content_recommendation_index", self.stats)
+
+    @property
+    def db(self):
+        if self._db is None:
+            from src.shared.database import get_db
+            self._db = get_db()
+        return self._db
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else get_shared_cache_backend()
+
+    def _read_version(self) -> Optional[int]:
+        try:
+            return self.backend.get_counter(INDEX_VERSION_KEY)
+        except Exception as e:
+            logging.debug(f"ContentRecommendationIndex: no se pudo leer el sello de versión: {e}")
+            return None
+
+    def _bump_version(self) -> None:
+        try:
+            self._version = self.backend.incr(INDEX_VERSION_KEY)
+        except Exception as e:
+            logging.debug(f"ContentRecommendationIndex: no se pudo incrementar el sello de versión: {e}")
+
+    # ---- Indexación ----
+
+    def _index_resource_locked(self, resource: Dict) -> bool:
+        key = _doc_key("resources", resource["_id"])
+        kind = resource_kind(resource)
+        if kind is None or resource.get("status") == "deleted":
+            return self._index.remove(key)
+        fields = {
+            "title": resource.get("title") or resource.get("name") or "",
+            "tags": resource.get("tags") or [],
+            "description": resource.get("description") or "",
+            "url": resource.get("url") or ""
+        }
+        self._index.upsert(key, fields, {"kind": kind}, weights=RESOURCE_FIELD_WEIGHTS)
+        return True
+
+    def _index_diagram_locked(self, content: Dict) -> bool:
+        key = _doc_key("topic_contents", content["_id"])
+        if content.get("content_type") != KIND_DIAGRAM or content.get("status") == "deleted":
+            return self._index.remove(key)
+        body = content.get("content")
+        title = content.get("title") or (body.get("title") if isinstance(body, dict) else "") or ""
+        fields = {"title": title, "description": content.get("description") or "", "content": str(body or "")}
+        self._index.upsert(key, fields, {"kind": KIND_DIAGRAM}, weights=DIAGRAM_FIELD_WEIGHTS)
+        return True
+
+    def _sync_locked(self, since: Optional[datetime]) -> int:
+        """Indexa recursos y diagramas (todos, o los modificados desde `since`)."""
+        started_at = datetime.now()
+        changed_filter = {}
+        if since is not None:
+            since = since - timedelta(seconds=CATCH_UP_OVERLAP_SECONDS)
+            changed_filter = {"$or": [{"updated_at": {"$gte": since}}, {"created_at": {"$gte": since}}]}
+
+        changed = 0
+        for resource in self.db.resources.find(changed_filter, _RESOURCE_PROJECTION):
+            self._index_resource_locked(resource)
+            changed += 1
+        diagram_filter = {"content_type": KIND_DIAGRAM, **changed_filter}
+        for content in self.db.topic_contents.find(diagram_filter, _DIAGRAM_PROJECTION):
+            self._index_diagram_locked(content)
+            changed += 1
+
+        self._synced_at = started_at
+        self._caught_up_at = time.monotonic()
+        return changed
+
+    def _build_slice_locked(self) -> bool:
+        """
+        Indexa el siguiente tramo (cold_build_batch documentos) del arranque en
+        frío y lo persiste. Retorna True si la construcción terminó.
+        """
+        sources = (
+            ("resources", {}, _RESOURCE_PROJECTION, self._index_resource_locked),
+            ("topic_contents", {"content_type": KIND_DIAGRAM}, _DIAGRAM_PROJECTION, self._index_diagram_locked),
+        )
+        remaining = self.cold_build_batch
+        for collection, query, projection, index_document in sources:
+            after = self._build_cursor.get(collection)
+            if after == BUILD_DONE:
+                continue
+            if remaining <= 0:
+                break
+            if after:
+                query = {**query, "_id": {"$gt": ObjectId(after)}}
+            documents = list(self.db[collection].find(query, projection, sort=[("_id", 1)], limit=remaining))
+            for document in documents:
+                index_document(document)
+            if len(documents) < remaining:
+                self._build_cursor[collection] = BUILD_DONE
+            else:
+                self._build_cursor[collection] = str(documents[-1]["_id"])
+            remaining -= len(documents)
+
+        finished = all(self._build_cursor.get(collection) == BUILD_DONE for collection, *_ in sources)
+        if finished:
+            # _synced_at es el inicio de la construcción: la sincronización siguiente cubre lo escrito durante ella
+            self._build_cursor = None
+            self._caught_up_at = time.monotonic()
+            self._stats["full_builds"] += 1
+            increment("content_recommendation_index.full_builds")
+        try:
+            self.persist()
+        except Exception as e:
+            logging.warning(f"ContentRecommendationIndex: no se pudo guardar el tramo de construcción: {e}")
+        self._last_slice_at = time.monotonic()
+        return finished
+
+    def _ensure_ready(self) -> BM25Index:
+        now = time.monotonic()
+        if self._index is not None and self._build_cursor is None and not self._needs_catch_up(now):
+            return self._index
+        with self._lock:
+            if self._index is None:
+                self._version = self._read_version()
+                if self.load_snapshot():
+                    self._stats["warm_starts"] += 1
+                    if self._build_cursor is None:
+                        self._schedule_persist_if(self._sync_locked(self._synced_at))
+                else:
+                    self._index = BM25Index()
+                    self._synced_at = datetime.now()
+                    self._build_cursor = {}
+            if self._build_cursor is not None:
+                # Las demás consultas de la misma petición usan el índice parcial
+                if time.monotonic() - self._last_slice_at >= self.cold_build_interval_seconds:
+                    self._build_slice_locked()
+            elif self._needs_catch_up(time.monotonic()):
+                self._version = self._read_version()
+                self._schedule_persist_if(self._sync_locked(self._synced_at))
+                self._stats["catch_ups"] += 1
+            return self._index
+
+    def _needs_catch_up(self, now: float) -> bool:
+        if now - self._caught_up_at >= self.catch_up_seconds:
+            return True
+        if now - self._version_checked_at < self.version_check_seconds:
+            return False
+        self._version_checked_at = now
+        version = self._read_version()
+        return version is not None and version != self._version
+
+    def upsert_resource(self, resource_id: Any) -> None:
+        """Reindexa un recurso tras crearlo o actualizarlo."""
+        try:
+            resource = self.db.resources.find_one({"_id": ObjectId(str(resource_id))}, _RESOURCE_PROJECTION)
+            with self._lock:
+                if self._index is not None:
+                    if resource:
+                        self._index_resource_locked(resource)
+                    else:
+                        self._index.remove(_doc_key("resources", resource_id))
+            self._bump_version()
+            self._schedule_persist_if(self._index is not None)
+        except Exception as e:
+            logging.warning(f"No se pudo indexar el recurso {resource_id} para recomendaciones: {e}")
+
+    def remove_resource(self, resource_id: Any) -> None:
+        """Retira un recurso eliminado del índice."""
+        with self._lock:
+            removed = self._index is not None and self._index.remove(_doc_key("resources", resource_id))
+        self._bump_version()
+        self._schedule_persist_if(removed)
+
+    # ---- Consultas ----
+
+    def idf(self, term: str) -> float:
+        return self._ensure_ready().idf(term)
+
+    def top_terms(self, term_counts: Dict[str, int], limit: int = 10) -> List[str]:
+        """
+        Términos con mayor TF-IDF respecto del índice, preparando el índice una
+        sola vez para todos ellos.
+
+        Args:
+            term_counts: Frecuencia de cada término normalizado en el texto
+            limit: Máximo de términos
+
+        Returns:
+            Términos ordenados por peso descendente (solo los de peso positivo)
+        """
+        index = self._ensure_ready()
+        weighted = sorted(((count * index.idf(term), term) for term, count in term_counts.items()), reverse=True)
+        return [term for weight, term in weighted[:limit] if weight > 0]
+
+    def search(self, query_terms: Iterable[str], kind: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Claves de documentos del tipo indicado ordenadas por BM25.
+
+        Args:
+            query_terms: Términos normalizados (src.shared.keyword_index.tokenize)
+            kind: KIND_PDF, KIND_WEB o KIND_DIAGRAM
+            limit: Máximo de resultados
+
+        Returns:
+            Lista de (clave, puntuación)
+        """
+        index = self._ensure_ready()
+        self._stats["searches"] += 1
+        return index.search(query_terms, limit=limit, predicate=lambda payload: payload.get("kind") == kind)
+
+    def fetch_ranked(self, ranked: List[Tuple[str, float]]) -> List[Dict]:
+        """
+        Documentos completos de un resultado de search(), en orden y con
+        `relevance_score`, usando una consulta $in por colección. Las claves
+        cuyo documento ya no existe se retiran del índice.
+        """
+        ids_by_collection: Dict[str, List[ObjectId]] = {}
+        for key, _ in ranked:
+            collection, document_id = key.split(":", 1)
+            ids_by_collection.setdefault(collection, []).append(ObjectId(document_id))
+
+        found: Dict[str, Dict] = {}
+        for collection, ids in ids_by_collection.items():
+            for document in self.db[collection].find({"_id": {"$in": ids}, "status": {"$ne": "deleted"}}):
+                found[_doc_key(collection, document["_id"])] = document
+
+        documents = []
+        for key, score in ranked:
+            document = found.get(key)
+            if document is None:
+                with self._lock:
+                    if self._index is not None and self._index.remove(key):
+                        self._stats["pruned"] += 1
+                continue
+            document["relevance_score"] = round(score, 4)
+            documents.append(document)
+        return documents
+
+    # ---- Persistencia ----
+
+    def _schedule_persist_if(self, changed: Any) -> None:
+        if not changed:
+            return
+        try:
+            background_runner.submit(INDEX_PERSIST_TASK, RECOMMENDATION_INDEX_ID)
+        except Exception as e:
+            logging.debug(f"ContentRecommendationIndex: no se pudo programar la persistencia: {e}")
+
+    def persist(self) -> bool:
+        """Guarda la instantánea comprimida del índice (archivo o Mongo)."""
+        with self._lock:
+            if self._index is None:
+                return False
+            state = {"format": SNAPSHOT_FORMAT_VERSION, "synced_at": self._synced_at.isoformat(),
+                     "build_cursor": self._build_cursor, "index": self._index.to_state()}
+        data = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"), 6)
+        if len(data) > MAX_SNAPSHOT_BYTES:
+            logging.warning(f"ContentRecommendationIndex: instantánea de {len(data)} bytes excede el límite; no se guarda")
+            return False
+
+        if self.snapshot_path:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.snapshot_path)
+        else:
+            self.db[RECOMMENDATION_INDEX_COLLECTION].update_one(
+                {"_id": RECOMMENDATION_INDEX_ID},
+                {"$set": {"data": Binary(data), "size": len(data), "updated_at": datetime.now()}},
+                upsert=True
+            )
+        return True
+
+    def load_snapshot(self) -> bool:
+        """Carga la instantánea guardada, si existe y es legible."""
+        try:
+            if self.snapshot_path:
+                if not os.path.exists(self.snapshot_path):
+                    return False
+                with open(self.snapshot_path, "rb") as f:
+                    data = f.read()
+            else:
+                stored = self.db[RECOMMENDATION_INDEX_COLLECTION].find_one({"_id": RECOMMENDATION_INDEX_ID})
+                if not stored or not stored.get("data"):
+                    return False
+                data = bytes(stored["data"])
+            state = json.loads(zlib.decompress(data).decode("utf-8"))
+            if state.get("format") != SNAPSHOT_FORMAT_VERSION:
+                return False
+            with self._lock:
+                self._index = BM25Index.from_state(state["index"])
+                self._synced_at = datetime.fromisoformat(state["synced_at"])
+                self._build_cursor = state.get("build_cursor")
+            return True
+        except Exception as e:
+            logging.warning(f"ContentRecommendationIndex: instantánea ilegible, se reconstruye: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "documents": len(self._index) if self._index is not None else 0}
+
+
+content_recommendation_index = ContentRecommendationIndex()
+
+
+def _run_index_persist() -> None:
+    content_recommendation_index.persist()
+
+
+background_runner.register(INDEX_PERSIST_TASK, _run_index_persist, debounce_seconds=INDEX_PERSIST_DEBOUNCE_SECONDS)
@@ -17,6 +17,7 @@ from .services import (
     TopicReadinessService,
     AutomaticGradingService
 )
+from .plan_tree_service import PLAN_TREE_PROFILE_FULL, PLAN_TREE_PROFILES
 from src.resources.services import ResourceService, ResourceFolderService
 import logging
 from src.shared.constants import ROLES
@@ -143,12 +144,20 @@ def list_study_plans():
 @auth_required
 @apply_workspace_filter('study_plans_per_subject')
 def get_study_plan(plan_id):
-    """Obtiene un plan de estudios con sus módulos, temas y evaluaciones"""
+    """
+    Obtiene un plan de estudios con sus módulos, temas y evaluaciones.
+
+    Query params:
+        profile: "full" (por defecto) | "outline" (sin campos pesados como theory_content)
+    """
     workspace_info = get_current_workspace_info()
     workspace_type = workspace_info.get('workspace_type')
     current_user_id = request.user_id
+    profile = request.args.get('profile', PLAN_TREE_PROFILE_FULL)
+    if profile not in PLAN_TREE_PROFILES:
+        return APIRoute.error(ErrorCodes.BAD_REQUEST, f"Perfil inválido. Valores permitidos: {', '.join(PLAN_TREE_PROFILES)}")
     
-    plan = study_plan_service.get_study_plan(plan_id, workspace_info=workspace_info)
+    plan = study_plan_service.get_study_plan(plan_id, workspace_info=workspace_info, profile=profile)
     
     if plan:
         # En workspaces individuales, verificar que el plan pertenece al usuario
@@ -561,6 +570,25 @@ def list_topic_evaluations_route(topic_id):
     evaluations = ensure_json_serializable(evaluations)
     return APIRoute.success(data={"evaluations": evaluations})
 
+@study_plan_bp.route('/evaluations/status-matrix', methods=['GET'])
+@APIRoute.standard(auth_required_flag=True, roles=[ROLES["TEACHER"], ROLES["ADMIN"]])
+def get_evaluations_status_matrix():
+    """
+    Matriz de estado estudiantes × evaluaciones para la vista de calificaciones.
+    Query params: topic_id o evaluation_ids (separados por coma), y class_id y/o
+    student_ids (separados por coma).
+    """
+    def _id_list(param):
+        return [value.strip() for value in (request.args.get(param) or "").split(",") if value.strip()]
+
+    matrix = evaluation_service.get_evaluations_status_matrix(
+        topic_id=request.args.get('topic_id'),
+        evaluation_ids=_id_list('evaluation_ids'),
+        class_id=request.args.get('class_id'),
+        student_ids=_id_list('student_ids')
+    )
+    return APIRoute.success(data=ensure_json_serializable(matrix))
+
 # New endpoints: Slides completeness for topic, slides completeness for module, and auto-publish topic
 
 @study_plan_bp.route('/topic/<topic_id>/slides-completeness', methods=['GET'])
@@ -730,6 +758,36 @@ def auto_publish_topic(topic_id):
         return APIRoute.error(ErrorCodes.SERVER_ERROR, str(e), status_code=500)
 
 
+def _bulk_publish_response(result):
+    message = (f"{result['published']} temas publicados, {result['already_published']} ya publicados, "
+               f"{result['blocked']} con requisitos pendientes")
+    return APIRoute.success(data=ensure_json_serializable(result), message=message)
+
+@study_plan_bp.route('/module/<module_id>/publish', methods=['POST'])
+@APIRoute.standard(auth_required_flag=True, roles=[ROLES["TEACHER"], ROLES["INSTITUTE_ADMIN"], ROLES["ADMIN"]])
+def bulk_publish_module_topics(module_id):
+    """
+    Publica en bloque los temas del módulo que cumplen los requisitos.
+    Body opcional: {"dry_run": true} para solo obtener el informe por tema.
+    """
+    payload = request.get_json(silent=True) or {}
+    result = topic_service.bulk_publish(module_id=module_id, user_id=request.user_id,
+                                        dry_run=bool(payload.get("dry_run", False)))
+    return _bulk_publish_response(result)
+
+@study_plan_bp.route('/<plan_id>/publish', methods=['POST'])
+@APIRoute.standard(auth_required_flag=True, roles=[ROLES["TEACHER"], ROLES["INSTITUTE_ADMIN"], ROLES["ADMIN"]])
+def bulk_publish_plan_topics(plan_id):
+    """
+    Publica en bloque los temas de todos los módulos del plan que cumplen los requisitos.
+    Body opcional: {"dry_run": true} para solo obtener el informe por tema.
+    """
+    payload = request.get_json(silent=True) or {}
+    result = topic_service.bulk_publish(study_plan_id=plan_id, user_id=request.user_id,
+                                        dry_run=bool(payload.get("dry_run", False)))
+    return _bulk_publish_response(result)
+
+
 # Rutas para Evaluaciones
 @study_plan_bp.route('/evaluation', methods=['POST'])
 @APIRoute.standard(auth_required_flag=True, roles=[ROLES["TEACHER"]], required_fields=['topic_ids', 'title', 'description', 'weight', 'criteria', 'due_date'])
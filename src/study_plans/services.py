@@ -4,12 +4,14 @@ from datetime import datetime, timedelta
 import json
 import re
 import logging
-from src.shared.validators import validate_object_id
+from collections import Counter
+from src.shared.validators import validate_object_id, find_missing_references
 from src.shared.constants import STATUS
 from src.shared.standardization import VerificationBaseService, ErrorCodes
 from src.shared.exceptions import AppException
 from src.shared.database import get_db
 from src.shared.cascade_deletion_service import CascadeDeletionService
+from src.shared.blob_store import content_blob_store
 from src.classes.services import ClassService
 from src.study_plans.models import (
     StudyPlanPerSubject, StudyPlanAssignment, Module, Topic
@@ -25,6 +27,26 @@ from src.content.services import ContentService
 from src.content.services import ContentResultService
 from src.virtual.services import ContentChangeDetector
 from src.shared.logging import log_error
+from src.study_plans.plan_tree_service import (
+    PLAN_TREE_PROFILE_FULL,
+    StudyPlanTreeLoader,
+    invalidate_study_plan_tree,
+)
+from src.study_plans.readiness_snapshot_service import (
+    ModuleReadinessSnapshot,
+    invalidate_topic_readiness,
+    topics_with_evaluations,
+)
+from src.study_plans.bulk_publish_service import BulkTopicPublisher, INVALID_THEORY_VALUES
+from src.study_plans.recommendation_index import (
+    KIND_DIAGRAM,
+    KIND_PDF,
+    KIND_WEB,
+    content_recommendation_index,
+)
+from src.shared.keyword_index import tokenize
+from src.study_plans.evaluation_status_service import EvaluationStatusBatch
+from src.shared.evaluation_statistics import EvaluationStatisticsEngine, invalidate_evaluation_statistics
 
 class StudyPlanService(VerificationBaseService):
     def __init__(self):
@@ -186,66 +208,18 @@ class StudyPlanService(VerificationBaseService):
             logging.error(f"Error al listar planes: {str(e)}")
             return []
 
-    def get_study_plan(self, plan_id: str, workspace_info: Dict = None) -> Optional[Dict]:
+    def get_study_plan(self, plan_id: str, workspace_info: Dict = None,
+                       profile: str = PLAN_TREE_PROFILE_FULL) -> Optional[Dict]:
+        """
+        Obtiene un plan de estudios con sus módulos, temas y evaluaciones.
+
+        El árbol se carga con StudyPlanTreeLoader (tres consultas $in, cacheado
+        por plan); profile="outline" omite los campos pesados.
+        """
         try:
-            plan = self.collection.find_one({"_id": ObjectId(plan_id)})
+            plan = StudyPlanTreeLoader(get_db()).load(plan_id, profile=profile)
             if not plan:
                 return None
-
-            # Convertir _id a string para que sea JSON serializable
-            plan["_id"] = str(plan["_id"])
-            if isinstance(plan.get("author_id"), ObjectId):
-                plan["author_id"] = str(plan["author_id"])
-            if isinstance(plan.get("workspace_id"), ObjectId):
-                plan["workspace_id"] = str(plan["workspace_id"])
-            if isinstance(plan.get("institute_id"), ObjectId):
-                plan["institute_id"] = str(plan["institute_id"])
-            
-            # Obtener módulos asociados
-            modules = list(get_db().modules.find({"study_plan_id": ObjectId(plan_id)}))
-            
-            # Para cada módulo, obtener sus temas y evaluaciones
-            for module in modules:
-                # Convertir ObjectId a string
-                module["_id"] = str(module["_id"])
-                module["study_plan_id"] = str(module["study_plan_id"])
-                
-                # Rellenar date_start y date_end si faltan (para registros antiguos)
-                if 'date_start' not in module or module.get('date_start') is None:
-                    module['date_start'] = module.get('created_at')
-                if 'date_end' not in module or module.get('date_end') is None:
-                    module['date_end'] = module.get('created_at')
-                
-                # Obtener temas relacionados
-                topics = list(get_db().topics.find({"module_id": ObjectId(module["_id"])}))
-                for topic in topics:
-                    topic["_id"] = str(topic["_id"])
-                    topic["module_id"] = str(topic["module_id"])
-                    
-                    # Rellenar date_start y date_end si faltan en el topic
-                    if 'date_start' not in topic or topic.get('date_start') is None:
-                        topic['date_start'] = topic.get('created_at')
-                    if 'date_end' not in topic or topic.get('date_end') is None:
-                        topic['date_end'] = topic.get('created_at')
-                
-                module["topics"] = topics
-                
-                # Obtener evaluaciones asociadas a los temas del módulo
-                module_topic_ids = [ObjectId(t["_id"]) for t in topics]
-                evaluations = []
-                if module_topic_ids:
-                    evaluations = list(get_db().evaluations.find({"topic_ids": {"$in": module_topic_ids}}))
-                
-                # Prevenir duplicados si una evaluación está en múltiples temas del mismo módulo
-                unique_evaluations = {str(e["_id"]): e for e in evaluations}.values()
-
-                for evaluation in unique_evaluations:
-                    evaluation["_id"] = str(evaluation["_id"])
-                    evaluation["topic_ids"] = [str(tid) for tid in evaluation["topic_ids"]]
-                
-                module["evaluations"] = list(unique_evaluations)
-
-            plan["modules"] = modules
             
             # Agregar información del workspace si está disponible
             if workspace_info:
@@ -287,6 +261,7 @@ class StudyPlanService(VerificationBaseService):
             
             if result.modified_count == 0:
                 raise AppException("No se realizaron cambios", AppException.BAD_REQUEST)
+            invalidate_study_plan_tree(plan_ids=[plan_id])
         except AppException:
             # Re-lanzar excepciones AppException
             raise
@@ -316,6 +291,7 @@ class StudyPlanService(VerificationBaseService):
 
             result = self.collection.delete_one({"_id": ObjectId(plan_id)})
             if result.deleted_count > 0:
+                invalidate_study_plan_tree(plan_ids=[plan_id])
                 return True, "Plan de estudios eliminado correctamente"
             return False, "No se pudo eliminar el plan de estudios"
 
@@ -329,6 +305,7 @@ class StudyPlanService(VerificationBaseService):
 
         if not cascade_result.get('success', False):
             return False, cascade_result.get('error', 'No se pudo eliminar el plan de estudios')
+        invalidate_study_plan_tree(plan_ids=[plan_id])
 
         total_deleted = cascade_result.get('total_deleted', 1)
         dependencies_deleted = max(total_deleted - 1, 0)
@@ -738,6 +715,7 @@ class ModuleService(VerificationBaseService):
             module_to_insert['updated_at'] = datetime.now()
             
             result = self.collection.insert_one(module_to_insert)
+            invalidate_study_plan_tree(plan_ids=[study_plan_id])
             
             return True, str(result.inserted_id)
         except Exception as e:
@@ -793,6 +771,7 @@ class ModuleService(VerificationBaseService):
             )
             
             if result.modified_count > 0:
+                invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id"), update_data.get("study_plan_id")])
                 return True, "Módulo actualizado exitosamente"
             return False, "No se pudo actualizar el módulo"
         except Exception as e:
@@ -820,6 +799,7 @@ class ModuleService(VerificationBaseService):
 
                 result = self.collection.delete_one({"_id": ObjectId(module_id)})
                 if result.deleted_count > 0:
+                    invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id")])
                     return True, "Módulo eliminado exitosamente"
                 return False, "No se pudo eliminar el módulo"
 
@@ -827,6 +807,7 @@ class ModuleService(VerificationBaseService):
             cascade_result = cascade_service.delete_with_cascade('modules', module_id)
             if not cascade_result.get('success', False):
                 return False, cascade_result.get('error', 'No se pudo eliminar el módulo en cascada')
+            invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id")])
 
             total_deleted = cascade_result.get('total_deleted', 1)
             dependencies_deleted = max(total_deleted - 1, 0)
@@ -861,6 +842,90 @@ class ModuleService(VerificationBaseService):
         except Exception as e:
             return None
 
+    @staticmethod
+    def _empty_slides_completeness() -> Dict:
+        return {
+            "total_topics": 0,
+            "topics_with_slides": 0,
+            "slides_by_status": {},
+            "topics_needing_attention": [],
+            "completion_percentage": 0.0,
+            "slides_statistics": {
+                "total_slides": 0,
+                "skeleton": 0,
+                "html_ready": 0,
+                "narrative_ready": 0
+            }
+        }
+
+    @staticmethod
+    def _build_slides_completeness(topics: List[Dict], slide_counts: Dict[str, Dict[str, int]]) -> Dict:
+        """
+        Arma el informe de completitud a partir de los conteos por (tema, estado).
+        """
+        slides_by_status = {}
+        topics_with_slides = 0
+        topics_needing_attention = []
+
+        for topic in topics:
+            topic_id_str = str(topic["_id"])
+            counts = slide_counts.get(topic_id_str, {})
+            slides_count = sum(counts.values())
+            for status, count in counts.items():
+                slides_by_status[status] = slides_by_status.get(status, 0) + count
+
+            if not slides_count:
+                topics_needing_attention.append({
+                    "topic_id": topic_id_str,
+                    "topic_name": topic.get("name", "Sin nombre"),
+                    "issue": "no_slides",
+                    "description": "No tiene diapositivas"
+                })
+                continue
+            topics_with_slides += 1
+
+            # Verificar completitud de diapositivas
+            narrative_ready_count = counts.get("narrative_ready", 0)
+            html_ready_count = counts.get("html_ready", 0)
+            skeleton_count = counts.get("skeleton", 0)
+
+            issues = []
+            if skeleton_count > 0:
+                issues.append(f"{skeleton_count} diapositivas sin HTML")
+            if html_ready_count > 0:
+                issues.append(f"{html_ready_count} diapositivas sin narrativa")
+
+            if issues:
+                topics_needing_attention.append({
+                    "topic_id": topic_id_str,
+                    "topic_name": topic.get("name", "Sin nombre"),
+                    "issue": "incomplete_slides",
+                    "description": ", ".join(issues),
+                    "slides_count": slides_count,
+                    "narrative_ready": narrative_ready_count,
+                    "html_ready": html_ready_count,
+                    "skeleton": skeleton_count
+                })
+
+        # Calcular porcentaje de completitud
+        total_slides = sum(slides_by_status.values())
+        narrative_ready_slides = slides_by_status.get("narrative_ready", 0)
+        completion_percentage = (narrative_ready_slides / total_slides * 100) if total_slides > 0 else 0.0
+
+        return {
+            "total_topics": len(topics),
+            "topics_with_slides": topics_with_slides,
+            "slides_by_status": slides_by_status,
+            "topics_needing_attention": topics_needing_attention,
+            "completion_percentage": round(completion_percentage, 2),
+            "slides_statistics": {
+                "total_slides": total_slides,
+                "skeleton": slides_by_status.get("skeleton", 0),
+                "html_ready": slides_by_status.get("html_ready", 0),
+                "narrative_ready": narrative_ready_slides
+            }
+        }
+
     def check_slides_completeness_for_module(self, module_id: str) -> Dict:
         """
         Verifica la completitud de las diapositivas de todos los temas de un módulo.
@@ -876,120 +941,17 @@ class ModuleService(VerificationBaseService):
             db = get_db()
             
             # Obtener todos los temas del módulo
-            topics = list(db.topics.find({"module_id": ObjectId(module_id)}))
-            topic_ids = [t["_id"] for t in topics]
-            
-            if not topic_ids:
-                return {
-                    "total_topics": 0,
-                    "topics_with_slides": 0,
-                    "slides_by_status": {},
-                    "topics_needing_attention": [],
-                    "completion_percentage": 0.0,
-                    "slides_statistics": {
-                        "total_slides": 0,
-                        "skeleton": 0,
-                        "html_ready": 0,
-                        "narrative_ready": 0
-                    }
-                }
-            
-            # Consultar todas las diapositivas del módulo
-            slides_query = {
-                "topic_id": {"$in": topic_ids},
-                "content_type": "slide",
-                "status": {"$ne": "deleted"}
-            }
-            
-            slides = list(db.topic_contents.find(slides_query, {
-                "topic_id": 1,
-                "status": 1,
-                "content.content_html": 1,
-                "content.narrative_text": 1,
-                "content.full_text": 1
-            }))
-            
-            # Estadísticas por estado
-            slides_by_status = {}
-            topics_with_slides = set()
-            topics_needing_attention = []
+            topics = list(db.topics.find({"module_id": ObjectId(module_id)}, {"name": 1}))
+            if not topics:
+                return self._empty_slides_completeness()
             
-            for slide in slides:
-                status = slide.get("status", "draft")
-                slides_by_status[status] = slides_by_status.get(status, 0) + 1
-                topics_with_slides.add(str(slide["topic_id"]))
-            
-            # Verificar cada tema para identificar los que necesitan atención
-            for topic in topics:
-                topic_id_str = str(topic["_id"])
-                topic_slides = [s for s in slides if str(s["topic_id"]) == topic_id_str]
-                
-                if not topic_slides:
-                    topics_needing_attention.append({
-                        "topic_id": topic_id_str,
-                        "topic_name": topic.get("name", "Sin nombre"),
-                        "issue": "no_slides",
-                        "description": "No tiene diapositivas"
-                    })
-                    continue
-                
-                # Verificar completitud de diapositivas
-                narrative_ready_count = len([s for s in topic_slides if s.get("status") == "narrative_ready"])
-                html_ready_count = len([s for s in topic_slides if s.get("status") == "html_ready"])
-                skeleton_count = len([s for s in topic_slides if s.get("status") == "skeleton"])
-                
-                issues = []
-                if skeleton_count > 0:
-                    issues.append(f"{skeleton_count} diapositivas sin HTML")
-                if html_ready_count > 0:
-                    issues.append(f"{html_ready_count} diapositivas sin narrativa")
-                
-                if issues:
-                    topics_needing_attention.append({
-                        "topic_id": topic_id_str,
-                        "topic_name": topic.get("name", "Sin nombre"),
-                        "issue": "incomplete_slides",
-                        "description": ", ".join(issues),
-                        "slides_count": len(topic_slides),
-                        "narrative_ready": narrative_ready_count,
-                        "html_ready": html_ready_count,
-                        "skeleton": skeleton_count
-                    })
-            
-            # Calcular porcentaje de completitud
-            total_slides = len(slides)
-            narrative_ready_slides = slides_by_status.get("narrative_ready", 0)
-            completion_percentage = (narrative_ready_slides / total_slides * 100) if total_slides > 0 else 0.0
-            
-            return {
-                "total_topics": len(topics),
-                "topics_with_slides": len(topics_with_slides),
-                "slides_by_status": slides_by_status,
-                "topics_needing_attention": topics_needing_attention,
-                "completion_percentage": round(completion_percentage, 2),
-                "slides_statistics": {
-                    "total_slides": total_slides,
-                    "skeleton": slides_by_status.get("skeleton", 0),
-                    "html_ready": slides_by_status.get("html_ready", 0),
-                    "narrative_ready": slides_by_status.get("narrative_ready", 0)
-                }
-            }
+            # Conteos por (tema, estado) desde la instantánea del módulo
+            slide_counts = ModuleReadinessSnapshot(db).get_slide_counts(module_id, [t["_id"] for t in topics])
+            return self._build_slides_completeness(topics, slide_counts)
             
         except Exception as e:
             logging.error(f"Error verificando completitud de diapositivas para módulo {module_id}: {str(e)}")
-            return {
-                "total_topics": 0,
-                "topics_with_slides": 0,
-                "slides_by_status": {},
-                "topics_needing_attention": [],
-                "completion_percentage": 0.0,
-                "slides_statistics": {
-                    "total_slides": 0,
-                    "skeleton": 0,
-                    "html_ready": 0,
-                    "narrative_ready": 0
-                }
-            }
+            return self._empty_slides_completeness()
 
     def get_virtualization_readiness(self, module_id: str) -> Dict:
         """
@@ -1004,26 +966,32 @@ class ModuleService(VerificationBaseService):
         
         db = get_db()
         # Obtener temas del módulo
-        topics = list(db.topics.find({"module_id": ObjectId(module_id)}))
+        topics = list(db.topics.find(
+            {"module_id": ObjectId(module_id)},
+            {"name": 1, "theory_content": 1, "resources": 1, "published": 1}
+        ))
         total_topics = len(topics)
+        topic_ids = [t["_id"] for t in topics]
         
-        # Obtener estadísticas de diapositivas
-        slides_stats = self.check_slides_completeness_for_module(module_id)
-        
-        # Conteo de temas publicados/no publicados
-        published_topics = list(db.topics.find({"module_id": ObjectId(module_id), "published": True}))
-        published_topics_count = len(published_topics)
-        unpublished_topics_count = total_topics - published_topics_count
+        # Conteos de diapositivas por (tema, estado) y estadísticas derivadas
+        slide_counts = ModuleReadinessSnapshot(db).get_slide_counts(module_id, topic_ids) if topics else {}
+        slides_stats = (self._build_slides_completeness(topics, slide_counts) if topics
+                        else self._empty_slides_completeness())
+        topics_with_complete_slides = {
+            tid for tid, counts in slide_counts.items() if counts.get("narrative_ready", 0) > 0
+        }
         
         # Análisis de contenido teórico y recursos
         missing_theory = [t for t in topics if not t.get("theory_content")]
         missing_resources = [t for t in topics if not t.get("resources") or len(t.get("resources")) == 0]
         
         # Conteo de evaluaciones
-        topic_ids = [t["_id"] for t in topics]
         eval_count = 0
+        topics_with_evaluation = set()
         if topic_ids:
             eval_count = db.evaluations.count_documents({"topic_ids": {"$in": topic_ids}})
+            if eval_count:
+                topics_with_evaluation = topics_with_evaluations(db, topic_ids)
         
         # Lógica automática para marcar Topic.published=true
         topics_auto_published = 0
@@ -1032,18 +1000,11 @@ class ModuleService(VerificationBaseService):
             
             # Verificar criterios para auto-publicación:
             # 1) theory_content presente
-            has_theory = bool(topic.get("theory_content"))
-            
             # 2) al menos una diapositiva en estado 'narrative_ready'
-            narrative_ready_slides = db.topic_contents.count_documents({
-                "topic_id": topic_id,
-                "content_type": "slide",
-                "status": "narrative_ready"
-            })
-            has_complete_slides = narrative_ready_slides > 0
-            
             # 3) al menos una evaluación/quiz asociada
-            has_evaluation = db.evaluations.count_documents({"topic_ids": topic_id}) > 0
+            has_theory = bool(topic.get("theory_content"))
+            has_complete_slides = str(topic_id) in topics_with_complete_slides
+            has_evaluation = str(topic_id) in topics_with_evaluation
             
             # Si cumple todos los criterios y no está publicado, publicarlo automáticamente
             if has_theory and has_complete_slides and has_evaluation and not topic.get("published", False):
@@ -1058,35 +1019,25 @@ class ModuleService(VerificationBaseService):
                             }
                         }
                     )
+                    topic["published"] = True
                     topics_auto_published += 1
                     logging.info(f"Tema {topic_id} marcado automáticamente como publicado")
                 except Exception as e:
                     logging.error(f"Error auto-publicando tema {topic_id}: {str(e)}")
+        if topics_auto_published:
+            invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id")])
         
-        # Recalcular temas publicados después de auto-publicación
-        if topics_auto_published > 0:
-            published_topics = list(db.topics.find({"module_id": ObjectId(module_id), "published": True}))
-            published_topics_count = len(published_topics)
-            unpublished_topics_count = total_topics - published_topics_count
+        # Conteo de temas publicados/no publicados (después de la auto-publicación)
+        published_topics_count = len([t for t in topics if t.get("published", False)])
+        unpublished_topics_count = total_topics - published_topics_count
         
         # Calcular content_completeness_score considerando teoría y diapositivas
         content_completeness_score = 0
         if total_topics > 0:
             topics_with_theory = total_topics - len(missing_theory)
             
-            # Contar temas con diapositivas completas (narrative_ready)
-            topics_with_complete_slides = 0
-            for topic in topics:
-                narrative_ready_count = db.topic_contents.count_documents({
-                    "topic_id": topic["_id"],
-                    "content_type": "slide",
-                    "status": "narrative_ready"
-                })
-                if narrative_ready_count > 0:
-                    topics_with_complete_slides += 1
-            
             # Nueva fórmula: (temas_con_teoría + temas_con_diapositivas_completas) / (total_temas * 2) * 100
-            content_completeness_score = int(((topics_with_theory + topics_with_complete_slides) / (total_topics * 2)) * 100)
+            content_completeness_score = int(((topics_with_theory + len(topics_with_complete_slides)) / (total_topics * 2)) * 100)
             
             # Actualizar el score en el módulo si ha cambiado
             current_score = module.get("content_completeness_score", 0)
@@ -1100,6 +1051,7 @@ class ModuleService(VerificationBaseService):
                         }
                     }
                 )
+                invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id")])
         
         # Preparar detalles de cheques incluyendo estadísticas de diapositivas
         checks = {
@@ -1113,11 +1065,7 @@ class ModuleService(VerificationBaseService):
             "topics_auto_published": topics_auto_published,
             "slides_statistics": slides_stats["slides_statistics"],
             "slides_completion_percentage": slides_stats["completion_percentage"],
-            "topics_with_complete_slides": len([t for t in topics if db.topic_contents.count_documents({
-                "topic_id": t["_id"],
-                "content_type": "slide", 
-                "status": "narrative_ready"
-            }) > 0])
+            "topics_with_complete_slides": len(topics_with_complete_slides)
         }
         
         # Generar sugerencias incluyendo recomendaciones específicas sobre diapositivas
@@ -1205,6 +1153,7 @@ class TopicService(VerificationBaseService):
             
             result = self.collection.insert_one(topic_to_insert)
             topic_id = str(result.inserted_id)
+            invalidate_study_plan_tree(plan_ids=[module.get("study_plan_id")])
             
             # Procesar recursos externos como TopicContent
             if external_resources:
@@ -1275,6 +1224,9 @@ class TopicService(VerificationBaseService):
             )
             
             if result.modified_count > 0:
+                invalidate_study_plan_tree(module_ids=[topic.get("module_id"), update_data.get("module_id")])
+                if update_data.get("module_id") and update_data["module_id"] != topic.get("module_id"):
+                    invalidate_topic_readiness(topic_id, [topic.get("module_id"), update_data["module_id"]])
                 # Disparar detección de cambios y encolar actualizaciones
                 module_id = str(topic.get("module_id"))
                 if module_id:
@@ -1320,6 +1272,7 @@ class TopicService(VerificationBaseService):
 
                 result = self.collection.delete_one({"_id": topic_id_obj})
                 if result.deleted_count > 0:
+                    invalidate_study_plan_tree(module_ids=[topic.get("module_id")])
                     return True, "Tema eliminado exitosamente"
                 return False, "No se pudo eliminar el tema"
 
@@ -1339,6 +1292,7 @@ class TopicService(VerificationBaseService):
             cascade_result = cascade_service.delete_with_cascade('topics', topic_id)
             if not cascade_result.get('success', False):
                 return False, cascade_result.get('error', 'No se pudo eliminar el tema en cascada')
+            invalidate_study_plan_tree(module_ids=[topic.get("module_id")])
 
             total_deleted = cascade_result.get('total_deleted', 1)
             dependencies_deleted = max(total_deleted - 1, 0)
@@ -1404,6 +1358,7 @@ class TopicService(VerificationBaseService):
                 )
 
                 if result.modified_count > 0:
+                    invalidate_study_plan_tree(topic_ids=[topic_id])
                     return True, "Contenido teórico actualizado exitosamente"
                 elif result.matched_count > 0 and result.modified_count == 0:
                     logging.info(f"update_theory_content: Sin cambios en el contenido teórico para topic {topic_id}")
@@ -1466,6 +1421,7 @@ class TopicService(VerificationBaseService):
             )
             
             if result.modified_count > 0:
+                invalidate_study_plan_tree(topic_ids=[topic_id])
                 return True, "Contenido teórico eliminado exitosamente"
             return False, "No se pudo eliminar el contenido teórico"
         except Exception as e:
@@ -1551,7 +1507,7 @@ class TopicService(VerificationBaseService):
                 })
 
             # Verificar contenidos '[object Object]' en theory_content
-            if has_topic_theory and topic_theory_content in ['[object Object]', '[Object object]', 'undefined', 'null']:
+            if has_topic_theory and topic_theory_content in INVALID_THEORY_VALUES:
                 inconsistencies.append({
                     "type": "invalid_theory_content",
                     "description": f"theory_content contiene valor inválido: '{topic_theory_content}'",
@@ -1775,6 +1731,7 @@ class TopicService(VerificationBaseService):
                 )
 
                 if updated.modified_count > 0:
+                    invalidate_study_plan_tree(topic_ids=[topic_obj_id])
                     logging.info(f"publish_topic: Tema {topic_id} publicado exitosamente" +
                                (f" por usuario {user_id}" if user_id else ""))
                     return {
@@ -1818,6 +1775,19 @@ class TopicService(VerificationBaseService):
                 "topic_id": topic_id
             }
 
+    def bulk_publish(self, module_id: str = None, study_plan_id: str = None,
+                     user_id: str = None, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Publica en bloque los temas de un módulo o de un plan que cumplen los
+        requisitos de publicación. Ver BulkTopicPublisher.publish.
+
+        Raises:
+            AppException: Si los IDs son inválidos o el módulo/plan no existe
+        """
+        return BulkTopicPublisher(get_db()).publish(
+            module_id=module_id, study_plan_id=study_plan_id, user_id=user_id, dry_run=dry_run
+        )
+
 class EvaluationService(VerificationBaseService):
     def __init__(self):
         super().__init__(collection_name="evaluations")
@@ -1828,10 +1798,10 @@ class EvaluationService(VerificationBaseService):
             if not topic_ids or not isinstance(topic_ids, list):
                 return False, "topic_ids es requerido y debe ser una lista"
 
-            # Validar que todos los topics existen
-            for tid in topic_ids:
-                if not get_db().topics.find_one({"_id": ObjectId(tid)}):
-                    return False, f"El tema con ID {tid} no fue encontrado"
+            # Validar que todos los topics existen (una consulta $in)
+            missing_topics = find_missing_references(get_db().topics, topic_ids)
+            if missing_topics:
+                return False, f"Temas no encontrados: {', '.join(missing_topics)}"
             
             # Validar y procesar weightings para evaluaciones multi-temáticas
             weightings = evaluation_data.get('weightings', {})
@@ -1892,6 +1862,7 @@ class EvaluationService(VerificationBaseService):
             evaluation_to_insert['updated_at'] = datetime.now()
             
             result = self.collection.insert_one(evaluation_to_insert)
+            invalidate_study_plan_tree(topic_ids=evaluation_to_insert.get("topic_ids", []))
             
             return True, str(result.inserted_id)
         except Exception as e:
@@ -1909,9 +1880,9 @@ class EvaluationService(VerificationBaseService):
                 topic_ids = update_data.get('topic_ids')
                 if not topic_ids or not isinstance(topic_ids, list):
                     return False, "topic_ids debe ser una lista no vacía"
-                for tid in topic_ids:
-                    if not get_db().topics.find_one({"_id": ObjectId(tid)}):
-                        return False, f"El tema con ID {tid} no fue encontrado"
+                missing_topics = find_missing_references(get_db().topics, topic_ids)
+                if missing_topics:
+                    return False, f"Temas no encontrados: {', '.join(missing_topics)}"
                 update_data['topic_ids'] = [ObjectId(tid) for tid in topic_ids]
             
             # Validar weightings si se actualiza
@@ -1964,6 +1935,9 @@ class EvaluationService(VerificationBaseService):
             )
             
             if result.modified_count > 0:
+                invalidate_study_plan_tree(
+                    topic_ids=list(evaluation.get("topic_ids", [])) + list(update_data.get("topic_ids", []))
+                )
                 return True, "Evaluación actualizada exitosamente"
             return False, "No se pudo actualizar la evaluación"
         except Exception as e:
@@ -1994,6 +1968,7 @@ class EvaluationService(VerificationBaseService):
 
                 result = self.collection.delete_one({"_id": evaluation_id_obj})
                 if result.deleted_count > 0:
+                    invalidate_study_plan_tree(topic_ids=evaluation.get("topic_ids", []))
                     return True, "Evaluación eliminada exitosamente"
                 return False, "No se pudo eliminar la evaluación"
 
@@ -2001,6 +1976,7 @@ class EvaluationService(VerificationBaseService):
             cascade_result = cascade_service.delete_with_cascade('evaluations', evaluation_id)
             if not cascade_result.get('success', False):
                 return False, cascade_result.get('error', 'No se pudo eliminar la evaluación en cascada')
+            invalidate_study_plan_tree(topic_ids=evaluation.get("topic_ids", []))
 
             total_deleted = cascade_result.get('total_deleted', 1)
             dependencies_deleted = max(total_deleted - 1, 0)
@@ -2041,27 +2017,61 @@ class EvaluationService(VerificationBaseService):
         """Obtiene evaluaciones de un tema con estado para un estudiante."""
         try:
             evaluations = self.get_evaluations_by_topic(topic_id)
-            db = get_db()
-            results = []
-            for ev in evaluations:
-                submission = db.evaluation_submissions.find_one({
-                    "evaluation_id": ObjectId(ev["_id"]),
-                    "student_id": student_id
-                })
+            return EvaluationStatusBatch(get_db()).statuses_for_student(evaluations, student_id)
+        except Exception:
+            return []
 
-                status = {
-                    "evaluation": ev,
-                    "submitted": submission is not None,
-                    "submitted_at": submission.get("updated_at") if submission else None,
-                    "grade": submission.get("grade") if submission else None,
-                    "feedback": submission.get("feedback") if submission else None
-                }
+    def get_evaluations_status_matrix(self, topic_id: str = None, evaluation_ids: List[str] = None,
+                                      class_id: str = None, student_ids: List[str] = None) -> Dict:
+        """
+        Matriz de estado estudiantes × evaluaciones para las vistas de
+        calificaciones del profesor (ver EvaluationStatusBatch.matrix).
+
+        Args:
+            topic_id: Tema cuyas evaluaciones forman las columnas
+            evaluation_ids: Evaluaciones explícitas (alternativa a topic_id)
+            class_id: Clase cuyos estudiantes forman las filas
+            student_ids: Estudiantes explícitos (se suman a los de la clase)
 
-                results.append(status)
+        Raises:
+            AppException: Si faltan evaluaciones o estudiantes, o algún ID es inválido
+        """
+        if not topic_id and not evaluation_ids:
+            raise AppException("Debe indicar topic_id o evaluation_ids", AppException.BAD_REQUEST)
+        if not class_id and not student_ids:
+            raise AppException("Debe indicar class_id o student_ids", AppException.BAD_REQUEST)
+        db = get_db()
 
-            return results
-        except Exception:
-            return []
+        if topic_id:
+            validate_object_id(topic_id, "ID de tema")
+            evaluations = self.get_evaluations_by_topic(topic_id)
+        else:
+            for evaluation_id in evaluation_ids:
+                validate_object_id(evaluation_id, "ID de evaluación")
+            evaluations = list(self.collection.find(
+                {"_id": {"$in": [ObjectId(eid) for eid in evaluation_ids]}},
+                {"title": 1, "weight": 1, "due_date": 1}
+            ))
+
+        students = list(student_ids or [])
+        if class_id:
+            validate_object_id(class_id, "ID de clase")
+            students.extend(str(member["user_id"]) for member in db.class_members.find(
+                {"class_id": ObjectId(class_id), "role": "STUDENT"}, {"user_id": 1}
+            ))
+
+        matrix = EvaluationStatusBatch(db).matrix(evaluations, students)
+
+        # Nombres de los estudiantes con una sola consulta
+        user_oids = [ObjectId(sid) for sid in matrix["student_ids"] if ObjectId.is_valid(sid)]
+        users = {str(user["_id"]): user for user in db.users.find(
+            {"_id": {"$in": user_oids}}, {"name": 1, "email": 1}
+        )} if user_oids else {}
+        matrix["students"] = [
+            {"id": sid, "name": users.get(sid, {}).get("name", ""), "email": users.get(sid, {}).get("email", "")}
+            for sid in matrix.pop("student_ids")
+        ]
+        return matrix
     
     def record_result(self, result_data: dict) -> Tuple[bool, str]:
         """
@@ -2257,6 +2267,7 @@ class EvaluationService(VerificationBaseService):
                     {"_id": existing_submission["_id"]},
                     {"$set": submission_data}
                 )
+                invalidate_evaluation_statistics(evaluation_id)
                 
                 return True, str(existing_submission["_id"])
             else:
@@ -2266,6 +2277,7 @@ class EvaluationService(VerificationBaseService):
                 # Crear nueva entrega
                 submission = EvaluationSubmission(**submission_data)
                 result = db.evaluation_submissions.insert_one(submission.to_dict())
+                invalidate_evaluation_statistics(evaluation_id)
                 
                 return True, str(result.inserted_id)
                 
@@ -2497,6 +2509,8 @@ class EvaluationService(VerificationBaseService):
                     )
                 except Exception as e:
                     logging.error(f"Error guardando evaluation_results (study_plans.grade_submission): {str(e)}")
+                # Invalidar tras escribir la entrega y el resultado consolidado
+                invalidate_evaluation_statistics(submission["evaluation_id"])
                 
                 return True, "Entrega calificada exitosamente"
             
@@ -2622,48 +2636,33 @@ class EvaluationService(VerificationBaseService):
     def get_evaluation_statistics(self, evaluation_id: str) -> Dict:
         """
         Obtiene estadísticas completas de una evaluación.
+
+        Se calculan con EvaluationStatisticsEngine (agregación en el servidor o
+        NumPy sobre las notas proyectadas), sin cargar las entregas completas.
         """
         try:
-            # Obtener todas las entregas
-            submissions = self.get_submissions_by_evaluation(evaluation_id)
-            
-            if not submissions:
-                return {
-                    "total_submissions": 0,
-                    "graded_submissions": 0,
-                    "pending_submissions": 0,
-                    "average_grade": 0,
-                    "grade_distribution": {},
-                    "late_submissions": 0
-                }
-            
-            # Calcular estadísticas
-            total = len(submissions)
-            graded = len([s for s in submissions if s.get("grade") is not None])
-            pending = total - graded
-            late = len([s for s in submissions if s.get("is_late", False)])
-            
-            # Calcular promedio de calificaciones
-            grades = [s["grade"] for s in submissions if s.get("grade") is not None]
-            average_grade = sum(grades) / len(grades) if grades else 0
-            
-            # Distribución de calificaciones
-            grade_distribution = {
-                "A (90-100)": len([g for g in grades if g >= 90]),
-                "B (80-89)": len([g for g in grades if 80 <= g < 90]),
-                "C (70-79)": len([g for g in grades if 70 <= g < 80]),
-                "D (60-69)": len([g for g in grades if 60 <= g < 70]),
-                "F (0-59)": len([g for g in grades if g < 60])
-            }
-            
+            validate_object_id(evaluation_id)
+            stats = EvaluationStatisticsEngine(get_db()).submission_statistics(evaluation_id)
+
+            total = stats["count"]
+            graded = stats["scored"]
             return {
                 "total_submissions": total,
                 "graded_submissions": graded,
-                "pending_submissions": pending,
-                "average_grade": round(average_grade, 2),
-                "grade_distribution": grade_distribution,
-                "late_submissions": late,
-                "completion_rate": round((graded / total) * 100, 2) if total > 0 else 0
+                "pending_submissions": total - graded,
+                "average_grade": stats["mean"] if stats["mean"] is not None else 0,
+                "grade_distribution": {
+                    bucket["label"]: bucket["count"] for bucket in stats["histogram"]
+                } if total else {},
+                "late_submissions": stats["late"],
+                "completion_rate": round((graded / total) * 100, 2) if total > 0 else 0,
+                "grade_statistics": {
+                    "stddev": stats["stddev"],
+                    "min": stats["min"],
+                    "max": stats["max"],
+                    "percentiles": stats["percentiles"],
+                    "passing": stats["passing"]
+                }
             }
             
         except Exception as e:
@@ -3064,10 +3063,10 @@ class TopicContentService(VerificationBaseService):
             if not content:
                 return False, "Contenido no encontrado"
                 
-            # Eliminar el contenido
-            result = self.collection.delete_one({"_id": ObjectId(content_id)})
+            # Eliminar el contenido liberando sus referencias a blobs
+            deleted = content_blob_store.delete_documents(self.collection, [ObjectId(content_id)])
             
-            if result.deleted_count > 0:
+            if deleted > 0:
                 return True, "Contenido eliminado exitosamente"
             return False, "No se pudo eliminar el contenido"
         except Exception as e:
@@ -3623,51 +3622,41 @@ class ContentRecommendationService(VerificationBaseService):
     
     def _extract_keywords_from_topic(self, topic: Dict) -> List[str]:
         """
-        Extrae palabras clave de un tema.
+        Extrae los términos de búsqueda de un tema: los del nombre más los 10
+        términos del contenido teórico con mayor TF-IDF respecto del índice de
+        recomendaciones.
         
         Args:
             topic: Diccionario del tema
             
         Returns:
-            Lista de palabras clave
+            Lista de términos normalizados (ver src.shared.keyword_index.tokenize)
         """
-        keywords = []
-        
-        # Añadir nombre del tema
-        if "name" in topic:
-            keywords.append(topic["name"])
+        keywords = tokenize(topic.get("name") or "")
             
-        # Extraer palabras del contenido teórico
-        if "theory_content" in topic and topic["theory_content"]:
-            # Definir palabras a ignorar (stop words)
-            stop_words = set(['el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'y', 'o', 'a', 
-                             'de', 'del', 'en', 'con', 'por', 'para', 'es', 'son', 'al', 'e', 'u'])
-                             
-            # Extraer palabras relevantes
-            words = re.findall(r'\b[a-zA-ZáéíóúÁÉÍÓÚñÑ]{4,}\b', topic["theory_content"].lower())
-            
-            # Filtrar stop words y contar frecuencia
-            word_counts = {}
-            for word in words:
-                if word not in stop_words:
-                    word_counts[word] = word_counts.get(word, 0) + 1
-                    
-            # Obtener las 10 palabras más frecuentes
-            sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
-            frequent_words = [word for word, count in sorted_words[:10]]
-            
-            keywords.extend(frequent_words)
+        # Términos del contenido teórico ponderados por su rareza en el índice
+        theory_content = topic.get("theory_content")
+        if theory_content and isinstance(theory_content, str):
+            keywords.extend(content_recommendation_index.top_terms(Counter(tokenize(theory_content)), limit=10))
             
         # Si no hay suficientes palabras clave, usar el módulo
-        if len(keywords) < 3 and "module_id" in topic:
+        if len(set(keywords)) < 3 and topic.get("module_id"):
             try:
-                module = get_db().modules.find_one({"_id": ObjectId(topic["module_id"])})
-                if module and "name" in module:
-                    keywords.append(module["name"])
+                module = get_db().modules.find_one({"_id": ObjectId(topic["module_id"])}, {"name": 1})
+                if module and module.get("name"):
+                    keywords.extend(tokenize(module["name"]))
             except (TypeError, ValueError):
                 pass
                 
-        return list(set(keywords))  # Eliminar duplicados
+        return list(dict.fromkeys(keywords))  # Eliminar duplicados conservando el orden
+    
+    def _recommend_from_index(self, keywords: List[str], kind: str, limit: int) -> List[Dict]:
+        """Documentos del tipo indicado ordenados por relevancia BM25."""
+        if not keywords:
+            return []
+        ranked = content_recommendation_index.search(keywords, kind, limit=limit)
+        return [self.ensure_json_serializable(document)
+                for document in content_recommendation_index.fetch_ranked(ranked)]
     
     def _recommend_pdfs(self, keywords: List[str]) -> List[Dict]:
         """
@@ -3680,54 +3669,7 @@ class ContentRecommendationService(VerificationBaseService):
             Lista de PDFs recomendados
         """
         try:
-            # Buscar PDFs en la colección de recursos que sean PDFs
-            query = {
-                "$and": [
-                    {
-                        "$or": [
-                            {"tags": {"$in": keywords}},
-                            {"title": {"$regex": "|".join(keywords), "$options": "i"}},
-                            {"description": {"$regex": "|".join(keywords), "$options": "i"}}
-                        ]
-                    },
-                    {
-                        "$or": [
-                            {"file_type": "pdf"},
-                            {"resource_type": "pdf"},
-                            {"content_type": "pdf"}
-                        ]
-                    }
-                ],
-                "status": {"$ne": "deleted"}
-            }
-            
-            # Intentar buscar en diferentes colecciones posibles
-            pdfs_collection = get_db().resources  # O pdfs si existe
-            pdfs = list(pdfs_collection.find(query).limit(5))
-            
-            # Convertir a formato serializable
-            relevant_pdfs = []
-            for pdf in pdfs:
-                pdf = self.ensure_json_serializable(pdf)
-                
-                # Añadir puntuación de relevancia
-                score = 0
-                for keyword in keywords:
-                    if keyword.lower() in pdf.get("title", "").lower():
-                        score += 3
-                    if keyword.lower() in " ".join(pdf.get("tags", [])).lower():
-                        score += 2
-                    description = pdf.get("description", "")
-                    if description and keyword.lower() in description.lower():
-                        score += 1
-                        
-                pdf["relevance_score"] = score
-                relevant_pdfs.append(pdf)
-                
-            # Ordenar por relevancia
-            relevant_pdfs.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-            
-            return relevant_pdfs
+            return self._recommend_from_index(keywords, KIND_PDF, limit=5)
         except Exception as e:
             logging.error(f"Error al recomendar PDFs: {str(e)}")
             return []
@@ -3743,54 +3685,7 @@ class ContentRecommendationService(VerificationBaseService):
             Lista de recursos web recomendados
         """
         try:
-            # Buscar recursos web que contengan las palabras clave
-            query = {
-                "$and": [
-                    {
-                        "$or": [
-                            {"tags": {"$in": keywords}},
-                            {"title": {"$regex": "|".join(keywords), "$options": "i"}},
-                            {"description": {"$regex": "|".join(keywords), "$options": "i"}},
-                            {"url": {"$regex": "|".join(keywords), "$options": "i"}}
-                        ]
-                    },
-                    {
-                        "$or": [
-                            {"resource_type": "link"},
-                            {"content_type": "link"},
-                            {"resource_type": "web"}
-                        ]
-                    }
-                ],
-                "status": {"$ne": "deleted"}
-            }
-            
-            web_resources_collection = get_db().resources
-            web_resources = list(web_resources_collection.find(query).limit(5))
-            
-            # Convertir a formato serializable
-            relevant_resources = []
-            for resource in web_resources:
-                resource = self.ensure_json_serializable(resource)
-                
-                # Añadir puntuación de relevancia
-                score = 0
-                for keyword in keywords:
-                    if keyword.lower() in resource.get("title", "").lower():
-                        score += 3
-                    if keyword.lower() in " ".join(resource.get("tags", [])).lower():
-                        score += 2
-                    description = resource.get("description", "")
-                    if description and keyword.lower() in description.lower():
-                        score += 1
-                        
-                resource["relevance_score"] = score
-                relevant_resources.append(resource)
-                
-            # Ordenar por relevancia
-            relevant_resources.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
-            
-            return relevant_resources
+            return self._recommend_from_index(keywords, KIND_WEB, limit=5)
         except Exception as e:
             logging.error(f"Error al recomendar recursos web: {str(e)}")
             return []
@@ -3807,49 +3702,16 @@ class ContentRecommendationService(VerificationBaseService):
             Dict con 'existing_diagrams' y 'recommended_types'
         """
         try:
-            # Buscar diagramas existentes en topic_contents con content_type='diagram'
-            query = {
-                "$or": [
-                    {"title": {"$regex": "|".join(keywords), "$options": "i"}},
-                    {"content": {"$regex": "|".join(keywords), "$options": "i"}},
-                    {"description": {"$regex": "|".join(keywords), "$options": "i"}}
-                ],
-                "content_type": "diagram",
-                "status": {"$ne": "deleted"}
-            }
-            
-            diagrams_collection = get_db().topic_contents
-            diagrams = list(diagrams_collection.find(query).limit(3))
-            
-            # Convertir a formato serializable
-            relevant_diagrams = []
-            for diagram in diagrams:
-                diagram = self.ensure_json_serializable(diagram)
-                
-                # Añadir puntuación de relevancia
-                score = 0
-                for keyword in keywords:
-                    title = diagram.get("title", "") or diagram.get("content", {}).get("title", "")
-                    if title and keyword.lower() in title.lower():
-                        score += 3
-                    content_str = str(diagram.get("content", ""))
-                    if keyword.lower() in content_str.lower():
-                        score += 1
-                        
-                diagram["relevance_score"] = score
-                relevant_diagrams.append(diagram)
-                
-            # Ordenar por relevancia
-            relevant_diagrams.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
+            # Diagramas existentes (topic_contents con content_type='diagram')
+            relevant_diagrams = self._recommend_from_index(keywords, KIND_DIAGRAM, limit=3)
             
             # Determinar qué tipos de diagramas serían más útiles según las palabras clave
             process_keywords = ['proceso', 'flujo', 'pasos', 'etapas', 'procedimiento', 'secuencia']
-            relation_keywords = ['relación', 'estructura', 'jerarquía', 'organización', 'sistema']
-            concept_keywords = ['concepto', 'idea', 'teoría', 'principio', 'fundamento', 'mapa']
+            relation_keywords = ['relacion', 'estructura', 'jerarquia', 'organizacion', 'sistema']
+            concept_keywords = ['concepto', 'idea', 'teoria', 'principio', 'fundamento', 'mapa']
             
             recommended_types = []
-            for keyword in keywords:
-                keyword = keyword.lower()
+            for keyword in keywords + tokenize(topic_name or ""):
                 if any(k in keyword for k in process_keywords):
                     recommended_types.append("flowchart")
                 if any(k in keyword for k in relation_keywords):
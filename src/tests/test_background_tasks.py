@@ -0,0 +1,190 @@
+import threading
+import unittest
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from unittest.mock import MagicMock, patch
+
+from pymongo.errors import DuplicateKeyError
+
+from src.shared import background_tasks
+from src.shared.background_tasks import CoalescingTaskRunner
+
+
+class TestCoalescingTaskRunner(unittest.TestCase):
+    """Pruebas del ejecutor de tareas con debounce y coalescencia"""
+
+    def setUp(self):
+        self.runner = CoalescingTaskRunner("test_runner", max_workers=2, max_pending=10, mode="thread")
+        self.calls = []
+        self.lock = threading.Lock()
+
+        def handler(student_id, attempt=0):
+            with self.lock:
+                self.calls.append((student_id, attempt))
+
+        self.runner.register("refresh", handler, debounce_seconds=0.05)
+
+    def test_burst_is_coalesced_per_key(self):
+        statuses = [self.runner.submit("refresh", "s1", student_id="s1", attempt=i) for i in range(20)]
+        self.runner.submit("refresh", "s2", student_id="s2")
+        self.runner.flush()
+
+        self.assertEqual(statuses[0], "scheduled")
+        self.assertEqual(set(statuses[1:]), {"coalesced"})
+        # Una sola ejecución por clave, con los últimos argumentos
+        self.assertEqual(sorted(self.calls), [("s1", 19), ("s2", 0)])
+
+    def test_submit_while_running_schedules_single_rerun(self):
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def slow(student_id):
+            runs.append(student_id)
+            started.set()
+            release.wait(2)
+
+        self.runner.register("slow", slow, debounce_seconds=0)
+        self.runner.submit("slow", "s1", student_id="s1")
+        self.assertTrue(started.wait(2))
+        self.assertEqual(self.runner.submit("slow", "s1", student_id="s1"), "rerun")
+        self.assertEqual(self.runner.submit("slow", "s1", student_id="s1"), "rerun")
+        release.set()
+        self.runner.flush()
+        self.assertEqual(runs, ["s1", "s1"])
+
+    def test_unknown_task_type_raises(self):
+        with self.assertRaises(ValueError):
+            self.runner.submit("missing", "k")
+
+
+
+class TestInlineDurableDrain(unittest.TestCase):
+    """Pruebas del procesamiento inline de las tareas durables de una petición"""
+
+    def setUp(self):
+        self.tasks = {}
+        collection = MagicMock()
+
+        def upsert(task_filter, update, upsert=False):
+            key = (task_filter["task_type"], task_filter["key"])
+            task = self.tasks.setdefault(key, {"_id": key, "task_type": key[0], "key": key[1], "status": "pending",
+                                              "attempts": 0, "run_after": update["$setOnInsert"]["run_after"]})
+            task["kwargs"] = update["$set"]["kwargs"]
+
+        def claim(query, update, return_document=None):
+            task = self.tasks.get((query["task_type"], query["key"]))
+            if not task or task["status"] != "pending" or task["run_after"] > query["run_after"]["$lte"]:
+                return None
+            task["status"] = "processing"
+            task["attempts"] += 1
+            return dict(task)
+
+        collection.update_one.side_effect = upsert
+        collection.find_one_and_update.side_effect = claim
+        collection.delete_one.side_effect = lambda query: self.tasks.pop(query["_id"], None)
+        db = MagicMock()
+        db.__getitem__.return_value = collection
+        patcher = patch.object(background_tasks, "get_db", return_value=db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.runner = CoalescingTaskRunner("test_inline", mode="durable", inline_drain_seconds=5)
+        self.calls = []
+        self.runner.register("sync", lambda module_id: self.calls.append(module_id), debounce_seconds=0)
+        self.runner.register("debounced", lambda module_id: self.calls.append(module_id), debounce_seconds=60)
+
+    def test_request_drains_its_own_tasks_once(self):
+        self.runner.submit("sync", "m1", module_id="m1")
+        self.runner.submit("sync", "m1", module_id="m1")
+        self.runner.submit("sync", "m2", module_id="m2")
+
+        result = self.runner.drain_submitted_tasks()
+
+        # Cada clave corre una sola vez
+        self.assertEqual(result, {"processed": 2, "failed": 0, "deferred": 0})
+        self.assertEqual(self.calls, ["m1", "m2"])
+        self.assertEqual(self.tasks, {})
+        self.assertEqual(self.runner.drain_submitted_tasks()["processed"], 0)
+
+    def test_debounced_tasks_are_left_to_the_cron(self):
+        self.runner.submit("debounced", "m1", module_id="m1")
+
+        result = self.runner.drain_submitted_tasks()
+
+        self.assertEqual(result, {"processed": 0, "failed": 0, "deferred": 1})
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.tasks[("debounced", "m1")]["status"], "pending")
+
+    def test_tasks_see_the_remaining_drain_budget(self):
+        budgets = []
+        self.runner.register("job", lambda: budgets.append(self.runner.remaining_seconds(40)), debounce_seconds=0)
+        self.runner.submit("job", "j1")
+
+        self.runner.drain_submitted_tasks()
+
+        self.assertEqual(len(budgets), 1)
+        self.assertLessEqual(budgets[0], 5)
+        self.assertEqual(self.runner.remaining_seconds(40), 40)
+
+    def test_zero_budget_defers_to_cron(self):
+        self.runner.submit("sync", "m1", module_id="m1")
+
+        result = self.runner.drain_submitted_tasks(time_budget_seconds=0)
+
+        self.assertEqual(result["deferred"], 1)
+        self.assertEqual(self.calls, [])
+        self.assertIn(("sync", "m1"), self.tasks)
+
+
+class TestDurableStaleRecovery(unittest.TestCase):
+    """Pruebas de la recuperación de tareas durables abandonadas en "processing" """
+
+    def setUp(self):
+        self.runner = CoalescingTaskRunner("test_stale", mode="durable")
+        self.collection = MagicMock()
+
+    def test_stale_task_is_reset_to_pending(self):
+        self.collection.find.return_value = [{"_id": "t1", "attempts": 1}]
+
+        self.runner._recover_stale_tasks(self.collection)
+
+        self.collection.update_one.assert_called_once_with(
+            {"_id": "t1", "status": "processing"}, {"$set": {"status": "pending"}})
+        self.collection.delete_one.assert_not_called()
+
+    def test_stale_task_with_pending_sibling_is_dropped(self):
+        self.collection.find.return_value = [{"_id": "t1", "attempts": 1}, {"_id": "t2", "attempts": 1}]
+        self.collection.update_one.side_effect = [DuplicateKeyError("duplicate"), None]
+
+        self.runner._recover_stale_tasks(self.collection)
+
+        # El índice único rechaza t1 sin detener la recuperación de t2
+        self.collection.delete_one.assert_called_once_with({"_id": "t1", "status": "processing"})
+        self.assertEqual(self.collection.update_one.call_count, 2)
+
+    def test_exhausted_stale_task_fails(self):
+        self.collection.find.return_value = [{"_id": "t1", "attempts": background_tasks.DURABLE_MAX_ATTEMPTS}]
+
+        self.runner._recover_stale_tasks(self.collection)
+
+        self.collection.update_one.assert_called_once_with(
+            {"_id": "t1", "status": "processing"}, {"$set": {"status": "failed"}})
+
+    def test_submit_skips_exhausted_pending_task(self):
+        db = MagicMock()
+        db.__getitem__.return_value = self.collection
+        self.runner.register("sync", lambda: None)
+        with patch.object(background_tasks, "get_db", return_value=db):
+            self.runner.submit("sync", "m1")
+
+        task_filter = self.collection.update_one.call_args[0][0]
+        self.assertEqual(task_filter["attempts"], {"$lt": background_tasks.DURABLE_MAX_ATTEMPTS})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from pymongo.errors import DuplicateKeyError
+
+from src.shared.blob_store import ContentBlobStore, blob_text_length, is_blob_ref
+
+
+class _BlobCollection:
+    """Colección en memoria con las operaciones que usa ContentBlobStore"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one_and_update(self, query, update, projection=None):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            return None
+        doc["ref_count"] += update["$inc"]["ref_count"]
+        return {"_id": doc["_id"]}
+
+    def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicado")
+        self.docs[doc["_id"]] = dict(doc)
+
+    def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is not None:
+            doc["ref_count"] += update["$inc"]["ref_count"]
+
+    def find(self, query, projection=None):
+        if "ref_count" in query:
+            return _Cursor([{"_id": sha} for sha, doc in self.docs.items() if doc["ref_count"] <= 0])
+        return [dict(self.docs[sha]) for sha in query["_id"]["$in"] if sha in self.docs]
+
+    def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        deleted = doc is not None and doc["ref_count"] <= 0
+        if deleted:
+            del self.docs[query["_id"]]
+        return MagicMock(deleted_count=int(deleted))
+
+
+class _Cursor(list):
+    def limit(self, n):
+        return _Cursor(self[:n])
+
+
+class _ContentCollection:
+    """Colección de contenidos en memoria (topic_contents / virtual_topic_contents)"""
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find_one_and_delete(self, query, projection=None):
+        return self.docs.pop(query["_id"], None)
+
+
+class TestContentBlobStore(unittest.TestCase):
+    """Pruebas del almacén de blobs direccionado por contenido"""
+
+    def setUp(self):
+        self.collection = _BlobCollection()
+        db = MagicMock()
+        db.__getitem__.return_value = self.collection
+        self.store = ContentBlobStore(db=db, enabled=True, min_bytes=64)
+        self.html = "<html><body>" + ("<div class='slide'>contenido</div>" * 50) + "</body></html>"
+
+    def test_identical_html_is_stored_once_and_ref_counted(self):
+        ref_a = self.store.put(self.html)
+        ref_b = self.store.put(self.html)
+
+        self.assertEqual(ref_a, ref_b)
+        self.assertEqual(len(self.collection.docs), 1)
+        blob = self.collection.docs[ref_a["blob_ref"]]
+        self.assertEqual(blob["ref_count"], 2)
+        self.assertLess(blob["compressed_size"], blob["size"])
+
+        self.store.release(ref_a)
+        self.assertEqual(blob["ref_count"], 1)
+
+    def test_resolve_expands_refs_in_place(self):
+        content = self.store.externalize_fields({"content_html": self.html, "narrative_text": "hola"})
+        self.assertTrue(is_blob_ref(content["content_html"]))
+        self.assertEqual(blob_text_length(content["content_html"]), len(self.html))
+
+        # Un proceso nuevo (sin caché) debe leer y descomprimir desde la colección
+        self.store._text_cache.clear()
+        docs = [{"content": content}, {"content": {"content_html": "<p>corto</p>"}}]
+        self.store.resolve(docs)
+        self.assertEqual(docs[0]["content"]["content_html"], self.html)
+        self.assertEqual(docs[1]["content"]["content_html"], "<p>corto</p>")
+
+    def test_small_html_and_disabled_store_stay_inline(self):
+        self.assertEqual(self.store.externalize("<p>x</p>"), "<p>x</p>")
+        disabled = ContentBlobStore(db=MagicMock(), enabled=False, min_bytes=64)
+        self.assertEqual(disabled.externalize(self.html), self.html)
+        self.assertEqual(self.collection.docs, {})
+
+    def test_hard_delete_releases_refs_and_gc_removes_blob(self):
+        content = self.store.externalize_fields({"content_html": self.html})
+        # La copia virtual del contenido suma su propia referencia
+        self.store.put(self.html)
+        contents = _ContentCollection([{"_id": "c1", "content": content}])
+        virtual_contents = _ContentCollection([{"_id": "v1", "content": dict(content)}])
+
+        self.assertEqual(self.store.delete_documents(contents, ["c1", "missing"]), 1)
+        self.assertEqual(self.store.collect_garbage(), 0)
+
+        self.assertEqual(self.store.delete_documents(virtual_contents, ["v1"]), 1)
+        self.assertEqual(self.store.collect_garbage(), 1)
+        self.assertEqual(self.collection.docs, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
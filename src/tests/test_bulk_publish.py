@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared.exceptions import AppException
+from src.study_plans import bulk_publish_service
+from src.study_plans.bulk_publish_service import BulkTopicPublisher, MODULE_VIRTUAL_SYNC_TASK
+
+
+class TestBulkPublish(unittest.TestCase):
+    """Pruebas de la publicación en bloque de temas"""
+
+    def setUp(self):
+        self.plan_id = ObjectId()
+        self.module_a, self.module_b = ObjectId(), ObjectId()
+        self.ready = {"_id": ObjectId(), "module_id": self.module_a, "name": "Listo", "theory_content": "Teoría"}
+        self.published = {"_id": ObjectId(), "module_id": self.module_a, "name": "Publicado",
+                           "theory_content": "Teoría", "published": True}
+        self.invalid = {"_id": ObjectId(), "module_id": self.module_b, "name": "Inválido",
+                        "theory_content": "[object Object]"}
+        self.ready_b = {"_id": ObjectId(), "module_id": self.module_b, "name": "Listo B", "theory_content": "Teoría"}
+        topics = [self.ready, self.published, self.invalid, self.ready_b]
+
+        self.db = MagicMock()
+        self.db.study_plans_per_subject.find_one.return_value = {"_id": self.plan_id}
+        self.db.modules.find.return_value = [{"_id": self.module_a}, {"_id": self.module_b}]
+        self.db.topics.find.return_value = topics
+        self.db.topics.bulk_write.return_value.modified_count = 2
+        self.db.topic_contents.aggregate.return_value = [
+            {"_id": {"topic_id": t["_id"], "status": "narrative_ready"}, "count": 1} for t in topics
+        ]
+        self.db.evaluations.aggregate.return_value = [
+            {"_id": t["_id"]} for t in (self.ready, self.published, self.invalid)
+        ]
+
+        patcher = patch.object(bulk_publish_service, "background_runner")
+        self.runner = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(bulk_publish_service, "invalidate_study_plan_tree")
+        self.invalidate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_plan_is_evaluated_with_batched_queries_and_published_in_one_bulk_write(self):
+        result = BulkTopicPublisher(self.db).publish(study_plan_id=str(self.plan_id))
+
+        statuses = {item["name"]: (item["status"], item["missing_requirements"]) for item in result["topics"]}
+        self.assertEqual(statuses, {
+            "Listo": ("published", []),
+            "Publicado": ("already_published", []),
+            "Inválido": ("blocked", ["valid_theory_content"]),
+            "Listo B": ("blocked", ["evaluation_quiz"]),
+        })
+        self.assertEqual((result["published"], result["already_published"], result["blocked"]), (2, 1, 2))
+
+        self.assertEqual(self.db.topics.find.call_count, 1)
+        self.assertEqual(self.db.topic_contents.aggregate.call_count, 1)
+        self.assertEqual(self.db.evaluations.aggregate.call_count, 1)
+        operations = self.db.topics.bulk_write.call_args[0][0]
+        self.assertEqual([op._filter["_id"] for op in operations], [self.ready["_id"]])
+        self.assertIn("auto_published_at", operations[0]._doc["$set"])
+
+        self.runner.submit.assert_called_once_with(MODULE_VIRTUAL_SYNC_TASK, str(self.module_a),
+                                                   module_id=str(self.module_a))
+        self.assertEqual(result["virtual_sync_enqueued"], [str(self.module_a)])
+
+    def test_dry_run_reports_without_writing(self):
+        result = BulkTopicPublisher(self.db).publish(module_id=str(self.module_a), dry_run=True)
+
+        self.assertEqual(result["total_topics"], 4)
+        self.assertEqual(result["published"], 0)
+        self.db.topics.bulk_write.assert_not_called()
+        self.runner.submit.assert_not_called()
+        self.invalidate.assert_not_called()
+
+    def test_scope_must_be_a_single_existing_module_or_plan(self):
+        publisher = BulkTopicPublisher(self.db)
+        with self.assertRaises(AppException) as ctx:
+            publisher.publish(module_id=str(self.module_a), study_plan_id=str(self.plan_id))
+        self.assertEqual(ctx.exception.code, AppException.BAD_REQUEST)
+
+        self.db.study_plans_per_subject.find_one.return_value = None
+        with self.assertRaises(AppException) as ctx:
+            publisher.publish(study_plan_id=str(self.plan_id))
+        self.assertEqual(ctx.exception.code, AppException.NOT_FOUND)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from unittest.mock import MagicMock, patch
+
+from src.shared.cache import LRUCache, LocalCacheBackend, VersionedCache, content_hash
+from src.shared.metrics import get_metrics_snapshot
+
+
+class TestLRUCache(unittest.TestCase):
+    """Pruebas para la caché LRU compartida"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache("test_lru_eviction", max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiration(self):
+        cache = LRUCache("test_lru_ttl", max_size=4, ttl_seconds=5)
+        with patch("src.shared.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("src.shared.cache.time.monotonic", return_value=104.0):
+            self.assertEqual(cache.get("a"), (True, 1))
+        with patch("src.shared.cache.time.monotonic", return_value=105.5):
+            self.assertEqual(cache.get("a"), (False, None))
+
+    def test_hit_rate_is_reported_in_metrics(self):
+        cache = LRUCache("test_lru_metrics", max_size=4)
+        cache.get_or_compute("k", lambda: 1)
+        cache.get_or_compute("k", lambda: 2)
+        stats = get_metrics_snapshot()["providers"]["cache.test_lru_metrics"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+
+    def test_content_hash_separates_parts(self):
+        self.assertNotEqual(content_hash("ab", "c"), content_hash("a", "bc"))
+        self.assertEqual(content_hash("<p>x</p>", True), content_hash("<p>x</p>", True))
+
+
+class TestVersionedCache(unittest.TestCase):
+    """Pruebas de la caché con versión por ámbito sobre un backend compartido"""
+
+    def setUp(self):
+        # Backend en memoria que simula el almacén compartido entre instancias
+        self.shared = LocalCacheBackend("test_shared_store", register_metrics=False)
+        self.instance_a = VersionedCache("test_versioned", ttl_seconds=60, backend=self.shared)
+        self.instance_b = VersionedCache("test_versioned", ttl_seconds=60, backend=self.shared)
+
+    def test_value_is_shared_between_instances(self):
+        self.instance_a.set("topic1", {"total": 3}, "status")
+        self.assertEqual(self.instance_b.get("topic1", "status"), (True, {"total": 3}))
+        self.assertEqual(self.instance_b.get("topic1", "other"), (False, None))
+
+    def test_bump_in_one_instance_invalidates_all(self):
+        self.instance_a.set("topic1", {"total": 3}, "status")
+        self.instance_b.get("topic1", "status")  # queda también en el nivel local de B
+        self.instance_a.set("topic2", {"total": 1}, "status")
+
+        self.instance_a.bump_version("topic1")
+
+        self.assertEqual(self.instance_b.get("topic1", "status"), (False, None))
+        self.assertEqual(self.instance_a.get("topic1", "status"), (False, None))
+        self.assertEqual(self.instance_b.get("topic2", "status"), (True, {"total": 1}))
+
+    def test_backend_errors_are_treated_as_misses(self):
+        backend = MagicMock()
+        backend.get_counter.side_effect = RuntimeError("sin conexión")
+        cache = VersionedCache("test_versioned_errors", backend=backend)
+        cache.set("topic1", {"total": 3})
+        self.assertEqual(cache.get("topic1"), (False, None))
+        backend.set.assert_not_called()
+
+    def test_value_computed_before_concurrent_bump_is_not_served(self):
+        hit, _, version = self.instance_a.get_with_version("topic1", "status")
+        self.assertFalse(hit)
+        # Otra instancia escribe e invalida mientras A recalcula
+        self.instance_b.bump_version("topic1")
+        self.instance_a.set("topic1", {"total": 3}, "status", version=version)
+
+        self.assertEqual(self.instance_a.get("topic1", "status"), (False, None))
+        self.assertEqual(self.instance_b.get("topic1", "status"), (False, None))
+
+    def test_counters_are_bounded_and_never_go_back(self):
+        backend = LocalCacheBackend("test_bounded_counters", register_metrics=False, max_counters=2)
+        stale = backend.incr("a")
+        backend.incr("b")
+        backend.incr("c")  # expulsa "a"
+
+        self.assertEqual(len(backend._counters), 2)
+        self.assertGreater(backend.get_counter("a"), stale)
+
+
+if __name__ == '__main__':
+    unittest.main()
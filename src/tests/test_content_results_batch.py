@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.content.services import ContentResultService
+
+
+class TestContentResultsBatch(unittest.TestCase):
+    """Pruebas de la ingesta por lotes de ContentResult"""
+
+    def setUp(self):
+        with patch('src.content.services.get_db', return_value=MagicMock()):
+            self.service = ContentResultService()
+        self.service._schedule_side_effects = MagicMock()
+        self.service._update_linked_content_evaluations_best_effort = MagicMock()
+
+        self.student_id = ObjectId()
+        self.topic_id = ObjectId()
+        self.virtual_topic_id = ObjectId()
+        self.content_id = ObjectId()
+        self.vc_ids = [ObjectId(), ObjectId()]
+        self.service.virtual_contents.find.return_value = [
+            {"_id": vc_id, "student_id": self.student_id, "content_id": self.content_id,
+             "virtual_topic_id": self.virtual_topic_id, "content_type": "quiz"}
+            for vc_id in self.vc_ids
+        ]
+        self.service.virtual_topics.find.return_value = [
+            {"_id": self.virtual_topic_id, "topic_id": self.topic_id, "order": 1}
+        ]
+        self.service.topic_contents.find.return_value = [
+            {"_id": self.content_id, "topic_id": self.topic_id, "content_type": "quiz", "content": {}}
+        ]
+
+    def _item(self, vc_id, score=0.8):
+        return {"virtual_content_id": str(vc_id), "score": score, "session_data": {"completion_percentage": 100}}
+
+    def test_metadata_resolved_with_single_in_query_per_collection(self):
+        items = [self._item(self.vc_ids[0]), self._item(self.vc_ids[1]), self._item(self.vc_ids[0], 0.5)]
+        result = self.service.record_results_batch(items, student_id=str(self.student_id))
+
+        self.assertEqual(len(result["inserted"]), 3)
+        self.assertEqual(result["errors"], [])
+        self.service.virtual_contents.find.assert_called_once()
+        self.service.virtual_topics.find.assert_called_once()
+        self.service.topic_contents.find.assert_called_once()
+        self.service.collection.insert_many.assert_called_once()
+        # Efectos secundarios una vez por (estudiante, topic)
+        self.service._schedule_side_effects.assert_called_once_with(str(self.student_id), str(self.topic_id))
+
+    def test_partial_failures_are_reported_by_index(self):
+        other_student = ObjectId()
+        self.service.virtual_contents.find.return_value[1]["student_id"] = other_student
+        items = [self._item(self.vc_ids[0]), self._item(self.vc_ids[1]), self._item(ObjectId()), "x"]
+        result = self.service.record_results_batch(items, student_id=str(self.student_id))
+
+        self.assertEqual([entry["index"] for entry in result["inserted"]], [0])
+        self.assertEqual([error["index"] for error in result["errors"]], [1, 2, 3])
+
+    def test_write_errors_map_back_to_input_positions(self):
+        self.service.collection.insert_many.side_effect = BulkWriteError(
+            {"writeErrors": [{"index": 1, "errmsg": "duplicate"}]}
+        )
+        items = ["x", self._item(self.vc_ids[0]), self._item(self.vc_ids[1])]
+        result = self.service.record_results_batch(items, student_id=str(self.student_id))
+
+        self.assertEqual([entry["index"] for entry in result["inserted"]], [1])
+        self.assertEqual(result["errors"], [
+            {"index": 0, "error": "Payload inválido para ContentResult"},
+            {"index": 2, "error": "duplicate"},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content.content_type_registry import ContentTypeRegistry
+from src.shared.cache import LocalCacheBackend
+
+
+class TestContentTypeRegistry(unittest.TestCase):
+    """Pruebas del registro en memoria de tipos de contenido"""
+
+    def setUp(self):
+        self.docs = [
+            {"_id": ObjectId(), "code": "slide", "name": "Slide", "status": "active"},
+            {"_id": ObjectId(), "code": "documents", "name": "Documentos", "status": "active", "subcategory": "static"},
+        ]
+        self.collection = MagicMock()
+        self.collection.find.side_effect = lambda query: [dict(doc) for doc in self.docs]
+        self.backend = LocalCacheBackend("test_registry_backend", register_metrics=False)
+        self.registry = ContentTypeRegistry(collection=self.collection, ttl_seconds=300,
+                                            version_check_seconds=0, backend=self.backend,
+                                            register_metrics=False)
+
+    def test_lookups_resolve_aliases_with_a_single_load(self):
+        self.assertEqual(self.registry.get("slide")["name"], "Slide")
+        self.assertEqual(self.registry.get(" PDF ")["code"], "documents")
+        self.assertEqual(self.registry.get("slide_template")["code"], "slide_template")
+        self.assertIsNone(self.registry.get("game"))
+        self.assertEqual(set(self.registry.get_many(["slide", "doc", "game", None])), {"slide", "doc"})
+        self.assertEqual([ct["code"] for ct in self.registry.list("static")], ["documents"])
+
+        self.assertEqual(self.collection.find.call_count, 1)
+
+    def test_version_bump_from_another_instance_forces_reload(self):
+        self.registry.get("slide")
+        other = ContentTypeRegistry(collection=self.collection, backend=self.backend, register_metrics=False)
+
+        self.docs.append({"_id": ObjectId(), "code": "video", "name": "Video", "status": "active"})
+        other.invalidate()
+
+        self.assertEqual(self.registry.get("video_content")["code"], "video")
+        self.assertEqual(self.collection.find.call_count, 2)
+
+    def test_returned_definitions_do_not_alias_the_snapshot(self):
+        self.registry.get("slide")["name"] = "modificado"
+        self.assertEqual(self.registry.get("slide")["name"], "Slide")
+
+
+if __name__ == '__main__':
+    unittest.main()
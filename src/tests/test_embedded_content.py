@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content.embedded_content_service import EmbeddedContentService
+from src.content.models import ContentTypes
+
+
+class TestEmbeddedContentBatch(unittest.TestCase):
+    """Pruebas del análisis de embedding por lote de un tema"""
+
+    def setUp(self):
+        self.topic_id = ObjectId()
+        self.slide_1, self.slide_2 = ObjectId(), ObjectId()
+        self.docs = [
+            {"_id": self.slide_2, "content_type": ContentTypes.SLIDE, "status": "active", "order": 2,
+             "content": {"title": "Segunda"}},
+            {"_id": self.slide_1, "content_type": ContentTypes.SLIDE, "status": "draft", "order": 1,
+             "content": {"title": "Primera", "slide_plan": "two-column"}},
+            {"_id": ObjectId(), "content_type": ContentTypes.TEXT, "status": "active",
+             "parent_content_id": self.slide_1, "content": "Texto corto"},
+            {"_id": ObjectId(), "content_type": ContentTypes.VIDEO, "status": "active",
+             "parent_content_id": self.slide_2, "content": {}},
+            {"_id": ObjectId(), "content_type": ContentTypes.TEXT, "status": "embedded",
+             "parent_content_id": self.slide_2},
+        ]
+        self.collection = MagicMock()
+        self.collection.find.side_effect = lambda query, projection=None: [dict(d) for d in self.docs]
+        self.collection.find_one.side_effect = lambda query: next(
+            (dict(d) for d in self.docs if d["_id"] == query["_id"]), None
+        )
+        db = MagicMock()
+        db.topic_contents = self.collection
+        self.service = EmbeddedContentService(db)
+
+    def test_recommendations_match_pairwise_analysis_with_one_query(self):
+        recommendations = self.service.get_embedding_recommendations(str(self.topic_id))
+
+        self.assertEqual(self.collection.find.call_count, 1)
+        self.collection.find_one.assert_not_called()
+        self.assertEqual([r["slide_title"] for r in recommendations], ["Primera", "Segunda"])
+        for recommendation in recommendations:
+            expected = self.service.analyze_content_embedding_strategy(
+                recommendation["slide_id"], recommendation["content_id"]
+            )
+            self.assertEqual(recommendation["strategy"], expected["strategy"])
+            self.assertAlmostEqual(recommendation["confidence"], expected["confidence"])
+
+    def test_statistics_use_a_single_projected_query(self):
+        statistics = self.service.get_embedding_statistics(str(self.topic_id))
+
+        self.assertEqual(statistics["total_slides"], 2)
+        self.assertEqual(statistics["embedded_contents"], 1)
+        self.assertEqual(statistics["separate_contents"], 2)
+        self.assertAlmostEqual(statistics["embedding_ratio"], 1 / 3)
+        self.assertIsNotNone(self.collection.find.call_args[0][1])
+        self.collection.count_documents.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
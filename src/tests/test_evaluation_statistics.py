@@ -0,0 +1,128 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from src.shared import evaluation_statistics
+from src.shared.cache import LocalCacheBackend, VersionedCache
+from src.shared.evaluation_statistics import (
+    EvaluationStatisticsEngine,
+    compute_score_statistics,
+    invalidate_evaluation_statistics,
+)
+
+
+class TestEvaluationStatistics(unittest.TestCase):
+    """Pruebas del motor de estadísticas de calificaciones"""
+
+    def setUp(self):
+        self.evaluation_id = ObjectId()
+        self.submissions = [
+            {"grade": 95, "is_late": False, "status": "graded"},
+            {"grade": 85, "is_late": True, "status": "graded"},
+            {"grade": 72.5, "status": "graded"},
+            {"grade": 40, "status": "graded"},
+            {"grade": None, "status": "submitted"},
+            {"status": "submitted", "is_late": True},
+        ]
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: getattr(self.db, name)
+        self.db.evaluation_submissions.find.side_effect = lambda match, projection: iter(
+            [{k: v for k, v in doc.items() if k in projection} for doc in self.submissions]
+        )
+
+        cache = VersionedCache("test_evaluation_statistics", ttl_seconds=60,
+                               backend=LocalCacheBackend("test_evaluation_statistics_backend", register_metrics=False))
+        for patcher in (patch.object(evaluation_statistics, "_statistics_cache", cache),
+                        patch.object(EvaluationStatisticsEngine, "_server_percentiles", None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_compute_score_statistics(self):
+        stats = compute_score_statistics([95, 85, 72.5, 40])
+
+        self.assertEqual(stats["scored"], 4)
+        self.assertEqual(stats["mean"], 73.12)
+        self.assertEqual(stats["min"], 40)
+        self.assertEqual(stats["max"], 95)
+        self.assertEqual(stats["percentiles"]["p50"], 78.75)
+        self.assertEqual([b["count"] for b in stats["histogram"]], [1, 1, 1, 0, 1])
+
+    def test_empty_scores(self):
+        stats = compute_score_statistics([])
+
+        self.assertEqual(stats["scored"], 0)
+        self.assertIsNone(stats["mean"])
+        self.assertIsNone(stats["percentiles"]["p90"])
+        self.assertEqual(sum(b["count"] for b in stats["histogram"]), 0)
+
+    def test_numpy_fallback_when_percentile_unsupported(self):
+        self.db.evaluation_submissions.aggregate.side_effect = OperationFailure("unknown group operator '$percentile'", code=15952)
+        engine = EvaluationStatisticsEngine(self.db)
+
+        stats = engine.submission_statistics(str(self.evaluation_id))
+
+        self.assertEqual(stats["source"], "numpy")
+        self.assertEqual(stats["count"], 6)
+        self.assertEqual(stats["scored"], 4)
+        self.assertEqual(stats["late"], 2)
+        self.assertEqual(stats["passing"], 3)
+        # El cursor solo proyecta la nota y los indicadores
+        projection = self.db.evaluation_submissions.find.call_args[0][1]
+        self.assertEqual(set(projection), {"_id", "grade", "is_late", "status"})
+
+        # El servidor sin $percentile no se vuelve a intentar
+        EvaluationStatisticsEngine(self.db).result_statistics(str(self.evaluation_id))
+        self.assertEqual(self.db.evaluation_submissions.aggregate.call_count, 1)
+
+    def test_transient_aggregation_error_is_not_remembered(self):
+        self.db.evaluation_submissions.aggregate.side_effect = OperationFailure("operation exceeded time limit", code=50)
+
+        stats = EvaluationStatisticsEngine(self.db).submission_statistics(str(self.evaluation_id))
+
+        self.assertEqual(stats["source"], "numpy")
+        self.assertIsNone(EvaluationStatisticsEngine._server_percentiles)
+
+    def test_server_side_statistics(self):
+        self.db.evaluation_submissions.aggregate.return_value = iter([{
+            "_id": None, "count": 6, "scored": 4, "mean": 73.125, "stddev": 20.1, "min": 40, "max": 95,
+            "late": 2, "completed": 0, "passing": 3, "percentiles": [66.0, 78.75, 87.5, 92.0],
+            "bucket_0": 1, "bucket_1": 1, "bucket_2": 1, "bucket_3": 0, "bucket_4": 1
+        }])
+
+        stats = EvaluationStatisticsEngine(self.db).submission_statistics(str(self.evaluation_id))
+
+        self.assertEqual(stats["source"], "server")
+        self.assertEqual(stats["mean"], 73.12)
+        self.assertEqual(stats["percentiles"], {"p25": 66.0, "p50": 78.75, "p75": 87.5, "p90": 92.0})
+        self.assertEqual(stats["histogram"][0], {"label": "A (90-100)", "min": 90, "max": None, "count": 1})
+        self.db.evaluation_submissions.find.assert_not_called()
+        pipeline = self.db.evaluation_submissions.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {"$match": {"evaluation_id": self.evaluation_id}})
+        self.assertIn("$percentile", pipeline[-1]["$group"]["percentiles"])
+
+    def test_cache_is_invalidated_by_writes(self):
+        self.db.evaluation_submissions.aggregate.side_effect = OperationFailure("unknown group operator", code=15952)
+        engine = EvaluationStatisticsEngine(self.db)
+
+        engine.submission_statistics(str(self.evaluation_id))
+        engine.submission_statistics(str(self.evaluation_id))
+        self.assertEqual(self.db.evaluation_submissions.find.call_count, 1)
+
+        self.submissions.append({"grade": 100, "status": "graded"})
+        invalidate_evaluation_statistics(str(self.evaluation_id))
+        stats = engine.submission_statistics(str(self.evaluation_id))
+
+        self.assertEqual(self.db.evaluation_submissions.find.call_count, 2)
+        self.assertEqual(stats["scored"], 5)
+        self.assertEqual(stats["max"], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
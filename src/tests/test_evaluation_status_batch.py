@@ -0,0 +1,69 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.study_plans.evaluation_status_service import EvaluationStatusBatch
+
+
+class TestEvaluationStatusBatch(unittest.TestCase):
+    """Pruebas del estado de evaluaciones en lote"""
+
+    def setUp(self):
+        self.eval_a, self.eval_b = ObjectId(), ObjectId()
+        self.ana, self.beto = ObjectId(), ObjectId()
+        self.evaluations = [
+            {"_id": str(self.eval_a), "title": "Quiz 1", "weight": 0.4},
+            {"_id": str(self.eval_b), "title": "Proyecto", "weight": 0.6},
+        ]
+        self.submissions = [
+            # student_id como string (create_submission) y como ObjectId (modelo)
+            {"_id": ObjectId(), "evaluation_id": self.eval_a, "student_id": str(self.ana), "status": "submitted",
+             "grade": 60, "updated_at": datetime(2026, 1, 1)},
+            {"_id": ObjectId(), "evaluation_id": self.eval_a, "student_id": self.ana, "status": "graded",
+             "grade": 70, "final_grade": 80, "updated_at": datetime(2026, 2, 1)},
+            {"_id": ObjectId(), "evaluation_id": self.eval_b, "student_id": self.beto, "status": "resubmitted",
+             "grade": None, "attempts": 2, "updated_at": datetime(2026, 1, 5)},
+        ]
+        self.db = MagicMock()
+        self.db.evaluation_submissions.find.side_effect = self._find
+
+    def _find(self, query, projection=None):
+        evaluations = query["evaluation_id"]["$in"]
+        students = query["student_id"]["$in"]
+        return [dict(s) for s in self.submissions
+                if s["evaluation_id"] in evaluations and s["student_id"] in students]
+
+    def test_student_statuses_come_from_one_query_with_both_id_forms(self):
+        statuses = EvaluationStatusBatch(self.db).statuses_for_student(self.evaluations, str(self.ana))
+
+        self.assertEqual(self.db.evaluation_submissions.find.call_count, 1)
+        query = self.db.evaluation_submissions.find.call_args[0][0]
+        self.assertEqual(query["student_id"]["$in"], [str(self.ana), self.ana])
+        self.assertEqual([(s["submitted"], s["grade"]) for s in statuses], [(True, 70), (False, None)])
+
+    def test_matrix_rows_align_with_evaluations(self):
+        matrix = EvaluationStatusBatch(self.db).matrix(self.evaluations, [str(self.ana), self.beto, str(self.beto)])
+
+        self.assertEqual(self.db.evaluation_submissions.find.call_count, 1)
+        self.assertEqual(matrix["student_ids"], [str(self.ana), str(self.beto)])
+        self.assertEqual([e["title"] for e in matrix["evaluations"]], ["Quiz 1", "Proyecto"])
+        ana_row, beto_row = matrix["cells"]
+        self.assertEqual((ana_row[0]["status"], ana_row[0]["grade"]), ("graded", 80))
+        self.assertIsNone(ana_row[1])
+        self.assertIsNone(beto_row[0])
+        self.assertEqual(beto_row[1]["attempts"], 2)
+        self.assertEqual(matrix["summary"], [
+            {"submitted": 1, "pending": 1, "average_grade": 80.0},
+            {"submitted": 1, "pending": 1, "average_grade": None},
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
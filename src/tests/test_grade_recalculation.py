@@ -0,0 +1,166 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared import grade_recalculation
+from src.shared.exceptions import AppException
+from src.shared.grade_recalculation import (
+    GRADE_RECALC_TASK,
+    JOB_COMPLETED,
+    WeightedGradeRecalculator,
+    compute_weighted_grades,
+    resolve_topic_weights,
+)
+
+
+class TestGradeRecalculation(unittest.TestCase):
+    """Pruebas del recálculo por lotes de calificaciones ponderadas"""
+
+    def setUp(self):
+        self.topic_a, self.topic_b = ObjectId(), ObjectId()
+        self.evaluation = {"_id": ObjectId(), "topic_ids": [self.topic_a, self.topic_b],
+                           "weightings": {str(self.topic_a): 0.25, str(self.topic_b): 0.75}}
+        now = datetime(2026, 5, 1)
+        self.results = [
+            {"student_id": "s1", "topic_id": self.topic_a, "score": 0.4, "created_at": now - timedelta(days=1)},
+            {"student_id": "s1", "topic_id": self.topic_a, "score": 80, "created_at": now},
+            {"student_id": "s1", "topic_id": self.topic_b, "score": 100, "created_at": now},
+            {"student_id": "s2", "topic_id": self.topic_b, "score": 0.6, "created_at": now},
+            {"student_id": "s3", "topic_id": self.topic_a, "score": 100, "created_at": now},
+        ]
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: getattr(self.db, name)
+        self.db.evaluations.find_one.return_value = self.evaluation
+        self.db.content_results.aggregate.side_effect = self._aggregate
+
+        for target in ("background_runner", "invalidate_evaluation_statistics"):
+            patcher = patch.object(grade_recalculation, target)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _normalize(score):
+        return min(score, 100) if score > 1 else score * 100
+
+    def _aggregate(self, pipeline, allowDiskUse=False):
+        """Emula las agregaciones del recalculador sobre self.results."""
+        stages = {key: stage[key] for stage in pipeline for key in stage}
+        if "$count" in stages:
+            return iter([{"total": len({r["student_id"] for r in self.results})}])
+        if "$project" in stages:
+            wanted = pipeline[0]["$match"]["student_id"]["$in"]
+            policy = next(iter(stages["$group"]["score"]))
+            rows = {}
+            for r in sorted(self.results, key=lambda r: r["created_at"], reverse=True):
+                if r["student_id"] not in wanted:
+                    continue
+                key = (r["student_id"], r["topic_id"])
+                score = self._normalize(r["score"])
+                if key not in rows:
+                    rows[key] = score
+                elif policy == "$max":
+                    rows[key] = max(rows[key], score)
+            return iter([{"_id": {"student_id": s, "topic_id": t}, "score": v} for (s, t), v in rows.items()])
+        after = pipeline[1]["$match"]["$expr"]["$gt"][1] if len(pipeline) > 4 else None
+        students = sorted({r["student_id"] for r in self.results if after is None or r["student_id"] > after})
+        return iter([{"_id": s} for s in students[:stages["$limit"]]])
+
+    def _written(self):
+        operations = [op for call in self.db.evaluation_submissions.bulk_write.call_args_list for op in call[0][0]]
+        return {op._filter["student_id"]: op._doc for op in operations}
+
+    def test_weights_resolution_and_vectorized_grades(self):
+        self.assertEqual(resolve_topic_weights({"topic_ids": ["a", "b"]}), {"a": 0.5, "b": 0.5})
+        self.assertEqual(resolve_topic_weights({"topic_ids": ["a"], "topic_weights": {"a": 1}}), {"a": 1.0})
+        grades = compute_weighted_grades(["a", "b"], {"a": 0.25, "b": 0.75}, [{"a": 80, "b": 100}, {"b": 60}])
+        self.assertEqual(grades.tolist(), [95.0, 45.0])
+
+    def test_recalculate_writes_each_batch_with_one_bulk_write(self):
+        summary = WeightedGradeRecalculator(self.db, batch_size=2).recalculate(str(self.evaluation["_id"]))
+
+        self.assertEqual(summary["total_students"], 3)
+        self.assertEqual({r["student_id"]: r["final_score"] for r in summary["results"]},
+                         {"s1": 95.0, "s2": 45.0, "s3": 25.0})
+        self.assertEqual(self.db.evaluation_submissions.bulk_write.call_count, 2)
+        written = self._written()
+        self.assertEqual(written["s1"]["$set"]["topic_scores"], {str(self.topic_a): 80, str(self.topic_b): 100})
+        self.assertEqual(written["s2"]["$setOnInsert"]["status"], "auto_graded")
+
+    def test_recalculate_returns_resume_token_when_budget_runs_out(self):
+        recalculator = WeightedGradeRecalculator(self.db, batch_size=2)
+
+        partial = recalculator.recalculate(str(self.evaluation["_id"]), time_budget_seconds=0)
+        self.assertFalse(partial["completed"])
+        self.assertEqual([r["student_id"] for r in partial["results"]], ["s1", "s2"])
+
+        rest = recalculator.recalculate(str(self.evaluation["_id"]), resume_token=partial["resume_token"])
+        self.assertTrue(rest["completed"])
+        self.assertIsNone(rest["resume_token"])
+        self.assertEqual([r["student_id"] for r in rest["results"]], ["s3"])
+
+    def test_reweight_stamps_a_client_side_date(self):
+        self.db.evaluation_submissions.update_many.return_value = MagicMock(modified_count=4)
+
+        self.assertEqual(WeightedGradeRecalculator(self.db).reweight_submissions(str(self.evaluation["_id"])), 4)
+
+        pipeline = self.db.evaluation_submissions.update_many.call_args[0][1]
+        self.assertIsInstance(pipeline[0]["$set"]["updated_at"], datetime)
+
+    def test_best_score_policy(self):
+        self.results.append({"student_id": "s2", "topic_id": self.topic_b, "score": 0.9,
+                             "created_at": datetime(2026, 1, 1)})
+
+        summary = WeightedGradeRecalculator(self.db).recalculate(str(self.evaluation["_id"]), "best")
+
+        self.assertEqual({r["student_id"]: r["final_score"] for r in summary["results"]}["s2"], 67.5)
+
+    def test_single_topic_evaluation_is_rejected(self):
+        self.evaluation["topic_ids"] = [self.topic_a]
+        with self.assertRaises(AppException):
+            WeightedGradeRecalculator(self.db).recalculate(str(self.evaluation["_id"]))
+
+    def test_job_resumes_from_token_and_completes(self):
+        job = {"_id": ObjectId(), "evaluation_id": self.evaluation["_id"], "status": "pending",
+               "generation": 1, "score_policy": "latest", "resume_token": None, "processed": 0,
+               "total_students": 3}
+        self.db.grade_recalculation_jobs.find_one_and_update.return_value = job
+        self.db.grade_recalculation_jobs.find_one.side_effect = lambda query: dict(job)
+
+        def update_job(query, update):
+            if query.get("generation") not in (None, job["generation"]):
+                return MagicMock(matched_count=0)
+            job.update(update.get("$set", {}))
+            for key, value in update.get("$inc", {}).items():
+                job[key] = job.get(key, 0) + value
+            return MagicMock(matched_count=1)
+        self.db.grade_recalculation_jobs.update_one.side_effect = update_job
+
+        recalculator = WeightedGradeRecalculator(self.db, batch_size=2)
+        started = recalculator.start_job(str(self.evaluation["_id"]))
+        self.assertEqual(started["total_students"], 3)
+        self.background_runner.submit.assert_called_once_with(
+            GRADE_RECALC_TASK, str(self.evaluation["_id"]), evaluation_id=str(self.evaluation["_id"])
+        )
+
+        # Presupuesto agotado tras el primer lote: se guarda el token y se re-encola
+        status = recalculator.run_job(str(self.evaluation["_id"]), time_budget_seconds=0)
+        self.assertEqual(status["processed"], 2)
+        self.assertIsNotNone(status["resume_token"])
+        self.assertEqual(self.background_runner.submit.call_count, 2)
+
+        status = recalculator.run_job(str(self.evaluation["_id"]))
+        self.assertEqual(status["status"], JOB_COMPLETED)
+        self.assertEqual(status["processed"], 3)
+        self.assertEqual(status["progress"], 100.0)
+        self.assertEqual(set(self._written()), {"s1", "s2", "s3"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.content.html_safety import scan_slide_html, validate_slide_html
+
+
+class TestSlideHtmlScanner(unittest.TestCase):
+    """Pruebas del escáner de seguridad de HTML de slides"""
+
+    def setUp(self):
+        self.framework_script = '<script src="https://cdn.jsdelivr.net/gh/Luisdanielgm/framework_slide@1/x.js"></script>'
+
+    def test_clean_fragment_is_valid(self):
+        html = f'<div class="slide"><h1>Título</h1><p>Texto</p>{self.framework_script}</div>'
+        self.assertEqual(validate_slide_html(html), (True, ""))
+
+    def test_dangerous_tag_priority_follows_rule_order(self):
+        # <object> se reporta antes que <iframe> aunque aparezca después
+        html = '<div><iframe src="x"></iframe><object data="y"></object></div>'
+        self.assertEqual(
+            validate_slide_html(html),
+            (False, "HTML contiene etiqueta <object> prohibida")
+        )
+        self.assertEqual(validate_slide_html(html, allow_full_document=True, allow_iframe=True)[0], False)
+
+    def test_collects_all_violations(self):
+        html = '<div onclick="x()"><a href="javascript:alert(1)">x</a><script>alert(1)</script></div>'
+        codes = [v["code"] for v in scan_slide_html(html)]
+        self.assertEqual(codes, ["inline_script", "inline_event", "javascript_uri"])
+
+    def test_link_whitelist(self):
+        ok = '<link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Roboto"><p>x</p>'
+        bad = '<link rel="stylesheet" href="https://evil.example.com/x.css"><p>x</p>'
+        self.assertTrue(validate_slide_html(ok)[0])
+        self.assertEqual(
+            validate_slide_html(bad),
+            (False, "HTML contiene etiqueta <link> con href no autorizado: https://evil.example.com/x.css")
+        )
+
+    def test_nested_link_inside_other_tag_is_detected(self):
+        html = '<div title="a <link href=\'https://evil.example.com/x.css\'>"><p>x</p></div>'
+        self.assertFalse(validate_slide_html(html)[0])
+
+    def test_inline_script_only_allowed_for_full_documents(self):
+        html = '<html><body><p>x</p><script>var a = 1;</script></body></html>'
+        self.assertFalse(validate_slide_html(html)[0])
+        self.assertTrue(validate_slide_html(html, allow_full_document=True)[0])
+
+    def test_uppercase_patterns_are_detected(self):
+        html = '<DIV STYLE="width: EXPRESSION(alert(1))">x</DIV>'
+        self.assertEqual(
+            validate_slide_html(html),
+            (False, "HTML contiene expresiones CSS potencialmente peligrosas")
+        )
+
+    def test_size_limit(self):
+        html = "<p>" + ("a" * (150 * 1024)) + "</p>"
+        valid, message = validate_slide_html(html)
+        self.assertFalse(valid)
+        self.assertIn("excede el tamaño máximo", message)
+        self.assertTrue(validate_slide_html(html, allow_full_document=True)[0])
+
+    def test_empty_and_non_string(self):
+        self.assertEqual(validate_slide_html("   "), (False, "HTML no debe estar vacío"))
+        self.assertEqual(validate_slide_html(None), (False, "HTML debe ser una cadena de texto"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content.structured_sequence_service import SEQUENCES_COLLECTION
+from src.study_plans.readiness_snapshot_service import (
+    READINESS_SNAPSHOTS_COLLECTION,
+    SNAPSHOT_MAX_AGE_SECONDS,
+    ModuleReadinessSnapshot,
+    invalidate_topic_readiness,
+)
+
+
+class TestModuleReadinessSnapshot(unittest.TestCase):
+    """Pruebas de la instantánea de conteos de diapositivas por módulo"""
+
+    def setUp(self):
+        self.module_id = ObjectId()
+        self.topic_a, self.topic_b, self.topic_c = ObjectId(), ObjectId(), ObjectId()
+        self.rows = [
+            {"_id": {"topic_id": self.topic_a, "status": "narrative_ready"}, "count": 3},
+            {"_id": {"topic_id": self.topic_a, "status": "skeleton"}, "count": 1},
+            {"_id": {"topic_id": self.topic_b, "status": "html_ready"}, "count": 2},
+        ]
+        self.snapshots = MagicMock()
+        self.snapshots.find_one.return_value = None
+        self.write_seqs = {}
+        self.sequences = MagicMock()
+        self.sequences.find.side_effect = lambda query, projection: [
+            {"_id": tid, "write_seq": seq} for tid, seq in self.write_seqs.items() if tid in query["_id"]["$in"]
+        ]
+        self.db = MagicMock()
+        self.db.__getitem__.side_effect = lambda name: {READINESS_SNAPSHOTS_COLLECTION: self.snapshots,
+                                                        SEQUENCES_COLLECTION: self.sequences}[name]
+        self.db.topic_contents.aggregate.side_effect = self._aggregate
+
+    def _aggregate(self, pipeline):
+        topic_ids = pipeline[0]["$match"]["topic_id"]["$in"]
+        return [row for row in self.rows if row["_id"]["topic_id"] in topic_ids]
+
+    def test_missing_snapshot_is_built_with_one_group_aggregation(self):
+        counts = ModuleReadinessSnapshot(self.db).get_slide_counts(
+            str(self.module_id), [self.topic_a, self.topic_b, self.topic_c]
+        )
+
+        self.assertEqual(counts, {
+            str(self.topic_a): {"narrative_ready": 3, "skeleton": 1},
+            str(self.topic_b): {"html_ready": 2},
+            str(self.topic_c): {},
+        })
+        self.assertEqual(self.db.topic_contents.aggregate.call_count, 1)
+        query, update = self.snapshots.update_one.call_args[0]
+        self.assertEqual(query, {"_id": self.module_id})
+        self.assertEqual(update["$set"]["topics"][str(self.topic_b)], {"html_ready": 2})
+        self.assertTrue(self.snapshots.update_one.call_args[1]["upsert"])
+
+    def test_fresh_snapshot_is_read_without_aggregating(self):
+        self.write_seqs[self.topic_a] = 4
+        self.snapshots.find_one.return_value = {
+            "_id": self.module_id,
+            "built_at": datetime.now(),
+            "topics": {str(self.topic_a): {"narrative_ready": 5}, str(ObjectId()): {"skeleton": 9}},
+            "write_seqs": {str(self.topic_a): 4, str(self.topic_b): 0},
+        }
+
+        counts = ModuleReadinessSnapshot(self.db).get_slide_counts(self.module_id, [self.topic_a, self.topic_b])
+
+        self.assertEqual(counts, {str(self.topic_a): {"narrative_ready": 5}, str(self.topic_b): {}})
+        self.db.topic_contents.aggregate.assert_not_called()
+
+        self.snapshots.find_one.return_value["built_at"] = datetime.now() - timedelta(seconds=SNAPSHOT_MAX_AGE_SECONDS + 1)
+        ModuleReadinessSnapshot(self.db).get_slide_counts(self.module_id, [self.topic_a])
+        self.assertEqual(self.db.topic_contents.aggregate.call_count, 1)
+
+    def test_written_topics_are_recounted_on_read(self):
+        self.write_seqs[self.topic_a] = 2
+        self.snapshots.find_one.return_value = {
+            "_id": self.module_id,
+            "built_at": datetime.now(),
+            "topics": {str(self.topic_a): {"skeleton": 4}, str(self.topic_b): {"html_ready": 1}},
+            # topic_a recibió escrituras; topic_c llegó al módulo después de construirla
+            "write_seqs": {str(self.topic_a): 1, str(self.topic_b): 0},
+        }
+
+        counts = ModuleReadinessSnapshot(self.db).get_slide_counts(
+            self.module_id, [self.topic_a, self.topic_b, self.topic_c]
+        )
+
+        self.assertEqual(counts[str(self.topic_a)], {"narrative_ready": 3, "skeleton": 1})
+        self.assertEqual(counts[str(self.topic_b)], {"html_ready": 1})
+        pipeline = self.db.topic_contents.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0]["$match"]["topic_id"], {"$in": [self.topic_a, self.topic_c]})
+        query, update = self.snapshots.update_one.call_args[0]
+        self.assertEqual(query, {"_id": self.module_id})
+        self.assertEqual(update["$set"][f"write_seqs.{self.topic_a}"], 2)
+        self.assertEqual(update["$set"][f"topics.{self.topic_c}"], {})
+
+    def test_moving_a_topic_invalidates_both_modules(self):
+        new_module = ObjectId()
+
+        invalidate_topic_readiness(str(self.topic_a), [self.module_id, str(new_module), None], self.db)
+
+        query, update = self.snapshots.update_many.call_args[0]
+        self.assertEqual(set(query["_id"]["$in"]), {self.module_id, new_module})
+        self.assertEqual(update["$unset"], {f"topics.{self.topic_a}": "", f"write_seqs.{self.topic_a}": ""})
+
+
+if __name__ == '__main__':
+    unittest.main()
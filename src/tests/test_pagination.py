@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime
+from bson import ObjectId
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.shared.exceptions import AppException
+from src.shared.pagination import (
+    build_keyset_filter,
+    decode_cursor,
+    encode_cursor,
+    paginate_results,
+    parse_page_limit,
+)
+
+
+class TestKeysetPagination(unittest.TestCase):
+    """Pruebas para las utilidades de paginación por cursor"""
+
+    def setUp(self):
+        self.sort_spec = [("order", 1), ("_id", 1)]
+
+    def test_cursor_roundtrip_preserves_object_ids(self):
+        oid = ObjectId()
+        cursor = encode_cursor([3, oid])
+        self.assertEqual(decode_cursor(cursor), [3, oid])
+
+    def test_cursor_roundtrip_preserves_datetimes(self):
+        created_at = datetime(2026, 3, 1, 10, 30, 15, 123000)
+        oid = ObjectId()
+        self.assertEqual(decode_cursor(encode_cursor([created_at, oid])), [created_at, oid])
+
+    def test_decode_invalid_cursor_raises(self):
+        with self.assertRaises(AppException):
+            decode_cursor("no-es-un-cursor")
+
+    def test_keyset_filter_for_compound_sort(self):
+        oid = ObjectId()
+        query = build_keyset_filter(self.sort_spec, [2, oid])
+        self.assertEqual(query, {"$or": [
+            {"order": {"$gt": 2}},
+            {"order": 2, "_id": {"$gt": oid}},
+        ]})
+
+    def test_keyset_filter_handles_null_cursor_values(self):
+        oid = ObjectId()
+        self.assertEqual(build_keyset_filter(self.sort_spec, [None, oid]), {"$or": [
+            {"order": {"$ne": None}},
+            {"order": None, "_id": {"$gt": oid}},
+        ]})
+        # En orden descendente los null van al final
+        self.assertEqual(build_keyset_filter([("order", -1), ("_id", 1)], [2, oid]), {"$or": [
+            {"$or": [{"order": {"$lt": 2}}, {"order": None}]},
+            {"order": 2, "_id": {"$gt": oid}},
+        ]})
+        self.assertEqual(build_keyset_filter([("order", -1), ("_id", -1)], [None, oid]),
+                         {"order": None, "$or": [{"_id": {"$lt": oid}}, {"_id": None}]})
+        self.assertEqual(build_keyset_filter([("order", -1)], [None]), {"_id": {"$in": []}})
+
+    def test_keyset_filter_without_cursor_is_empty(self):
+        self.assertEqual(build_keyset_filter(self.sort_spec, None), {})
+
+    def test_paginate_results_returns_next_cursor(self):
+        docs = [{"_id": ObjectId(), "order": i} for i in range(4)]
+        page, next_cursor = paginate_results(docs, self.sort_spec, 3)
+        self.assertEqual(len(page), 3)
+        self.assertEqual(decode_cursor(next_cursor), [2, docs[2]["_id"]])
+
+        page, next_cursor = paginate_results(docs[:2], self.sort_spec, 3)
+        self.assertEqual(len(page), 2)
+        self.assertIsNone(next_cursor)
+
+    def test_parse_page_limit_bounds(self):
+        self.assertIsNone(parse_page_limit(None, default=None))
+        self.assertEqual(parse_page_limit("0"), 1)
+        self.assertEqual(parse_page_limit("5000"), 200)
+        with self.assertRaises(AppException):
+            parse_page_limit("abc")
+
+
+if __name__ == '__main__':
+    unittest.main()
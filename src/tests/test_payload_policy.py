@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.content.payload_policy import (
+    compile_path_whitelist,
+    find_forbidden_key,
+    iter_forbidden_keys,
+)
+
+
+class TestForbiddenKeyWalker(unittest.TestCase):
+    """Pruebas del recorrido iterativo de claves prohibidas"""
+
+    def test_clean_payload(self):
+        payload = {"content": {"questions": [{"options": ["a", "b"], "answer": 1}]}, "slide_plan": "x"}
+        self.assertIsNone(find_forbidden_key(payload))
+
+    def test_reports_path_with_list_indexes(self):
+        payload = {"contents": [{"content": {}}, {"content": {"items": [{"model": "gpt"}]}}]}
+        self.assertEqual(find_forbidden_key(payload), ("model", "contents[1].content.items[0].model"))
+
+    def test_reports_first_violation_in_document_order(self):
+        payload = {"a": {"b": {"model": 1}}, "provider": 2}
+        self.assertEqual(find_forbidden_key(payload), ("model", "a.b.model"))
+        self.assertEqual(
+            list(iter_forbidden_keys(payload)),
+            [("model", "a.b.model"), ("provider", "provider")]
+        )
+
+    def test_root_list_and_numeric_keys(self):
+        self.assertEqual(find_forbidden_key([{"x": 1}, {"provider": "p"}]), ("provider", "[1].provider"))
+        self.assertEqual(find_forbidden_key({0: {"model": 1}}), ("model", "0.model"))
+
+    def test_whitelisted_paths_are_skipped_but_walked(self):
+        whitelist = compile_path_whitelist(["content.history"])
+        payload = {"content": {"history": [{"model": "x", "meta": {"provider": "y"}}], "model": "z"}}
+        self.assertEqual(find_forbidden_key(payload, whitelist_re=whitelist), ("model", "content.model"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import sys
+import os
+import tempfile
+from collections import Counter
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared.cache import LocalCacheBackend
+from src.shared.keyword_index import BM25Index, tokenize
+from src.study_plans import recommendation_index
+from src.study_plans.recommendation_index import (
+    KIND_DIAGRAM,
+    KIND_PDF,
+    KIND_WEB,
+    ContentRecommendationIndex,
+)
+
+
+class TestBM25Index(unittest.TestCase):
+    """Pruebas del índice invertido BM25"""
+
+    def test_ranking_updates_and_state_round_trip(self):
+        index = BM25Index()
+        index.upsert("a", {"title": "Fotosíntesis en plantas", "description": "clorofila"}, {"kind": "pdf"},
+                     weights={"title": 3})
+        index.upsert("b", {"title": "Respiración celular", "description": "fotosintesis y energía"}, {"kind": "pdf"},
+                     weights={"title": 3})
+        index.upsert("c", {"title": "Historia de Roma"}, {"kind": "web"})
+
+        self.assertEqual(tokenize("La FOTOSÍNTESIS y los niños"), ["fotosintesis", "niños"])
+        self.assertEqual([doc for doc, _ in index.search(["fotosintesis"])], ["a", "b"])
+        self.assertEqual(index.search(["fotosintesis"], predicate=lambda p: p["kind"] == "web"), [])
+
+        index.upsert("a", {"title": "Geometría"}, {"kind": "pdf"})
+        self.assertEqual([doc for doc, _ in index.search(["fotosintesis"])], ["b"])
+        self.assertTrue(index.remove("b"))
+        self.assertEqual(index.search(["fotosintesis"]), [])
+
+        restored = BM25Index.from_state(index.to_state())
+        self.assertEqual(restored.search(["roma", "geometria"]), index.search(["roma", "geometria"]))
+
+
+class TestContentRecommendationIndex(unittest.TestCase):
+    """Pruebas del índice de recomendaciones de recursos y diagramas"""
+
+    def setUp(self):
+        self.pdf = {"_id": ObjectId(), "name": "Guía de fotosíntesis", "type": "pdf", "tags": ["biologia"],
+                    "updated_at": datetime.now()}
+        self.link = {"_id": ObjectId(), "title": "Simulador de fotosíntesis", "resource_type": "link",
+                     "url": "https://example.org/fotosintesis"}
+        self.video = {"_id": ObjectId(), "name": "Fotosíntesis en video", "type": "video"}
+        self.diagram = {"_id": ObjectId(), "content_type": "diagram", "content": {"title": "Ciclo de la fotosíntesis"}}
+        self.resources = [self.pdf, self.link, self.video]
+        self.diagrams = [self.diagram]
+
+        self.db = MagicMock()
+        self.db.resources.find.side_effect = lambda query, projection=None, **kwargs: self._matching(
+            self.resources, query, **kwargs)
+        self.db.topic_contents.find.side_effect = lambda query, projection=None, **kwargs: self._matching(
+            self.diagrams, query, **kwargs)
+        self.db.resources.find_one.side_effect = lambda query, projection=None: next(
+            (dict(r) for r in self.resources if r["_id"] == query["_id"]), None)
+        self.db.__getitem__.side_effect = lambda name: getattr(self.db, name)
+
+        patcher = patch.object(recommendation_index, "background_runner")
+        self.runner = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _matching(self, docs, query, sort=None, limit=None):
+        if "$in" in query.get("_id", {}):
+            return [dict(d) for d in docs if d["_id"] in query["_id"]["$in"]]
+        if "$gt" in query.get("_id", {}):
+            docs = [d for d in docs if d["_id"] > query["_id"]["$gt"]]
+        if "$or" in query:
+            since = query["$or"][0]["updated_at"]["$gte"]
+            docs = [d for d in docs if (d.get("updated_at") or d.get("created_at") or datetime.min) >= since]
+        if sort:
+            docs = sorted(docs, key=lambda d: d["_id"])
+        return [dict(d) for d in docs][:limit]
+
+    def _index(self, cold_build_batch=None, cold_build_interval_seconds=0):
+        return ContentRecommendationIndex(
+            db=self.db, backend=LocalCacheBackend("test_recommendation_backend", register_metrics=False),
+            snapshot_path=os.path.join(self.tmpdir.name, "index.bin"), catch_up_seconds=3600,
+            register_metrics=False, cold_build_batch=cold_build_batch,
+            cold_build_interval_seconds=cold_build_interval_seconds
+        )
+
+    def test_search_is_split_by_kind_and_fetches_ranked_documents(self):
+        index = self._index()
+
+        pdfs = index.fetch_ranked(index.search(["fotosintesis"], KIND_PDF))
+        self.assertEqual([d["_id"] for d in pdfs], [self.pdf["_id"]])
+        self.assertGreater(pdfs[0]["relevance_score"], 0)
+        self.assertEqual([key for key, _ in index.search(["fotosintesis"], KIND_WEB)], [f"resources:{self.link['_id']}"])
+        self.assertEqual(len(index.search(["ciclo"], KIND_DIAGRAM)), 1)
+
+        # Un recurso borrado fuera del índice se retira al no encontrarse
+        self.resources.remove(self.pdf)
+        self.assertEqual(index.fetch_ranked(index.search(["fotosintesis"], KIND_PDF)), [])
+        self.assertEqual(index.search(["fotosintesis"], KIND_PDF), [])
+
+    def test_resource_writes_update_the_index_incrementally(self):
+        index = self._index()
+        index.search(["algebra"], KIND_PDF)
+        finds = self.db.resources.find.call_count
+
+        new_pdf = {"_id": ObjectId(), "title": "Álgebra lineal", "file_type": "pdf"}
+        self.resources.append(new_pdf)
+        index.upsert_resource(new_pdf["_id"])
+        self.assertEqual(index.search(["algebra"], KIND_PDF)[0][0], f"resources:{new_pdf['_id']}")
+
+        index.remove_resource(new_pdf["_id"])
+        self.assertEqual(index.search(["algebra"], KIND_PDF), [])
+        self.assertEqual(self.db.resources.find.call_count, finds)
+
+    def test_warm_start_only_syncs_changes_after_the_snapshot(self):
+        index = self._index()
+        index.search(["fotosintesis"], KIND_PDF)
+        self.assertTrue(index.persist())
+
+        self.pdf["title"] = "Mitosis"
+        self.pdf["updated_at"] = datetime.now()
+        warm = self._index()
+        self.assertEqual(warm.search(["mitosis"], KIND_PDF)[0][0], f"resources:{self.pdf['_id']}")
+        self.assertEqual(warm.stats()["warm_starts"], 1)
+        # La sincronización tras el arranque en caliente solo reindexa lo modificado
+        self.assertEqual(len(self.db.resources.find.side_effect(self.db.resources.find.call_args[0][0])), 1)
+
+    def test_cold_build_is_split_in_persisted_slices(self):
+        index = self._index(cold_build_batch=2)
+
+        # Primer tramo: solo dos recursos; el diagrama aún no está indexado
+        self.assertEqual(index.search(["ciclo"], KIND_DIAGRAM), [])
+        self.assertEqual(index.stats()["documents"], 2)
+        self.assertEqual(self.db.resources.find.call_args[1]["limit"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "index.bin")))
+
+        # Otra instancia carga la instantánea y continúa desde el cursor guardado
+        resumed = self._index(cold_build_batch=2)
+        self.assertEqual(len(resumed.search(["ciclo"], KIND_DIAGRAM)), 1)
+        self.assertEqual(resumed.stats()["warm_starts"], 1)
+        self.assertEqual(resumed.stats()["full_builds"], 0)
+
+        resumed.search(["ciclo"], KIND_DIAGRAM)
+        self.assertEqual(resumed.stats()["full_builds"], 1)
+        self.assertIsNone(resumed._build_cursor)
+        self.assertEqual(len(resumed.search(["fotosintesis"], KIND_PDF)), 1)
+
+    def test_recommendation_request_runs_one_cold_build_slice(self):
+        index = self._index(cold_build_batch=2, cold_build_interval_seconds=60)
+        self.db.resources.find.reset_mock()
+
+        # Mismas consultas que ContentRecommendationService.get_content_recommendations
+        with patch.object(index, "persist", wraps=index.persist) as persist:
+            keywords = tokenize("Fotosíntesis") + index.top_terms(
+                Counter(tokenize("La fotosíntesis y el ciclo del carbono en las plantas")))
+            for kind in (KIND_PDF, KIND_WEB, KIND_DIAGRAM):
+                index.search(keywords, kind)
+
+        self.assertEqual(self.db.resources.find.call_count + self.db.topic_contents.find.call_count, 1)
+        self.assertEqual(persist.call_count, 1)
+        self.assertEqual(index.stats()["documents"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
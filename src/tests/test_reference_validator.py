@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared.validators import ReferenceValidator, find_missing_references
+
+
+class TestReferenceValidator(unittest.TestCase):
+    """Pruebas del validador de referencias con una consulta $in"""
+
+    def setUp(self):
+        self.existing = [ObjectId(), ObjectId(), ObjectId()]
+        self.collection = MagicMock()
+        self.collection.count_documents.side_effect = lambda query: len(
+            [oid for oid in query["_id"]["$in"] if oid in self.existing]
+        )
+        self.collection.find.side_effect = lambda query, projection: iter(
+            [{"_id": oid} for oid in query["_id"]["$in"] if oid in self.existing]
+        )
+
+    def test_all_existing_uses_single_count(self):
+        ids = [str(oid) for oid in self.existing] + [str(self.existing[0])]
+
+        self.assertEqual(find_missing_references(self.collection, ids), [])
+        self.collection.count_documents.assert_called_once()
+        self.collection.find.assert_not_called()
+
+    def test_reports_missing_and_invalid_ids_in_order(self):
+        unknown = ObjectId()
+        ids = ["no-es-id", str(self.existing[0]), unknown]
+
+        self.assertEqual(find_missing_references(self.collection, ids), ["no-es-id", str(unknown)])
+
+    def test_prefetch_answers_batch_without_new_queries(self):
+        validator = ReferenceValidator(self.collection, "Tema")
+        unknown = ObjectId()
+        self.assertEqual(validator.prefetch(self.existing + [unknown]), [str(unknown)])
+        queries = self.collection.count_documents.call_count + self.collection.find.call_count
+
+        for oid in self.existing:
+            self.assertEqual(validator.find_missing([oid]), [])
+        self.assertEqual(self.collection.count_documents.call_count + self.collection.find.call_count, queries)
+
+
+if __name__ == '__main__':
+    unittest.main()
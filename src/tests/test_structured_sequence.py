@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared.cache import content_hash
+from src.content.structured_sequence_service import StructuredSequenceService, SEQUENCES_COLLECTION
+
+
+class TestStructuredSequence(unittest.TestCase):
+    """Pruebas de la secuencia estructurada precalculada por tema"""
+
+    def setUp(self):
+        self.topic_a = ObjectId()
+        self.topic_b = ObjectId()
+        self.slide_1, self.slide_2 = ObjectId(), ObjectId()
+        self.contents = [
+            {"_id": ObjectId(), "topic_id": self.topic_a, "content_type": "quiz", "order": 1},
+            {"_id": self.slide_2, "topic_id": self.topic_a, "content_type": "slide", "order": 2},
+            {"_id": ObjectId(), "topic_id": self.topic_a, "content_type": "video", "order": 5,
+             "parent_content_id": self.slide_1},
+            {"_id": self.slide_1, "topic_id": self.topic_a, "content_type": "slide", "order": 1},
+            {"_id": ObjectId(), "topic_id": self.topic_b, "content_type": "slide", "order": 1},
+        ]
+        self.db = {"topic_contents": MagicMock(), SEQUENCES_COLLECTION: MagicMock()}
+        self.db["topic_contents"].find.side_effect = self._find_contents
+        self.stored = []
+        self.db[SEQUENCES_COLLECTION].find.side_effect = lambda query: list(self.stored)
+
+        db = MagicMock()
+        db.__getitem__.side_effect = lambda name: self.db[name]
+        db.topic_contents = self.db["topic_contents"]
+        self.service = StructuredSequenceService(db)
+
+    def _find_contents(self, query, projection=None):
+        statuses = query.get("status", {}).get("$in")
+        if statuses is not None:
+            contents = [c for c in self.contents if c.get("status", "draft") in statuses]
+        else:
+            contents = self.contents
+        if "_id" in query:
+            return [dict(c) for c in contents if c["_id"] in query["_id"]["$in"]]
+        topic_filter = query["topic_id"]
+        topic_ids = topic_filter["$in"] if isinstance(topic_filter, dict) else [topic_filter]
+        return [dict(c) for c in contents if c["topic_id"] in topic_ids]
+
+    def test_items_follow_slide_optional_evaluation_order(self):
+        items = StructuredSequenceService.build_sequence_items(self.contents[:4])
+
+        self.assertEqual([item["kind"] for item in items], ["slide", "optional", "slide", "evaluation"])
+        self.assertEqual(items[0]["content_id"], str(self.slide_1))
+        self.assertEqual(items[1]["order"], 1.01)
+        self.assertEqual(items[1]["parent_content_id"], str(self.slide_1))
+
+    def test_batch_rebuilds_missing_topics_with_one_query_and_reuses_fresh_ones(self):
+        fresh_items = [{"content_id": "x", "content_type": "slide", "kind": "slide", "order": 1, "parent_content_id": None}]
+        self.stored.append({"_id": self.topic_b, "write_seq": 3, "built_seq": 3, "version": 7,
+                            "items": fresh_items, "built_at": datetime.utcnow()})
+
+        result = self.service.get_topic_sequences([str(self.topic_a), str(self.topic_b)])
+
+        self.assertEqual(self.db["topic_contents"].find.call_count, 1)
+        self.assertEqual(result[str(self.topic_b)]["version"], 7)
+        self.assertEqual(result[str(self.topic_b)]["items"], fresh_items)
+        self.assertEqual(result[str(self.topic_a)]["version"], 1)
+        self.assertEqual(len(result[str(self.topic_a)]["items"]), 4)
+        self.db[SEQUENCES_COLLECTION].insert_one.assert_called_once()
+
+    def test_stale_sequence_keeps_version_when_items_are_unchanged(self):
+        items = StructuredSequenceService.build_sequence_items(
+            [c for c in self.contents if c["topic_id"] == self.topic_b]
+        )
+        self.stored.append({"_id": self.topic_b, "write_seq": 4, "built_seq": 3, "version": 2,
+                            "digest": content_hash(items), "items": items, "built_at": datetime.utcnow()})
+
+        sequence = self.service.get_topic_sequence(str(self.topic_b))
+
+        self.assertEqual(sequence["version"], 2)
+        query, update = self.db[SEQUENCES_COLLECTION].update_one.call_args[0]
+        self.assertEqual(query, {"_id": self.topic_b, "write_seq": 4})
+        self.assertEqual(update["$set"]["built_seq"], 4)
+
+    def test_unpersisted_rebuild_has_no_etag(self):
+        self.stored.append({"_id": self.topic_b, "write_seq": 4, "built_seq": 3, "version": 2,
+                            "digest": "old", "items": [], "built_at": datetime.utcnow()})
+        # Una invalidación concurrente incrementó write_seq: la escritura condicional no coincide
+        self.db[SEQUENCES_COLLECTION].update_one.return_value.matched_count = 0
+
+        sequence = self.service.get_topic_sequence(str(self.topic_b))
+
+        self.assertEqual(len(sequence["items"]), 1)
+        self.assertIsNone(sequence["etag"])
+
+    def test_contents_deleted_after_build_are_skipped(self):
+        items = StructuredSequenceService.build_sequence_items(
+            [c for c in self.contents if c["topic_id"] == self.topic_a]
+        )
+        self.stored.append({"_id": self.topic_a, "write_seq": 1, "built_seq": 1, "version": 1,
+                            "items": items, "built_at": datetime.utcnow()})
+        # Borrado lógico aún no reflejado en la secuencia precalculada
+        self.contents[1]["status"] = "deleted"
+
+        sequence = self.service.get_structured_content_sequence(str(self.topic_a))
+
+        self.assertEqual([c["_id"] for c in sequence],
+                         [str(i["content_id"]) for i in items if i["content_id"] != str(self.slide_2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.shared.cache import LocalCacheBackend, VersionedCache
+from src.study_plans import plan_tree_service
+from src.study_plans.plan_tree_service import StudyPlanTreeLoader, invalidate_study_plan_tree
+
+
+class TestStudyPlanTree(unittest.TestCase):
+    """Pruebas del cargador del árbol plan → módulos → temas → evaluaciones"""
+
+    def setUp(self):
+        created = datetime(2026, 1, 1)
+        self.plan_id = ObjectId()
+        self.module_a, self.module_b = ObjectId(), ObjectId()
+        self.topic_a1, self.topic_a2, self.topic_b1 = ObjectId(), ObjectId(), ObjectId()
+        self.shared_eval = ObjectId()
+        self.data = {
+            "study_plans_per_subject": [{"_id": self.plan_id, "name": "Plan", "author_id": ObjectId()}],
+            "modules": [
+                {"_id": self.module_a, "study_plan_id": self.plan_id, "name": "A", "created_at": created,
+                 "learning_outcomes": ["x"]},
+                {"_id": self.module_b, "study_plan_id": self.plan_id, "name": "B", "created_at": created},
+            ],
+            "topics": [
+                {"_id": self.topic_a1, "module_id": self.module_a, "name": "A1", "created_at": created,
+                 "theory_content": "largo"},
+                {"_id": self.topic_a2, "module_id": self.module_a, "name": "A2", "created_at": created},
+                {"_id": self.topic_b1, "module_id": self.module_b, "name": "B1", "created_at": created},
+            ],
+            "evaluations": [
+                {"_id": self.shared_eval, "title": "Compartida", "topic_ids": [self.topic_a1, self.topic_a2, self.topic_b1]},
+                {"_id": ObjectId(), "title": "Solo B", "topic_ids": [self.topic_b1]},
+            ],
+        }
+        self.db = MagicMock()
+        self.calls = []
+        for name, docs in self.data.items():
+            collection = getattr(self.db, name)
+            collection.find.side_effect = self._finder(name, docs)
+            collection.find_one.side_effect = lambda query, docs=docs: next(
+                (dict(d) for d in docs if d["_id"] == query["_id"]), None
+            )
+
+        cache = VersionedCache("test_study_plan_tree", ttl_seconds=60,
+                               backend=LocalCacheBackend("test_study_plan_tree_backend", register_metrics=False))
+        patcher = patch.object(plan_tree_service, "_plan_tree_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _finder(self, name, docs):
+        def find(query, projection=None):
+            self.calls.append(name)
+            field, condition = next(iter(query.items()))
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            result = []
+            for doc in docs:
+                current = doc.get(field)
+                matches = any(v in values for v in current) if isinstance(current, list) else current in values
+                if matches:
+                    result.append({k: v for k, v in doc.items() if projection is None or k == "_id" or k in projection})
+            return result
+        return find
+
+    def test_tree_is_built_with_one_query_per_level(self):
+        plan = StudyPlanTreeLoader(self.db).load(str(self.plan_id))
+
+        self.assertEqual(self.calls, ["modules", "topics", "evaluations"])
+        module_a, module_b = plan["modules"]
+        self.assertEqual([t["name"] for t in module_a["topics"]], ["A1", "A2"])
+        self.assertEqual(module_a["date_start"], module_a["created_at"])
+        self.assertEqual([e["title"] for e in module_a["evaluations"]], ["Compartida"])
+        self.assertEqual(sorted(e["title"] for e in module_b["evaluations"]), ["Compartida", "Solo B"])
+        self.assertEqual(module_b["evaluations"][0]["topic_ids"][0], str(self.topic_a1))
+
+    def test_outline_profile_omits_heavy_fields(self):
+        plan = StudyPlanTreeLoader(self.db).load(str(self.plan_id), profile="outline")
+
+        module_a = plan["modules"][0]
+        self.assertNotIn("learning_outcomes", module_a)
+        self.assertNotIn("theory_content", module_a["topics"][0])
+        with self.assertRaises(ValueError):
+            StudyPlanTreeLoader(self.db).load(str(self.plan_id), profile="completo")
+
+    def test_cached_tree_is_invalidated_by_topic_writes(self):
+        loader = StudyPlanTreeLoader(self.db)
+        loader.load(str(self.plan_id))["modules"].clear()
+        self.assertEqual(len(loader.load(str(self.plan_id))["modules"]), 2)
+        self.assertEqual(len(self.calls), 3)
+
+        invalidate_study_plan_tree(topic_ids=[str(self.topic_b1)], db=self.db)
+        loader.load(str(self.plan_id))
+        # topics + modules para resolver el plan, y luego las tres consultas del árbol
+        self.assertEqual(self.calls[3:], ["topics", "modules", "modules", "topics", "evaluations"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import sys
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content import template_services
+from src.content.template_services import TemplateService
+from src.shared.cache import LocalCacheBackend, VersionedCache
+
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, spec):
+        for field, direction in reversed(spec):
+            self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class TestTemplateCatalogCache(unittest.TestCase):
+    """Pruebas de la caché particionada y la paginación keyset del catálogo de plantillas"""
+
+    def setUp(self):
+        self.teacher_id = str(ObjectId())
+        self.other_id = str(ObjectId())
+        base = datetime(2026, 1, 1)
+        self.docs = [
+            {"_id": ObjectId(), "name": f"Plantilla {i}", "owner_id": ObjectId(self.teacher_id), "scope": "public",
+             "html": "<div>x</div>", "created_at": base + timedelta(minutes=i)}
+            for i in range(5)
+        ]
+        self.queries = []
+
+        self.service = TemplateService.__new__(TemplateService)
+        self.service.db = MagicMock()
+        self.service.templates_collection = MagicMock()
+        self.service.templates_collection.find.side_effect = self._find
+        self.service.templates_collection.insert_one.return_value.inserted_id = ObjectId()
+
+        cache = VersionedCache("test_template_catalog", ttl_seconds=60,
+                               backend=LocalCacheBackend("test_template_catalog_backend", register_metrics=False))
+        patcher = patch.object(template_services, "_template_catalog_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _find(self, query, projection=None):
+        self.queries.append(query)
+        return _FakeCursor([dict(d) for d in self.docs])
+
+    def test_owner_all_query_does_not_expose_private_templates(self):
+        query = self.service._build_catalog_query(owner_filter="all", user_id=self.teacher_id,
+                                                  learning_methodology="visual")
+
+        owner_clause, methodology_clause = query["$and"]
+        self.assertEqual(owner_clause, {"$or": [{"scope": "public"}, {"owner_id": ObjectId(self.teacher_id)}]})
+        self.assertIn({"capabilities.methodologies": "visual"}, methodology_clause["$or"])
+
+    def test_warm_cache_skips_mongo_until_a_visible_partition_changes(self):
+        first, next_cursor = self.service.list_templates_page(user_id=self.teacher_id, limit=2)
+        self.service.list_templates_page(user_id=self.teacher_id, limit=2)
+        self.assertEqual([t.name for t in first], ["Plantilla 4", "Plantilla 3"])
+        self.assertIsNotNone(next_cursor)
+        self.assertEqual(len(self.queries), 1)
+
+        # Una plantilla privada de otro usuario no invalida la consulta
+        self.service.create_template({"name": "Privada"}, self.other_id)
+        self.service.list_templates_page(user_id=self.teacher_id, limit=2)
+        self.assertEqual(len(self.queries), 1)
+
+        # Una plantilla pública sí
+        self.service.create_template({"name": "Pública", "scope": "public"}, self.other_id)
+        self.service.list_templates_page(user_id=self.teacher_id, limit=2)
+        self.assertEqual(len(self.queries), 2)
+
+    def test_cursor_filters_after_last_row(self):
+        _, next_cursor = self.service.list_templates_page(user_id=self.teacher_id, limit=2)
+        self.service.list_templates_page(user_id=self.teacher_id, limit=2, cursor=next_cursor)
+
+        keyset = self.queries[-1]["$and"][1]["$or"]
+        self.assertEqual(keyset[0], {"$or": [{"created_at": {"$lt": self.docs[3]["created_at"]}},
+                                             {"created_at": None}]})
+
+    def test_available_templates_count_usage_with_one_aggregation(self):
+        self.service.db.template_instances.aggregate.return_value = [
+            {"_id": self.docs[4]["_id"], "count": 2},
+            {"_id": str(self.docs[4]["_id"]), "count": 1},
+        ]
+        self.service.db.template_metrics.find.return_value = [
+            {"template_id": self.docs[3]["_id"], "effectiveness_score": 0.8}
+        ]
+
+        templates, _ = self.service.get_available_templates_page_for_teacher(self.teacher_id, limit=3)
+
+        by_id = {t["template_id"]: t for t in templates}
+        self.assertEqual(by_id[str(self.docs[4]["_id"])]["usage_statistics"]["usage_count"], 3)
+        self.assertEqual(by_id[str(self.docs[3]["_id"])]["effectiveness_metrics"]["effectiveness_score"], 0.8)
+        self.service.db.template_instances.aggregate.assert_called_once()
+        self.service.db.template_instances.count_documents.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
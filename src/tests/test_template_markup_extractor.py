@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.content.template_services import TemplateMarkupExtractor
+
+
+class TestTemplateMarkupExtractor(unittest.TestCase):
+    """Pruebas de la extracción de marcadores data-sapiens-* en una sola pasada"""
+
+    HTML = (
+        '<div style="background:#fff" data-sapiens-param="title">Título</div>'
+        "<img data-sapiens-asset='hero_image' src='x.png'>"
+        '<canvas data-sapiens-param="canvas_width"></canvas>'
+        '<p data-sapiens-slot="intro_text"></p>'
+        '<section data-sapiens-if="hints"></section>'
+        '<span data-sapiens-param="title"></span>'
+        '<script id="sapiens-defaults" type="application/json">{"title": "Hola", "canvas_width": 640}</script>'
+    )
+
+    def test_extracts_all_marker_kinds_and_defaults(self):
+        result = TemplateMarkupExtractor.extract_markers(self.HTML)
+
+        self.assertEqual(result["markers_found"], {
+            "params": ["title", "canvas_width"],
+            "assets": ["hero_image"],
+            "slots": ["intro_text"],
+            "conditions": ["hints"],
+        })
+        properties = result["props_schema"]["properties"]
+        self.assertEqual(properties["canvas_width"]["type"], "number")
+        self.assertEqual(properties["hero_image"]["format"], "uri")
+        self.assertTrue(properties["show_hints"]["default"])
+        self.assertEqual(result["defaults"], {"title": "Hola", "canvas_width": 640})
+
+    def test_cached_result_is_not_shared_with_callers(self):
+        first = TemplateMarkupExtractor.extract_markers(self.HTML)
+        first["defaults"]["title"] = "modificado"
+
+        second = TemplateMarkupExtractor.extract_markers(self.HTML)
+        self.assertEqual(second["defaults"]["title"], "Hola")
+
+    def test_context_is_limited_to_the_marker_tag(self):
+        context = TemplateMarkupExtractor.scan_markers(self.HTML)["markers"]["param"]["title"]
+        self.assertEqual(context, '<div style="background:#fff" data-sapiens-param="title">Título')
+
+
+if __name__ == '__main__':
+    unittest.main()
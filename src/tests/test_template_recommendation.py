@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content.template_recommendation_service import TemplateRecommendationService
+
+
+class TestTemplateRecommendation(unittest.TestCase):
+    """Pruebas del scoring matricial de plantillas"""
+
+    def setUp(self):
+        now = datetime(2026, 1, 1)
+        self.templates = [
+            {"_id": ObjectId(), "name": "Quiz", "version": "1.0.0", "updated_at": now, "style_tags": ["quiz", "assessment"],
+             "subject_tags": ["fisica"], "baseline_mix": {"V": 10, "A": 10, "K": 60, "R": 20}, "html": "<div>" + "x" * 600},
+            {"_id": ObjectId(), "name": "Video", "version": "1.0.0", "updated_at": now, "style_tags": ["informative", "video"],
+             "subject_tags": ["fisica", "ondas"], "baseline_mix": {"V": 70, "A": 10, "K": 10, "R": 10}, "html": "<p>x</p>"},
+            {"_id": ObjectId(), "name": "Juego", "version": "2.0.0", "updated_at": now, "style_tags": ["game", "interactive"],
+             "subject_tags": [], "baseline_mix": {}, "html": "<script>javascript</script>"},
+        ]
+        self.slides = [
+            {"_id": ObjectId(), "order": i + 1, "content": "palabra " * (50 * (i + 1))}
+            for i in range(4)
+        ]
+        self.topic_context = {"tags": ["fisica", "ondas"]}
+
+        self.service = TemplateRecommendationService.__new__(TemplateRecommendationService)
+        self.service.templates_collection = MagicMock()
+        self.service.templates_collection.find.side_effect = self._find_templates
+        self.service.content_collection = MagicMock()
+        self.service.content_collection.find.return_value.sort.return_value = self.slides
+        self.service._get_topic_context = lambda topic_id: self.topic_context
+
+    def _find_templates(self, query, projection=None):
+        if "_id" in query:
+            self.full_fetches.append(len(query["_id"]["$in"]))
+            return [dict(t) for t in self.templates if t["_id"] in query["_id"]["$in"]]
+        return [{k: v for k, v in t.items() if k != "html"} for t in self.templates]
+
+    def test_matrix_scores_match_scalar_compatibility_score(self):
+        self.full_fetches = []
+        features = self.service._get_available_template_features()
+        analyses = [self.service._analyze_slide_content(slide) for slide in self.slides]
+        scored = self.service._score_slides(analyses, features, self.topic_context, max_recommendations=3)
+
+        balance = {"V": 0, "A": 0, "K": 0, "R": 0}
+        for j, score, _ in scored[0]:
+            template = next(t for t in self.templates if str(t["_id"]) == features[j]["template_id"])
+            expected = self.service._calculate_compatibility_score(
+                template, analyses[0], self.topic_context, balance, 1, len(self.slides)
+            )
+            self.assertAlmostEqual(score, expected)
+
+    def test_sequential_pass_avoids_repeats_and_features_are_cached_per_version(self):
+        self.full_fetches = []
+        first = self.service.recommend_templates_for_slides(str(ObjectId()), None, max_recommendations=2)
+        second = self.service.recommend_templates_for_slides(str(ObjectId()), None, max_recommendations=2)
+
+        selected = [next(r["template_id"] for r in recs if r["selected"]) for recs in first.values()]
+        self.assertEqual(len(set(selected[:3])), 3)
+        self.assertTrue(all(len(recs) == 2 for recs in first.values()))
+        self.assertEqual(first, second)
+        # El HTML solo se descarga en la primera llamada
+        self.assertEqual(self.full_fetches, [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
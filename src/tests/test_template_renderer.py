@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content import template_services
+from src.content.template_models import Template, TemplateInstance
+from src.content.template_services import (
+    TemplateInstanceService,
+    TemplateRenderer,
+    invalidate_template_render,
+)
+from src.shared.cache import LocalCacheBackend, VersionedCache
+
+
+class TestTemplateRenderer(unittest.TestCase):
+    """Pruebas del plan de sustitución de props y la caché de previews"""
+
+    HTML = ('<html><body><h1 data-sapiens-param="title">Viejo</h1>'
+            '<p>Hola title, color: accent</p></BODY></html>')
+
+    def setUp(self):
+        cache = VersionedCache("test_template_render", ttl_seconds=60,
+                               backend=LocalCacheBackend("test_template_render_backend", register_metrics=False))
+        patcher = patch.object(template_services, "_template_render_cache", cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_props_replace_param_content_and_literal_names(self):
+        html = TemplateRenderer.apply_props(self.HTML, {"title": "Nuevo", "accent": "#f00"})
+
+        self.assertEqual(html, '<html><body><h1 data-sapiens-param="Nuevo">Nuevo</h1>'
+                               '<p>Hola Nuevo, color: #f00</p></BODY></html>')
+        self.assertEqual(TemplateRenderer.apply_props(self.HTML, {}), self.HTML)
+
+    def test_inserted_values_are_not_rescanned(self):
+        html = TemplateRenderer.apply_props("<p>alpha beta</p>", {"alpha": "beta", "beta": "gamma"})
+        self.assertEqual(html, "<p>beta gamma</p>")
+
+    def test_instance_preview_is_served_from_cache_until_template_changes(self):
+        template = Template(name="Quiz", owner_id=str(ObjectId()), html=self.HTML)
+        instance = TemplateInstance(template_id=str(template._id), template_version="1",
+                                    topic_id=str(ObjectId()), creator_id=str(ObjectId()), props={"title": "Nuevo"})
+        service = TemplateInstanceService.__new__(TemplateInstanceService)
+        service.get_instance = MagicMock(return_value=instance)
+        service.template_service = MagicMock()
+        service.template_service.get_template.return_value = template
+
+        first = service.get_instance_preview(str(instance._id))
+        second = service.get_instance_preview(str(instance._id))
+
+        self.assertEqual(first, second)
+        self.assertEqual(first["body_index"], first["html"].index("</BODY>"))
+        self.assertEqual(service.get_instance.call_count, 1)
+
+        invalidate_template_render(template._id)
+        service.get_instance_preview(str(instance._id))
+        self.assertEqual(service.get_instance.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+from unittest.mock import MagicMock
+
+# Añadir el directorio raíz al path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from bson import ObjectId
+
+from src.content.services import ContentService, invalidate_topic_slide_stats
+from src.shared.pagination import decode_cursor
+
+
+class TestTopicSlidesOptimized(unittest.TestCase):
+    """Pruebas de get_topic_slides_optimized resuelto con una sola agregación $facet"""
+
+    def setUp(self):
+        self.service = ContentService.__new__(ContentService)
+        self.service.collection = MagicMock()
+        self.topic_id = str(ObjectId())
+        self.parent_id = ObjectId()
+        self.slide_ids = [ObjectId() for _ in range(3)]
+        now = datetime(2026, 1, 1, 12, 0, 0)
+        self.facet_result = {
+            "slides": [
+                {"_id": self.slide_ids[i], "order": i + 1, "status": "html_ready", "has_html": True,
+                 "has_narrative": i == 0, "parent_content_id": self.parent_id if i else None,
+                 "created_at": now, "updated_at": now}
+                for i in range(3)
+            ],
+            "stats": [{"total": 3, "slides_with_html": 3, "slides_with_narrative": 1,
+                       "slides_complete": 1, "avg_gen_time_ms": 2000.0}],
+            "last_completed": [{"_id": self.slide_ids[0], "updated_at": now}],
+            "trend": [{"_id": "2026-01-01", "count": 3}],
+            "by_parent": [
+                {"_id": None, "total": 1, "with_html": 1, "with_narrative": 1, "complete": 1, "orders": [1]},
+                {"_id": self.parent_id, "total": 2, "with_html": 2, "with_narrative": 0, "complete": 0, "orders": [3, 2]},
+            ],
+        }
+        self.service.collection.aggregate.side_effect = lambda pipeline: iter([self.facet_result])
+        invalidate_topic_slide_stats(self.topic_id)
+
+    def test_single_round_trip_with_keyset_page(self):
+        result = self.service.get_topic_slides_optimized(self.topic_id, group_by_parent=True, limit=2)
+
+        self.assertEqual(self.service.collection.aggregate.call_count, 1)
+        pipeline = self.service.collection.aggregate.call_args[0][0]
+        self.assertEqual(len(pipeline), 2)
+        self.assertIn("$facet", pipeline[1])
+        self.assertEqual(set(pipeline[1]["$facet"]), {"slides", "stats", "last_completed", "trend", "by_parent"})
+        self.assertIn({"$limit": 3}, pipeline[1]["$facet"]["slides"])
+
+        self.assertEqual([s["order"] for s in result["slides"]], [1, 2])
+        self.assertEqual(decode_cursor(result["next_cursor"]), [2, self.slide_ids[1]])
+        self.assertEqual(result["stats"]["pending"], 0)
+        self.assertEqual(result["stats"]["completion_percentage"], 33.33)
+        self.assertEqual(result["last_completed_slide"]["content_id"], str(self.slide_ids[0]))
+        self.assertEqual(result["by_parent"]["root"]["complete"], 1)
+        self.assertEqual(result["by_parent"][str(self.parent_id)]["orders"], [2, 3])
+
+    def test_cursor_filters_page_and_cached_stats_skip_stat_facets(self):
+        first = self.service.get_topic_slides_optimized(self.topic_id, limit=2)
+        self.service.get_topic_slides_optimized(self.topic_id, limit=2, cursor=first["next_cursor"])
+
+        pipeline = self.service.collection.aggregate.call_args[0][0]
+        facets = pipeline[1]["$facet"]
+        self.assertEqual(set(facets), {"slides"})
+        self.assertEqual(facets["slides"][0], {"$match": {"$or": [
+            {"order": {"$gt": 2}},
+            {"order": 2, "_id": {"$gt": self.slide_ids[1]}},
+        ]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,12 @@ from src.shared.constants import ROLES
 from src.shared.database import get_db
 from src.shared.decorators import auth_required, role_required, workspace_type_required, workspace_access_required
 from src.shared.middleware import apply_workspace_filter, get_current_workspace_info
+from src.shared.pagination import parse_page_limit
+from src.shared.blob_store import content_blob_store, content_blob_refs
 from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 import threading
 
@@ -64,6 +67,202 @@ def _regrade_evaluations_async(student_id: str, topic_id: str, module_id: Option
     except Exception as exc:
         logging.warning(f"Error encolando regrading para topic {topic_id}: {exc}")
 
+
+def _build_content_result_payload(data: Dict[str, Any], student_id: str) -> Dict[str, Any]:
+    """
+    Construye el payload de ContentResultService a partir del cuerpo enviado por el
+    frontend (un resultado de POST /content-result o un elemento del lote).
+    """
+    session_data = data.get('session_data') or {}
+    if not isinstance(session_data, dict):
+        session_data = {}
+    learning_metrics = data.get('learning_metrics', {})
+    if not isinstance(learning_metrics, dict):
+        learning_metrics = {}
+    metrics = data.get('metrics', {}) or {}
+    if not isinstance(metrics, dict):
+        metrics = {}
+    completion_percentage = data.get('completion_percentage')
+    if completion_percentage is None:
+        completion_percentage = session_data.get('completion_percentage', 100)
+
+    return {
+        "virtual_content_id": data.get('virtual_content_id'),
+        "student_id": student_id,
+        "score": data.get('score'),
+        "completion_percentage": completion_percentage,
+        "session_data": session_data,
+        "metrics": metrics,
+        "learning_metrics": learning_metrics,
+        "feedback": data.get('feedback', ''),
+        "session_type": data.get('session_type', 'completion'),
+        "prediction_id": data.get("prediction_id"),
+        "rl_context": data.get("rl_context"),
+        "baseline_mix": data.get("baseline_mix"),
+        "variant_label": data.get("variant_label"),
+        "template_instance_id": data.get("template_instance_id"),
+        "template_usage_id": data.get("template_usage_id"),
+        "topic_id": data.get("topic_id"),
+        "content_type": data.get("content_type")
+    }
+
+
+def _build_interaction_tracking_update(
+    virtual_tracking: Dict[str, Any],
+    completion_percentage: Any,
+    normalized_score: Any,
+    time_spent_seconds: Any,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Calcula los campos $set/$inc de interaction_tracking para un resultado.
+    virtual_tracking es el tracking previo del contenido virtual.
+    """
+    prev_sessions = virtual_tracking.get("sessions", 0) or 0
+    session_completed = completion_percentage >= 100
+    if session_completed:
+        total_sessions = prev_sessions + 1
+        prev_avg = virtual_tracking.get("avg_score") or 0.0
+        avg_score_value = (
+            normalized_score
+            if prev_sessions == 0
+            else (prev_avg * prev_sessions + normalized_score) / total_sessions
+        )
+    else:
+        avg_score_value = virtual_tracking.get("avg_score")
+
+    update_data = {
+        "interaction_tracking.last_accessed": datetime.now(),
+        "interaction_tracking.completion_percentage": completion_percentage,
+        "updated_at": datetime.now()
+    }
+
+    if session_completed:
+        update_data["interaction_tracking.completion_status"] = "completed"
+    elif completion_percentage > 0:
+        update_data["interaction_tracking.completion_status"] = "in_progress"
+
+    if avg_score_value is not None:
+        update_data["interaction_tracking.avg_score"] = avg_score_value
+
+    best_score = virtual_tracking.get("best_score")
+    if isinstance(normalized_score, (int, float)) and (best_score is None or normalized_score > best_score):
+        update_data["interaction_tracking.best_score"] = normalized_score
+
+    if isinstance(time_spent_seconds, (int, float)) and time_spent_seconds > 0:
+        update_data["interaction_tracking.time_spent_seconds"] = time_spent_seconds
+    inc_operations: Dict[str, Any] = {"interaction_tracking.access_count": 1}
+    if session_completed:
+        inc_operations["interaction_tracking.sessions"] = 1
+    if isinstance(time_spent_seconds, (int, float)) and time_spent_seconds > 0:
+        inc_operations["interaction_tracking.total_time_spent"] = time_spent_seconds
+
+    return update_data, inc_operations
+
+
+def _refresh_virtual_topic_progress(virtual_topic_id: ObjectId, student_id: str) -> None:
+    """
+    Recalcula el progreso de un tema virtual a partir de sus contenidos y, si se
+    completó, desbloquea el siguiente tema, actualiza el módulo y encola la
+    generación del siguiente módulo al 80%.
+    """
+    try:
+        # Obtener todos los contenidos del tema
+        topic_contents = list(get_db().virtual_topic_contents.find({
+            "virtual_topic_id": virtual_topic_id
+        }))
+        
+        if topic_contents:
+            # Calcular progreso promedio del tema
+            total_completion = sum(
+                content.get("interaction_tracking", {}).get("completion_percentage", 0)
+                for content in topic_contents
+            )
+            topic_progress = total_completion / len(topic_contents)
+            
+            # Determinar estado del tema
+            topic_status = "completed" if topic_progress >= 100 else "in_progress" if topic_progress > 0 else "not_started"
+            
+            # Actualizar progreso del tema virtual
+            get_db().virtual_topics.update_one(
+                {"_id": virtual_topic_id},
+                {"$set": {
+                    "progress": topic_progress,
+                    "completion_status": topic_status,
+                    "updated_at": datetime.now()
+                }}
+            )
+            
+            # Si el tema se completó al 100%, desbloquear siguiente tema
+            if topic_progress >= 100:
+                virtual_topic = get_db().virtual_topics.find_one({"_id": virtual_topic_id})
+                if virtual_topic:
+                    virtual_module_id = virtual_topic.get("virtual_module_id")
+                    current_order = virtual_topic.get("order", 0)
+                    
+                    # Desbloquear siguiente tema
+                    get_db().virtual_topics.update_one(
+                        {
+                            "virtual_module_id": virtual_module_id,
+                            "order": current_order + 1
+                        },
+                        {"$set": {"locked": False, "updated_at": datetime.now()}}
+                    )
+                    
+                    # Actualizar progreso del módulo
+                    virtual_module_service._update_module_progress_from_topic(virtual_topic)
+                    
+                    # Trigger para actualización de perfil adaptativo
+                    try:
+                        adaptive_service = AdaptiveLearningService()
+                        adaptive_service.update_profile_from_results(student_id)
+                    except Exception as adaptive_err:
+                        logging.warning(f"Error actualizando perfil adaptativo: {adaptive_err}")
+                    
+                    # Verificar si necesitamos generar siguiente módulo (trigger al 80%)
+                    updated_module = get_db().virtual_modules.find_one({"_id": virtual_module_id})
+                    if updated_module and updated_module.get("progress", 0) >= 80:
+                        try:
+                            # Obtener información del módulo para generar el siguiente
+                            module_id = updated_module.get("module_id")
+                            study_plan_id = updated_module.get("study_plan_id")
+                            
+                            # Buscar siguiente módulo en el plan de estudios
+                            current_module = get_db().modules.find_one({"_id": module_id})
+                            if current_module:
+                                next_module = get_db().modules.find_one({
+                                    "study_plan_id": study_plan_id,
+                                    "order": current_module.get("order", 0) + 1
+                                })
+                                
+                                if next_module:
+                                    # Verificar si el siguiente módulo virtual ya existe
+                                    existing_next = get_db().virtual_modules.find_one({
+                                        "module_id": next_module["_id"],
+                                        "student_id": ObjectId(student_id)
+                                    })
+                                    
+                                    if not existing_next:
+                                        # Encolar generación del siguiente módulo
+                                        success, task_id = queue_service.enqueue_generation_task(
+                                            student_id=student_id,
+                                            module_id=str(next_module["_id"]),
+                                            task_type="generate",
+                                            priority=1,
+                                            payload={
+                                                "trigger_reason": "auto_progress_80",
+                                                "source_module_id": str(module_id)
+                                            }
+                                        )
+                                        if not success:
+                                            logging.warning(
+                                                f"Failed to enqueue next module generation (auto progress): {task_id}"
+                                            )
+                        except Exception as next_module_err:
+                            logging.warning(f"Error generando siguiente módulo: {next_module_err}")
+            
+    except Exception as progress_err:
+        logging.warning(f"Error calculando progreso del tema: {progress_err}")
+
 # Rutas para Módulos Virtuales
 @virtual_bp.route('/module', methods=['POST'])
 @APIRoute.standard(
@@ -128,7 +327,19 @@ def create_virtual_topic():
 @virtual_bp.route('/module/<module_id>/topics', methods=['GET'])
 @APIRoute.standard(auth_required_flag=True)
 def get_module_topics(module_id):
-    """Obtiene todos los temas de un módulo virtual"""
+    """
+    Obtiene todos los temas de un módulo virtual.
+
+    Query params opcionales:
+        view=summary: devuelve filas compactas por tema
+        limit / cursor: paginación keyset (implica view=summary)
+    """
+    limit = parse_page_limit(request.args.get('limit'), default=None)
+    cursor = request.args.get('cursor')
+    if limit or cursor or request.args.get('view') == 'summary':
+        page = virtual_topic_service.get_module_topics_page(module_id, limit=limit, cursor=cursor)
+        return APIRoute.success(data=page)
+
     topics = virtual_topic_service.get_module_topics(module_id)
     return APIRoute.success(data={"topics": topics})
 
@@ -314,9 +525,6 @@ def submit_content_result():
     try:
         data = request.get_json() or {}
         virtual_content_id = data.get('virtual_content_id')
-        session_data = data.get('session_data') or {}
-        if not isinstance(session_data, dict):
-            session_data = {}
         student_id = get_jwt_identity()
         if not student_id:
             return APIRoute.error(
@@ -324,18 +532,10 @@ def submit_content_result():
                 "JWT identity is required",
                 status_code=401
             )
-        learning_metrics = data.get('learning_metrics', {})
-        if not isinstance(learning_metrics, dict):
-            learning_metrics = {}
-        feedback = data.get('feedback', '')
-        session_type = data.get('session_type', 'completion')
-        metrics = data.get('metrics', {}) or {}
-        if not isinstance(metrics, dict):
-            metrics = {}
-        score = data.get('score')
-        completion_percentage = data.get('completion_percentage')
-        if completion_percentage is None:
-            completion_percentage = session_data.get('completion_percentage', 100)
+        result_data = _build_content_result_payload(data, student_id)
+        session_data = result_data["session_data"]
+        score = result_data["score"]
+        completion_percentage = result_data["completion_percentage"]
         
         # Verificar que el contenido virtual existe
         virtual_content = get_db().virtual_topic_contents.find_one({
@@ -361,70 +561,15 @@ def submit_content_result():
         normalized_score = content_result_service.normalize_score(score, session_data, completion_percentage)
         time_spent_seconds = session_data.get("time_spent")
         virtual_tracking = virtual_content.get("interaction_tracking") or {}
-        prev_sessions = virtual_tracking.get("sessions", 0) or 0
-        session_completed = completion_percentage >= 100
-        if session_completed:
-            total_sessions = prev_sessions + 1
-            prev_avg = virtual_tracking.get("avg_score") or 0.0
-            avg_score_value = (
-                normalized_score
-                if prev_sessions == 0
-                else (prev_avg * prev_sessions + normalized_score) / total_sessions
-            )
-        else:
-            avg_score_value = virtual_tracking.get("avg_score")
 
         # Crear el resultado usando el servicio unificado
-        result_data = {
-            "virtual_content_id": virtual_content_id,
-            "student_id": student_id,
-            "score": score,
-            "completion_percentage": completion_percentage,
-            "session_data": session_data,
-            "metrics": metrics,
-            "learning_metrics": learning_metrics,
-            "feedback": feedback,
-            "session_type": session_type,
-            "prediction_id": data.get("prediction_id"),
-            "rl_context": data.get("rl_context"),
-            "baseline_mix": data.get("baseline_mix"),
-            "variant_label": data.get("variant_label"),
-            "template_instance_id": data.get("template_instance_id"),
-            "template_usage_id": data.get("template_usage_id"),
-            "topic_id": data.get("topic_id"),
-            "content_type": data.get("content_type")
-        }
-        
         success, result_id = content_result_service.record_result(result_data)
         
         if success:
             # Actualizar tracking del contenido virtual
-            update_data = {
-            "interaction_tracking.last_accessed": datetime.now(),
-            "interaction_tracking.completion_percentage": completion_percentage,
-            "updated_at": datetime.now()
-            }
-
-            if session_completed:
-                update_data["interaction_tracking.completion_status"] = "completed"
-            elif completion_percentage > 0:
-                update_data["interaction_tracking.completion_status"] = "in_progress"
-
-            if avg_score_value is not None:
-                update_data["interaction_tracking.avg_score"] = avg_score_value
-
-            best_score = virtual_tracking.get("best_score")
-            if isinstance(normalized_score, (int, float)) and (best_score is None or normalized_score > best_score):
-                update_data["interaction_tracking.best_score"] = normalized_score
-
-            if isinstance(time_spent_seconds, (int, float)) and time_spent_seconds > 0:
-                update_data["interaction_tracking.time_spent_seconds"] = time_spent_seconds
-            inc_operations: Dict[str, Any] = {"interaction_tracking.access_count": 1}
-            if session_completed:
-                inc_operations["interaction_tracking.sessions"] = 1
-            if isinstance(time_spent_seconds, (int, float)) and time_spent_seconds > 0:
-                inc_operations["interaction_tracking.total_time_spent"] = time_spent_seconds
-
+            update_data, inc_operations = _build_interaction_tracking_update(
+                virtual_tracking, completion_percentage, normalized_score, time_spent_seconds
+            )
             get_db().virtual_topic_contents.update_one(
                 {"_id": ObjectId(virtual_content_id)},
                 {"$set": update_data, "$inc": inc_operations}
@@ -433,103 +578,7 @@ def submit_content_result():
             # Calcular progreso del tema automáticamente
             virtual_topic_id = virtual_content.get("virtual_topic_id")
             if virtual_topic_id and completion_percentage >= 100:
-                try:
-                    # Obtener todos los contenidos del tema
-                    topic_contents = list(get_db().virtual_topic_contents.find({
-                        "virtual_topic_id": virtual_topic_id
-                    }))
-                    
-                    if topic_contents:
-                        # Calcular progreso promedio del tema
-                        total_completion = sum(
-                            content.get("interaction_tracking", {}).get("completion_percentage", 0)
-                            for content in topic_contents
-                        )
-                        topic_progress = total_completion / len(topic_contents)
-                        
-                        # Determinar estado del tema
-                        topic_status = "completed" if topic_progress >= 100 else "in_progress" if topic_progress > 0 else "not_started"
-                        
-                        # Actualizar progreso del tema virtual
-                        get_db().virtual_topics.update_one(
-                            {"_id": virtual_topic_id},
-                            {"$set": {
-                                "progress": topic_progress,
-                                "completion_status": topic_status,
-                                "updated_at": datetime.now()
-                            }}
-                        )
-                        
-                        # Si el tema se completó al 100%, desbloquear siguiente tema
-                        if topic_progress >= 100:
-                            virtual_topic = get_db().virtual_topics.find_one({"_id": virtual_topic_id})
-                            if virtual_topic:
-                                virtual_module_id = virtual_topic.get("virtual_module_id")
-                                current_order = virtual_topic.get("order", 0)
-                                
-                                # Desbloquear siguiente tema
-                                get_db().virtual_topics.update_one(
-                                    {
-                                        "virtual_module_id": virtual_module_id,
-                                        "order": current_order + 1
-                                    },
-                                    {"$set": {"locked": False, "updated_at": datetime.now()}}
-                                )
-                                
-                                # Actualizar progreso del módulo
-                                virtual_module_service._update_module_progress_from_topic(virtual_topic)
-                                
-                                # Trigger para actualización de perfil adaptativo
-                                try:
-                                    adaptive_service = AdaptiveLearningService()
-                                    adaptive_service.update_profile_from_results(student_id)
-                                except Exception as adaptive_err:
-                                    logging.warning(f"Error actualizando perfil adaptativo: {adaptive_err}")
-                                
-                                # Verificar si necesitamos generar siguiente módulo (trigger al 80%)
-                                updated_module = get_db().virtual_modules.find_one({"_id": virtual_module_id})
-                                if updated_module and updated_module.get("progress", 0) >= 80:
-                                    try:
-                                        # Obtener información del módulo para generar el siguiente
-                                        module_id = updated_module.get("module_id")
-                                        study_plan_id = updated_module.get("study_plan_id")
-                                        
-                                        # Buscar siguiente módulo en el plan de estudios
-                                        current_module = get_db().modules.find_one({"_id": module_id})
-                                        if current_module:
-                                            next_module = get_db().modules.find_one({
-                                                "study_plan_id": study_plan_id,
-                                                "order": current_module.get("order", 0) + 1
-                                            })
-                                            
-                                            if next_module:
-                                                # Verificar si el siguiente módulo virtual ya existe
-                                                existing_next = get_db().virtual_modules.find_one({
-                                                    "module_id": next_module["_id"],
-                                                    "student_id": ObjectId(student_id)
-                                                })
-                                                
-                                                if not existing_next:
-                                                    # Encolar generación del siguiente módulo
-                                                    success, task_id = queue_service.enqueue_generation_task(
-                                                        student_id=student_id,
-                                                        module_id=str(next_module["_id"]),
-                                                        task_type="generate",
-                                                        priority=1,
-                                                        payload={
-                                                            "trigger_reason": "auto_progress_80",
-                                                            "source_module_id": str(module_id)
-                                                        }
-                                                    )
-                                                    if not success:
-                                                        logging.warning(
-                                                            f"Failed to enqueue next module generation (auto progress): {task_id}"
-                                                        )
-                                    except Exception as next_module_err:
-                                        logging.warning(f"Error generando siguiente módulo: {next_module_err}")
-                        
-                except Exception as progress_err:
-                    logging.warning(f"Error calculando progreso del tema: {progress_err}")
+                _refresh_virtual_topic_progress(virtual_topic_id, student_id)
             
             topic_id = data.get("topic_id")
             module_id = virtual_content.get("virtual_module_id") or virtual_content.get("module_id")
@@ -563,6 +612,147 @@ def submit_content_result():
         )
 
 
+CONTENT_RESULTS_BATCH_MAX = 200
+
+
+@virtual_bp.route('/content-results/batch', methods=['POST'])
+@APIRoute.standard(
+    auth_required_flag=True,
+    roles=[ROLES["STUDENT"]],
+    required_fields=['results']
+)
+def submit_content_results_batch():
+    """
+    Registra varios resultados de contenido en una sola petición.
+
+    Body: {"results": [<mismo formato que POST /content-result>, ...]} (máx. 200)
+
+    Los metadatos de los contenidos virtuales se resuelven con una consulta $in,
+    los resultados se insertan con insert_many y el tracking con un bulk_write.
+    El progreso de cada tema, el re-calificado y los efectos secundarios se
+    disparan una vez por tema/estudiante. Responde 201 si todo se registró,
+    207 con "errors" por índice si hubo fallos parciales, y 400 si ninguno se registró.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('results')
+        if not isinstance(items, list) or not items:
+            return APIRoute.error(ErrorCodes.VALIDATION_ERROR, "'results' debe ser una lista no vacía")
+        if len(items) > CONTENT_RESULTS_BATCH_MAX:
+            return APIRoute.error(
+                ErrorCodes.VALIDATION_ERROR,
+                f"Máximo {CONTENT_RESULTS_BATCH_MAX} resultados por lote"
+            )
+        student_id = get_jwt_identity()
+        if not student_id:
+            return APIRoute.error(
+                ErrorCodes.VALIDATION_ERROR,
+                "JWT identity is required",
+                status_code=401
+            )
+
+        errors: List[Dict[str, Any]] = []
+        payloads: List[Dict[str, Any]] = []
+        payload_indexes: List[int] = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('virtual_content_id') or 'session_data' not in item:
+                errors.append({"index": index, "error": "Se requieren virtual_content_id y session_data"})
+                continue
+            payloads.append(_build_content_result_payload(item, student_id))
+            payload_indexes.append(index)
+
+        prefetched = content_result_service._prefetch_virtual_content_metadata(
+            [payload["virtual_content_id"] for payload in payloads]
+        )
+        batch_result = content_result_service.record_results_batch(
+            payloads, student_id=student_id, prefetched=prefetched
+        )
+        errors.extend(
+            {"index": payload_indexes[error["index"]], "error": error["error"]}
+            for error in batch_result["errors"]
+        )
+
+        # Tracking de contenidos virtuales: se aplica cada resultado en orden sobre
+        # el tracking en memoria y se emite un UpdateOne por contenido virtual.
+        tracking_state: Dict[str, Dict[str, Any]] = {}
+        completed_topics = set()
+        regrade_targets = {}
+        inserted = []
+        for entry in batch_result["inserted"]:
+            payload = payloads[entry["index"]]
+            inserted.append({"index": payload_indexes[entry["index"]], "result_id": entry["result_id"]})
+            vc_id = str(payload["virtual_content_id"])
+            virtual_content = prefetched[vc_id]["virtual_content"]
+            completion_percentage = payload["completion_percentage"]
+            normalized_score = content_result_service.normalize_score(
+                payload["score"], payload["session_data"], completion_percentage
+            )
+
+            state = tracking_state.setdefault(vc_id, {
+                "tracking": dict(virtual_content.get("interaction_tracking") or {}),
+                "set": {},
+                "inc": {},
+            })
+            update_data, inc_operations = _build_interaction_tracking_update(
+                state["tracking"], completion_percentage, normalized_score,
+                payload["session_data"].get("time_spent")
+            )
+            state["set"].update(update_data)
+            for field, value in inc_operations.items():
+                state["inc"][field] = state["inc"].get(field, 0) + value
+            # Reflejar el efecto en el tracking en memoria para el siguiente resultado
+            for field, value in update_data.items():
+                if field.startswith("interaction_tracking."):
+                    state["tracking"][field.split(".", 1)[1]] = value
+            if "interaction_tracking.sessions" in inc_operations:
+                state["tracking"]["sessions"] = (state["tracking"].get("sessions", 0) or 0) + 1
+
+            if virtual_content.get("virtual_topic_id") and completion_percentage >= 100:
+                completed_topics.add(virtual_content["virtual_topic_id"])
+            if payload.get("topic_id"):
+                module_id = virtual_content.get("virtual_module_id") or virtual_content.get("module_id")
+                regrade_targets[str(payload["topic_id"])] = str(module_id) if module_id else None
+
+        if tracking_state:
+            get_db().virtual_topic_contents.bulk_write([
+                UpdateOne({"_id": ObjectId(vc_id)}, {"$set": state["set"], "$inc": state["inc"]})
+                for vc_id, state in tracking_state.items()
+            ], ordered=False)
+
+        for virtual_topic_id in completed_topics:
+            _refresh_virtual_topic_progress(virtual_topic_id, student_id)
+        for topic_id, module_id in regrade_targets.items():
+            _regrade_evaluations_async(student_id, topic_id, module_id)
+
+        errors.sort(key=lambda error: error["index"])
+        response_data = {
+            "inserted": inserted,
+            "errors": errors,
+            "inserted_count": len(inserted),
+            "error_count": len(errors),
+        }
+        if not inserted:
+            return APIRoute.error(
+                ErrorCodes.OPERATION_FAILED,
+                "No se registró ningún resultado",
+                details=response_data,
+                status_code=400
+            )
+        return APIRoute.success(
+            data=response_data,
+            message="Resultados registrados" if not errors else "Resultados registrados parcialmente",
+            status_code=201 if not errors else 207
+        )
+
+    except Exception as e:
+        logging.error(f"Error al registrar lote de resultados de contenido: {str(e)}")
+        return APIRoute.error(
+            ErrorCodes.SERVER_ERROR,
+            str(e),
+            status_code=500
+        )
+
+
 # Rutas para Métricas de UI y Optimización Automática
 @virtual_bp.route('/ui-metrics', methods=['POST'])
 @APIRoute.standard(
@@ -1013,6 +1203,17 @@ def list_virtual_modules():
     workspace_user_id = jwt_claims.get('workspace_user_id')
     class_id = jwt_claims.get('class_id')
     
+    # Listado compacto y paginado (keyset) cuando se solicita explícitamente
+    limit = parse_page_limit(request.args.get('limit'), default=None)
+    cursor = request.args.get('cursor')
+    include_topics = str(request.args.get('include_topics', '')).lower() in ('1', 'true', 'yes')
+    if limit or cursor or include_topics or request.args.get('view') == 'summary':
+        page = virtual_module_service.get_student_modules_page(
+            study_plan_id, student_id, workspace_type, workspace_user_id, class_id,
+            limit=limit, cursor=cursor, include_topics=include_topics
+        )
+        return APIRoute.success(data=page)
+
     modules = virtual_module_service.get_student_modules(
         study_plan_id, student_id, workspace_type, workspace_user_id, class_id
     )
@@ -1024,24 +1225,33 @@ def generate_virtual_topics(module_id: str, student_id: str, virtual_module_id:
     """
     try:
         # Obtener temas del módulo ordenados por 'order' o fecha de creación
-        topics = list(get_db().topics.find({
-            "module_id": ObjectId(module_id),
-            "published": True
-        }).sort([("order", 1), ("created_at", 1)]))
+        topics = list(get_db().topics.find(
+            {"module_id": ObjectId(module_id), "published": True},
+            {"_id": 1, "name": 1, "difficulty": 1, "order": 1, "created_at": 1}
+        ).sort([("order", 1), ("created_at", 1)]))
         
         if not topics:
             logging.warning(f"No se encontraron temas publicados para el módulo {module_id}. El módulo virtual se generará sin temas.")
             return True
+
+        # Resolver en una sola consulta qué temas ya tienen tema virtual para el estudiante
+        existing_by_topic = {
+            vt["topic_id"]: vt
+            for vt in get_db().virtual_topics.find(
+                {
+                    "topic_id": {"$in": [t["_id"] for t in topics]},
+                    "student_id": ObjectId(student_id)
+                },
+                {"_id": 1, "topic_id": 1}
+            )
+        }
         
         for idx, topic in enumerate(topics):
             topic_id = str(topic["_id"])
             is_locked = idx > 0
             
             # Verificar si ya existe un tema virtual para este estudiante y tema
-            existing = get_db().virtual_topics.find_one({
-                "topic_id": ObjectId(topic_id),
-                "student_id": ObjectId(student_id)
-            })
+            existing = existing_by_topic.get(topic["_id"])
             
             # Datos para crear/actualizar
             adaptations = {
@@ -1226,6 +1436,7 @@ def generate_personalized_content(topic_id: str, virtual_topic_id: str, cognitiv
                     if content.get("instance_id"):
                         virtual_content_payload["instance_id"] = content["instance_id"]
 
+                content_blob_store.retain_many(content_blob_refs(virtual_content_payload["content"]))
                 get_db().virtual_topic_contents.insert_one(virtual_content_payload)
                 
                 logging.debug(f"Contenido virtual creado: {content.get('content_type')} con personalización: {list(personalization_data.keys())}")
@@ -10,6 +10,13 @@ from src.shared.database import get_db
 from src.shared.constants import STATUS, COLLECTIONS
 from src.shared.standardization import BaseService, VerificationBaseService
 from src.shared.exceptions import AppException
+from src.shared.blob_store import content_blob_store, content_blob_refs
+from src.shared.pagination import (
+    build_keyset_filter,
+    decode_cursor,
+    merge_filters,
+    paginate_results,
+)
 from .models import (
     VirtualModule,
     VirtualTopic,
@@ -66,6 +73,54 @@ def _strip_heavy_fields(node: Any) -> Any:
     return node
 
 
+# Campos devueltos en los listados compactos de temas virtuales
+TOPIC_SUMMARY_PROJECTION = {
+    "_id": 1,
+    "topic_id": 1,
+    "virtual_module_id": 1,
+    "name": 1,
+    "order": 1,
+    "locked": 1,
+    "status": 1,
+    "progress": 1,
+    "completion_status": 1,
+    "updated_at": 1,
+}
+TOPIC_PAGE_SORT = [("order", 1), ("_id", 1)]
+
+# Campos devueltos en el listado de módulos virtuales (sin adaptaciones pesadas)
+MODULE_SUMMARY_PROJECTION = {
+    "_id": 1,
+    "module_id": 1,
+    "student_id": 1,
+    "study_plan_id": 1,
+    "name": 1,
+    "status": 1,
+    "progress": 1,
+    "completion_status": 1,
+    "generation_status": 1,
+    "generation_progress": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+MODULE_PAGE_SORT = [("_id", 1)]
+
+
+def _build_topic_summary(topic: Dict) -> Dict:
+    """Construye la fila compacta de un tema virtual."""
+    return {
+        "_id": str(topic["_id"]),
+        "topic_id": str(topic["topic_id"]) if topic.get("topic_id") else None,
+        "virtual_module_id": str(topic["virtual_module_id"]) if topic.get("virtual_module_id") else None,
+        "name": topic.get("name", ""),
+        "order": topic.get("order", 0),
+        "locked": topic.get("locked", False),
+        "status": topic.get("status", ""),
+        "progress": topic.get("progress", 0),
+        "completion_status": topic.get("completion_status", "not_started"),
+    }
+
+
 def _build_original_content_payload(raw_value: Any, light_mode: bool) -> Any:
     if not light_mode:
         return raw_value
@@ -212,6 +267,51 @@ class VirtualModuleService(VerificationBaseService):
             logging.error(f"Error al listar módulos virtuales: {str(e)}")
             return []
 
+    def get_student_modules_page(self, study_plan_id: str, student_id: str, workspace_type: str = None,
+                                 workspace_user_id: str = None, class_id: str = None,
+                                 limit: Optional[int] = None, cursor: Optional[str] = None,
+                                 include_topics: bool = False) -> Dict[str, Any]:
+        """
+        Variante paginada (keyset sobre _id) y proyectada de get_student_modules.
+
+        Si include_topics es True, adjunta a cada módulo el resumen compacto de sus
+        temas virtuales obtenido con una única consulta $in para toda la página.
+
+        Returns:
+            Dict con "modules" y "next_cursor"
+        """
+        module_query = {"study_plan_id": ObjectId(study_plan_id)}
+        if workspace_type and workspace_user_id:
+            from src.workspaces.services import WorkspaceService
+            workspace_service = WorkspaceService()
+            module_query = workspace_service.apply_workspace_filters(
+                module_query, workspace_type, workspace_user_id, class_id
+            )
+        module_ids = [m["_id"] for m in self.db.modules.find(module_query, {"_id": 1})]
+
+        virtual_module_query = merge_filters(
+            {"student_id": ObjectId(student_id), "module_id": {"$in": module_ids}},
+            build_keyset_filter(MODULE_PAGE_SORT, decode_cursor(cursor))
+        )
+        find_cursor = self.collection.find(virtual_module_query, MODULE_SUMMARY_PROJECTION).sort(MODULE_PAGE_SORT)
+        if limit:
+            find_cursor = find_cursor.limit(limit + 1)
+        vmods, next_cursor = paginate_results(list(find_cursor), MODULE_PAGE_SORT, limit)
+
+        topics_by_module = {}
+        if include_topics:
+            topics_by_module = VirtualTopicService().get_topic_summaries_by_module([vm["_id"] for vm in vmods])
+
+        for vm in vmods:
+            vm["_id"] = str(vm["_id"])
+            vm["module_id"] = str(vm["module_id"])
+            vm["student_id"] = str(vm["student_id"])
+            if vm.get("study_plan_id"):
+                vm["study_plan_id"] = str(vm["study_plan_id"])
+            if include_topics:
+                vm["topics"] = topics_by_module.get(vm["_id"], [])
+        return {"modules": vmods, "next_cursor": next_cursor}
+
     def get_module_progress(self, virtual_module_id: str) -> Dict[str, Any]:
         """
         Calcula y retorna el progreso actual de un módulo virtual.
@@ -473,6 +573,52 @@ class VirtualTopicService(VerificationBaseService):
             print(f"Error al obtener temas del módulo: {str(e)}")
             return []
 
+    def get_module_topics_page(self, module_id: str, limit: Optional[int] = None,
+                               cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Lista paginada (keyset sobre (order, _id)) y proyectada de los temas de un
+        módulo virtual. Cada fila es un resumen compacto sin adaptaciones ni contenidos.
+
+        Args:
+            module_id: ID del módulo virtual
+            limit: Tamaño de página (None = todos los temas)
+            cursor: Cursor devuelto en la página anterior
+
+        Returns:
+            Dict con "topics" y "next_cursor"
+        """
+        query = merge_filters(
+            {"virtual_module_id": ObjectId(module_id)},
+            build_keyset_filter(TOPIC_PAGE_SORT, decode_cursor(cursor))
+        )
+        find_cursor = self.collection.find(query, TOPIC_SUMMARY_PROJECTION).sort(TOPIC_PAGE_SORT)
+        if limit:
+            find_cursor = find_cursor.limit(limit + 1)
+
+        topics, next_cursor = paginate_results(list(find_cursor), TOPIC_PAGE_SORT, limit)
+        return {
+            "topics": [_build_topic_summary(topic) for topic in topics],
+            "next_cursor": next_cursor
+        }
+
+    def get_topic_summaries_by_module(self, virtual_module_ids: List[ObjectId]) -> Dict[str, List[Dict]]:
+        """
+        Obtiene en una sola consulta los resúmenes de temas de varios módulos virtuales.
+
+        Returns:
+            Dict virtual_module_id (str) -> lista de resúmenes ordenada por 'order'
+        """
+        grouped: Dict[str, List[Dict]] = defaultdict(list)
+        if not virtual_module_ids:
+            return grouped
+        cursor = self.collection.find(
+            {"virtual_module_id": {"$in": list(virtual_module_ids)}},
+            TOPIC_SUMMARY_PROJECTION
+        ).sort(TOPIC_PAGE_SORT)
+        for topic in cursor:
+            grouped[str(topic.get("virtual_module_id"))].append(_build_topic_summary(topic))
+        return grouped
+
     def get_topic_contents(self, virtual_topic_id: str, light_mode: bool = False, include_all_variants: bool = False) -> List[Dict]:
         """
         Obtiene todos los contenidos de un tema virtual específico.
@@ -496,6 +642,7 @@ class VirtualTopicService(VerificationBaseService):
                     .find({"virtual_topic_id": ObjectId(virtual_topic_id)})
                     .sort([("order", 1), ("created_at", 1)])
                 )
+                content_blob_store.resolve(virtual_contents)
 
             # Fallback: solo si no hay virtuales o se pidieron todas las variantes
             if include_all_variants or not virtual_contents:
@@ -508,6 +655,8 @@ class VirtualTopicService(VerificationBaseService):
                 original_contents = list(
                     self.db.topic_contents.find(topic_filter).sort([("order", 1), ("created_at", 1)])
                 )
+                if not light_mode:
+                    content_blob_store.resolve(original_contents)
                 fallback_contents = []
                 for content in original_contents:
                     ctype = (content.get("content_type") or "").lower()
@@ -565,6 +714,8 @@ class VirtualTopicService(VerificationBaseService):
                 # NUEVO: Enriquecer con datos del contenido original
                 original_content = self.db.topic_contents.find_one({"_id": content["content_id"]})
                 if original_content:
+                    if not light_mode:
+                        content_blob_store.resolve([original_content])
                     # Incluir personalization_markers y slide_template del contenido original
                     content["original_personalization_markers"] = original_content.get("personalization_markers", {})
                     content["original_slide_template"] = original_content.get("slide_template", "")
@@ -1713,6 +1864,8 @@ class FastVirtualModuleGenerator(VerificationBaseService):
                         "created_at": now,
                         "updated_at": now,
                     }
+                    # La copia de `content` comparte los blobs de HTML del original
+                    content_blob_store.retain_many(content_blob_refs(payload["content"]))
                     result = self.db.virtual_topic_contents.insert_one(payload)
                     payload["_id"] = result.inserted_id
                     virtual_by_original[original_id] = payload
@@ -1914,7 +2067,8 @@ class FastVirtualModuleGenerator(VerificationBaseService):
                 if content.get("instance_id"):
                     virtual_content_data["instance_id"] = content["instance_id"]
             
-            # Insertar contenido virtual
+            # Insertar contenido virtual (la copia de `content` comparte los blobs de HTML del original)
+            content_blob_store.retain_many(content_blob_refs(virtual_content_data["content"]))
             result = self.db.virtual_topic_contents.insert_one(virtual_content_data)
             logging.debug(f"Contenido virtual tradicional creado: {result.inserted_id} para tema {virtual_topic_id}")
             